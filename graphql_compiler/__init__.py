@@ -1,14 +1,20 @@
 # Copyright 2017-present Kensho Technologies, LLC.
 """Commonly-used functions and data types from this package."""
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from .compiler import (  # noqa
+    KEYSET_CURSOR_PARAMETER_NAME,
     CompilationResult,
+    CypherCompilationOptions,
+    GremlinCompilationOptions,
+    MatchCompilationOptions,
     OutputMetadata,
+    SQLCompilationOptions,
     compile_graphql_to_cypher,
     compile_graphql_to_gremlin,
     compile_graphql_to_match,
     compile_graphql_to_sql,
+    encode_keyset_cursor,
 )
 from .exceptions import (  # noqa
     GraphQLCompilationError,
@@ -38,7 +44,10 @@ __version__ = "1.11.0"
 
 
 def graphql_to_match(
-    common_schema_info: CommonSchemaInfo, graphql_query: str, parameters: Dict[str, Any]
+    common_schema_info: CommonSchemaInfo,
+    graphql_query: str,
+    parameters: Dict[str, Any],
+    compilation_options: Optional[MatchCompilationOptions] = None,
 ) -> CompilationResult:
     """Compile the GraphQL input using the schema into a MATCH query and associated metadata.
 
@@ -46,6 +55,8 @@ def graphql_to_match(
         common_schema_info: GraphQL schema object describing the schema of the graph to be queried
         graphql_query: str, GraphQL query to compile to MATCH
         parameters: dict, mapping argument name to its value, for every parameter the query expects.
+        compilation_options: optional MatchCompilationOptions controlling how this query is
+                             lowered. If not specified, the default options are used.
 
     Returns:
         CompilationResult object, containing:
@@ -54,14 +65,19 @@ def graphql_to_match(
             - output_metadata: dict, output name -> OutputMetadata namedtuple object
             - input_metadata: dict, name of input variables -> inferred GraphQL type, based on use
     """
-    compilation_result = compile_graphql_to_match(common_schema_info, graphql_query)
+    compilation_result = compile_graphql_to_match(
+        common_schema_info, graphql_query, compilation_options=compilation_options
+    )
     return compilation_result._replace(
         query=insert_arguments_into_query(compilation_result, parameters)
     )
 
 
 def graphql_to_sql(
-    sql_schema_info: SQLAlchemySchemaInfo, graphql_query: str, parameters: Dict[str, Any]
+    sql_schema_info: SQLAlchemySchemaInfo,
+    graphql_query: str,
+    parameters: Dict[str, Any],
+    compilation_options: Optional[SQLCompilationOptions] = None,
 ) -> CompilationResult:
     """Compile the GraphQL input using the schema into a SQL query and associated metadata.
 
@@ -69,6 +85,8 @@ def graphql_to_sql(
         sql_schema_info: SQLAlchemySchemaInfo used to compile the query.
         graphql_query: str, GraphQL query to compile to SQL
         parameters: dict, mapping argument name to its value, for every parameter the query expects.
+        compilation_options: optional SQLCompilationOptions controlling how this query is emitted.
+                             If not specified, the default options are used.
 
     Returns:
         CompilationResult object, containing:
@@ -79,20 +97,28 @@ def graphql_to_sql(
             - output_metadata: dict, output name -> OutputMetadata namedtuple object
             - input_metadata: dict, name of input variables -> inferred GraphQL type, based on use
     """
-    compilation_result = compile_graphql_to_sql(sql_schema_info, graphql_query)
+    compilation_result = compile_graphql_to_sql(
+        sql_schema_info, graphql_query, compilation_options=compilation_options
+    )
     return compilation_result._replace(
         query=insert_arguments_into_query(compilation_result, parameters)
     )
 
 
 def graphql_to_gremlin(
-    common_schema_info: CommonSchemaInfo, graphql_query: str, parameters: Dict[str, Any]
+    common_schema_info: CommonSchemaInfo,
+    graphql_query: str,
+    parameters: Dict[str, Any],
+    compilation_options: Optional[GremlinCompilationOptions] = None,
 ) -> CompilationResult:
     """Compile the GraphQL input using the schema into a Gremlin query and associated metadata.
 
     Args:
         common_schema_info: GraphQL schema object describing the schema of the graph to be queried
         graphql_query: str, GraphQL query to compile to Gremlin
+        parameters: dict, mapping argument name to its value, for every parameter the query expects.
+        compilation_options: optional GremlinCompilationOptions controlling how this query is
+                             lowered. If not specified, the default options are used.
 
     Returns:
         CompilationResult object, containing:
@@ -101,14 +127,19 @@ def graphql_to_gremlin(
             - output_metadata: dict, output name -> OutputMetadata namedtuple object
             - input_metadata: dict, name of input variables -> inferred GraphQL type, based on use
     """
-    compilation_result = compile_graphql_to_gremlin(common_schema_info, graphql_query)
+    compilation_result = compile_graphql_to_gremlin(
+        common_schema_info, graphql_query, compilation_options=compilation_options
+    )
     return compilation_result._replace(
         query=insert_arguments_into_query(compilation_result, parameters)
     )
 
 
 def graphql_to_redisgraph_cypher(
-    common_schema_info: CommonSchemaInfo, graphql_query: str, parameters: Dict[str, Any]
+    common_schema_info: CommonSchemaInfo,
+    graphql_query: str,
+    parameters: Dict[str, Any],
+    compilation_options: Optional[CypherCompilationOptions] = None,
 ) -> CompilationResult:
     """Compile the GraphQL input into a RedisGraph Cypher query and associated metadata.
 
@@ -122,6 +153,9 @@ def graphql_to_redisgraph_cypher(
     Args:
         common_schema_info: GraphQL schema object describing the schema of the graph to be queried
         graphql_query: str, GraphQL query to compile to Cypher
+        parameters: dict, mapping argument name to its value, for every parameter the query expects.
+        compilation_options: optional CypherCompilationOptions controlling how this query is
+                             lowered. If not specified, the default options are used.
 
     Returns:
         CompilationResult object, containing:
@@ -130,7 +164,9 @@ def graphql_to_redisgraph_cypher(
             - output_metadata: dict, output name -> OutputMetadata namedtuple object
             - input_metadata: dict, name of input variables -> inferred GraphQL type, based on use
     """
-    compilation_result = compile_graphql_to_cypher(common_schema_info, graphql_query)
+    compilation_result = compile_graphql_to_cypher(
+        common_schema_info, graphql_query, compilation_options=compilation_options
+    )
     return compilation_result._replace(
         query=insert_arguments_into_query(compilation_result, parameters)
     )
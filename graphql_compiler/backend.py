@@ -26,7 +26,8 @@ Backend = namedtuple(
         # The subclass of SchemaInfo appropriate for this backend.
         "SchemaInfoClass",
         # Given a SchemaInfoClass and an IR that respects its schema, return a lowered IR with
-        # the same semantics.
+        # the same semantics. Also accepts an optional lowering_pass_hook keyword argument,
+        # a function called with the LoweringPassStatistics of each lowering pass.
         "lower_func",
         # Given a SchemaInfoClass and a lowered IR that respects its schema, emit a query
         # in this language with the same semantics.
@@ -11,3 +11,14 @@ from .common import (  # noqa; noqa
     compile_graphql_to_sql,
 )
 from .compiler_frontend import OutputMetadata  # noqa
+from .emit_sql import SQLCompilationOptions  # noqa
+from .ir_lowering_common.pipeline import LoweringPassStatistics  # noqa
+from .ir_lowering_cypher import CypherCompilationOptions  # noqa
+from .ir_lowering_gremlin import GremlinCompilationOptions  # noqa
+from .ir_lowering_match import MatchCompilationOptions  # noqa
+from .keyset_pagination import (  # noqa
+    KEYSET_COLUMN_PREFIX,
+    KEYSET_CURSOR_PARAMETER_NAME,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+)
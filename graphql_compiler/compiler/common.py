@@ -1,11 +1,21 @@
 # Copyright 2017-present Kensho Technologies, LLC.
 from collections import namedtuple
-from typing import Union
+from functools import partial
+from typing import List, Optional, Union
 
+from graphql import GraphQLString
+
+from . import emit_cypher, emit_sql, ir_lowering_cypher, ir_lowering_gremlin, ir_lowering_match
 from .. import backend
 from ..backend import Backend
 from ..schema.schema_info import CommonSchemaInfo, SQLAlchemySchemaInfo
 from .compiler_frontend import graphql_to_ir
+from .emit_sql import SQLCompilationOptions
+from .ir_lowering_common.pipeline import LoweringPassStatistics
+from .ir_lowering_cypher import CypherCompilationOptions
+from .ir_lowering_gremlin import GremlinCompilationOptions
+from .ir_lowering_match import MatchCompilationOptions
+from .keyset_pagination import KEYSET_CURSOR_PARAMETER_NAME
 
 
 # The CompilationResult will have the following types for its members:
@@ -14,8 +24,13 @@ from .compiler_frontend import graphql_to_ir
 # - language: string, specifying the language to which the query was compiled
 # - output_metadata: dict, output name -> OutputMetadata namedtuple object
 # - input_metadata: dict, name of input variables -> inferred GraphQL type, based on use
+# - lowering_pass_statistics: tuple of LoweringPassStatistics, one for each lowering pass in the
+#                             order they were applied, if the lowering passes were recorded.
+#                             Otherwise, None.
 CompilationResult = namedtuple(
-    "CompilationResult", ("query", "language", "output_metadata", "input_metadata")
+    "CompilationResult",
+    ("query", "language", "output_metadata", "input_metadata", "lowering_pass_statistics"),
+    defaults=(None,),
 )
 
 MATCH_LANGUAGE = backend.match_backend.language
@@ -25,69 +40,155 @@ CYPHER_LANGUAGE = backend.cypher_backend.language
 
 
 def compile_graphql_to_match(
-    common_schema_info: CommonSchemaInfo, graphql_query: str
+    common_schema_info: CommonSchemaInfo,
+    graphql_query: str,
+    compilation_options: Optional[MatchCompilationOptions] = None,
+    record_lowering_passes: bool = False,
 ) -> CompilationResult:
     """Compile the GraphQL input using the schema into a MATCH query and associated metadata.
 
     Args:
         common_schema_info: GraphQL schema object describing the schema of the graph to be queried
         graphql_query: str, GraphQL query to compile to MATCH
+        compilation_options: optional MatchCompilationOptions controlling how this query is
+                             lowered. If not specified, the default options are used.
+        record_lowering_passes: if True, measure each lowering pass applied to the query, and
+                                return the measurements in the lowering_pass_statistics field
+                                of the result.
 
     Returns:
         CompilationResult object
     """
-    return _compile_graphql_generic(backend.match_backend, common_schema_info, graphql_query)
+    match_backend = backend.match_backend
+    if compilation_options is not None:
+        match_backend = match_backend._replace(
+            lower_func=partial(ir_lowering_match.lower_ir, compilation_options=compilation_options)
+        )
+    return _compile_graphql_generic(
+        match_backend,
+        common_schema_info,
+        graphql_query,
+        record_lowering_passes=record_lowering_passes,
+    )
 
 
 def compile_graphql_to_gremlin(
-    common_schema_info: CommonSchemaInfo, graphql_query: str
+    common_schema_info: CommonSchemaInfo,
+    graphql_query: str,
+    compilation_options: Optional[GremlinCompilationOptions] = None,
+    record_lowering_passes: bool = False,
 ) -> CompilationResult:
     """Compile the GraphQL input using the schema into a Gremlin query and associated metadata.
 
     Args:
         common_schema_info: GraphQL schema object describing the schema of the graph to be queried
         graphql_query: the GraphQL query to compile to Gremlin, as a string
+        compilation_options: optional GremlinCompilationOptions controlling how this query is
+                             lowered. If not specified, the default options are used.
+        record_lowering_passes: if True, measure each lowering pass applied to the query, and
+                                return the measurements in the lowering_pass_statistics field
+                                of the result.
 
     Returns:
         CompilationResult object
     """
-    return _compile_graphql_generic(backend.gremlin_backend, common_schema_info, graphql_query)
+    gremlin_backend = backend.gremlin_backend
+    if compilation_options is not None:
+        gremlin_backend = gremlin_backend._replace(
+            lower_func=partial(
+                ir_lowering_gremlin.lower_ir, compilation_options=compilation_options
+            )
+        )
+    return _compile_graphql_generic(
+        gremlin_backend,
+        common_schema_info,
+        graphql_query,
+        record_lowering_passes=record_lowering_passes,
+    )
 
 
 def compile_graphql_to_sql(
-    sql_schema_info: SQLAlchemySchemaInfo, graphql_query: str
+    sql_schema_info: SQLAlchemySchemaInfo,
+    graphql_query: str,
+    compilation_options: Optional[SQLCompilationOptions] = None,
+    record_lowering_passes: bool = False,
 ) -> CompilationResult:
     """Compile the GraphQL input using the schema into a SQL query and associated metadata.
 
     Args:
         sql_schema_info: SQLAlchemySchemaInfo used to compile the query.
         graphql_query: str, GraphQL query to compile to SQL
+        compilation_options: optional SQLCompilationOptions controlling how this query is emitted.
+                             If not specified, the default options are used.
+        record_lowering_passes: if True, measure each lowering pass applied to the query, and
+                                return the measurements in the lowering_pass_statistics field
+                                of the result.
 
     Returns:
         CompilationResult object
     """
-    return _compile_graphql_generic(backend.sql_backend, sql_schema_info, graphql_query)
+    sql_backend = backend.sql_backend
+    if compilation_options is not None:
+        sql_backend = sql_backend._replace(
+            emit_func=partial(emit_sql.emit_code_from_ir, compilation_options=compilation_options)
+        )
+    compilation_result = _compile_graphql_generic(
+        sql_backend, sql_schema_info, graphql_query, record_lowering_passes=record_lowering_passes
+    )
+    if compilation_options is not None and compilation_options.keyset_after_cursor:
+        # The cursor token is decoded into the query's bind parameters when it is executed.
+        compilation_result = compilation_result._replace(
+            input_metadata={
+                **compilation_result.input_metadata,
+                KEYSET_CURSOR_PARAMETER_NAME: GraphQLString,
+            }
+        )
+    return compilation_result
 
 
 def compile_graphql_to_cypher(
-    common_schema_info: CommonSchemaInfo, graphql_query: str
+    common_schema_info: CommonSchemaInfo,
+    graphql_query: str,
+    compilation_options: Optional[CypherCompilationOptions] = None,
+    record_lowering_passes: bool = False,
 ) -> CompilationResult:
     """Compile the GraphQL input using the schema into a Cypher query and associated metadata.
 
     Args:
         common_schema_info: GraphQL schema object describing the schema of the graph to be queried
         graphql_query: the GraphQL query to compile to Cypher, as a string
+        compilation_options: optional CypherCompilationOptions controlling how this query is
+                             lowered and emitted. If not specified, the default options are used.
+        record_lowering_passes: if True, measure each lowering pass applied to the query, and
+                                return the measurements in the lowering_pass_statistics field
+                                of the result.
 
     Returns:
         CompilationResult object
     """
-    return _compile_graphql_generic(backend.cypher_backend, common_schema_info, graphql_query)
+    cypher_backend = backend.cypher_backend
+    if compilation_options is not None:
+        cypher_backend = cypher_backend._replace(
+            lower_func=partial(
+                ir_lowering_cypher.lower_ir, compilation_options=compilation_options
+            ),
+            emit_func=partial(
+                emit_cypher.emit_code_from_ir, compilation_options=compilation_options
+            ),
+        )
+    return _compile_graphql_generic(
+        cypher_backend,
+        common_schema_info,
+        graphql_query,
+        record_lowering_passes=record_lowering_passes,
+    )
 
 
 def _compile_graphql_generic(
     target_backend: Backend,
     schema_info: Union[CommonSchemaInfo, SQLAlchemySchemaInfo],
     graphql_string: str,
+    record_lowering_passes: bool = False,
 ) -> CompilationResult:
     """Compile the GraphQL input, lowering and emitting the query using the given functions.
 
@@ -95,6 +196,9 @@ def _compile_graphql_generic(
         target_backend: Backend used to compile the query
         schema_info: target_backend.schemaInfoClass containing all necessary schema information.
         graphql_string: str, GraphQL query to compile to the target language
+        record_lowering_passes: if True, measure each lowering pass applied to the query, and
+                                return the measurements in the lowering_pass_statistics field
+                                of the result.
 
     Returns:
         CompilationResult object
@@ -105,11 +209,22 @@ def _compile_graphql_generic(
         type_equivalence_hints=schema_info.type_equivalence_hints,
     )
 
-    lowered_ir_blocks = target_backend.lower_func(schema_info, ir_and_metadata)
+    lowering_pass_statistics: Optional[List[LoweringPassStatistics]] = None
+    if record_lowering_passes:
+        lowering_pass_statistics = []
+        lowered_ir_blocks = target_backend.lower_func(
+            schema_info, ir_and_metadata, lowering_pass_hook=lowering_pass_statistics.append
+        )
+    else:
+        lowered_ir_blocks = target_backend.lower_func(schema_info, ir_and_metadata)
+
     query = target_backend.emit_func(schema_info, lowered_ir_blocks)
     return CompilationResult(
         query=query,
         language=target_backend.language,
         output_metadata=ir_and_metadata.output_metadata,
         input_metadata=ir_and_metadata.input_metadata,
+        lowering_pass_statistics=(
+            None if lowering_pass_statistics is None else tuple(lowering_pass_statistics)
+        ),
     )
@@ -11,17 +11,51 @@ from sqlalchemy.sql.selectable import CTE, Alias
 from ..global_utils import is_same_type
 
 
+# Names of the keyword args with which CompilerEntity objects were constructed, in sorted order.
+# Entities of the same class are nearly always constructed with the same keyword args, so each
+# distinct tuple of names is stored once, and shared between all entities constructed with it.
+_interned_print_kwarg_names: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
 @six.python_2_unicode_compatible
 @six.add_metaclass(ABCMeta)
 class CompilerEntity(object):
-    """An abstract compiler entity. Can represent things like basic blocks and expressions."""
+    """An abstract compiler entity. Can represent things like basic blocks and expressions.
 
-    __slots__ = ("_print_args", "_print_kwargs")
+    Every entity records the args and kwargs it was constructed with, for printing, comparison,
+    and rewriting purposes. Since the IR of large queries contains many entities, they are stored
+    compactly: the values of all args and kwargs are kept in a single tuple, together with the
+    shared tuple of kwarg names. The args and kwargs themselves are only rebuilt when requested.
+    """
+
+    __slots__ = ("_print_values", "_print_kwarg_names")
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         """Construct a new CompilerEntity."""
-        self._print_args = args
-        self._print_kwargs = kwargs
+        if kwargs:
+            kwarg_names = tuple(sorted(kwargs))
+            self._print_kwarg_names = _interned_print_kwarg_names.setdefault(
+                kwarg_names, kwarg_names
+            )
+            self._print_values = args + tuple(kwargs[name] for name in kwarg_names)
+        else:
+            self._print_kwarg_names = ()
+            self._print_values = args
+
+    @property
+    def _print_args(self) -> Tuple[Any, ...]:
+        """Return the args with which this CompilerEntity was constructed."""
+        if not self._print_kwarg_names:
+            return self._print_values
+        return self._print_values[: -len(self._print_kwarg_names)]
+
+    @property
+    def _print_kwargs(self) -> Dict[str, Any]:
+        """Return a new dict of the kwargs with which this CompilerEntity was constructed."""
+        if not self._print_kwarg_names:
+            return {}
+        kwarg_values = self._print_values[-len(self._print_kwarg_names) :]
+        return dict(zip(self._print_kwarg_names, kwarg_values))
 
     @abstractmethod
     def validate(self) -> None:
@@ -30,16 +64,17 @@ class CompilerEntity(object):
 
     def __str__(self) -> str:
         """Return a human-readable unicode representation of this CompilerEntity."""
+        print_args = self._print_args
+        print_kwargs = self._print_kwargs
+
         printed_args = []
-        if self._print_args:
+        if print_args:
             printed_args.append("{args}")
-        if self._print_kwargs:
+        if print_kwargs:
             printed_args.append("{kwargs}")
 
         template = "{cls_name}(" + ", ".join(printed_args) + ")"
-        return template.format(
-            cls_name=type(self).__name__, args=self._print_args, kwargs=self._print_kwargs
-        )
+        return template.format(cls_name=type(self).__name__, args=print_args, kwargs=print_kwargs)
 
     def __repr__(self) -> str:
         """Return a human-readable str representation of the CompilerEntity object."""
@@ -48,23 +83,30 @@ class CompilerEntity(object):
     # pylint: disable=protected-access
     def __eq__(self, other: Any) -> bool:
         """Return True if the CompilerEntity objects are equal, and False otherwise."""
+        if self is other:
+            # IR rewrites reuse unchanged entities, so comparing an entity with itself is common.
+            return True
+
         if type(self) != type(other):
             return False
 
-        if len(self._print_args) != len(other._print_args):
+        if self._print_kwarg_names != other._print_kwarg_names:
+            return False
+
+        if len(self._print_values) != len(other._print_values):
             return False
 
         # The args sometimes contain GraphQL type objects, which unfortunately do not define "==".
         # We have to split them out and compare them using "is_same_type()" instead.
-        for self_arg, other_arg in six.moves.zip(self._print_args, other._print_args):
-            if is_type(self_arg):
-                if not is_same_type(self_arg, other_arg):
+        for self_value, other_value in six.moves.zip(self._print_values, other._print_values):
+            if is_type(self_value):
+                if not is_same_type(self_value, other_value):
                     return False
             else:
-                if self_arg != other_arg:
+                if self_value != other_value:
                     return False
 
-        return self._print_kwargs == other._print_kwargs
+        return True
 
     # pylint: enable=protected-access
 
@@ -5,6 +5,7 @@ from itertools import chain
 from . import cypher_helpers
 from .blocks import Fold, QueryRoot, Recurse, Traverse
 from .cypher_query import CypherStep
+from .expressions import FoldedContextField
 from .helpers import FoldScopeLocation
 
 
@@ -247,13 +248,143 @@ def _emit_fold_scope(cypher_query):
     return query_data
 
 
+def _get_folded_locations_with_outputs(cypher_query):
+    """Return the set of FoldScopeLocations at which the query outputs any fields."""
+    folded_locations = set()
+    for output_expression in cypher_query.output_block.fields.values():
+        if isinstance(output_expression, FoldedContextField):
+            folded_locations.add(output_expression.fold_scope_location.at_vertex())
+    return folded_locations
+
+
+def _emit_pattern_comprehension(fold_path_cypher_steps):
+    """Return a pattern comprehension collecting the vertices at the end of the given fold path.
+
+    Args:
+        fold_path_cypher_steps: list of CypherStep objects, the steps of a fold scope from its
+                                first step up to and including the step whose vertices to collect
+
+    Returns:
+        string, a Cypher list expression containing each vertex at the end of the fold path
+        that is reachable along the path while satisfying the filters of each of its steps
+    """
+    first_step = fold_path_cypher_steps[0]
+    pattern = "(%s)" % cypher_helpers.get_unique_vertex_name_from_location(
+        first_step.linked_location
+    )
+
+    predicates = []
+    for cypher_step in fold_path_cypher_steps:
+        if isinstance(cypher_step.step_block, Fold):
+            direction, edge_name = cypher_step.step_block.fold_scope_location.fold_path[0]
+        else:
+            direction = cypher_step.step_block.direction
+            edge_name = cypher_step.step_block.edge_name
+
+        edge_pattern = {
+            "in": "<-[:%s]-",
+            "out": "-[:%s]->",
+        }[direction] % edge_name
+        vertex_name = cypher_helpers.get_unique_vertex_name_from_location(
+            cypher_step.as_block.location
+        )
+        pattern += "%s(%s:%s)" % (
+            edge_pattern,
+            vertex_name,
+            ":".join(sorted(cypher_step.step_types)),
+        )
+
+        if cypher_step.where_block is not None:
+            predicates.append(cypher_step.where_block.predicate.to_cypher())
+
+    if predicates:
+        pattern += " WHERE " + " AND ".join(predicates)
+
+    return "[%s | %s]" % (pattern, vertex_name)
+
+
+def _emit_fold_scopes_as_pattern_comprehensions(cypher_query):
+    """Return a WITH clause computing the outputs of each fold scope with pattern comprehensions.
+
+    Emitting each fold scope as OPTIONAL MATCH clauses followed by a WITH clause that collects
+    the matched vertices (see _emit_fold_scope()) first expands every result row into one row per
+    path through the fold scope, and then aggregates the rows back together. With several fold
+    scopes, the intermediate rows grow with the product of their sizes. Instead, this emits one
+    WITH clause, with a pattern comprehension per folded location at which the query outputs
+    fields. Each pattern comprehension is evaluated separately for each result row, so there is
+    no cross-product growth, and no aggregation. For example, the query in the docstring of
+    _emit_fold_scope() becomes:
+
+    MATCH (Animal___1:Animal)
+    WITH
+      Animal___1 AS Animal___1,
+      [(Animal___1)<-[:Animal_ParentOf]-(Animal__in_Animal_ParentOf___1:Animal) |
+        Animal__in_Animal_ParentOf___1] AS collected_Animal__in_Animal_ParentOf___1,
+      [(Animal___1)-[:Animal_ParentOf]->(Animal__out_Animal_ParentOf___1:Animal) |
+        Animal__out_Animal_ParentOf___1] AS collected_Animal__out_Animal_ParentOf___1
+    RETURN
+      ...
+
+    Args:
+        cypher_query: CypherQuery object compiled from the given GraphQL query.
+
+    Returns:
+        list of strings that, when concatenated in order, form the WITH clause.
+    """
+    folded_locations_with_outputs = _get_folded_locations_with_outputs(cypher_query)
+
+    with_clause_components = {}  # alias name -> expression bound to that alias
+    for cypher_step in cypher_query.steps:
+        location_name = cypher_helpers.get_unique_vertex_name_from_location(
+            cypher_step.as_block.location
+        )
+        with_clause_components[location_name] = location_name
+
+    for fold_scope_location in sorted(cypher_query.folds.keys()):
+        fold_scope_cypher_steps = cypher_query.folds[fold_scope_location]
+        for step_index, cypher_step in enumerate(fold_scope_cypher_steps):
+            location = cypher_step.as_block.location
+            if location not in folded_locations_with_outputs:
+                continue
+
+            collected_name = cypher_helpers.get_collected_vertex_list_name(
+                cypher_helpers.get_fold_scope_location_full_path_name(location)
+            )
+            with_clause_components[collected_name] = _emit_pattern_comprehension(
+                fold_scope_cypher_steps[: step_index + 1]
+            )
+
+    query_data = ["WITH"]
+    # Sort the aliases, to ensure a deterministic order.
+    for index, alias_name in enumerate(sorted(with_clause_components)):
+        if index > 0:
+            query_data.append(",")
+        query_data.append("\n  %s AS %s" % (with_clause_components[alias_name], alias_name))
+    query_data.append("\n")
+    return query_data
+
+
 ##############
 # Public API #
 ##############
 
 
-def emit_code_from_ir(schema_info, cypher_query):
-    """Return a Cypher query string from a CypherQuery object."""
+def emit_code_from_ir(schema_info, cypher_query, compilation_options=None):
+    """Return a Cypher query string from a CypherQuery object.
+
+    Args:
+        schema_info: CommonSchemaInfo containing all relevant schema information
+        cypher_query: CypherQuery object to emit
+        compilation_options: optional CypherCompilationOptions controlling how the query is
+                             emitted. If not specified, the default options are used.
+
+    Returns:
+        string, the Cypher query
+    """
+    use_pattern_comprehensions_for_folds = (
+        compilation_options is not None and compilation_options.use_pattern_comprehensions_for_folds
+    )
+
     # According to the Cypher Query Language Reference [0], the standard Cypher version is
     # Cypher 9 (page 196) and we should be able to specify the Cypher version in the query.
     # Unfortunately, this turns out to be invalid in both Neo4j and RedisGraph-- Neo4j supports
@@ -269,7 +400,7 @@ def emit_code_from_ir(schema_info, cypher_query):
     for cypher_step in cypher_query.steps:
         query_data.append(_emit_code_from_cypher_step(cypher_step))
 
-    if cypher_query.folds:
+    if cypher_query.folds and not use_pattern_comprehensions_for_folds:
         query_data.extend(_emit_fold_scope(cypher_query))
 
     if cypher_query.global_where_block is not None:
@@ -280,6 +411,11 @@ def emit_code_from_ir(schema_info, cypher_query):
         query_data.append(cypher_query.global_where_block.predicate.to_cypher())
         query_data.append("\n")
 
+    if cypher_query.folds and use_pattern_comprehensions_for_folds:
+        # The global filters don't depend on the fold scopes, so applying them first
+        # avoids evaluating the pattern comprehensions for rows that are filtered out.
+        query_data.extend(_emit_fold_scopes_as_pattern_comprehensions(cypher_query))
+
     query_data.append("RETURN")
     output_fields = cypher_query.output_block.fields
     sorted_output_keys = sorted(output_fields.keys())
@@ -1,24 +1,26 @@
 # Copyright 2018-present Kensho Technologies, LLC.
 """Transform a SqlNode tree into an executable SQLAlchemy query."""
 from dataclasses import dataclass
-from typing import AbstractSet, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+from typing import AbstractSet, Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
 
 import six
 import sqlalchemy
 from sqlalchemy import select
+from sqlalchemy.dialects import mssql, postgresql
 from sqlalchemy.dialects.mssql.base import MSDialect
 from sqlalchemy.dialects.postgresql.base import PGDialect
 from sqlalchemy.engine.default import DefaultDialect
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql import expression
 from sqlalchemy.sql.compiler import _CompileLabel
-from sqlalchemy.sql.elements import Label
+from sqlalchemy.sql.elements import ClauseElement, Label
 from sqlalchemy.sql.expression import Alias, BinaryExpression
 from sqlalchemy.sql.functions import func
 from sqlalchemy.sql.schema import Column
 from sqlalchemy.sql.selectable import FromClause, Join, Select
 
 from . import blocks
+from ..exceptions import GraphQLCompilationError, GraphQLInvalidArgumentError
 from ..global_utils import VertexPath
 from ..schema import COUNT_META_FIELD_NAME
 from ..schema.schema_info import (
@@ -29,27 +31,88 @@ from ..schema.schema_info import (
 )
 from .compiler_entities import BasicBlock
 from .compiler_frontend import IrAndMetadata
-from .expressions import ContextField, Expression
-from .helpers import (
-    BaseLocation,
-    FoldPath,
-    FoldScopeLocation,
-    Location,
-    QueryPath,
-    get_edge_direction_and_name,
-    get_vertex_path,
+from .expressions import (
+    ContextField,
+    Expression,
+    FoldCountContextField,
+    FoldedContextField,
+    GlobalContextField,
+    LocalField,
+    OutputContextField,
 )
+from .helpers import BaseLocation, FoldPath, FoldScopeLocation, Location, QueryPath
+from .ir_lowering_sql import ContextColumn
+from .keyset_pagination import KEYSET_COLUMN_PREFIX, KEYSET_LAST_SEEN_PARAMETER_PREFIX
 from .metadata import LocationInfo
+from .sqlalchemy_extensions import CollectionMembership
 
 
 # Some reserved column names used in emitted SQL queries
 CTE_DEPTH_NAME = "__cte_depth"
 CTE_KEY_NAME = "__cte_key"
+CTE_PATH_NAME = "__cte_path"
+
+# Delimiter surrounding each primary key in the string-encoded recursion paths used by MSSQL.
+MSSQL_CTE_PATH_DELIMITER = "|"
 
 # Formatting strings for intermediate queries/outputs from folds
 FOLD_OUTPUT_FORMAT_STRING = "fold_output_{}"
 FOLD_SUBQUERY_FORMAT_STRING = "folded_subquery_{}"
 
+# Key identifying the alias of a location in the query: the query path of the location, and the
+# fold path if the location is inside a fold.
+AliasKey = Tuple[QueryPath, Optional[FoldPath]]
+
+
+@dataclass(frozen=True)
+class SQLCompilationOptions:
+    """Per-query options controlling how the SQL query is emitted.
+
+    The default value of each option produces the same SQL as if no options were specified.
+    """
+
+    # Whether @recurse should skip vertices already visited on the current recursion path.
+    # Without this, cycles in the data are followed repeatedly until the recursion depth is
+    # reached, which on graph-shaped data produces exponentially many intermediate rows.
+    # With it, the recursive CTE carries the primary keys visited so far (as an array on
+    # PostgreSQL, and as a delimited string on MSSQL) and stops at any vertex already on the path.
+    # Note that this changes the results of queries over cyclic data: a vertex is then produced
+    # once per simple path leading to it, rather than once per walk of at most the given depth.
+    # On MSSQL, primary key values must not contain the "|" character.
+    prune_recursion_cycles: bool = False
+
+    # Largest collection that in_collection and not_in_collection filters pass to the database
+    # as an IN list with one parameter per element. Larger collections are passed as a single
+    # parameter instead: an array on PostgreSQL, and a JSON array read with OPENJSON on MSSQL
+    # (which requires SQL Server 2016 or newer). The semantics of the filter are unchanged.
+    # Set to None to always use IN lists.
+    large_collection_threshold: Optional[int] = 1000
+
+    # If set, the query uses keyset pagination and returns at most this many results.
+    # Results are ordered by the primary keys of all vertices visited outside of @fold scopes,
+    # which are output in extra columns named with the KEYSET_COLUMN_PREFIX. Queries with
+    # @optional or @recurse cannot be keyset-paginated, since their results are not uniquely
+    # identified by those primary keys.
+    keyset_page_size: Optional[int] = None
+
+    # If set, the query only returns the results after the last result of the previous page.
+    # The cursor token returned by encode_keyset_cursor for that result is a runtime parameter
+    # named KEYSET_CURSOR_PARAMETER_NAME, so the same compiled query fetches every page after the
+    # first one. Only valid if keyset_page_size is set.
+    keyset_after_cursor: bool = False
+
+
+def _set_large_collection_threshold(query: Select, threshold: Optional[int]) -> None:
+    """Set the threshold of every collection membership check in the query, in place."""
+
+    def visit_collection_membership(collection_membership: CollectionMembership) -> None:
+        """Set the threshold of a single collection membership check."""
+        collection_membership.large_collection_threshold = threshold
+
+    sqlalchemy.sql.visitors.traverse(
+        query, {}, {CollectionMembership.__visit_name__: visit_collection_membership}
+    )
+
 
 def _get_primary_key_name(alias: Alias, vertex_type_name: str, directive_name: str) -> str:
     """Return the name of the single-column primary key for the alias.
@@ -118,73 +181,155 @@ def _traverse_and_validate_blocks(ir: IrAndMetadata) -> Iterator[BasicBlock]:
         yield block
 
 
-def _find_used_columns(
-    sql_schema_info: SQLAlchemySchemaInfo, ir: IrAndMetadata
-) -> Dict[VertexPath, Set[str]]:
-    """For each query path, find which of its columns would be used in the resulting query."""
-    # TODO(bojanserafimov): The IR only talks about fields, and the query builder that emits
-    #                       sql interprets them as columns in some complicated way. This function
-    #                       spec implicitly depends on the implementation of the sql emitter in
-    #                       this module, as it tries to predict what columns it will use.
-    #
-    #                       It would be much cleaner to go the other way: To define here what
-    #                       the field->column conversion strategy is, specify what columns are
-    #                       considered "used", and put the burden on the query builder to respect
-    #                       that: to expose all "used" columns when encapsulating with subqueries
-    #                       or CTEs, and only ask for "used" columns from those encapsulations.
-    used_columns: Dict[VertexPath, Set[str]] = {}
-
-    # Find filters used
-    for location, _ in ir.query_metadata_table.registered_locations:
-        for filter_info in ir.query_metadata_table.get_filter_infos(location):
-            for field in filter_info.fields:
-                used_columns.setdefault(get_vertex_path(location), set()).add(field)
-
-    # Find columns used to emit edges
-    for location, location_info in ir.query_metadata_table.registered_locations:
-        for child_location in ir.query_metadata_table.get_child_locations(location):
-            edge_direction, edge_name = get_edge_direction_and_name(
-                get_vertex_path(child_location)[-1]
+def _get_alias_key(location: BaseLocation) -> AliasKey:
+    """Return the key under which the alias for the given location is stored."""
+    if isinstance(location, FoldScopeLocation):
+        return (location.base_location.query_path, location.fold_path)
+    elif isinstance(location, Location):
+        return (location.query_path, None)
+    else:
+        raise AssertionError(
+            f"Expected a Location or a FoldScopeLocation, but got {type(location)}: {location}."
+        )
+
+
+def _find_expression_column_uses(
+    expression: Expression, current_location: Optional[BaseLocation]
+) -> Dict[AliasKey, Set[str]]:
+    """Find the columns of each alias that the expression reads when emitted as SQL."""
+    column_uses: Dict[AliasKey, Set[str]] = {}
+
+    def visitor_fn(expression_to_visit: Expression) -> Expression:
+        """Record the columns read by the visited expression, if any."""
+        if isinstance(expression_to_visit, LocalField):
+            if isinstance(current_location, Location):
+                column_uses.setdefault(_get_alias_key(current_location), set()).add(
+                    expression_to_visit.field_name
+                )
+        elif isinstance(
+            expression_to_visit, (ContextField, GlobalContextField, OutputContextField)
+        ):
+            location = expression_to_visit.location
+            if isinstance(location, Location) and location.field is not None:
+                column_uses.setdefault(_get_alias_key(location), set()).add(location.field)
+        elif isinstance(expression_to_visit, ContextColumn):
+            column_uses.setdefault((expression_to_visit.vertex_query_path, None), set()).add(
+                expression_to_visit.column_name
             )
-            vertex_field_name = f"{edge_direction}_{edge_name}"
-            edge = sql_schema_info.join_descriptors[location_info.type.name][vertex_field_name]
-            if isinstance(edge, DirectJoinDescriptor):
-                columns_at_location = {edge.from_column}
-                columns_at_child = {edge.to_column}
-            elif isinstance(edge, CompositeJoinDescriptor):
-                columns_at_location = {column_pair[0] for column_pair in edge.column_pairs}
-                columns_at_child = {column_pair[1] for column_pair in edge.column_pairs}
-            else:
-                raise AssertionError(f"Unknown join descriptor type {edge}: {type(edge)}")
-
-            used_columns.setdefault(get_vertex_path(location), set()).update(columns_at_location)
-            used_columns.setdefault(get_vertex_path(child_location), set()).update(columns_at_child)
-
-            # Check if the edge is recursive
-            child_location_info = ir.query_metadata_table.get_location_info(child_location)
-            if child_location_info.recursive_scopes_depth > location_info.recursive_scopes_depth:
-                # The primary key may be used if the recursive cte base semijoins to
-                # the pre-recurse cte by primary key.
-                alias = sql_schema_info.vertex_name_to_table[location_info.type.name].alias()
-                primary_keys = {column.name for column in alias.primary_key}
-                used_columns.setdefault(get_vertex_path(location), set()).update(primary_keys)
-
-                # The from_column is used at the destination as well, inside the recursive step
-                used_columns.setdefault(get_vertex_path(child_location), set()).update(
-                    columns_at_location
+        elif isinstance(expression_to_visit, (FoldedContextField, FoldCountContextField)):
+            fold_scope_location = expression_to_visit.fold_scope_location
+            field = fold_scope_location.field
+            if field is not None:
+                column_uses.setdefault(_get_alias_key(fold_scope_location), set()).add(
+                    FOLD_OUTPUT_FORMAT_STRING.format(field)
                 )
+        return expression_to_visit
 
-    # Find outputs used
-    for _, output_info in ir.query_metadata_table.outputs:
-        query_path = get_vertex_path(output_info.location)
-        used_columns.setdefault(query_path, set()).add(output_info.location.field)
+    expression.visit_and_update(visitor_fn)
+    return column_uses
+
+
+def _find_live_columns_at_recursions(
+    sql_schema_info: SQLAlchemySchemaInfo, ir: IrAndMetadata
+) -> Dict[QueryPath, Dict[AliasKey, Set[str]]]:
+    """For each @recurse, find which columns of each alias are read by it or any later block.
 
-    # Find tags used
-    for _, tag_info in ir.query_metadata_table.tags:
-        query_path = get_vertex_path(tag_info.location)
-        used_columns.setdefault(query_path, set()).add(tag_info.location.field)
+    Before a @recurse, the query so far may be wrapped into a CTE, and the recursive CTE itself
+    only needs to carry the columns that the rest of the query reads. Any column only needed for
+    filters or joins that were already emitted inside the CTE can be dropped from its SELECT list,
+    which keeps the materialized CTE narrow.
 
-    return used_columns
+    Args:
+        sql_schema_info: SQLAlchemySchemaInfo containing all relevant schema information
+        ir: IrAndMetadata containing query information with lowered blocks
+
+    Returns:
+        dict mapping the query path of each @recurse destination vertex to a dict of
+        alias key -> names of columns read at that alias by the Recurse block or any block after it
+    """
+    # The columns each block reads in block order, together with the query path of the
+    # destination vertex for Recurse blocks.
+    block_column_uses: List[Tuple[Dict[AliasKey, Set[str]], Optional[QueryPath]]] = []
+
+    current_location: Optional[BaseLocation] = None
+    for block in ir.ir_blocks:
+        column_uses: Dict[AliasKey, Set[str]] = {}
+        recursion_destination: Optional[QueryPath] = None
+        if isinstance(block, blocks.QueryRoot):
+            current_location = ir.query_metadata_table.root_location
+        elif isinstance(block, blocks.Backtrack):
+            current_location = block.location
+        elif isinstance(block, (blocks.Traverse, blocks.Recurse)):
+            if current_location is None:
+                raise AssertionError(f"Found {block} in global scope: {ir.ir_blocks}")
+            vertex_field = f"{block.direction}_{block.edge_name}"
+            location_info = ir.query_metadata_table.get_location_info(current_location)
+            edge = sql_schema_info.join_descriptors[location_info.type.name][vertex_field]
+            if isinstance(current_location, Location):
+                if isinstance(block, blocks.Recurse):
+                    # The recursion is joined to the rest of the query by primary key.
+                    alias = sql_schema_info.vertex_name_to_table[location_info.type.name].alias()
+                    column_uses[_get_alias_key(current_location)] = {
+                        column.name for column in alias.primary_key
+                    }
+                elif isinstance(edge, DirectJoinDescriptor):
+                    column_uses[_get_alias_key(current_location)] = {edge.from_column}
+                elif isinstance(edge, CompositeJoinDescriptor):
+                    column_uses[_get_alias_key(current_location)] = {
+                        from_column for from_column, _ in edge.column_pairs
+                    }
+                else:
+                    raise AssertionError(f"Unknown join descriptor type {edge}: {type(edge)}")
+            current_location = current_location.navigate_to_subpath(vertex_field)
+            if isinstance(block, blocks.Recurse) and isinstance(current_location, Location):
+                recursion_destination = current_location.query_path
+        elif isinstance(block, (blocks.Fold, blocks.Unfold)):
+            if isinstance(block, blocks.Fold):
+                fold_scope_location = block.fold_scope_location
+                current_location = fold_scope_location
+            elif isinstance(current_location, FoldScopeLocation):
+                fold_scope_location = current_location
+                current_location = current_location.base_location
+            else:
+                raise AssertionError(f"Found {block} outside of a fold: {ir.ir_blocks}")
+
+            # The fold subquery reads the column it joins from at the vertex outside the fold,
+            # and is grouped by and joined to the rest of the query by primary key.
+            base_location = fold_scope_location.base_location
+            location_info = ir.query_metadata_table.get_location_info(base_location)
+            alias = sql_schema_info.vertex_name_to_table[location_info.type.name].alias()
+            edge_direction, edge_name = fold_scope_location.fold_path[0]
+            edge = sql_schema_info.join_descriptors[location_info.type.name][
+                f"{edge_direction}_{edge_name}"
+            ]
+            base_columns = {column.name for column in alias.primary_key}
+            if isinstance(edge, DirectJoinDescriptor):
+                base_columns.add(edge.from_column)
+            column_uses[_get_alias_key(base_location)] = base_columns
+        elif isinstance(block, blocks.GlobalOperationsStart):
+            current_location = None
+        elif isinstance(block, blocks.Filter):
+            column_uses = _find_expression_column_uses(block.predicate, current_location)
+        elif isinstance(block, blocks.ConstructResult):
+            for field in block.fields.values():
+                for alias_key, columns in six.iteritems(
+                    _find_expression_column_uses(field, current_location)
+                ):
+                    column_uses.setdefault(alias_key, set()).update(columns)
+        block_column_uses.append((column_uses, recursion_destination))
+
+    # Walk the blocks backwards, accumulating the columns that are live at each @recurse.
+    live_columns: Dict[AliasKey, Set[str]] = {}
+    live_columns_at_recursions: Dict[QueryPath, Dict[AliasKey, Set[str]]] = {}
+    for column_uses, recursion_destination in reversed(block_column_uses):
+        for alias_key, columns in six.iteritems(column_uses):
+            live_columns.setdefault(alias_key, set()).update(columns)
+        if recursion_destination is not None:
+            live_columns_at_recursions[recursion_destination] = {
+                alias_key: set(columns) for alias_key, columns in six.iteritems(live_columns)
+            }
+
+    return live_columns_at_recursions
 
 
 def _find_tagged_parameters(expression_from_filter: Expression) -> bool:
@@ -742,6 +887,124 @@ class FoldSubqueryBuilder(object):
         return fold_subquery, self._output_vertex_location
 
 
+def _get_mssql_recursion_path_entry(primary_key_column: Column) -> BinaryExpression:
+    """Return the delimited string representation of the primary key in MSSQL recursion paths."""
+    delimiter = expression.literal_column(f"'{MSSQL_CTE_PATH_DELIMITER}'")
+    return delimiter + sqlalchemy.cast(primary_key_column, mssql.NVARCHAR(length="max")) + delimiter
+
+
+def _get_recursion_path_start(dialect: DefaultDialect, primary_key_column: Column) -> Any:
+    """Return a recursion path containing only the vertex with the given primary key.
+
+    PostgreSQL represents recursion paths as arrays of primary keys. MSSQL does not support
+    arrays, so it represents them as strings of delimited primary keys instead.
+
+    Args:
+        dialect: dialect to which the query will be compiled.
+        primary_key_column: primary key column of the vertex at which the recursion starts.
+
+    Returns:
+        SQLAlchemy expression for the recursion path
+    """
+    if isinstance(dialect, PGDialect):
+        return postgresql.array([primary_key_column])
+    elif isinstance(dialect, MSDialect):
+        # Recursive CTEs in MSSQL require the types of the base and the recursive step to
+        # match exactly, so the path is always cast to the same type.
+        return sqlalchemy.cast(
+            _get_mssql_recursion_path_entry(primary_key_column), mssql.NVARCHAR(length="max")
+        )
+    else:
+        raise NotImplementedError(
+            "Pruning recursion cycles is only supported for MSSQL and PostgreSQL, "
+            f"dialect was set to {dialect.name}."
+        )
+
+
+def _get_extended_recursion_path(
+    dialect: DefaultDialect, path_column: Column, primary_key_column: Column
+) -> Any:
+    """Return the given recursion path, extended with the vertex with the given primary key."""
+    if isinstance(dialect, PGDialect):
+        return func.array_append(path_column, primary_key_column)
+    elif isinstance(dialect, MSDialect):
+        # The path already ends with a delimiter, so only the trailing delimiter is needed.
+        delimiter = expression.literal_column(f"'{MSSQL_CTE_PATH_DELIMITER}'")
+        return sqlalchemy.cast(
+            path_column
+            + sqlalchemy.cast(primary_key_column, mssql.NVARCHAR(length="max"))
+            + delimiter,
+            mssql.NVARCHAR(length="max"),
+        )
+    else:
+        raise NotImplementedError(
+            "Pruning recursion cycles is only supported for MSSQL and PostgreSQL, "
+            f"dialect was set to {dialect.name}."
+        )
+
+
+def _get_recursion_path_exclusion(
+    dialect: DefaultDialect, path_column: Column, primary_key_column: Column
+) -> Any:
+    """Return a predicate that is true iff the vertex with the given key is not on the path."""
+    if isinstance(dialect, PGDialect):
+        return primary_key_column != sqlalchemy.all_(path_column)
+    elif isinstance(dialect, MSDialect):
+        return func.CHARINDEX(
+            _get_mssql_recursion_path_entry(primary_key_column), path_column
+        ) == sqlalchemy.literal_column("0")
+    else:
+        raise NotImplementedError(
+            "Pruning recursion cycles is only supported for MSSQL and PostgreSQL, "
+            f"dialect was set to {dialect.name}."
+        )
+
+
+def _get_keyset_predicate(dialect: DefaultDialect, key_columns: List[Column]) -> ClauseElement:
+    """Return a predicate selecting rows whose key sorts after the last seen key.
+
+    The last seen key is not known at compile time, so each of its components is a bind
+    parameter named with the KEYSET_LAST_SEEN_PARAMETER_PREFIX.
+
+    Args:
+        dialect: dialect the query is being emitted for
+        key_columns: columns making up the ordering key, in order of significance
+
+    Returns:
+        SQLAlchemy expression, true for rows whose key is lexicographically greater than the
+        last seen key
+    """
+    if not key_columns:
+        raise AssertionError(
+            "Attempted to construct a keyset predicate without any key columns. This is a bug."
+        )
+
+    last_seen_values = [
+        sqlalchemy.bindparam(f"{KEYSET_LAST_SEEN_PARAMETER_PREFIX}{index}", type_=column.type)
+        for index, column in enumerate(key_columns)
+    ]
+    if len(key_columns) == 1:
+        return key_columns[0] > last_seen_values[0]
+    elif isinstance(dialect, PGDialect):
+        # Row value comparisons can be answered directly from a composite index in PostgreSQL.
+        return sqlalchemy.tuple_(*key_columns) > sqlalchemy.tuple_(*last_seen_values)
+    else:
+        # MSSQL doesn't support row value comparisons, so the lexicographic comparison is
+        # expanded into (a > :a) OR (a = :a AND b > :b) OR ...
+        return sqlalchemy.or_(
+            *(
+                sqlalchemy.and_(
+                    *(
+                        key_columns[equal_index] == last_seen_values[equal_index]
+                        for equal_index in range(index)
+                    ),
+                    key_columns[index] > last_seen_values[index],
+                )
+                for index in range(len(key_columns))
+            )
+        )
+
+
 class UniqueAliasGenerator(object):
     """Mutable class used to generate unique aliases for subqueries."""
 
@@ -775,12 +1038,23 @@ class ColumnRouter:
 class CompilationState(object):
     """Mutable class used to keep track of state while emitting a sql query."""
 
-    def __init__(self, sql_schema_info: SQLAlchemySchemaInfo, ir: IrAndMetadata):
+    def __init__(
+        self,
+        sql_schema_info: SQLAlchemySchemaInfo,
+        ir: IrAndMetadata,
+        compilation_options: SQLCompilationOptions,
+    ):
         """Initialize a CompilationState, setting the current location at the root of the query."""
         # Immutable metadata
         self._sql_schema_info: SQLAlchemySchemaInfo = sql_schema_info
         self._ir: IrAndMetadata = ir
-        self._used_columns: Dict[VertexPath, Set[str]] = _find_used_columns(sql_schema_info, ir)
+        self._compilation_options: SQLCompilationOptions = compilation_options
+        # Mapping each @recurse destination to the columns of each alias that are read by the
+        # @recurse or any later part of the query. These are the only columns that need to be
+        # carried through CTEs.
+        self._live_columns_at_recursions: Dict[
+            QueryPath, Dict[AliasKey, Set[str]]
+        ] = _find_live_columns_at_recursions(sql_schema_info, ir)
         # Mapping FoldScopeLocations (without field information) to output fields at that location.
         self._all_folded_fields: Dict[FoldScopeLocation, Set[str]] = _find_folded_fields(ir)
 
@@ -803,14 +1077,15 @@ class CompilationState(object):
         # the tuple will be None.
         # Note: for tables with an _x_count column, that column will always
         # be named "fold_output__x_count".
-        self._aliases: Dict[Tuple[QueryPath, Optional[FoldPath]], Union[Alias, ColumnRouter]] = {}
+        self._aliases: Dict[AliasKey, Union[Alias, ColumnRouter]] = {}
 
         # Move to the beginning location of the query.
         self._relocate(ir.query_metadata_table.root_location)
 
         # Mapping aliases to one of the column used to join into them. We use this column
         # to check for LEFT JOIN misses, since it helps us distinguish actual NULL values
-        # from values that are NULL because of a LEFT JOIN miss.
+        # from values that are NULL because of a LEFT JOIN miss. LEFT JOINs are only used in
+        # optional scopes, so only aliases in optional scopes are recorded here.
         self._came_from: Dict[Union[Alias, ColumnRouter], Column] = {}
 
         self._recurse_needs_cte: bool = False
@@ -836,22 +1111,13 @@ class CompilationState(object):
 
     def _relocate(self, new_location: BaseLocation):
         """Move to a different location in the query, updating the _current_alias."""
-        self._current_location = new_location
-        # Create appropriate alias key based on whether new_location is a FoldScopeLocation or a
-        # Location.
-        alias_key: Tuple[QueryPath, Optional[FoldPath]]
-        if isinstance(self._current_location, FoldScopeLocation):
-            alias_key = (
-                self._current_location.base_location.query_path,
-                self._current_location.fold_path,
-            )
-        elif isinstance(self._current_location, Location):
-            alias_key = (self._current_location.query_path, None)
-        else:
+        if not isinstance(new_location, (Location, FoldScopeLocation)):
             raise AssertionError(
                 f"Attempted an invalid relocation to a {type(new_location)}. new_location must be "
                 f"either a Location or a FoldScopeLocation. new_location was {new_location}."
             )
+        self._current_location = new_location
+        alias_key = _get_alias_key(new_location)
 
         # Update the current alias.
         if alias_key in self._aliases:
@@ -897,8 +1163,9 @@ class CompilationState(object):
                 f"Invalid join descriptor {join_descriptor}, produced no matching column pairs."
             )
 
-        _, non_null_column = sorted(matching_column_pairs)[0]
-        self._came_from[self._current_alias] = self._current_alias.c[non_null_column]
+        if self._is_in_optional_scope():
+            _, non_null_column = sorted(matching_column_pairs)[0]
+            self._came_from[self._current_alias] = self._current_alias.c[non_null_column]
 
         if self._is_in_optional_scope() and not optional:
             # For mandatory edges in optional scope, we emit LEFT OUTER JOIN and enforce the
@@ -975,6 +1242,12 @@ class CompilationState(object):
 
         self._recurse_needs_cte = True
 
+        if optional and self._compilation_options.keyset_page_size is not None:
+            raise NotImplementedError(
+                "Keyset pagination is not supported for queries with @optional, since their "
+                "results are not uniquely identified by the primary keys of visited vertices."
+            )
+
         # Follow the edge, either by calling add_traversal if in a fold or joining to the
         # parent location.
         previous_alias = self._current_alias
@@ -999,15 +1272,31 @@ class CompilationState(object):
         else:
             self._join_to_parent_location(previous_alias, edge, optional)
 
-    def _wrap_into_cte(self) -> None:
-        """Wrap the current query into a cte."""
+    def _wrap_into_cte(self, live_columns: Dict[AliasKey, Set[str]]) -> None:
+        """Wrap the current query into a cte, exporting only the given columns of each alias.
+
+        Args:
+            live_columns: mapping alias key -> names of columns of that alias that are used
+                          after the cte. Columns that are used to detect LEFT JOIN misses are
+                          exported as well, even if not present in this mapping.
+        """
         # Additional outputs the CTE needs to export for use elsewhere in the query
         extra_outputs: List[Label] = []
         # Mapping alias_key -> external_name -> internal_name
-        column_mappings: Dict[Tuple[QueryPath, Optional[FoldPath]], Dict[str, str]] = {}
+        column_mappings: Dict[AliasKey, Dict[str, str]] = {}
         for alias_key, alias in self._aliases.items():
-            vertex_path, _ = alias_key
-            for used_column_name in sorted(self._used_columns[vertex_path]):
+            query_path, fold_path = alias_key
+            vertex_path: VertexPath = query_path
+            if fold_path is not None:
+                vertex_path += tuple(
+                    f"{direction}_{edge_name}" for direction, edge_name in fold_path
+                )
+
+            exported_column_names = set(live_columns.get(alias_key, set()))
+            if alias in self._came_from:
+                exported_column_names.add(self._came_from[alias].name)
+
+            for used_column_name in sorted(exported_column_names):
                 label = "_".join(vertex_path) + "__" + used_column_name
                 extra_outputs.append(alias.c[used_column_name].label(label))
                 column_mappings.setdefault(alias_key, {})[used_column_name] = label
@@ -1069,6 +1358,11 @@ class CompilationState(object):
             raise AssertionError("Recurse inside a fold is not allowed.")
         if self._current_alias is None:
             raise AssertionError("Cannot recurse when _current_alias is None.")
+        if self._compilation_options.keyset_page_size is not None:
+            raise NotImplementedError(
+                "Keyset pagination is not supported for queries with @recurse, since their "
+                "results are not uniquely identified by the primary keys of visited vertices."
+            )
         if self._current_location is None:
             raise AssertionError("Cannot recurse when _current_location is None.")
         if not isinstance(self._current_location, Location):
@@ -1084,10 +1378,13 @@ class CompilationState(object):
                 f"not supported for use with @recurse."
             )
         primary_key = self._get_current_primary_key_name("@recurse")
+        live_columns = self._live_columns_at_recursions[
+            self._current_location.navigate_to_subpath(vertex_field).query_path
+        ]
 
         # Wrap the query so far into a CTE if it would speed up the recursive query.
         if self._recurse_needs_cte:
-            self._wrap_into_cte()
+            self._wrap_into_cte(live_columns)
 
         previous_alias = self._current_alias
         self._relocate(self._current_location.navigate_to_subpath(vertex_field))
@@ -1099,18 +1396,27 @@ class CompilationState(object):
         literal_0 = sqlalchemy.literal_column("0")
         literal_1 = sqlalchemy.literal_column("1")
 
-        # Find which columns should be selected
-        used_columns = sorted(self._used_columns[self._current_location.query_path])
+        # Find which columns should be selected: the ones used by the rest of the query, and the
+        # column the recursive step joins from.
+        used_columns = sorted(
+            live_columns.get(_get_alias_key(self._current_location), set()) | {edge.from_column}
+        )
 
         # The base of the recursive CTE selects all needed columns and sets the depth to 0
         base_alias = self._current_alias.alias()
-        base = sqlalchemy.select(
-            [base_alias.c[col].label(col) for col in used_columns]
-            + [
-                base_alias.c[primary_key].label(CTE_KEY_NAME),
-                literal_0.label(CTE_DEPTH_NAME),
-            ]
-        )
+        base_columns = [base_alias.c[col].label(col) for col in used_columns] + [
+            base_alias.c[primary_key].label(CTE_KEY_NAME),
+            literal_0.label(CTE_DEPTH_NAME),
+        ]
+        prune_cycles = self._compilation_options.prune_recursion_cycles
+        if prune_cycles:
+            # The recursion path starts out containing only the starting vertex.
+            base_columns.append(
+                _get_recursion_path_start(
+                    self._sql_schema_info.dialect, base_alias.c[primary_key]
+                ).label(CTE_PATH_NAME)
+            )
+        base = sqlalchemy.select(base_columns)
         if self._recurse_needs_cte:
             # Optimization: Only compute the recursion for the valid starting points -- ones that
             # will not be discarded when the recursive CTE is joined to the rest of the query.
@@ -1126,18 +1432,29 @@ class CompilationState(object):
 
         # The recursive step selects all needed columns, increments the depth, and joins to the base
         step = self._current_alias.alias()
-        self._current_alias = base.union_all(
-            sqlalchemy.select(
-                [step.c[col] for col in used_columns]
-                + [
-                    base.c[CTE_KEY_NAME].label(CTE_KEY_NAME),
-                    (base.c[CTE_DEPTH_NAME] + literal_1).label(CTE_DEPTH_NAME),
-                ]
+        step_columns = [step.c[col] for col in used_columns] + [
+            base.c[CTE_KEY_NAME].label(CTE_KEY_NAME),
+            (base.c[CTE_DEPTH_NAME] + literal_1).label(CTE_DEPTH_NAME),
+        ]
+        step_filters = [base.c[CTE_DEPTH_NAME] < literal_depth]
+        if prune_cycles:
+            # Extend the recursion path with the newly visited vertex, and stop at any vertex
+            # that was already visited on the path.
+            dialect = self._sql_schema_info.dialect
+            step_columns.append(
+                _get_extended_recursion_path(
+                    dialect, base.c[CTE_PATH_NAME], step.c[primary_key]
+                ).label(CTE_PATH_NAME)
             )
+            step_filters.append(
+                _get_recursion_path_exclusion(dialect, base.c[CTE_PATH_NAME], step.c[primary_key])
+            )
+        self._current_alias = base.union_all(
+            sqlalchemy.select(step_columns)
             .select_from(
                 base.join(step, onclause=base.c[edge.from_column] == step.c[edge.to_column])
             )
-            .where(base.c[CTE_DEPTH_NAME] < literal_depth)
+            .where(sqlalchemy.and_(*step_filters))
         )
 
         join_descriptor = DirectJoinDescriptor(primary_key, CTE_KEY_NAME)
@@ -1275,19 +1592,12 @@ class CompilationState(object):
 
     def mark_location(self) -> None:
         """Execute a MarkLocation Block."""
-        alias_key: Tuple[QueryPath, Optional[FoldPath]]
-        if isinstance(self._current_location, FoldScopeLocation):
-            alias_key = (
-                self._current_location.base_location.query_path,
-                self._current_location.fold_path,
-            )
-        elif isinstance(self._current_location, Location):
-            alias_key = (self._current_location.query_path, None)
-        else:
+        if not isinstance(self._current_location, (Location, FoldScopeLocation)):
             raise AssertionError(
                 f"Attempted to mark location at a _current_location that was not a Location or a "
                 f"FoldScopeLocation. _current_location was set to {self._current_location}."
             )
+        alias_key = _get_alias_key(self._current_location)
         # If the current location is the beginning of a fold, the current alias
         # will eventually be replaced by the resulting fold subquery during Unfold.
         self._aliases[alias_key] = self._current_alias
@@ -1310,18 +1620,63 @@ class CompilationState(object):
             .where(sqlalchemy.and_(*self._filters))
         )
 
+    def get_keyset_paginated_query(self, page_size: int, after_cursor: bool) -> Select:
+        """Return the resulting SQLAlchemy query, returning one page of keyset-ordered results.
+
+        Args:
+            page_size: maximum number of results to return
+            after_cursor: whether to only return the results after the last seen key, which is
+                          given by bind parameters named with KEYSET_LAST_SEEN_PARAMETER_PREFIX
 
-def emit_code_from_ir(sql_schema_info: SQLAlchemySchemaInfo, ir: IrAndMetadata) -> Select:
+        Returns:
+            SQLAlchemy Query
+        """
+        # Outside of folds, each result corresponds to a distinct combination of visited
+        # vertices, so the primary keys of all of them together identify the result.
+        key_columns: List[Column] = []
+        for (_, fold_path), alias in self._aliases.items():
+            if fold_path is None:
+                if not isinstance(alias, Alias):
+                    raise AssertionError(
+                        f"Expected all vertices visited outside of folds to be table aliases, "
+                        f"since keyset pagination does not support @recurse, but found {alias}."
+                    )
+                if not alias.primary_key:
+                    raise GraphQLCompilationError(
+                        f"Keyset pagination requires every vertex visited outside of @fold "
+                        f"scopes to have a primary key, but the table {alias.element} has none."
+                    )
+                key_columns.extend(alias.c[column.name] for column in alias.primary_key)
+
+        key_outputs = [
+            column.label(f"{KEYSET_COLUMN_PREFIX}{index}")
+            for index, column in enumerate(key_columns)
+        ]
+        query = self.get_query(extra_outputs=key_outputs)
+        if after_cursor:
+            query = query.where(_get_keyset_predicate(self._sql_schema_info.dialect, key_columns))
+        return query.order_by(*key_columns).limit(page_size)
+
+
+def emit_code_from_ir(
+    sql_schema_info: SQLAlchemySchemaInfo,
+    ir: IrAndMetadata,
+    compilation_options: Optional[SQLCompilationOptions] = None,
+) -> Select:
     """Return a SQLAlchemy Query for the query described by the internal representation.
 
     Args:
         sql_schema_info: SQLAlchemySchemaInfo containing all relevant schema information
         ir: IrAndMetadata containing query information with lowered blocks
+        compilation_options: optional SQLCompilationOptions controlling how the query is emitted.
+                             If not specified, the default options are used.
 
     Returns:
         SQLAlchemy Query
     """
-    state = CompilationState(sql_schema_info, ir)
+    if compilation_options is None:
+        compilation_options = SQLCompilationOptions()
+    state = CompilationState(sql_schema_info, ir, compilation_options)
     for block in _traverse_and_validate_blocks(ir):
         if isinstance(block, blocks.QueryRoot):
             pass
@@ -1349,4 +1704,16 @@ def emit_code_from_ir(sql_schema_info: SQLAlchemySchemaInfo, ir: IrAndMetadata)
         else:
             raise NotImplementedError(f"Unsupported block {block}.")
 
-    return state.get_query()
+    if compilation_options.keyset_page_size is not None:
+        query = state.get_keyset_paginated_query(
+            compilation_options.keyset_page_size, compilation_options.keyset_after_cursor
+        )
+    elif compilation_options.keyset_after_cursor:
+        raise GraphQLInvalidArgumentError(
+            "keyset_after_cursor was set, but keyset pagination is not enabled since "
+            "keyset_page_size is not set."
+        )
+    else:
+        query = state.get_query()
+    _set_large_collection_threshold(query, compilation_options.large_collection_threshold)
+    return query
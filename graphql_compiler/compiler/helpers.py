@@ -4,7 +4,9 @@ from abc import ABCMeta, abstractmethod
 from collections import namedtuple
 from functools import total_ordering
 import string
+import threading
 from typing import Any, Collection, Dict, Hashable, Iterable, Optional, Tuple, TypeVar, Union, cast
+from weakref import WeakValueDictionary
 
 import funcy
 from graphql import GraphQLNonNull, GraphQLString, is_type
@@ -319,14 +321,33 @@ def get_parameter_name(argument: str) -> str:
 LocationT = TypeVar("LocationT", bound="BaseLocation")
 
 
+# Location and FoldScopeLocation objects are interned: while a location object is in use, creating
+# another location with the same components returns the existing object instead of a new one.
+# This allows locations to be compared by identity, and makes them cheap to use as dict keys,
+# which the compiler does constantly. The interning tables only hold weak references, so
+# locations that are no longer used anywhere are freed as usual.
+_location_interning_lock = threading.Lock()
+_interned_locations: "WeakValueDictionary[Hashable, Location]" = WeakValueDictionary()
+_interned_fold_scope_locations: "WeakValueDictionary[Hashable, FoldScopeLocation]" = (
+    WeakValueDictionary()
+)
+
+
 # Issue below might be due to https://github.com/python/mypy/issues/5374
 # Feel free to remove this mypy exception if you get mypy to pass
 @total_ordering  # type: ignore
 @six.add_metaclass(ABCMeta)
 class BaseLocation(object):
-    """An abstract location object, describing a location in the GraphQL query."""
+    """An abstract location object, describing a location in the GraphQL query.
+
+    Location objects are immutable and interned, so two location objects are equal if and only if
+    they are the same object.
+    """
+
+    __slots__ = ()
 
     field: Optional[str]
+    _hash: int
 
     @abstractmethod
     def navigate_to_field(self: LocationT, field: str) -> LocationT:
@@ -363,10 +384,32 @@ class BaseLocation(object):
         """Return True if the other object is smaller than self in the total ordering."""
         raise NotImplementedError()
 
-    @abstractmethod
     def __eq__(self, other: Any) -> bool:
         """Return True if the BaseLocations are equal, and False otherwise."""
-        raise NotImplementedError()
+        # Locations are interned, so equal locations are always the same object.
+        return self is other
+
+    def __ne__(self, other: Any) -> bool:
+        """Check another object for non-equality against this one."""
+        return self is not other
+
+    def __hash__(self) -> int:
+        """Return the object's hash value, computed when the location was created."""
+        return self._hash
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Disallow setting attributes, since locations are immutable."""
+        raise AttributeError(
+            "Location objects are immutable, cannot set {} on {}.".format(name, self)
+        )
+
+    def __copy__(self: LocationT) -> LocationT:
+        """Return the location itself, since it is immutable."""
+        return self
+
+    def __deepcopy__(self: LocationT, memo: Optional[Dict[int, Any]]) -> LocationT:
+        """Return the location itself, since it is immutable."""
+        return self
 
     def __lt__(self, other: "BaseLocation") -> bool:
         """Return True if the other object is smaller than self in the total ordering."""
@@ -391,13 +434,15 @@ class BaseLocation(object):
 class Location(BaseLocation):
     """A location in the GraphQL query, anywhere except within a @fold scope."""
 
+    __slots__ = ("query_path", "field", "visit_counter", "_hash", "__weakref__")
+
     query_path: QueryPath
     visit_counter: int
 
-    def __init__(
-        self, query_path: Tuple[str, ...], field: Optional[str] = None, visit_counter: int = 1
-    ) -> None:
-        """Create a new Location object.
+    def __new__(
+        cls, query_path: Tuple[str, ...], field: Optional[str] = None, visit_counter: int = 1
+    ) -> "Location":
+        """Return the Location object with the given components, creating it if necessary.
 
         Used to uniquely identify locations in the graph traversal, with three components.
             - The 'query_path' is a tuple containing the in-order nested set of vertex fields where
@@ -423,7 +468,7 @@ class Location(BaseLocation):
                            Location objects -- see the explanation above.
 
         Returns:
-            new Location object with the provided properties
+            Location object with the provided properties
         """
         if not isinstance(query_path, tuple):
             raise TypeError(
@@ -436,13 +481,27 @@ class Location(BaseLocation):
                 "{} {}".format(type(field).__name__, field)
             )
 
-        self.query_path = query_path
-        self.field = field
+        key = (query_path, field, visit_counter)
+        location = _interned_locations.get(key)
+        if location is not None:
+            return location
+
+        location = super(Location, cls).__new__(cls)
+        object.__setattr__(location, "query_path", query_path)
+        object.__setattr__(location, "field", field)
 
         # A single visit counter is enough, rather than a visit counter per path level,
         # because field names are unique -- one can't be at path 'X' and
         # visit 'Y' in two different ways to generate colliding 'X__Y___1' identifiers.
-        self.visit_counter = visit_counter
+        object.__setattr__(location, "visit_counter", visit_counter)
+
+        object.__setattr__(location, "_hash", hash(query_path) ^ hash(field) ^ hash(visit_counter))
+        with _location_interning_lock:
+            return _interned_locations.setdefault(key, location)
+
+    def __reduce__(self) -> Tuple[Any, Tuple[Tuple[str, ...], Optional[str], int]]:
+        """Return the arguments for recreating this Location, e.g. when it is unpickled."""
+        return (Location, (self.query_path, self.field, self.visit_counter))
 
     def navigate_to_field(self, field: str) -> "Location":
         """Return a new Location object at the specified field of the current Location's vertex."""
@@ -505,19 +564,6 @@ class Location(BaseLocation):
         """Return a human-readable str representation of the Location object."""
         return self.__str__()
 
-    def __eq__(self, other: Any) -> bool:
-        """Return True if the Locations are equal, and False otherwise."""
-        return (
-            type(self) == type(other)
-            and self.query_path == other.query_path
-            and self.field == other.field
-            and self.visit_counter == other.visit_counter
-        )
-
-    def __ne__(self, other: Any) -> bool:
-        """Check another object for non-equality against this one."""
-        return not self.__eq__(other)
-
     def _check_if_object_of_same_type_is_smaller(self, other: "Location") -> bool:
         """Return True if the other object is smaller than self in the total ordering."""
         if not isinstance(other, Location):
@@ -544,25 +590,25 @@ class Location(BaseLocation):
 
         return self.field < other.field
 
-    def __hash__(self) -> int:
-        """Return the object's hash value."""
-        return hash(self.query_path) ^ hash(self.field) ^ hash(self.visit_counter)
-
 
 @six.python_2_unicode_compatible
 class FoldScopeLocation(BaseLocation):
     """A location within a @fold scope."""
 
+    __slots__ = ("base_location", "fold_path", "field", "_hash", "__weakref__")
+
     base_location: Location
     fold_path: FoldPath
 
-    def __init__(
-        self,
+    def __new__(
+        cls,
         base_location: Location,
         fold_path: Tuple[Tuple[str, str], ...],
         field: Optional[str] = None,
-    ) -> None:
-        """Create a new FoldScopeLocation object. Used to represent the locations of @fold scopes.
+    ) -> "FoldScopeLocation":
+        """Return the FoldScopeLocation object with the given components, creating it if necessary.
+
+        FoldScopeLocation objects are used to represent the locations of @fold scopes.
 
         Args:
             base_location: Location object defining where the @fold scope is rooted. In other words,
@@ -572,7 +618,7 @@ class FoldScopeLocation(BaseLocation):
             field: string if at a field in a vertex, or None if at a vertex
 
         Returns:
-            new FoldScopeLocation object
+            FoldScopeLocation object with the provided properties
         """
         if not isinstance(base_location, Location):
             raise TypeError(
@@ -597,9 +643,22 @@ class FoldScopeLocation(BaseLocation):
         if not fold_path_is_valid:
             raise ValueError("Encountered an invalid fold_path: {}".format(fold_path))
 
-        self.base_location = base_location
-        self.fold_path = fold_path
-        self.field = field
+        key = (base_location, fold_path, field)
+        location = _interned_fold_scope_locations.get(key)
+        if location is not None:
+            return location
+
+        location = super(FoldScopeLocation, cls).__new__(cls)
+        object.__setattr__(location, "base_location", base_location)
+        object.__setattr__(location, "fold_path", fold_path)
+        object.__setattr__(location, "field", field)
+        object.__setattr__(location, "_hash", hash(base_location) ^ hash(fold_path) ^ hash(field))
+        with _location_interning_lock:
+            return _interned_fold_scope_locations.setdefault(key, location)
+
+    def __reduce__(self) -> Tuple[Any, Tuple[Location, FoldPath, Optional[str]]]:
+        """Return the arguments for recreating this FoldScopeLocation, e.g. when it is unpickled."""
+        return (FoldScopeLocation, (self.base_location, self.fold_path, self.field))
 
     def get_location_name(self) -> Tuple[str, Optional[str]]:
         """Return a tuple of a unique name of the location, and the current field name (or None)."""
@@ -663,23 +722,6 @@ class FoldScopeLocation(BaseLocation):
         """Return a human-readable str representation of the FoldScopeLocation object."""
         return self.__str__()
 
-    def __eq__(self, other: Any) -> bool:
-        """Return True if the FoldScopeLocations are equal, and False otherwise."""
-        return (
-            type(self) == type(other)
-            and self.base_location == other.base_location
-            and self.fold_path == other.fold_path
-            and self.field == other.field
-        )
-
-    def __ne__(self, other: Any) -> bool:
-        """Check another object for non-equality against this one."""
-        return not self.__eq__(other)
-
-    def __hash__(self) -> int:
-        """Return the object's hash value."""
-        return hash(self.base_location) ^ hash(self.fold_path) ^ hash(self.field)
-
     def _check_if_object_of_same_type_is_smaller(self, other: "FoldScopeLocation") -> bool:
         """Return True if the other object is smaller than self in the total ordering."""
         if not isinstance(other, FoldScopeLocation):
@@ -1,6 +1,6 @@
 # Copyright 2017-present Kensho Technologies, LLC.
 """Language-independent IR lowering and optimization functions."""
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 import six
 
@@ -51,9 +51,60 @@ def merge_consecutive_filter_clauses(ir_blocks: List[BasicBlock]) -> List[BasicB
     return new_ir_blocks
 
 
+# A rewrite rule is a function that, given a block and an expression within it, returns either the
+# expression itself if it doesn't need to be rewritten, or the expression to replace it with.
+# It is called on each expression after all of that expression's children have been rewritten.
+ExpressionRewriteRule = Callable[[BasicBlock, Expression], Expression]
+
+
+def get_conjunction_terms(predicate: Expression) -> List[Expression]:
+    """Return the list of predicates connected by "&&" in the given predicate, in order."""
+    if isinstance(predicate, BinaryComposition) and predicate.operator == "&&":
+        return get_conjunction_terms(predicate.left) + get_conjunction_terms(predicate.right)
+    return [predicate]
+
+
+def apply_expression_rewrite_rules(
+    ir_blocks: List[BasicBlockT], rewrite_rules: Sequence[ExpressionRewriteRule]
+) -> List[BasicBlockT]:
+    """Apply all the rewrite rules to the expressions in the IR blocks, in a single traversal.
+
+    Each expression is visited once, and the rules are applied to it in order, with each rule
+    receiving the expression returned by the previous rule. Blocks and expressions that no rule
+    rewrites are reused rather than copied.
+
+    This produces the same result as applying each rule in a separate traversal, as long as
+    no rule rewrites an expression into one that an earlier rule would rewrite differently
+    when it is encountered as the child of another expression. For example, lowering
+    ContextFieldExistence and then optimizing boolean comparisons can be fused, since the
+    optimization never produces a ContextFieldExistence.
+
+    Args:
+        ir_blocks: list of IR blocks whose expressions to rewrite
+        rewrite_rules: rules to apply to each expression, in order
+
+    Returns:
+        new list of IR blocks, with the rewrite rules applied
+    """
+    new_ir_blocks = []
+    for block in ir_blocks:
+
+        def visitor_fn(expression: Expression) -> Expression:
+            """Apply all rewrite rules to the expression, as found in the current block."""
+            for rewrite_rule in rewrite_rules:
+                expression = rewrite_rule(block, expression)
+            return expression
+
+        new_ir_blocks.append(block.visit_and_update_expressions(visitor_fn))
+
+    return new_ir_blocks
+
+
 class OutputContextVertex(ContextField):
     """An expression referring to a vertex location for output from the global context."""
 
+    __slots__ = ()
+
     def validate(self) -> None:
         """Validate that the OutputContextVertex is correctly representable."""
         super(OutputContextVertex, self).validate()
@@ -77,65 +128,119 @@ class OutputContextVertex(ContextField):
         return mark_name
 
 
-def lower_context_field_existence(
-    ir_blocks: List[BasicBlock], query_metadata_table: QueryMetadataTable
-) -> List[BasicBlock]:
-    """Lower ContextFieldExistence expressions into lower-level expressions."""
+def make_context_field_existence_lowering_rule(
+    query_metadata_table: QueryMetadataTable,
+) -> ExpressionRewriteRule:
+    """Return a rewrite rule that lowers ContextFieldExistence into lower-level expressions."""
 
-    def regular_visitor_fn(expression: Expression) -> Expression:
-        """Expression visitor function that rewrites ContextFieldExistence expressions."""
+    def rewrite_rule(block: BasicBlock, expression: Expression) -> Expression:
+        """Rewrite ContextFieldExistence expressions into a comparison with null."""
         if not isinstance(expression, ContextFieldExistence):
             return expression
 
         location_type = query_metadata_table.get_location_info(expression.location).type
 
-        # Since this function is only used in blocks that aren't ConstructResult,
-        # the location check is performed using a regular ContextField expression.
-        return BinaryComposition(
-            "!=", ContextField(expression.location, location_type), NullLiteral
-        )
+        # In ConstructResult blocks, the location check is performed using the special
+        # OutputContextVertex expression. Elsewhere, a regular ContextField expression is used.
+        if isinstance(block, ConstructResult):
+            vertex_expression: ContextField = OutputContextVertex(
+                expression.location, location_type
+            )
+        else:
+            vertex_expression = ContextField(expression.location, location_type)
 
-    def construct_result_visitor_fn(expression: Any) -> Any:
-        """Expression visitor function that rewrites ContextFieldExistence expressions."""
-        if not isinstance(expression, ContextFieldExistence):
-            return expression
+        return BinaryComposition("!=", vertex_expression, NullLiteral)
 
-        location_type = query_metadata_table.get_location_info(expression.location).type
+    return rewrite_rule
 
-        # Since this function is only used in ConstructResult blocks,
-        # the location check is performed using the special OutputContextVertex expression.
-        return BinaryComposition(
-            "!=", OutputContextVertex(expression.location, location_type), NullLiteral
-        )
 
-    new_ir_blocks = []
-    for block in ir_blocks:
-        new_block: BasicBlock
-        if isinstance(block, ConstructResult):
-            new_block = block.visit_and_update_expressions(construct_result_visitor_fn)
-        else:
-            new_block = block.visit_and_update_expressions(regular_visitor_fn)
-        new_ir_blocks.append(new_block)
+def lower_context_field_existence(
+    ir_blocks: List[BasicBlock], query_metadata_table: QueryMetadataTable
+) -> List[BasicBlock]:
+    """Lower ContextFieldExistence expressions into lower-level expressions."""
+    return apply_expression_rewrite_rules(
+        ir_blocks, [make_context_field_existence_lowering_rule(query_metadata_table)]
+    )
 
-    return new_ir_blocks
+
+def short_circuit_ternary_conditionals_rule(
+    block: BasicBlock, expression: Expression
+) -> Expression:
+    """Rewrite rule that simplifies TernaryConditionals whose predicate is a boolean Literal."""
+    if isinstance(expression, TernaryConditional) and isinstance(expression.predicate, Literal):
+        if isinstance(expression.predicate.value, bool):
+            if expression.predicate.value:
+                return expression.if_true
+            else:
+                return expression.if_false
+    return expression
 
 
 def short_circuit_ternary_conditionals(
     ir_blocks: List[BasicBlockT], query_metadata_table: QueryMetadataTable
 ) -> List[BasicBlockT]:
     """If the predicate outcome in a TernaryConditional is a Literal, evaluate and simplify it."""
+    return apply_expression_rewrite_rules(ir_blocks, [short_circuit_ternary_conditionals_rule])
 
-    def visitor_fn(expression: Expression) -> Expression:
-        """Simplify TernaryConditionals."""
-        if isinstance(expression, TernaryConditional) and isinstance(expression.predicate, Literal):
-            if isinstance(expression.predicate.value, bool):
-                if expression.predicate.value:
-                    return expression.if_true
-                else:
-                    return expression.if_false
+
+# Comparison operators that produce boolean values, and their inverses.
+_BOOLEAN_COMPARISON_INVERSES = {"=": "!=", "!=": "="}
+
+
+def optimize_boolean_expression_comparisons_rule(
+    block: BasicBlock, expression: Expression
+) -> Expression:
+    """Rewrite rule that optimizes comparisons of boolean comparisons against boolean literals.
+
+    See optimize_boolean_expression_comparisons() for an example of the rewriting.
+    """
+    if not isinstance(expression, BinaryComposition):
         return expression
 
-    return [block.visit_and_update_expressions(visitor_fn) for block in ir_blocks]
+    left_is_binary_composition: Optional[BinaryComposition] = (
+        expression.left if isinstance(expression.left, BinaryComposition) else None
+    )
+    right_is_binary_composition: Optional[BinaryComposition] = (
+        expression.right if isinstance(expression.right, BinaryComposition) else None
+    )
+
+    if not left_is_binary_composition and not right_is_binary_composition:
+        # Nothing to rewrite, return the expression as-is.
+        return expression
+
+    identity_literal = None  # The boolean literal for which we just use the inner expression.
+    inverse_literal = None  # The boolean literal for which we negate the inner expression.
+    if expression.operator == "=":
+        identity_literal = TrueLiteral
+        inverse_literal = FalseLiteral
+    elif expression.operator == "!=":
+        identity_literal = FalseLiteral
+        inverse_literal = TrueLiteral
+    else:
+        return expression
+
+    expression_to_rewrite: Optional[BinaryComposition] = None
+    if expression.left == identity_literal and right_is_binary_composition:
+        return expression.right
+    elif expression.right == identity_literal and left_is_binary_composition:
+        return expression.left
+    elif expression.left == inverse_literal and right_is_binary_composition:
+        expression_to_rewrite = right_is_binary_composition
+    elif expression.right == inverse_literal and left_is_binary_composition:
+        expression_to_rewrite = left_is_binary_composition
+
+    if expression_to_rewrite is None:
+        # We couldn't find anything to rewrite, return the expression as-is.
+        return expression
+    elif expression_to_rewrite.operator not in _BOOLEAN_COMPARISON_INVERSES:
+        # We can't rewrite the inner expression since we don't know its inverse operator.
+        return expression
+    else:
+        return BinaryComposition(
+            _BOOLEAN_COMPARISON_INVERSES[expression_to_rewrite.operator],
+            expression_to_rewrite.left,
+            expression_to_rewrite.right,
+        )
 
 
 def optimize_boolean_expression_comparisons(ir_blocks: List[BasicBlock]) -> List[BasicBlock]:
@@ -156,64 +261,7 @@ def optimize_boolean_expression_comparisons(ir_blocks: List[BasicBlock]) -> List
     Returns:
         new list of basic block objects, with the optimization applied
     """
-    operator_inverses = {"=": "!=", "!=": "="}
-
-    def visitor_fn(expression: Expression) -> Expression:
-        """Expression visitor function that performs the above rewriting."""
-        if not isinstance(expression, BinaryComposition):
-            return expression
-
-        left_is_binary_composition: Optional[BinaryComposition] = (
-            expression.left if isinstance(expression.left, BinaryComposition) else None
-        )
-        right_is_binary_composition: Optional[BinaryComposition] = (
-            expression.right if isinstance(expression.right, BinaryComposition) else None
-        )
-
-        if not left_is_binary_composition and not right_is_binary_composition:
-            # Nothing to rewrite, return the expression as-is.
-            return expression
-
-        identity_literal = None  # The boolean literal for which we just use the inner expression.
-        inverse_literal = None  # The boolean literal for which we negate the inner expression.
-        if expression.operator == "=":
-            identity_literal = TrueLiteral
-            inverse_literal = FalseLiteral
-        elif expression.operator == "!=":
-            identity_literal = FalseLiteral
-            inverse_literal = TrueLiteral
-        else:
-            return expression
-
-        expression_to_rewrite: Optional[BinaryComposition] = None
-        if expression.left == identity_literal and right_is_binary_composition:
-            return expression.right
-        elif expression.right == identity_literal and left_is_binary_composition:
-            return expression.left
-        elif expression.left == inverse_literal and right_is_binary_composition:
-            expression_to_rewrite = right_is_binary_composition
-        elif expression.right == inverse_literal and left_is_binary_composition:
-            expression_to_rewrite = left_is_binary_composition
-
-        if expression_to_rewrite is None:
-            # We couldn't find anything to rewrite, return the expression as-is.
-            return expression
-        elif expression_to_rewrite.operator not in operator_inverses:
-            # We can't rewrite the inner expression since we don't know its inverse operator.
-            return expression
-        else:
-            return BinaryComposition(
-                operator_inverses[expression_to_rewrite.operator],
-                expression_to_rewrite.left,
-                expression_to_rewrite.right,
-            )
-
-    new_ir_blocks = []
-    for block in ir_blocks:
-        new_block = block.visit_and_update_expressions(visitor_fn)
-        new_ir_blocks.append(new_block)
-
-    return new_ir_blocks
+    return apply_expression_rewrite_rules(ir_blocks, [optimize_boolean_expression_comparisons_rule])
 
 
 def extract_folds_from_ir_blocks(
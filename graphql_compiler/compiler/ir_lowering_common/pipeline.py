@@ -0,0 +1,112 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Run the lowering passes of a backend as a pipeline of named passes, optionally measuring them.
+
+Each backend lowers the IR by applying a sequence of passes, each of which takes the lowered
+query produced by the previous pass and returns a new one. The representation of the lowered
+query may change along the way: for example, the MATCH backend starts with a list of IR blocks,
+then converts it to a MatchQuery, and then to a CompoundMatchQuery.
+
+When a hook is given, each pass is measured, and the hook is called with its measurements right
+after the pass completes. Without a hook, the passes are applied with no measurement overhead.
+"""
+from dataclasses import dataclass
+import sys
+import time
+from typing import Any, Callable, Optional, Sequence
+
+from ..compiler_entities import BasicBlock
+
+
+@dataclass(frozen=True)
+class LoweringPass:
+    """A named lowering pass, transforming the lowered query produced by the previous pass."""
+
+    # Name of the pass, unique within its pipeline, used to identify it in measurements.
+    name: str
+
+    # Function from the lowered query produced by the previous pass to the new lowered query.
+    # Any other arguments the pass needs are bound ahead of time.
+    function: Callable[[Any], Any]
+
+
+@dataclass(frozen=True)
+class LoweringPassStatistics:
+    """Measurements of a single lowering pass, as applied to a single query."""
+
+    # Name of the measured pass.
+    pass_name: str
+
+    # Wall time taken by the pass, in seconds.
+    elapsed_seconds: float
+
+    # Number of IR blocks in the lowered query, before and after the pass.
+    block_count_before: int
+    block_count_after: int
+
+    # Change in the number of memory blocks allocated by the interpreter while the pass ran,
+    # as reported by sys.getallocatedblocks(). It does not count blocks that were allocated and
+    # freed during the pass, and is always zero on interpreters other than CPython.
+    allocated_memory_block_delta: int
+
+
+LoweringPassHook = Callable[[LoweringPassStatistics], None]
+
+
+def count_ir_blocks(lowered_query: Any) -> int:
+    """Return the number of IR blocks in the lowered query, in any of its representations."""
+    if isinstance(lowered_query, BasicBlock):
+        return 1
+    elif isinstance(lowered_query, (list, tuple)):
+        # This includes all namedtuple-based representations, such as MatchQuery and CypherQuery.
+        return sum(count_ir_blocks(element) for element in lowered_query)
+    elif isinstance(lowered_query, dict):
+        return sum(count_ir_blocks(value) for value in lowered_query.values())
+    else:
+        return 0
+
+
+def run_lowering_pipeline(
+    lowering_passes: Sequence[LoweringPass],
+    lowered_query: Any,
+    lowering_pass_hook: Optional[LoweringPassHook] = None,
+) -> Any:
+    """Apply the lowering passes in order, calling the hook with the measurements of each.
+
+    Args:
+        lowering_passes: passes to apply, in order. Their names must be unique.
+        lowered_query: the query to lower, in the representation the first pass expects
+        lowering_pass_hook: optional function to call with the LoweringPassStatistics of
+                            each pass, right after that pass is applied. If not specified,
+                            the passes are not measured.
+
+    Returns:
+        the lowered query produced by the last pass
+    """
+    pass_names = [lowering_pass.name for lowering_pass in lowering_passes]
+    if len(pass_names) != len(set(pass_names)):
+        raise AssertionError(f"Found lowering passes with duplicate names: {pass_names}")
+
+    for lowering_pass in lowering_passes:
+        if lowering_pass_hook is None:
+            lowered_query = lowering_pass.function(lowered_query)
+            continue
+
+        block_count_before = count_ir_blocks(lowered_query)
+        allocated_blocks_before = sys.getallocatedblocks()
+        start_time = time.perf_counter()
+
+        lowered_query = lowering_pass.function(lowered_query)
+
+        elapsed_seconds = time.perf_counter() - start_time
+        allocated_blocks_after = sys.getallocatedblocks()
+        lowering_pass_hook(
+            LoweringPassStatistics(
+                pass_name=lowering_pass.name,
+                elapsed_seconds=elapsed_seconds,
+                block_count_before=block_count_before,
+                block_count_after=count_ir_blocks(lowered_query),
+                allocated_memory_block_delta=allocated_blocks_after - allocated_blocks_before,
+            )
+        )
+
+    return lowered_query
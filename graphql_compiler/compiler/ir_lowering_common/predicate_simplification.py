@@ -0,0 +1,265 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Simplify conjunctions of filter predicates that apply at the same location.
+
+By the time a backend emits the filtering clause of a location, that clause is often the
+conjunction of several predicates that were written, or produced by lowering passes, separately.
+Such conjunctions may contain duplicate predicates, multiple bounds on the same field where one
+bound implies the other, or predicates implied by an equality on the same field. This module
+rewrites such conjunctions into equivalent ones without the redundant predicates. Where both
+an inclusive lower and an inclusive upper bound with the same value constrain a field, it also
+replaces them with an equality, which is more likely to be answered using an index.
+
+Only the following predicates are considered for tightening, since their semantics are the same
+in all backends: comparisons between a field and a variable or literal, and "contains"
+predicates checking whether a literal list contains a field's value, i.e. in_collection filters.
+All other predicates are only deduplicated. Predicates are never reordered, other than by the
+removal of redundant ones.
+"""
+from typing import Dict, List, Optional, Tuple, Union, cast
+
+from ..compiler_entities import Expression
+from ..expressions import (
+    BinaryComposition,
+    ContextField,
+    Literal,
+    LocalField,
+    TrueLiteral,
+    Variable,
+)
+from .common import get_conjunction_terms
+
+
+FieldExpression = Union[LocalField, ContextField]
+ValueExpression = Union[Literal, Variable]
+FieldComparison = Tuple[FieldExpression, str, ValueExpression]
+
+# The comparison that is equivalent to the given one after swapping its left and right sides.
+_SWAPPED_COMPARISON_OPERATORS: Dict[str, str] = {
+    "=": "=",
+    "!=": "!=",
+    "<": ">",
+    "<=": ">=",
+    ">": "<",
+    ">=": "<=",
+}
+_LOWER_BOUND_OPERATORS = frozenset({">", ">="})
+_UPPER_BOUND_OPERATORS = frozenset({"<", "<="})
+
+
+def _is_field_expression(expression: Expression) -> bool:
+    """Return True if the expression is the value of a property field, and False otherwise."""
+    if isinstance(expression, LocalField):
+        return True
+    # In some backends, fields at the current location are referenced as ContextFields.
+    return isinstance(expression, ContextField) and expression.location.field is not None
+
+
+def _is_value_expression(expression: Expression) -> bool:
+    """Return True if the expression's value is known before the query is executed."""
+    return isinstance(expression, (Literal, Variable))
+
+
+def _get_numeric_literal_value(expression: Expression) -> Optional[Union[int, float]]:
+    """Return the value of a numeric Literal, or None if the expression is not one."""
+    if isinstance(expression, Literal):
+        value = expression.value
+        # bool is a subclass of int, but booleans are not ordered in the database.
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+    return None
+
+
+def _make_conjunction(terms: List[Expression]) -> Expression:
+    """Return the conjunction of the given predicates, nested in the same way as the frontend."""
+    if not terms:
+        return TrueLiteral
+    conjunction = terms[-1]
+    for term in reversed(terms[:-1]):
+        conjunction = BinaryComposition("&&", term, conjunction)
+    return conjunction
+
+
+def _normalize_term(term: Expression) -> Expression:
+    """Return an equivalent predicate, with the field on the left side of any field comparison."""
+    if (
+        isinstance(term, BinaryComposition)
+        and term.operator in _SWAPPED_COMPARISON_OPERATORS
+        and _is_value_expression(term.left)
+        and _is_field_expression(term.right)
+    ):
+        swapped_operator = _SWAPPED_COMPARISON_OPERATORS[term.operator]
+        return BinaryComposition(swapped_operator, term.right, term.left)
+    return term
+
+
+def _get_field_comparison(term: Optional[Expression]) -> Optional[FieldComparison]:
+    """Return the (field, operator, value) of a normalized comparison, or None if not one.
+
+    In addition to comparisons, this also matches "contains" predicates that check whether a
+    list contains the value of a field, i.e. in_collection filters. For those, the returned
+    operator is "in_collection", and the returned value is the list.
+    """
+    if not isinstance(term, BinaryComposition):
+        return None
+    if term.operator in _SWAPPED_COMPARISON_OPERATORS:
+        if _is_field_expression(term.left) and _is_value_expression(term.right):
+            return cast(FieldComparison, (term.left, term.operator, term.right))
+    elif term.operator == "contains":
+        if _is_value_expression(term.left) and _is_field_expression(term.right):
+            return cast(FieldComparison, (term.right, "in_collection", term.left))
+    return None
+
+
+def _is_implied_by_equality(operator: str, value: Expression, equal_value: Expression) -> bool:
+    """Return True if "field <operator> <value>" holds whenever "field = <equal_value>" does."""
+    if operator in ("=", ">=", "<=") and value == equal_value:
+        return True
+
+    if operator == "in_collection":
+        if isinstance(value, Literal) and isinstance(equal_value, Literal):
+            return isinstance(value.value, list) and equal_value.value in value.value
+        return False
+
+    numeric_value = _get_numeric_literal_value(value)
+    numeric_equal_value = _get_numeric_literal_value(equal_value)
+    if numeric_value is None or numeric_equal_value is None:
+        return False
+    return {
+        "=": numeric_equal_value == numeric_value,
+        "!=": numeric_equal_value != numeric_value,
+        "<": numeric_equal_value < numeric_value,
+        "<=": numeric_equal_value <= numeric_value,
+        ">": numeric_equal_value > numeric_value,
+        ">=": numeric_equal_value >= numeric_value,
+    }[operator]
+
+
+def _is_implied_by_bound(
+    operator: str, value: Expression, other_operator: str, other_value: Expression
+) -> bool:
+    """Return True if the bound "field <operator> <value>" is implied by the other bound.
+
+    Both bounds must be lower bounds, or both must be upper bounds.
+    """
+    is_strict = operator in (">", "<")
+    is_other_strict = other_operator in (">", "<")
+    if value == other_value:
+        # A strict bound implies the inclusive bound with the same value, but not vice versa.
+        return is_other_strict or not is_strict
+
+    numeric_value = _get_numeric_literal_value(value)
+    numeric_other_value = _get_numeric_literal_value(other_value)
+    if numeric_value is None or numeric_other_value is None:
+        return False
+    if operator in _LOWER_BOUND_OPERATORS:
+        return numeric_other_value > numeric_value
+    else:
+        return numeric_other_value < numeric_value
+
+
+def _tighten_field_terms(
+    terms: List[Optional[Expression]], comparisons: Dict[int, FieldComparison]
+) -> None:
+    """Remove the redundant predicates on a single field from the terms, in place.
+
+    Args:
+        terms: normalized predicates of the conjunction, some of which may have already been
+               removed, i.e. replaced by None
+        comparisons: the comparison of each of the terms that constrain the same field,
+                     by index into the terms
+    """
+    term_indexes = sorted(comparisons)
+
+    # An inclusive lower bound and an inclusive upper bound with the same value
+    # are replaced with an equality, in the place of whichever of them comes first.
+    for lower_index in term_indexes:
+        field, lower_operator, lower_value = comparisons[lower_index]
+        if lower_operator != ">=" or terms[lower_index] is None:
+            continue
+        for upper_index in term_indexes:
+            _, upper_operator, upper_value = comparisons[upper_index]
+            if upper_operator == "<=" and terms[upper_index] is not None:
+                if upper_value == lower_value:
+                    equality = BinaryComposition("=", field, lower_value)
+                    first_index, second_index = sorted((lower_index, upper_index))
+                    terms[first_index] = equality
+                    comparisons[first_index] = (field, "=", lower_value)
+                    terms[second_index] = None
+                    break
+
+    equality_indexes = [
+        index for index in term_indexes if terms[index] is not None and comparisons[index][1] == "="
+    ]
+    if equality_indexes:
+        # Every other predicate that the first equality implies is redundant.
+        _, _, equal_value = comparisons[equality_indexes[0]]
+        for index in term_indexes:
+            if index != equality_indexes[0] and terms[index] is not None:
+                _, operator, value = comparisons[index]
+                if _is_implied_by_equality(operator, value, equal_value):
+                    terms[index] = None
+        return
+
+    # Of several lower bounds or several upper bounds, the ones implied by another are redundant.
+    for bound_operators in (_LOWER_BOUND_OPERATORS, _UPPER_BOUND_OPERATORS):
+        bound_indexes = [
+            index
+            for index in term_indexes
+            if terms[index] is not None and comparisons[index][1] in bound_operators
+        ]
+        for index in bound_indexes:
+            _, operator, value = comparisons[index]
+            for other_index in bound_indexes:
+                if other_index == index or terms[other_index] is None:
+                    continue
+                _, other_operator, other_value = comparisons[other_index]
+                if _is_implied_by_bound(operator, value, other_operator, other_value):
+                    terms[index] = None
+                    break
+
+
+def simplify_conjunction(predicate: Expression) -> Expression:
+    """Return an equivalent predicate, without redundant predicates in its conjunction.
+
+    Args:
+        predicate: predicate to simplify, usually the conjunction of all filters at a location
+
+    Returns:
+        the given predicate object itself, if it has no redundant parts. Otherwise, a new
+        predicate that is the conjunction of the remaining parts, in their original order.
+    """
+    original_terms = get_conjunction_terms(predicate)
+
+    # Normalize the predicates, then remove duplicates and predicates that are always true.
+    terms: List[Optional[Expression]] = []
+    for original_term in original_terms:
+        normalized_term = _normalize_term(original_term)
+        is_true_literal = isinstance(normalized_term, Literal) and normalized_term.value is True
+        if not is_true_literal and normalized_term not in terms:
+            terms.append(normalized_term)
+
+    # Group the comparisons by the field they constrain. Expressions are not hashable,
+    # so the fields are compared one by one, but conjunctions are rarely long.
+    field_comparisons: List[Tuple[FieldExpression, Dict[int, FieldComparison]]] = []
+    for index, term in enumerate(terms):
+        comparison = _get_field_comparison(term)
+        if comparison is None:
+            continue
+        field = comparison[0]
+        for other_field, comparisons in field_comparisons:
+            if other_field == field:
+                comparisons[index] = comparison
+                break
+        else:
+            field_comparisons.append((field, {index: comparison}))
+
+    for _, comparisons in field_comparisons:
+        if len(comparisons) > 1:
+            _tighten_field_terms(terms, comparisons)
+
+    remaining_terms = [term for term in terms if term is not None]
+    if len(remaining_terms) == len(original_terms) and all(
+        term is original_term for term, original_term in zip(remaining_terms, original_terms)
+    ):
+        return predicate
+    return _make_conjunction(remaining_terms)
@@ -1,17 +1,26 @@
 # Copyright 2019-present Kensho Technologies, LLC.
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Mapping, Optional
+
+from ...schema.schema_info import QueryPlanningSchemaInfo
 from ..cypher_query import convert_to_cypher_query
 from ..ir_lowering_common.common import (
-    lower_context_field_existence,
+    apply_expression_rewrite_rules,
+    make_context_field_existence_lowering_rule,
     merge_consecutive_filter_clauses,
-    optimize_boolean_expression_comparisons,
+    optimize_boolean_expression_comparisons_rule,
 )
+from ..ir_lowering_common.pipeline import LoweringPass, run_lowering_pipeline
 from ..ir_self_consistency_checks import self_consistency_check_ir_blocks_from_frontend
 from .ir_lowering import (
     insert_explicit_type_bounds,
     move_filters_in_optional_locations_to_global_operations,
     remove_mark_location_after_optional_backtrack,
     renumber_locations_to_one,
+    reorder_steps_by_estimated_cardinality,
     replace_local_fields_with_context_fields,
+    simplify_where_predicates,
 )
 
 
@@ -20,39 +29,120 @@ from .ir_lowering import (
 ##############
 
 
-def lower_ir(schema_info, ir):
+@dataclass(frozen=True)
+class CypherCompilationOptions:
+    """Per-query options controlling how the Cypher query is produced.
+
+    The default value of each option produces the same Cypher as if no options were specified.
+    """
+
+    # By default, the pattern is matched in the order in which the GraphQL query was written.
+    # If set, the statistics in this schema info are used to estimate the number of vertices at
+    # each location instead. The pattern is then anchored at the location with the lowest
+    # estimate, and its mandatory traversals are reordered to match more selective locations first.
+    query_planning_schema_info: Optional[QueryPlanningSchemaInfo] = None
+
+    # The parameters the query will be executed with, used to estimate the selectivity of filters
+    # when reordering the pattern. Filters using parameters that are not given here are assumed
+    # to not filter out any vertices. Ignored unless query_planning_schema_info is set.
+    parameters: Optional[Mapping[str, Any]] = None
+
+    # By default, each @fold scope is emitted as OPTIONAL MATCH clauses followed by a WITH clause
+    # that collects the matched vertices. Each such scope first multiplies the number of rows by
+    # the number of paths through it, so queries with several @fold scopes produce intermediate
+    # results that grow with the product of their sizes. If set, the folded vertices are instead
+    # collected using pattern comprehensions, which are evaluated separately for each row. This
+    # requires pattern comprehension support, available in Neo4j 3.1+ and RedisGraph 2.2+.
+    use_pattern_comprehensions_for_folds: bool = False
+
+
+def lower_ir(schema_info, ir, compilation_options=None, lowering_pass_hook=None):
     """Lower the IR into an IR form that can be represented in Cypher queries.
 
     Args:
         schema_info: CommonSchemaInfo containing all relevant schema information
         ir: IrAndMetadata representing the query to lower into Cypher-compatible form
+        compilation_options: optional CypherCompilationOptions controlling how the query is
+                             lowered. If not specified, the default options are used.
+        lowering_pass_hook: optional function to call with the LoweringPassStatistics of each
+                            lowering pass, right after that pass is applied
 
     Returns:
         CypherQuery object
     """
+    if compilation_options is None:
+        compilation_options = CypherCompilationOptions()
+
     self_consistency_check_ir_blocks_from_frontend(ir.ir_blocks, ir.query_metadata_table)
 
-    ir_blocks = insert_explicit_type_bounds(
-        ir.ir_blocks,
-        ir.query_metadata_table,
-        type_equivalence_hints=schema_info.type_equivalence_hints,
-    )
+    lowering_passes = [
+        LoweringPass(
+            "insert_explicit_type_bounds",
+            partial(
+                insert_explicit_type_bounds,
+                query_metadata_table=ir.query_metadata_table,
+                type_equivalence_hints=schema_info.type_equivalence_hints,
+            ),
+        ),
+        LoweringPass(
+            "remove_mark_location_after_optional_backtrack",
+            partial(
+                remove_mark_location_after_optional_backtrack,
+                query_metadata_table=ir.query_metadata_table,
+            ),
+        ),
+        # Optimizing boolean comparisons doesn't depend on whether fields are local or not,
+        # so it is done in the same traversal as the lowering of ContextFieldExistence.
+        LoweringPass(
+            "lower_context_field_existence+optimize_boolean_expression_comparisons",
+            partial(
+                apply_expression_rewrite_rules,
+                rewrite_rules=[
+                    make_context_field_existence_lowering_rule(ir.query_metadata_table),
+                    optimize_boolean_expression_comparisons_rule,
+                ],
+            ),
+        ),
+        LoweringPass(
+            "replace_local_fields_with_context_fields", replace_local_fields_with_context_fields
+        ),
+        LoweringPass("merge_consecutive_filter_clauses", merge_consecutive_filter_clauses),
+        LoweringPass("renumber_locations_to_one", renumber_locations_to_one),
+        # From this point on, the lowering passes work on the CypherQuery representation.
+        LoweringPass(
+            "convert_to_cypher_query",
+            partial(
+                convert_to_cypher_query,
+                query_metadata_table=ir.query_metadata_table,
+                type_equivalence_hints=schema_info.type_equivalence_hints,
+            ),
+        ),
+        LoweringPass(
+            "move_filters_in_optional_locations_to_global_operations",
+            partial(
+                move_filters_in_optional_locations_to_global_operations,
+                query_metadata_table=ir.query_metadata_table,
+            ),
+        ),
+        LoweringPass("simplify_where_predicates", simplify_where_predicates),
+    ]
 
-    ir_blocks = remove_mark_location_after_optional_backtrack(ir_blocks, ir.query_metadata_table)
-    ir_blocks = lower_context_field_existence(ir_blocks, ir.query_metadata_table)
-    ir_blocks = replace_local_fields_with_context_fields(ir_blocks)
-    ir_blocks = optimize_boolean_expression_comparisons(ir_blocks)
-    ir_blocks = merge_consecutive_filter_clauses(ir_blocks)
-    ir_blocks = renumber_locations_to_one(ir_blocks)
-
-    cypher_query = convert_to_cypher_query(
-        ir_blocks,
-        ir.query_metadata_table,
-        type_equivalence_hints=schema_info.type_equivalence_hints,
-    )
+    if compilation_options.query_planning_schema_info is not None:
+        parameters = compilation_options.parameters
+        if parameters is None:
+            parameters = dict()
+        lowering_passes.append(
+            LoweringPass(
+                "reorder_steps_by_estimated_cardinality",
+                partial(
+                    reorder_steps_by_estimated_cardinality,
+                    query_metadata_table=ir.query_metadata_table,
+                    schema_info=compilation_options.query_planning_schema_info,
+                    parameters=parameters,
+                ),
+            )
+        )
 
-    cypher_query = move_filters_in_optional_locations_to_global_operations(
-        cypher_query, ir.query_metadata_table
+    return run_lowering_pipeline(
+        lowering_passes, ir.ir_blocks, lowering_pass_hook=lowering_pass_hook
     )
-
-    return cypher_query
@@ -2,11 +2,20 @@
 from functools import partial
 
 from .. import cypher_helpers
+from ...cost_estimation.cardinality_estimator import estimate_vertex_count_at_location
 from ...schema import COUNT_META_FIELD_NAME
-from ..blocks import Backtrack, CoerceType, Filter, Fold, MarkLocation, Recurse, Traverse
+from ..blocks import Backtrack, CoerceType, Filter, Fold, MarkLocation, QueryRoot, Recurse, Traverse
 from ..compiler_entities import Expression
-from ..expressions import BinaryComposition, ContextField, LocalField, NullLiteral
+from ..expressions import (
+    BinaryComposition,
+    ContextField,
+    ContextFieldExistence,
+    LocalField,
+    NullLiteral,
+)
 from ..helpers import (
+    INBOUND_EDGE_DIRECTION,
+    OUTBOUND_EDGE_DIRECTION,
     FoldScopeLocation,
     Location,
     get_only_element_from_collection,
@@ -18,6 +27,7 @@ from ..ir_lowering_common.location_renaming import (
     make_location_rewriter_visitor_fn,
     make_revisit_location_translations,
 )
+from ..ir_lowering_common.predicate_simplification import simplify_conjunction
 
 
 ##################################
@@ -344,3 +354,233 @@ def renumber_locations_to_one(ir_blocks):
 
         new_ir_blocks.append(new_block)
     return new_ir_blocks
+
+
+def _is_reorderable_cypher_step(cypher_step):
+    """Return True if the step is a mandatory traversal or the query root, and False otherwise."""
+    step_block = cypher_step.step_block
+    if isinstance(step_block, QueryRoot):
+        return True
+    elif isinstance(step_block, Traverse):
+        return not (step_block.optional or step_block.within_optional_scope)
+    else:
+        return False
+
+
+def _get_locations_referenced_by_filter(filter_block):
+    """Return the set of vertex locations whose values the Filter block uses."""
+    referenced_locations = set()
+
+    def visitor_fn(expression):
+        """Record the location of each expression that references a location."""
+        if isinstance(expression, (ContextField, ContextFieldExistence)):
+            referenced_locations.add(
+                rewrite_locations_visit_counter_to_one(expression.location.at_vertex())
+            )
+        return expression
+
+    filter_block.visit_and_update_expressions(visitor_fn)
+    return referenced_locations
+
+
+def _make_anchor_cypher_step(cypher_step):
+    """Return a step matching the same vertices as the given step, without a linked location."""
+    return cypher_step._replace(
+        linked_location=None, step_block=QueryRoot(set(cypher_step.step_types))
+    )
+
+
+def _make_reversed_cypher_step(linking_cypher_step, linked_cypher_step):
+    """Return a step reaching the linked step's vertex by reversing the linking step's edge.
+
+    Args:
+        linking_cypher_step: CypherStep whose linked location is the vertex of linked_cypher_step
+        linked_cypher_step: CypherStep whose vertex is to be reached from the vertex of
+                            linking_cypher_step instead
+
+    Returns:
+        CypherStep traversing from the vertex of linking_cypher_step to the vertex of
+        linked_cypher_step, with the type bounds and filters of the linked_cypher_step
+    """
+    reversed_directions = {
+        INBOUND_EDGE_DIRECTION: OUTBOUND_EDGE_DIRECTION,
+        OUTBOUND_EDGE_DIRECTION: INBOUND_EDGE_DIRECTION,
+    }
+    linking_step_block = linking_cypher_step.step_block
+    return linked_cypher_step._replace(
+        linked_location=linking_cypher_step.as_block.location,
+        step_block=Traverse(
+            reversed_directions[linking_step_block.direction], linking_step_block.edge_name
+        ),
+    )
+
+
+def reorder_steps_by_estimated_cardinality(
+    cypher_query, query_metadata_table, schema_info, parameters
+):
+    """Anchor the pattern at its most selective vertex, and match more selective vertices first.
+
+    Neo4j and RedisGraph mostly execute MATCH clauses in the order in which they are written, so
+    the first vertex of the pattern determines how many vertices are scanned. This pass looks at
+    the query root and the mandatory traversals that precede any other kind of step. Together,
+    those form a tree pattern whose vertices can be matched in any order that keeps the tree
+    connected, without changing the query's results. The new order starts at the vertex with
+    the fewest estimated vertices, and then repeatedly matches the connected vertex with
+    the fewest estimated vertices, reversing edges as needed. Filters that use tagged values are
+    moved to the first step at which the tagged location is matched. All other steps keep
+    their position.
+
+    If the estimates are unavailable for any of the reorderable vertices, or the steps do not
+    form a tree pattern, the query is returned unchanged.
+
+    Args:
+        cypher_query: CypherQuery object describing the query to rewrite
+        query_metadata_table: QueryMetadataTable object that captures information about the query
+        schema_info: QueryPlanningSchemaInfo whose statistics are used to estimate the number of
+                     vertices at each location
+        parameters: dict, parameters with which the query will be executed. May be incomplete,
+                    in which case filters using the missing parameters are assumed to not filter
+                    out any vertices.
+
+    Returns:
+        CypherQuery object with the same semantics, with its steps reordered
+    """
+    reorderable_step_count = 0
+    for cypher_step in cypher_query.steps:
+        if not _is_reorderable_cypher_step(cypher_step):
+            break
+        reorderable_step_count += 1
+
+    reorderable_steps = cypher_query.steps[:reorderable_step_count]
+    remaining_steps = cypher_query.steps[reorderable_step_count:]
+
+    step_by_location = {}
+    vertex_count_estimates = {}
+    for cypher_step in reorderable_steps:
+        location = cypher_step.as_block.location
+        if location in step_by_location:
+            # The same location is matched more than once, so the steps don't form a tree.
+            return cypher_query
+
+        vertex_count_estimate = estimate_vertex_count_at_location(
+            schema_info,
+            query_metadata_table,
+            parameters,
+            location,
+            get_only_element_from_collection(cypher_step.step_types),
+        )
+        if vertex_count_estimate is None:
+            return cypher_query
+
+        step_by_location[location] = cypher_step
+        vertex_count_estimates[location] = vertex_count_estimate
+
+    for cypher_step in reorderable_steps[1:]:
+        if cypher_step.linked_location not in step_by_location:
+            raise AssertionError(
+                "Found a mandatory step linked to a location that is not matched by any "
+                "preceding mandatory step: {} {}".format(cypher_step, cypher_query)
+            )
+
+    # Ties are broken in favor of the original order of the steps.
+    original_positions = {
+        cypher_step.as_block.location: index for index, cypher_step in enumerate(reorderable_steps)
+    }
+
+    def sort_key(location):
+        """Return the sort key for choosing the location to match next."""
+        return (vertex_count_estimates[location], original_positions[location])
+
+    def is_filter_ready(where_block):
+        """Return True if all reorderable locations the filter uses are already matched."""
+        referenced_locations = _get_locations_referenced_by_filter(where_block)
+        return referenced_locations.intersection(step_by_location).issubset(matched_locations)
+
+    anchor_location = min(step_by_location, key=sort_key)
+    anchor_step = _make_anchor_cypher_step(step_by_location[anchor_location])
+    matched_locations = {anchor_location}
+
+    # Filters using tagged values from locations that are not matched yet are held back here.
+    pending_where_blocks = []
+    if anchor_step.where_block is not None and not is_filter_ready(anchor_step.where_block):
+        pending_where_blocks.append(anchor_step.where_block)
+        anchor_step = anchor_step._replace(where_block=None)
+    new_steps = [anchor_step]
+
+    while len(new_steps) < len(reorderable_steps):
+        # Find the step that can reach each unmatched location adjacent to a matched one.
+        candidate_steps = {}
+        for cypher_step in reorderable_steps[1:]:
+            location = cypher_step.as_block.location
+            linked_location = cypher_step.linked_location
+            if linked_location in matched_locations and location not in matched_locations:
+                candidate_steps[location] = cypher_step
+            elif location in matched_locations and linked_location not in matched_locations:
+                candidate_steps[linked_location] = _make_reversed_cypher_step(
+                    cypher_step, step_by_location[linked_location]
+                )
+
+        next_location = min(candidate_steps, key=sort_key)
+        next_step = candidate_steps[next_location]
+        matched_locations.add(next_location)
+
+        if next_step.where_block is not None:
+            pending_where_blocks.append(next_step.where_block)
+            next_step = next_step._replace(where_block=None)
+
+        # Attach each filter to the first step at which all locations it uses are matched.
+        # All these steps are mandatory, so attaching a filter to a later step is equivalent.
+        ready_where_blocks = [
+            where_block for where_block in pending_where_blocks if is_filter_ready(where_block)
+        ]
+        if ready_where_blocks:
+            pending_where_blocks = [
+                where_block
+                for where_block in pending_where_blocks
+                if where_block not in ready_where_blocks
+            ]
+            next_step = next_step._replace(
+                where_block=get_only_element_from_collection(
+                    merge_consecutive_filter_clauses(ready_where_blocks)
+                )
+            )
+
+        new_steps.append(next_step)
+
+    if pending_where_blocks:
+        raise AssertionError(
+            "Unexpectedly found filters using locations that are not matched by any step: "
+            "{} {}".format(pending_where_blocks, cypher_query)
+        )
+
+    return cypher_query._replace(steps=new_steps + remaining_steps)
+
+
+def _simplify_where_block(where_block):
+    """Return the where block with its predicate simplified, or the original if it is simplest."""
+    if where_block is None:
+        return None
+
+    simplified_predicate = simplify_conjunction(where_block.predicate)
+    if simplified_predicate is where_block.predicate:
+        return where_block
+    return Filter(simplified_predicate)
+
+
+def simplify_where_predicates(cypher_query):
+    """Remove redundant predicates from each WHERE clause of the query, and tighten the others.
+
+    Args:
+        cypher_query: CypherQuery object whose WHERE clauses to simplify
+
+    Returns:
+        CypherQuery with the same semantics, and simplified WHERE clauses
+    """
+    new_steps = [
+        step._replace(where_block=_simplify_where_block(step.where_block))
+        for step in cypher_query.steps
+    ]
+    return cypher_query._replace(
+        steps=new_steps,
+        global_where_block=_simplify_where_block(cypher_query.global_where_block),
+    )
@@ -1,13 +1,20 @@
 # Copyright 2018-present Kensho Technologies, LLC.
-from ..ir_lowering_common.common import (
+from dataclasses import dataclass
+from functools import partial
+
+from ..ir_lowering_common.common import (  # noqa
+    apply_expression_rewrite_rules,
     lower_context_field_existence,
+    make_context_field_existence_lowering_rule,
     merge_consecutive_filter_clauses,
-    optimize_boolean_expression_comparisons,
+    optimize_boolean_expression_comparisons_rule,
 )
+from ..ir_lowering_common.pipeline import LoweringPass, run_lowering_pipeline
 from ..ir_self_consistency_checks import self_consistency_check_ir_blocks_from_frontend
 from .ir_lowering import (
     lower_coerce_type_block_type_data,
     lower_coerce_type_blocks,
+    lower_filters_into_has_steps,
     lower_folded_outputs_and_context_fields,
     rewrite_filters_in_optional_blocks,
 )
@@ -18,27 +25,79 @@ from .ir_lowering import (
 ##############
 
 
-def lower_ir(schema_info, ir):
+@dataclass(frozen=True)
+class GremlinCompilationOptions:
+    """Per-query options controlling how the Gremlin query is produced.
+
+    The default value of each option produces the same Gremlin as if no options were specified.
+    """
+
+    # By default, all filters are emitted as filter{} closures. If set, the equality, comparison
+    # and in_collection filters outside @optional scopes that compare a vertex property against
+    # a parameter or literal value are emitted as has() steps instead, ahead of any remaining
+    # closure. The Gremlin server can then answer them using its indexes.
+    use_has_steps_for_filters: bool = False
+
+
+def lower_ir(schema_info, ir, compilation_options=None, lowering_pass_hook=None):
     """Lower the IR into an IR form that can be represented in Gremlin queries.
 
     Args:
         schema_info: CommonSchemaInfo containing all relevant schema information
         ir: IrAndMetadata representing the query to lower into Gremlin-compatible form
+        compilation_options: optional GremlinCompilationOptions controlling how the query is
+                             lowered. If not specified, the default options are used.
+        lowering_pass_hook: optional function to call with the LoweringPassStatistics of each
+                            lowering pass, right after that pass is applied
 
     Returns:
         list of IR blocks suitable for outputting as Gremlin
     """
+    if compilation_options is None:
+        compilation_options = GremlinCompilationOptions()
+
     self_consistency_check_ir_blocks_from_frontend(ir.ir_blocks, ir.query_metadata_table)
 
-    ir_blocks = lower_context_field_existence(ir.ir_blocks, ir.query_metadata_table)
-    ir_blocks = optimize_boolean_expression_comparisons(ir_blocks)
+    lowering_passes = [
+        LoweringPass(
+            "lower_context_field_existence+optimize_boolean_expression_comparisons",
+            partial(
+                apply_expression_rewrite_rules,
+                rewrite_rules=[
+                    make_context_field_existence_lowering_rule(ir.query_metadata_table),
+                    optimize_boolean_expression_comparisons_rule,
+                ],
+            ),
+        ),
+    ]
 
     if schema_info.type_equivalence_hints:
-        ir_blocks = lower_coerce_type_block_type_data(ir_blocks, schema_info.type_equivalence_hints)
+        lowering_passes.append(
+            LoweringPass(
+                "lower_coerce_type_block_type_data",
+                partial(
+                    lower_coerce_type_block_type_data,
+                    type_equivalence_hints=schema_info.type_equivalence_hints,
+                ),
+            )
+        )
+
+    lowering_passes.extend(
+        [
+            LoweringPass("lower_coerce_type_blocks", lower_coerce_type_blocks),
+            LoweringPass("rewrite_filters_in_optional_blocks", rewrite_filters_in_optional_blocks),
+            LoweringPass("merge_consecutive_filter_clauses", merge_consecutive_filter_clauses),
+            LoweringPass(
+                "lower_folded_outputs_and_context_fields", lower_folded_outputs_and_context_fields
+            ),
+        ]
+    )
 
-    ir_blocks = lower_coerce_type_blocks(ir_blocks)
-    ir_blocks = rewrite_filters_in_optional_blocks(ir_blocks)
-    ir_blocks = merge_consecutive_filter_clauses(ir_blocks)
-    ir_blocks = lower_folded_outputs_and_context_fields(ir_blocks)
+    if compilation_options.use_has_steps_for_filters:
+        lowering_passes.append(
+            LoweringPass("lower_filters_into_has_steps", lower_filters_into_has_steps)
+        )
 
-    return ir_blocks
+    return run_lowering_pipeline(
+        lowering_passes, ir.ir_blocks, lowering_pass_hook=lowering_pass_hook
+    )
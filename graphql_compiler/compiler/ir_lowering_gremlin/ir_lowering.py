@@ -14,7 +14,7 @@ import six
 
 from ...exceptions import GraphQLCompilationError
 from ...global_utils import is_same_type
-from ...schema import GraphQLDate, GraphQLDateTime
+from ...schema import GraphQLDate, GraphQLDateTime, is_vertex_field_name
 from ..blocks import Backtrack, CoerceType, Filter, GlobalOperationsStart, MarkLocation, Traverse
 from ..compiler_entities import Expression
 from ..expressions import (
@@ -23,6 +23,7 @@ from ..expressions import (
     Literal,
     LocalField,
     NullLiteral,
+    Variable,
     make_type_replacement_visitor,
 )
 from ..helpers import (
@@ -33,7 +34,7 @@ from ..helpers import (
     strip_non_null_from_type,
     validate_safe_string,
 )
-from ..ir_lowering_common.common import extract_folds_from_ir_blocks
+from ..ir_lowering_common.common import extract_folds_from_ir_blocks, get_conjunction_terms
 
 
 ##################################
@@ -146,6 +147,8 @@ def rewrite_filters_in_optional_blocks(ir_blocks):
 class GremlinFoldedContextField(Expression):
     """A Gremlin-specific FoldedContextField that knows how to output itself as Gremlin."""
 
+    __slots__ = ("fold_scope_location", "folded_ir_blocks", "field_type")
+
     def __init__(self, fold_scope_location, folded_ir_blocks, field_type):
         """Create a new GremlinFoldedContextField."""
         super(GremlinFoldedContextField, self).__init__(
@@ -280,6 +283,8 @@ class GremlinFoldedContextField(Expression):
 class GremlinFoldedFilter(Filter):
     """A Gremlin-specific Filter block to be used only within @fold scopes."""
 
+    __slots__ = ()
+
     def to_gremlin(self):
         """Return a unicode object with the Gremlin representation of this block."""
         self.validate()
@@ -289,6 +294,8 @@ class GremlinFoldedFilter(Filter):
 class GremlinFoldedTraverse(Traverse):
     """A Gremlin-specific Traverse block to be used only within @fold scopes."""
 
+    __slots__ = ()
+
     @classmethod
     def from_traverse(cls, traverse_block):
         """Create a GremlinFoldedTraverse block as a copy of the given Traverse block."""
@@ -317,6 +324,8 @@ class GremlinFoldedTraverse(Traverse):
 class GremlinFoldedLocalField(LocalField):
     """A Gremlin-specific LocalField expression to be used only within @fold scopes."""
 
+    __slots__ = ()
+
     def get_local_object_gremlin_name(self):
         """Return the Gremlin name of the local object whose field is being produced."""
         return "entry"
@@ -399,3 +408,127 @@ def lower_folded_outputs_and_context_fields(ir_blocks):
         new_ir_blocks.append(block.visit_and_update_expressions(visitor_fn))
 
     return new_ir_blocks
+
+
+# Gremlin comparison tokens used in has() steps, keyed by the filtering operator they implement.
+_HAS_STEP_COMPARISON_TOKENS = {
+    "=": "T.eq",
+    "<": "T.lt",
+    "<=": "T.lte",
+    ">": "T.gt",
+    ">=": "T.gte",
+}
+
+
+def _is_has_step_property_field(expression):
+    """Return True if the expression is a property field of the current vertex, usable in has()."""
+    return (
+        type(expression) is LocalField
+        and "@" not in expression.field_name
+        and not expression.field_name.startswith("__")
+        and not is_vertex_field_name(expression.field_name)
+    )
+
+
+def _is_has_step_value(expression):
+    """Return True if the expression is a value known before query execution, usable in has()."""
+    return isinstance(expression, (Variable, Literal)) and expression != NullLiteral
+
+
+def _can_lower_into_has_step(predicate):
+    """Return True if the predicate can be expressed as a single Gremlin has() step."""
+    if not isinstance(predicate, BinaryComposition):
+        return False
+    elif predicate.operator in _HAS_STEP_COMPARISON_TOKENS:
+        return _is_has_step_property_field(predicate.left) and _is_has_step_value(predicate.right)
+    elif predicate.operator == "contains":
+        # The "in_collection" filter checks that the collection contains the field's value.
+        return _is_has_step_value(predicate.left) and _is_has_step_property_field(predicate.right)
+    else:
+        return False
+
+
+class GremlinHasFilter(Filter):
+    """A Gremlin-specific Filter block whose predicate can be expressed as a has() step.
+
+    Unlike Filter blocks, which are emitted as closures that the Gremlin server must evaluate
+    on every vertex, has() steps can be pushed down into index lookups.
+    """
+
+    __slots__ = ()
+
+    def validate(self):
+        """Ensure that the GremlinHasFilter block is valid."""
+        super(GremlinHasFilter, self).validate()
+        if not _can_lower_into_has_step(self.predicate):
+            raise AssertionError(
+                "Predicate cannot be expressed as a has() step: {}".format(self.predicate)
+            )
+
+    def to_gremlin(self):
+        """Return a unicode object with the Gremlin representation of this block."""
+        self.validate()
+        if self.predicate.operator == "contains":
+            field_name = self.predicate.right.field_name
+            comparison_token = "T.in"
+            value = self.predicate.left
+        else:
+            field_name = self.predicate.left.field_name
+            comparison_token = _HAS_STEP_COMPARISON_TOKENS[self.predicate.operator]
+            value = self.predicate.right
+
+        return "has('{}', {}, {})".format(field_name, comparison_token, value.to_gremlin())
+
+
+def lower_filters_into_has_steps(ir_blocks):
+    """Emit the equality, range and in_collection filters outside @optional as has() steps.
+
+    Each Filter block is split into the terms of its predicate's conjunction. The terms that
+    compare a property of the current vertex against a parameter or literal value become
+    GremlinHasFilter blocks, which are emitted as has() steps, and which come first so that
+    the Gremlin server can use them for index lookups. Any remaining terms are kept together
+    in a regular Filter block after them. Filters within @optional scopes allow missing vertices
+    through, which has() steps can't express, so they are not changed. The same is true for
+    filters inside @fold scopes, which are not top-level blocks by this point.
+
+    Args:
+        ir_blocks: list of IR blocks to lower into Gremlin-compatible form
+
+    Returns:
+        new list of IR blocks with this lowering step applied
+    """
+    new_ir_blocks = []
+    optional_context_depth = 0
+    in_global_operations = False
+
+    for block in ir_blocks:
+        if isinstance(block, GlobalOperationsStart):
+            in_global_operations = True
+        elif isinstance(block, Traverse) and block.optional:
+            optional_context_depth += 1
+        elif isinstance(block, Backtrack) and block.optional:
+            optional_context_depth -= 1
+
+        can_lower_filter = (
+            type(block) is Filter and optional_context_depth == 0 and not in_global_operations
+        )
+        if not can_lower_filter:
+            new_ir_blocks.append(block)
+            continue
+
+        has_step_terms = []
+        remaining_terms = []
+        for term in get_conjunction_terms(block.predicate):
+            if _can_lower_into_has_step(term):
+                has_step_terms.append(term)
+            else:
+                remaining_terms.append(term)
+
+        new_ir_blocks.extend(GremlinHasFilter(term) for term in has_step_terms)
+        if remaining_terms:
+            remaining_predicate = remaining_terms[0]
+            for term in remaining_terms[1:]:
+                remaining_predicate = BinaryComposition("&&", remaining_predicate, term)
+            new_ir_blocks.append(Filter(remaining_predicate))
+
+    return new_ir_blocks
@@ -1,17 +1,25 @@
 # Copyright 2018-present Kensho Technologies, LLC.
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, List, Mapping, Optional
+
 import six
 
-from ...schema.schema_info import CommonSchemaInfo
+from ...schema.schema_info import CommonSchemaInfo, QueryPlanningSchemaInfo
 from ..blocks import Filter
+from ..compiler_entities import BasicBlock
 from ..compiler_frontend import IrAndMetadata
-from ..ir_lowering_common.common import (
+from ..ir_lowering_common.common import (  # noqa
+    apply_expression_rewrite_rules,
     extract_optional_location_root_info,
     extract_simple_optional_location_info,
     lower_context_field_existence,
+    make_context_field_existence_lowering_rule,
     merge_consecutive_filter_clauses,
-    optimize_boolean_expression_comparisons,
+    optimize_boolean_expression_comparisons_rule,
     remove_end_optionals,
 )
+from ..ir_lowering_common.pipeline import LoweringPass, LoweringPassHook, run_lowering_pipeline
 from ..ir_self_consistency_checks import self_consistency_check_ir_blocks_from_frontend
 from ..match_query import MatchQuery, convert_to_match_query
 from ..workarounds import (
@@ -20,12 +28,15 @@ from ..workarounds import (
     orientdb_query_execution,
 )
 from .between_lowering import lower_comparisons_to_between
-from .ir_lowering import (
+from .ir_lowering import (  # noqa
     lower_backtrack_blocks,
     lower_folded_coerce_types_into_filter_blocks,
     lower_string_operators,
+    lower_string_operators_rule,
     remove_backtrack_blocks_from_fold,
     rewrite_binary_composition_inside_ternary_conditional,
+    rewrite_binary_composition_inside_ternary_conditional_rule,
+    simplify_where_predicates,
     truncate_repeated_single_step_traversals,
     truncate_repeated_single_step_traversals_in_sub_queries,
 )
@@ -43,16 +54,48 @@ from .utils import construct_where_filter_predicate
 ##############
 
 
-def lower_ir(schema_info: CommonSchemaInfo, ir: IrAndMetadata) -> MatchQuery:
+@dataclass(frozen=True)
+class MatchCompilationOptions:
+    """Per-query options controlling how the MATCH query is produced.
+
+    The default value of each option produces the same MATCH as if no options were specified.
+    """
+
+    # OrientDB picks where to start executing a MATCH query based on class sizes alone, ignoring
+    # filters that it can't use an index for. By default, the compiler guides it using only the
+    # structure of the query. If set, the statistics in this schema info are used instead, to
+    # estimate the number of vertices at each possible start point. Each MATCH query then exposes
+    # only the start point with the lowest estimate to OrientDB.
+    query_planning_schema_info: Optional[QueryPlanningSchemaInfo] = None
+
+    # The parameters the query will be executed with, used to estimate the selectivity of filters
+    # when choosing the start point. Filters using parameters that are not given here are assumed
+    # to not filter out any vertices. Ignored unless query_planning_schema_info is set.
+    parameters: Optional[Mapping[str, Any]] = None
+
+
+def lower_ir(
+    schema_info: CommonSchemaInfo,
+    ir: IrAndMetadata,
+    compilation_options: Optional[MatchCompilationOptions] = None,
+    lowering_pass_hook: Optional[LoweringPassHook] = None,
+) -> MatchQuery:
     """Lower the IR into an IR form that can be represented in MATCH queries.
 
     Args:
         schema_info: CommonSchemaInfo containing all relevant schema information
         ir: IrAndMetadata representing the query to lower into MATCH-compatible form
+        compilation_options: optional MatchCompilationOptions controlling how the query is
+                             lowered. If not specified, the default options are used.
+        lowering_pass_hook: optional function to call with the LoweringPassStatistics of each
+                            lowering pass, right after that pass is applied
 
     Returns:
         MatchQuery object containing the IR blocks organized in a MATCH-like structure
     """
+    if compilation_options is None:
+        compilation_options = MatchCompilationOptions()
+
     self_consistency_check_ir_blocks_from_frontend(ir.ir_blocks, ir.query_metadata_table)
 
     # Construct the mapping of each location to its corresponding GraphQL type.
@@ -74,61 +117,114 @@ def lower_ir(schema_info: CommonSchemaInfo, ir: IrAndMetadata) -> MatchQuery:
     simple_optional_root_info = extract_simple_optional_location_info(
         ir.ir_blocks, complex_optional_roots, location_to_optional_roots
     )
-    ir_blocks = remove_end_optionals(ir.ir_blocks)
-
-    # Append global operation block(s) to filter out incorrect results
-    # from simple optional match traverses (using a WHERE statement)
-    if len(simple_optional_root_info) > 0:
-        where_filter_predicate = construct_where_filter_predicate(
-            ir.query_metadata_table, simple_optional_root_info
-        )
-        # The GlobalOperationsStart block should already exist at this point. It is inserted
-        # in the compiler_frontend, and this function asserts that at the beginning.
-        ir_blocks.insert(-1, Filter(where_filter_predicate))
-
-    # These lowering / optimization passes work on IR blocks.
-    ir_blocks = lower_context_field_existence(ir_blocks, ir.query_metadata_table)
-    ir_blocks = optimize_boolean_expression_comparisons(ir_blocks)
-    ir_blocks = rewrite_binary_composition_inside_ternary_conditional(ir_blocks)
-    ir_blocks = merge_consecutive_filter_clauses(ir_blocks)
-    ir_blocks = lower_string_operators(ir_blocks)
-    ir_blocks = orientdb_eval_scheduling.workaround_lowering_pass(
-        ir_blocks, ir.query_metadata_table
-    )
-
-    # Here, we lower from raw IR blocks into a MatchQuery object.
-    # From this point on, the lowering / optimization passes work on the MatchQuery representation.
-    match_query = convert_to_match_query(ir_blocks)
-
-    match_query = lower_comparisons_to_between(match_query)
 
-    match_query = lower_backtrack_blocks(match_query, ir.query_metadata_table)
-    match_query = truncate_repeated_single_step_traversals(match_query)
-    match_query = orientdb_class_with_while.workaround_type_coercions_in_recursions(match_query)
-
-    # Optimize and lower the IR blocks inside @fold scopes.
-    new_folds = {
-        key: merge_consecutive_filter_clauses(
-            remove_backtrack_blocks_from_fold(
-                lower_folded_coerce_types_into_filter_blocks(folded_ir_blocks)
+    def insert_simple_optional_where_filter(ir_blocks: List[BasicBlock]) -> List[BasicBlock]:
+        """Append a global Filter block that removes incorrect results of simple optionals."""
+        if len(simple_optional_root_info) > 0:
+            where_filter_predicate = construct_where_filter_predicate(
+                ir.query_metadata_table, simple_optional_root_info
             )
-        )
-        for key, folded_ir_blocks in six.iteritems(match_query.folds)
-    }
-    match_query = match_query._replace(folds=new_folds)
-
-    compound_match_query = convert_optional_traversals_to_compound_match_query(
-        match_query, complex_optional_roots, location_to_optional_roots
-    )
-    compound_match_query = prune_non_existent_outputs(compound_match_query)
-    compound_match_query = collect_filters_to_first_location_occurrence(compound_match_query)
-    compound_match_query = lower_context_field_expressions(compound_match_query)
-
-    compound_match_query = truncate_repeated_single_step_traversals_in_sub_queries(
-        compound_match_query
-    )
-    compound_match_query = orientdb_query_execution.expose_ideal_query_execution_start_points(
-        compound_match_query, location_types, coerced_locations
+            # The GlobalOperationsStart block should already exist at this point. It is inserted
+            # in the compiler_frontend, and this function asserts that at the beginning.
+            ir_blocks.insert(-1, Filter(where_filter_predicate))
+        return ir_blocks
+
+    def lower_folds(match_query: MatchQuery) -> MatchQuery:
+        """Optimize and lower the IR blocks inside @fold scopes."""
+        new_folds = {
+            key: merge_consecutive_filter_clauses(
+                remove_backtrack_blocks_from_fold(
+                    lower_folded_coerce_types_into_filter_blocks(folded_ir_blocks)
+                )
+            )
+            for key, folded_ir_blocks in six.iteritems(match_query.folds)
+        }
+        return match_query._replace(folds=new_folds)
+
+    lowering_passes = [
+        LoweringPass("remove_end_optionals", remove_end_optionals),
+        LoweringPass("insert_simple_optional_where_filter", insert_simple_optional_where_filter),
+        # These lowering / optimization passes work on IR blocks.
+        # Related expression rewrites are fused into a single traversal of the IR. They are split
+        # into two traversals since the ternary conditional rewrite produces comparisons with
+        # boolean literals, which must not be optimized away.
+        LoweringPass(
+            "lower_context_field_existence+optimize_boolean_expression_comparisons",
+            partial(
+                apply_expression_rewrite_rules,
+                rewrite_rules=[
+                    make_context_field_existence_lowering_rule(ir.query_metadata_table),
+                    optimize_boolean_expression_comparisons_rule,
+                ],
+            ),
+        ),
+        LoweringPass(
+            "rewrite_binary_composition_inside_ternary_conditional+lower_string_operators",
+            partial(
+                apply_expression_rewrite_rules,
+                rewrite_rules=[
+                    rewrite_binary_composition_inside_ternary_conditional_rule,
+                    lower_string_operators_rule,
+                ],
+            ),
+        ),
+        LoweringPass("merge_consecutive_filter_clauses", merge_consecutive_filter_clauses),
+        LoweringPass(
+            "orientdb_eval_scheduling",
+            partial(
+                orientdb_eval_scheduling.workaround_lowering_pass,
+                query_metadata_table=ir.query_metadata_table,
+            ),
+        ),
+        # Here, we lower from raw IR blocks into a MatchQuery object. From this point on,
+        # the lowering / optimization passes work on the MatchQuery representation.
+        LoweringPass("convert_to_match_query", convert_to_match_query),
+        LoweringPass("lower_comparisons_to_between", lower_comparisons_to_between),
+        LoweringPass(
+            "lower_backtrack_blocks",
+            partial(lower_backtrack_blocks, query_metadata_table=ir.query_metadata_table),
+        ),
+        LoweringPass(
+            "truncate_repeated_single_step_traversals", truncate_repeated_single_step_traversals
+        ),
+        LoweringPass(
+            "orientdb_class_with_while",
+            orientdb_class_with_while.workaround_type_coercions_in_recursions,
+        ),
+        LoweringPass("lower_folds", lower_folds),
+        # From this point on, the lowering passes work on the CompoundMatchQuery representation.
+        LoweringPass(
+            "convert_optional_traversals_to_compound_match_query",
+            partial(
+                convert_optional_traversals_to_compound_match_query,
+                complex_optional_roots=complex_optional_roots,
+                location_to_optional_roots=location_to_optional_roots,
+            ),
+        ),
+        LoweringPass("prune_non_existent_outputs", prune_non_existent_outputs),
+        LoweringPass(
+            "collect_filters_to_first_location_occurrence",
+            collect_filters_to_first_location_occurrence,
+        ),
+        LoweringPass("lower_context_field_expressions", lower_context_field_expressions),
+        LoweringPass(
+            "truncate_repeated_single_step_traversals_in_sub_queries",
+            truncate_repeated_single_step_traversals_in_sub_queries,
+        ),
+        LoweringPass("simplify_where_predicates", simplify_where_predicates),
+        LoweringPass(
+            "orientdb_query_execution",
+            partial(
+                orientdb_query_execution.expose_ideal_query_execution_start_points,
+                location_types=location_types,
+                coerced_locations=coerced_locations,
+                query_metadata_table=ir.query_metadata_table,
+                schema_info=compilation_options.query_planning_schema_info,
+                parameters=compilation_options.parameters,
+            ),
+        ),
+    ]
+
+    return run_lowering_pipeline(
+        lowering_passes, ir.ir_blocks, lowering_pass_hook=lowering_pass_hook
     )
-
-    return compound_match_query
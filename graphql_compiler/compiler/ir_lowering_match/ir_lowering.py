@@ -16,14 +16,17 @@ from ..blocks import Backtrack, CoerceType, Filter, MarkLocation, QueryRoot
 from ..compiler_entities import BasicBlock, Expression
 from ..expressions import BinaryComposition, FalseLiteral, Literal, TernaryConditional, TrueLiteral
 from ..helpers import Location
+from ..ir_lowering_common.common import apply_expression_rewrite_rules
 from ..ir_lowering_common.location_renaming import (
     make_location_rewriter_visitor_fn,
     make_revisit_location_translations,
     translate_potential_location,
 )
+from ..ir_lowering_common.predicate_simplification import simplify_conjunction
 from ..match_query import MatchQuery, MatchStep
 from ..metadata import QueryMetadataTable
-from .utils import CompoundMatchQuery, convert_coerce_type_to_instanceof_filter
+from .between_lowering import lower_comparisons_to_between
+from .utils import BetweenClause, CompoundMatchQuery, convert_coerce_type_to_instanceof_filter
 
 
 ##################################
@@ -31,73 +34,75 @@ from .utils import CompoundMatchQuery, convert_coerce_type_to_instanceof_filter
 ##################################
 
 
+def rewrite_binary_composition_inside_ternary_conditional_rule(
+    block: BasicBlock, expression: Expression
+) -> Expression:
+    """Rewrite rule for BinaryComposition expressions in the true/false values of ternaries."""
+    # MATCH queries do not allow BinaryComposition inside a TernaryConditional's true/false
+    # value blocks, since OrientDB cannot produce boolean values for comparisons inside them.
+    # We transform any structures that resemble the following:
+    #    TernaryConditional(predicate, X, Y), with X or Y of type BinaryComposition
+    # into the following:
+    # - if X is of type BinaryComposition, and Y is not,
+    #    BinaryComposition(
+    #        '=',
+    #        TernaryConditional(
+    #            predicate,
+    #            TernaryConditional(X, true, false),
+    #            Y
+    #        ),
+    #        true
+    #    )
+    # - if Y is of type BinaryComposition, and X is not,
+    #    BinaryComposition(
+    #        '=',
+    #        TernaryConditional(
+    #            predicate,
+    #            X,
+    #            TernaryConditional(Y, true, false),
+    #        ),
+    #        true
+    #    )
+    # - if both X and Y are of type BinaryComposition,
+    #    BinaryComposition(
+    #        '=',
+    #        TernaryConditional(
+    #            predicate,
+    #            TernaryConditional(X, true, false),
+    #            TernaryConditional(Y, true, false)
+    #        ),
+    #        true
+    #    )
+    if not isinstance(expression, TernaryConditional):
+        return expression
+
+    if_true = expression.if_true
+    if_false = expression.if_false
+
+    true_branch_rewriting_necessary = isinstance(if_true, BinaryComposition)
+    false_branch_rewriting_necessary = isinstance(if_false, BinaryComposition)
+
+    if not (true_branch_rewriting_necessary or false_branch_rewriting_necessary):
+        # No rewriting is necessary.
+        return expression
+
+    if true_branch_rewriting_necessary:
+        if_true = TernaryConditional(if_true, TrueLiteral, FalseLiteral)
+
+    if false_branch_rewriting_necessary:
+        if_false = TernaryConditional(if_false, TrueLiteral, FalseLiteral)
+
+    ternary = TernaryConditional(expression.predicate, if_true, if_false)
+    return BinaryComposition("=", ternary, TrueLiteral)
+
+
 def rewrite_binary_composition_inside_ternary_conditional(
     ir_blocks: List[BasicBlock],
 ) -> List[BasicBlock]:
     """Rewrite BinaryConditional expressions in the true/false values of TernaryConditionals."""
-
-    def visitor_fn(expression: Expression) -> Expression:
-        """Expression visitor function."""
-        # MATCH queries do not allow BinaryComposition inside a TernaryConditional's true/false
-        # value blocks, since OrientDB cannot produce boolean values for comparisons inside them.
-        # We transform any structures that resemble the following:
-        #    TernaryConditional(predicate, X, Y), with X or Y of type BinaryComposition
-        # into the following:
-        # - if X is of type BinaryComposition, and Y is not,
-        #    BinaryComposition(
-        #        '=',
-        #        TernaryConditional(
-        #            predicate,
-        #            TernaryConditional(X, true, false),
-        #            Y
-        #        ),
-        #        true
-        #    )
-        # - if Y is of type BinaryComposition, and X is not,
-        #    BinaryComposition(
-        #        '=',
-        #        TernaryConditional(
-        #            predicate,
-        #            X,
-        #            TernaryConditional(Y, true, false),
-        #        ),
-        #        true
-        #    )
-        # - if both X and Y are of type BinaryComposition,
-        #    BinaryComposition(
-        #        '=',
-        #        TernaryConditional(
-        #            predicate,
-        #            TernaryConditional(X, true, false),
-        #            TernaryConditional(Y, true, false)
-        #        ),
-        #        true
-        #    )
-        if not isinstance(expression, TernaryConditional):
-            return expression
-
-        if_true = expression.if_true
-        if_false = expression.if_false
-
-        true_branch_rewriting_necessary = isinstance(if_true, BinaryComposition)
-        false_branch_rewriting_necessary = isinstance(if_false, BinaryComposition)
-
-        if not (true_branch_rewriting_necessary or false_branch_rewriting_necessary):
-            # No rewriting is necessary.
-            return expression
-
-        if true_branch_rewriting_necessary:
-            if_true = TernaryConditional(if_true, TrueLiteral, FalseLiteral)
-
-        if false_branch_rewriting_necessary:
-            if_false = TernaryConditional(if_false, TrueLiteral, FalseLiteral)
-
-        ternary = TernaryConditional(expression.predicate, if_true, if_false)
-        return BinaryComposition("=", ternary, TrueLiteral)
-
-    new_ir_blocks = [block.visit_and_update_expressions(visitor_fn) for block in ir_blocks]
-
-    return new_ir_blocks
+    return apply_expression_rewrite_rules(
+        ir_blocks, [rewrite_binary_composition_inside_ternary_conditional_rule]
+    )
 
 
 def _prepend_wildcard(expression: Expression) -> BinaryComposition:
@@ -110,46 +115,45 @@ def _append_wildcard(expression: Expression) -> BinaryComposition:
     return BinaryComposition("+", expression, Literal("%"))
 
 
-def lower_string_operators(ir_blocks: List[BasicBlock]) -> List[BasicBlock]:
-    """Lower Filters with "has_substring", "starts_with", or "ends_with" operation into MATCH."""
-
-    def visitor_fn(expression: Expression) -> Expression:
-        if not isinstance(expression, BinaryComposition):
-            return expression
-        elif expression.operator == "has_substring":
-            # The implementation of "has_substring" must use the LIKE operator in MATCH, and must
-            # prepend and append "%" (wildcard) symbols to the substring being matched.
-            # We transform any structures that resemble the following:
-            #    BinaryComposition('has_substring', X, Y)
-            # into the following:
-            #    BinaryComposition(
-            #        'LIKE',
-            #        X,
-            #        BinaryComposition(
-            #            '+',
-            #            Literal("%"),
-            #            BinaryComposition(
-            #                 '+',
-            #                 Y,
-            #                 Literal("%")
-            #            )
-            #        )
-            #    )
-            return BinaryComposition(
-                "LIKE", expression.left, _prepend_wildcard(_append_wildcard(expression.right))
-            )
-        elif expression.operator == "starts_with":
-            # Append a wildcard to the right of the argument string
-            return BinaryComposition("LIKE", expression.left, _append_wildcard(expression.right))
-        elif expression.operator == "ends_with":
-            # Prepend a wildcard to the left of the argument string
-            return BinaryComposition("LIKE", expression.left, _prepend_wildcard(expression.right))
-        else:
-            return expression
+def lower_string_operators_rule(block: BasicBlock, expression: Expression) -> Expression:
+    """Rewrite rule lowering "has_substring", "starts_with", and "ends_with" into MATCH."""
+    if not isinstance(expression, BinaryComposition):
+        return expression
+    elif expression.operator == "has_substring":
+        # The implementation of "has_substring" must use the LIKE operator in MATCH, and must
+        # prepend and append "%" (wildcard) symbols to the substring being matched.
+        # We transform any structures that resemble the following:
+        #    BinaryComposition('has_substring', X, Y)
+        # into the following:
+        #    BinaryComposition(
+        #        'LIKE',
+        #        X,
+        #        BinaryComposition(
+        #            '+',
+        #            Literal("%"),
+        #            BinaryComposition(
+        #                 '+',
+        #                 Y,
+        #                 Literal("%")
+        #            )
+        #        )
+        #    )
+        return BinaryComposition(
+            "LIKE", expression.left, _prepend_wildcard(_append_wildcard(expression.right))
+        )
+    elif expression.operator == "starts_with":
+        # Append a wildcard to the right of the argument string
+        return BinaryComposition("LIKE", expression.left, _append_wildcard(expression.right))
+    elif expression.operator == "ends_with":
+        # Prepend a wildcard to the left of the argument string
+        return BinaryComposition("LIKE", expression.left, _prepend_wildcard(expression.right))
+    else:
+        return expression
 
-    new_ir_blocks = [block.visit_and_update_expressions(visitor_fn) for block in ir_blocks]
 
-    return new_ir_blocks
+def lower_string_operators(ir_blocks: List[BasicBlock]) -> List[BasicBlock]:
+    """Lower Filters with "has_substring", "starts_with", or "ends_with" operation into MATCH."""
+    return apply_expression_rewrite_rules(ir_blocks, [lower_string_operators_rule])
 
 
 def truncate_repeated_single_step_traversals(match_query: MatchQuery) -> MatchQuery:
@@ -359,3 +363,60 @@ def truncate_repeated_single_step_traversals_in_sub_queries(
         lowered_match_queries.append(new_match_query)
 
     return compound_match_query._replace(match_queries=lowered_match_queries)
+
+
+def _expand_between_clause(expression: Expression) -> Expression:
+    """If the expression is a BetweenClause, return the equivalent conjunction of comparisons."""
+    if isinstance(expression, BetweenClause):
+        return BinaryComposition(
+            "&&",
+            BinaryComposition(">=", expression.field, expression.lower_bound),
+            BinaryComposition("<=", expression.field, expression.upper_bound),
+        )
+    return expression
+
+
+def _simplify_where_block(where_block: Optional[Filter]) -> Optional[Filter]:
+    """Return the where block with its predicate simplified, or the original if it is simplest."""
+    if where_block is None:
+        return None
+
+    # BETWEEN clauses are expanded into comparisons, so that the simplification can tighten them.
+    expanded_predicate = where_block.predicate.visit_and_update(_expand_between_clause)
+    simplified_predicate = simplify_conjunction(expanded_predicate)
+    if simplified_predicate is expanded_predicate:
+        return where_block
+    return Filter(simplified_predicate)
+
+
+def simplify_where_predicates(compound_match_query: CompoundMatchQuery) -> CompoundMatchQuery:
+    """Remove redundant predicates from each WHERE clause, and tighten the remaining ones.
+
+    Filters applied at the same location, and the filters that lowering passes add to them,
+    are combined into a single WHERE clause by the time this pass runs. Removing redundant
+    predicates from it both shortens the query, and lets OrientDB use an index on the tightest
+    bound of each field. Any comparisons that end up bounding a field from both sides are
+    lowered to BETWEEN clauses again.
+
+    Args:
+        compound_match_query: CompoundMatchQuery whose WHERE clauses to simplify
+
+    Returns:
+        CompoundMatchQuery with the same semantics, and simplified WHERE clauses
+    """
+    new_match_queries = []
+    for match_query in compound_match_query.match_queries:
+        new_match_traversals = [
+            [
+                step._replace(where_block=_simplify_where_block(step.where_block))
+                for step in match_traversal
+            ]
+            for match_traversal in match_query.match_traversals
+        ]
+        new_match_query = match_query._replace(
+            match_traversals=new_match_traversals,
+            where_block=_simplify_where_block(match_query.where_block),
+        )
+        new_match_queries.append(lower_comparisons_to_between(new_match_query))
+
+    return compound_match_query._replace(match_queries=new_match_queries)
@@ -102,6 +102,15 @@ def _prune_traverse_using_omitted_locations(
     return new_match_traversal
 
 
+def _get_relevant_optional_root_locations(match_traversal, location_to_optional_roots):
+    """Return the optional root locations whose omission may affect the given match traversal."""
+    relevant_locations = set()
+    for step in match_traversal:
+        if step.as_block is not None:
+            relevant_locations.update(location_to_optional_roots.get(step.as_block.location, ()))
+    return frozenset(relevant_locations)
+
+
 def convert_optional_traversals_to_compound_match_query(
     match_query, complex_optional_roots, location_to_optional_roots
 ):
@@ -113,6 +122,18 @@ def convert_optional_traversals_to_compound_match_query(
     For each edge `e` in a subset of optional edges chosen to be omitted,
     discard all traversals following `e`, and add filters specifying that `e` *does not exist*.
 
+    Combinations in which a nested @optional is followed while an enclosing one is omitted
+    are never produced. Each match traversal is only affected by the omission of the optional
+    scopes it is within or passes through, so its pruned form is computed once per distinct
+    combination of those scopes and shared between all MatchQuery objects that contain it.
+
+    None of the MatchQuery objects can be merged together: OrientDB only allows optional nodes
+    at the end of a MATCH pattern, so the @optional traverses that expand vertex fields can't be
+    kept optional. Each MatchQuery thus requires the vertices of exactly the scopes it follows,
+    and produces results for no other combination of present and absent scopes. Queries with
+    many such scopes can instead be compiled into several smaller queries whose results are
+    merged by the client, see query_planning.match_query_plan.
+
     Args:
         match_query: MatchQuery object containing n `@optional` scopes which expand vertex fields
         complex_optional_roots: list of @optional locations (location preceding an @optional
@@ -127,6 +148,7 @@ def convert_optional_traversals_to_compound_match_query(
         one for each possible subset of the n optional edges being followed
     """
     tree = construct_optional_traversal_tree(complex_optional_roots, location_to_optional_roots)
+
     rooted_optional_root_location_subsets = tree.get_all_rooted_subtrees_as_lists()
 
     omitted_location_subsets = [
@@ -135,10 +157,17 @@ def convert_optional_traversals_to_compound_match_query(
     ]
     sorted_omitted_location_subsets = sorted(omitted_location_subsets)
 
+    relevant_locations_per_traversal = [
+        _get_relevant_optional_root_locations(match_traversal, location_to_optional_roots)
+        for match_traversal in match_query.match_traversals
+    ]
+    # Maps (match traversal index, relevant omitted locations) to the pruned match traversal.
+    pruned_match_traversals = {}
+
     compound_match_traversals = []
     for omitted_locations in reversed(sorted_omitted_location_subsets):
         new_match_traversals = []
-        for match_traversal in match_query.match_traversals:
+        for traversal_index, match_traversal in enumerate(match_query.match_traversals):
             location = match_traversal[0].as_block.location
             optional_root_locations_stack = location_to_optional_roots.get(location, None)
             if optional_root_locations_stack is not None:
@@ -147,12 +176,19 @@ def convert_optional_traversals_to_compound_match_query(
                 optional_root_location = None
 
             if optional_root_location is None or optional_root_location not in omitted_locations:
-                new_match_traversal = _prune_traverse_using_omitted_locations(
-                    match_traversal,
-                    set(omitted_locations),
-                    complex_optional_roots,
-                    location_to_optional_roots,
+                cache_key = (
+                    traversal_index,
+                    relevant_locations_per_traversal[traversal_index] & omitted_locations,
                 )
+                new_match_traversal = pruned_match_traversals.get(cache_key, None)
+                if new_match_traversal is None:
+                    new_match_traversal = _prune_traverse_using_omitted_locations(
+                        match_traversal,
+                        set(omitted_locations),
+                        complex_optional_roots,
+                        location_to_optional_roots,
+                    )
+                    pruned_match_traversals[cache_key] = new_match_traversal
                 new_match_traversals.append(new_match_traversal)
             else:
                 # The root_block is within an omitted scope.
@@ -1,7 +1,7 @@
 # Copyright 2018-present Kensho Technologies, LLC.
 from collections import namedtuple
 import itertools
-from typing import Callable, Collection, Dict, List, Optional, Set, Union
+from typing import Callable, Collection, Dict, List, Optional, Set, Tuple, Union
 
 import six
 
@@ -73,6 +73,8 @@ def expression_list_to_conjunction(expression_list: Collection[Expression]) -> E
 class BetweenClause(Expression):
     """A `BETWEEN` Expression, constraining a field value to lie within a lower and upper bound."""
 
+    __slots__ = ("field", "lower_bound", "upper_bound")
+
     def __init__(self, field: LocalField, lower_bound: Expression, upper_bound: Expression) -> None:
         """Construct an expression that is true when the field value is within the given bounds.
 
@@ -330,6 +332,23 @@ class OptionalTraversalTree(object):
                 self._location_to_children[parent_location].add(optional_root_location)
                 parent_location = optional_root_location
 
+    def get_rooted_subtree_count(self, start_location: Optional[Location] = None) -> int:
+        """Return the number of rooted subtrees, without enumerating them.
+
+        This is the length of the list returned by get_all_rooted_subtrees_as_lists, i.e.
+        the number of MatchQuery objects the optional traversals are expanded into. It is
+        computed in time linear in the size of the tree, so it can be checked before
+        the (potentially exponentially many) subtrees are enumerated.
+        """
+        if start_location is None:
+            start_location = self._root_location
+
+        # Each child is either omitted, or present together with one of its own rooted subtrees.
+        subtree_count = 1
+        for child_location in self._location_to_children[start_location]:
+            subtree_count *= 1 + self.get_rooted_subtree_count(child_location)
+        return subtree_count
+
     def get_all_rooted_subtrees_as_lists(
         self, start_location: Optional[Location] = None
     ) -> List[List[Location]]:
@@ -388,7 +407,7 @@ class OptionalTraversalTree(object):
 
 def construct_optional_traversal_tree(
     complex_optional_roots: List[Location],
-    location_to_optional_roots: Dict[Location, List[Location]],
+    location_to_optional_roots: Dict[Location, Tuple[Location, ...]],
 ) -> OptionalTraversalTree:
     """Return a tree of complex optional root locations.
 
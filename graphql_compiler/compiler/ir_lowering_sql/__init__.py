@@ -1,4 +1,6 @@
 # Copyright 2018-present Kensho Technologies, LLC.
+from functools import partial
+
 import six
 
 from .. import blocks, expressions
@@ -6,25 +8,16 @@ from ...compiler.compiler_frontend import IrAndMetadata
 from ...schema.schema_info import CompositeJoinDescriptor, DirectJoinDescriptor
 from ..helpers import FoldScopeLocation, get_edge_direction_and_name
 from ..ir_lowering_common import common
+from ..ir_lowering_common.pipeline import LoweringPass, run_lowering_pipeline
 
 
-def _remove_output_context_field_existence(ir_blocks, query_metadata_table):
-    """Convert ContextFieldExistence in ConstructResult blocks to TrueLiteral."""
-
-    def visitor_fn(expression):
-        """Convert ContextFieldExistence expressions to TrueLiteral."""
-        if isinstance(expression, expressions.ContextFieldExistence):
-            return expressions.TrueLiteral
-        return expression
-
-    new_ir_blocks = []
-    for block in ir_blocks:
-        new_block = block
-        if isinstance(block, blocks.ConstructResult):
-            new_block = block.visit_and_update_expressions(visitor_fn)
-        new_ir_blocks.append(new_block)
-
-    return new_ir_blocks
+def _remove_output_context_field_existence_rule(block, expression):
+    """Rewrite rule converting ContextFieldExistence in ConstructResult blocks to TrueLiteral."""
+    if isinstance(block, blocks.ConstructResult) and isinstance(
+        expression, expressions.ContextFieldExistence
+    ):
+        return expressions.TrueLiteral
+    return expression
 
 
 def _find_non_null_columns(schema_info, query_metadata_table):
@@ -62,6 +55,8 @@ class ContextColumn(expressions.Expression):
     in the test schema.
     """
 
+    __slots__ = ("_vertex_query_path", "_column_name")
+
     def __init__(self, vertex_query_path, column_name):
         """Construct a new ContextColumn."""
         super(ContextColumn, self).__init__(vertex_query_path, column_name)
@@ -69,6 +64,16 @@ class ContextColumn(expressions.Expression):
         self._column_name = column_name
         self.validate()
 
+    @property
+    def vertex_query_path(self):
+        """Return the query path of the vertex whose column is referenced."""
+        return self._vertex_query_path
+
+    @property
+    def column_name(self):
+        """Return the name of the referenced column."""
+        return self._column_name
+
     def validate(self):
         """Validate that the ContextColumn is correctly representable."""
         if not isinstance(self._vertex_query_path, tuple):
@@ -112,12 +117,12 @@ class ContextColumn(expressions.Expression):
         return aliases[(self._vertex_query_path, None)].c[self._column_name]
 
 
-def _lower_sql_context_field_existence(schema_info, ir_blocks, query_metadata_table):
-    """Lower ContextFieldExistence to BinaryComposition."""
+def _make_sql_context_field_existence_lowering_rule(schema_info, query_metadata_table):
+    """Return a rewrite rule lowering ContextFieldExistence to BinaryComposition."""
     non_null_columns = _find_non_null_columns(schema_info, query_metadata_table)
 
-    def visitor_fn(expression):
-        """Convert ContextFieldExistence expressions to TrueLiteral."""
+    def rewrite_rule(block, expression):
+        """Convert ContextFieldExistence expressions to a comparison of a column with null."""
         if not isinstance(expression, expressions.ContextFieldExistence):
             return expression
 
@@ -126,7 +131,7 @@ def _lower_sql_context_field_existence(schema_info, ir_blocks, query_metadata_ta
             "!=", ContextColumn(query_path, non_null_columns[query_path]), expressions.NullLiteral
         )
 
-    return [block.visit_and_update_expressions(visitor_fn) for block in ir_blocks]
+    return rewrite_rule
 
 
 ##############
@@ -134,19 +139,33 @@ def _lower_sql_context_field_existence(schema_info, ir_blocks, query_metadata_ta
 ##############
 
 
-def lower_ir(schema_info, ir):
+def lower_ir(schema_info, ir, lowering_pass_hook=None):
     """Lower the IR blocks into a form that can be represented by a SQL query.
 
     Args:
         schema_info: SqlAlchemySchemaInfo containing all relevant schema information
         ir: IrAndMetadata representing the query to lower into SQL-compatible form
+        lowering_pass_hook: optional function to call with the LoweringPassStatistics of each
+                            lowering pass, right after that pass is applied
 
     Returns:
         ir IrAndMetadata containing lowered blocks, ready to emit
     """
-    ir_blocks = ir.ir_blocks
-    ir_blocks = _remove_output_context_field_existence(ir_blocks, ir.query_metadata_table)
-    ir_blocks = _lower_sql_context_field_existence(schema_info, ir_blocks, ir.query_metadata_table)
-    ir_blocks = common.short_circuit_ternary_conditionals(ir_blocks, ir.query_metadata_table)
-    ir_blocks = common.optimize_boolean_expression_comparisons(ir_blocks)
+    # None of these rules produces expressions that an earlier rule would rewrite differently,
+    # so they are all applied in a single traversal of the IR.
+    rewrite_rules = [
+        _remove_output_context_field_existence_rule,
+        _make_sql_context_field_existence_lowering_rule(schema_info, ir.query_metadata_table),
+        common.short_circuit_ternary_conditionals_rule,
+        common.optimize_boolean_expression_comparisons_rule,
+    ]
+    lowering_passes = [
+        LoweringPass(
+            "rewrite_expressions",
+            partial(common.apply_expression_rewrite_rules, rewrite_rules=rewrite_rules),
+        ),
+    ]
+    ir_blocks = run_lowering_pipeline(
+        lowering_passes, ir.ir_blocks, lowering_pass_hook=lowering_pass_hook
+    )
     return IrAndMetadata(ir_blocks, ir.input_metadata, ir.output_metadata, ir.query_metadata_table)
@@ -0,0 +1,176 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Cursor tokens for keyset-paginated SQL queries.
+
+A keyset-paginated query orders its results by the primary keys of the vertices it visits,
+and only returns the results that come after the last result of the previous page. Each page
+therefore costs the same to compute regardless of how deep into the results it is, unlike pages
+produced by OFFSET, which require the database to produce and discard all earlier results.
+
+The ordering key of each result row is output in reserved columns named with the
+KEYSET_COLUMN_PREFIX. The cursor token for the next page is produced from the last row of the
+current page with encode_keyset_cursor. Queries compiled with the keyset_after_cursor
+SQLCompilationOptions value take it as the runtime parameter named KEYSET_CURSOR_PARAMETER_NAME,
+so a single compiled query can fetch every page after the first one.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from typing import Any, Dict, List, Mapping
+from uuid import UUID
+
+from ..exceptions import GraphQLInvalidArgumentError
+
+
+# Prefix of the names of the reserved output columns containing the keyset ordering key.
+# The column named f"{KEYSET_COLUMN_PREFIX}{i}" contains the i-th component of the key.
+KEYSET_COLUMN_PREFIX = "__keyset_key_"
+
+# Name of the runtime parameter containing the cursor token for the last result of the previous
+# page, for queries compiled with the keyset_after_cursor SQLCompilationOptions value.
+KEYSET_CURSOR_PARAMETER_NAME = "__keyset_cursor"
+
+# Prefix of the names of the bind parameters that the cursor token is decoded into.
+# The parameter named f"{KEYSET_LAST_SEEN_PARAMETER_PREFIX}{i}" contains the i-th component of
+# the last seen ordering key.
+KEYSET_LAST_SEEN_PARAMETER_PREFIX = "__keyset_last_seen_"
+
+# Values that are not natively representable in JSON are encoded as single-entry objects,
+# mapping one of these tags to the value's string representation.
+_DATE_TAG = "date"
+_DATETIME_TAG = "datetime"
+_DECIMAL_TAG = "decimal"
+_UUID_TAG = "uuid"
+
+
+def _encode_key_value(value: Any) -> Any:
+    """Return a JSON-serializable representation of the given ordering key value."""
+    # Order matters: datetime is a subclass of date, and bool is a subclass of int.
+    if isinstance(value, datetime.datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    elif isinstance(value, datetime.date):
+        return {_DATE_TAG: value.isoformat()}
+    elif isinstance(value, decimal.Decimal):
+        return {_DECIMAL_TAG: str(value)}
+    elif isinstance(value, UUID):
+        return {_UUID_TAG: str(value)}
+    elif isinstance(value, (str, int, float)):
+        return value
+    else:
+        raise GraphQLInvalidArgumentError(
+            f"Cannot encode keyset ordering key value {value} of type {type(value).__name__} "
+            f"in a cursor."
+        )
+
+
+def _decode_key_value(encoded_value: Any) -> Any:
+    """Return the ordering key value represented by the output of _encode_key_value."""
+    if isinstance(encoded_value, dict):
+        if len(encoded_value) != 1:
+            raise GraphQLInvalidArgumentError(
+                f"Malformed keyset cursor value encountered: {encoded_value}"
+            )
+        ((tag, string_value),) = encoded_value.items()
+        try:
+            if tag == _DATETIME_TAG:
+                return datetime.datetime.fromisoformat(string_value)
+            elif tag == _DATE_TAG:
+                return datetime.date.fromisoformat(string_value)
+            elif tag == _DECIMAL_TAG:
+                return decimal.Decimal(string_value)
+            elif tag == _UUID_TAG:
+                return UUID(string_value)
+        except (TypeError, ValueError, decimal.InvalidOperation) as e:
+            raise GraphQLInvalidArgumentError(
+                f"Malformed keyset cursor value encountered: {encoded_value}"
+            ) from e
+        raise GraphQLInvalidArgumentError(f"Unknown keyset cursor value type encountered: {tag}")
+    elif isinstance(encoded_value, (str, int, float)):
+        return encoded_value
+    else:
+        raise GraphQLInvalidArgumentError(
+            f"Malformed keyset cursor value encountered: {encoded_value}"
+        )
+
+
+######
+# Public API
+######
+
+
+def encode_keyset_cursor(result_row: Mapping[str, Any]) -> str:
+    """Return a cursor token for the page of results following the given result row.
+
+    Args:
+        result_row: the last result row of a page, as returned by executing a query compiled
+                    with keyset pagination enabled. The row must include the reserved ordering
+                    key columns, i.e. the columns whose names start with KEYSET_COLUMN_PREFIX.
+
+    Returns:
+        opaque, URL-safe cursor token to be used as the keyset_cursor SQLCompilationOptions value
+        when compiling the same query to fetch the next page of results.
+    """
+    key_values = {}
+    for column_name, value in result_row.items():
+        if column_name.startswith(KEYSET_COLUMN_PREFIX):
+            key_index = int(column_name[len(KEYSET_COLUMN_PREFIX) :])
+            key_values[key_index] = value
+
+    if not key_values:
+        raise GraphQLInvalidArgumentError(
+            f"The given result row does not contain any keyset ordering key columns. Was it "
+            f"produced by a query compiled with keyset pagination enabled? {result_row}"
+        )
+    if set(key_values.keys()) != set(range(len(key_values))):
+        raise AssertionError(
+            f"Unexpectedly found non-contiguous keyset ordering key columns: {result_row}"
+        )
+
+    encoded_key = [_encode_key_value(key_values[index]) for index in range(len(key_values))]
+    serialized_key = json.dumps(encoded_key, separators=(",", ":"))
+    return base64.urlsafe_b64encode(serialized_key.encode("utf-8")).decode("ascii")
+
+
+def decode_keyset_cursor(cursor: str) -> List[Any]:
+    """Return the ordering key values encoded in the given cursor token.
+
+    Args:
+        cursor: cursor token produced by encode_keyset_cursor
+
+    Returns:
+        list of ordering key values, in the same order as the keyset ordering key columns
+    """
+    try:
+        serialized_key = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        encoded_key = json.loads(serialized_key)
+    except (UnicodeError, binascii.Error, ValueError) as e:
+        raise GraphQLInvalidArgumentError(f"Malformed keyset cursor encountered: {cursor}") from e
+
+    if not isinstance(encoded_key, list) or not encoded_key:
+        raise GraphQLInvalidArgumentError(f"Malformed keyset cursor encountered: {cursor}")
+
+    return [_decode_key_value(encoded_value) for encoded_value in encoded_key]
+
+
+def get_keyset_cursor_bind_parameters(cursor: str, key_column_count: int) -> Dict[str, Any]:
+    """Return the values of the last seen key bind parameters, as encoded in the cursor token.
+
+    Args:
+        cursor: cursor token produced by encode_keyset_cursor
+        key_column_count: number of columns the keyset-paginated query is ordered by
+
+    Returns:
+        dict mapping the name of each last seen key bind parameter of the query to its value
+    """
+    last_seen_key = decode_keyset_cursor(cursor)
+    if len(last_seen_key) != key_column_count:
+        raise GraphQLInvalidArgumentError(
+            f"The keyset cursor has {len(last_seen_key)} ordering key values, but the query is "
+            f"ordered by {key_column_count} columns. Was the cursor produced for a different "
+            f"query? {cursor}"
+        )
+    return {
+        f"{KEYSET_LAST_SEEN_PARAMETER_PREFIX}{index}": value
+        for index, value in enumerate(last_seen_key)
+    }
@@ -1,7 +1,8 @@
 # Copyright 2018-present Kensho Technologies, LLC.
 """Utilities for recording, inspecting, and manipulating metadata collected during compilation."""
 from collections import namedtuple
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional, Tuple, cast
 
 from graphql import GraphQLType
 import six
@@ -71,11 +72,29 @@ RecurseInfo = namedtuple(
 #       In the meantime, this only exists for the sake of type hints.
 InputInfo = Any
 
+# Read-only empty mapping, shared by all QueryMetadataTable objects as the initial value of their
+# rarely-populated tables. Each table is replaced with a dict of its own on its first write.
+# It is typed as a dict since it stands in for one, but any attempt to modify it raises an error.
+_EMPTY_TABLE = cast(Dict[Any, Any], MappingProxyType({}))
+
 
 @six.python_2_unicode_compatible
 class QueryMetadataTable(object):
     """Query metadata container with info on locations, inputs, outputs, and tags in the query."""
 
+    __slots__ = (
+        "_root_location",
+        "_locations",
+        "_inputs",
+        "_outputs",
+        "_tags",
+        "_filter_infos",
+        "_recurse_infos",
+        "_revisit_origins",
+        "_revisits",
+        "_child_locations",
+    )
+
     _root_location: Location
 
     _locations: Dict[BaseLocation, LocationInfo]
@@ -86,9 +105,9 @@ class QueryMetadataTable(object):
     _recurse_infos: Dict[BaseLocation, List[RecurseInfo]]
 
     _revisit_origins: Dict[Location, Location]
-    _revisits: Dict[Location, Set[Location]]
+    _revisits: Dict[Location, List[Location]]
 
-    _child_locations: Dict[BaseLocation, Set[BaseLocation]]
+    _child_locations: Dict[BaseLocation, List[BaseLocation]]
 
     def __init__(self, root_location: Location, root_location_info: LocationInfo) -> None:
         """Create a new empty QueryMetadataTable object."""
@@ -105,25 +124,28 @@ class QueryMetadataTable(object):
                 "visit counter of 1, but received: {}".format(root_location)
             )
 
+        # Tables that many queries never write to start out as the shared _EMPTY_TABLE,
+        # to save memory in processes that keep the metadata of many queries around.
         self._root_location = root_location  # Location, the root location of the entire query
         self._locations = dict()  # dict, Location/FoldScopeLocation -> LocationInfo
-        self._inputs = dict()  # dict, input name -> input info namedtuple
+        self._inputs = _EMPTY_TABLE  # dict, input name -> input info namedtuple
         self._outputs = dict()  # dict, output name -> output info namedtuple
-        self._tags = dict()  # dict, tag name -> tag info namedtuple
+        self._tags = _EMPTY_TABLE  # dict, tag name -> tag info namedtuple
 
-        self._filter_infos = dict()  # Location -> FilterInfo array
-        self._recurse_infos = dict()  # Location -> RecurseInfo array
+        self._filter_infos = _EMPTY_TABLE  # Location -> FilterInfo array
+        self._recurse_infos = _EMPTY_TABLE  # Location -> RecurseInfo array
 
         # dict, revisiting Location -> revisit origin, i.e. the first Location with that query path
-        self._revisit_origins = dict()
+        self._revisit_origins = _EMPTY_TABLE
 
-        # dict, revisit origin Location -> set of Locations for which
+        # dict, revisit origin Location -> list of Locations for which
         #       that Location is the revisit origin
-        self._revisits = dict()
+        self._revisits = _EMPTY_TABLE
 
-        # dict, Location/FoldScopeLocation -> set of Location and FoldScopeLocation objects
-        #       that are directly descended from it
-        self._child_locations = dict()
+        # dict, Location/FoldScopeLocation -> list of Location and FoldScopeLocation objects
+        #       that are directly descended from it. Each location is registered exactly once,
+        #       so lists suffice, and they are considerably smaller than sets.
+        self._child_locations = _EMPTY_TABLE
 
         self.register_location(root_location, root_location_info)
 
@@ -159,7 +181,9 @@ class QueryMetadataTable(object):
                     "no parent: {} {}".format(location, location_info)
                 )
         else:
-            self._child_locations.setdefault(location_info.parent_location, set()).add(location)
+            if self._child_locations is _EMPTY_TABLE:
+                self._child_locations = dict()
+            self._child_locations.setdefault(location_info.parent_location, []).append(location)
 
         self._locations[location] = location_info
 
@@ -176,8 +200,11 @@ class QueryMetadataTable(object):
         # If "location" is itself a revisit, then we point "revisited_location" to "location"'s
         # revisit origin. If "location" is not a revisit, then it itself is the revisit origin.
         revisit_origin = self._revisit_origins.get(location, location)
+        if self._revisit_origins is _EMPTY_TABLE:
+            self._revisit_origins = dict()
+            self._revisits = dict()
         self._revisit_origins[revisited_location] = revisit_origin
-        self._revisits.setdefault(revisit_origin, set()).add(revisited_location)
+        self._revisits.setdefault(revisit_origin, []).append(revisited_location)
 
         self.register_location(revisited_location, self.get_location_info(location))
         return revisited_location
@@ -248,6 +275,8 @@ class QueryMetadataTable(object):
                 "Attempting to define an already-defined tag {}. "
                 "old info {}, new info {}".format(tag_name, old_info, tag_info)
             )
+        if self._tags is _EMPTY_TABLE:
+            self._tags = dict()
         self._tags[tag_name] = tag_info
 
     def get_tag_info(self, tag_name: str) -> Optional[TagInfo]:
@@ -257,6 +286,8 @@ class QueryMetadataTable(object):
     def record_filter_info(self, location: BaseLocation, filter_info: FilterInfo) -> None:
         """Record filter information about the location."""
         record_location = location.at_vertex()
+        if self._filter_infos is _EMPTY_TABLE:
+            self._filter_infos = dict()
         self._filter_infos.setdefault(record_location, []).append(filter_info)
 
     def get_filter_infos(self, location: BaseLocation) -> List[FilterInfo]:
@@ -266,6 +297,8 @@ class QueryMetadataTable(object):
     def record_recurse_info(self, location: BaseLocation, recurse_info: RecurseInfo) -> None:
         """Record recursion information about the location."""
         record_location = location.at_vertex()
+        if self._recurse_infos is _EMPTY_TABLE:
+            self._recurse_infos = dict()
         self._recurse_infos.setdefault(record_location, []).append(recurse_info)
 
     def get_recurse_infos(self, location: BaseLocation) -> List[RecurseInfo]:
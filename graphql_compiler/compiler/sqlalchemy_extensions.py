@@ -1,24 +1,166 @@
 # Copyright 2019-present Kensho Technologies, LLC.
 from copy import copy
-from typing import Any, Dict, List, Union
+import datetime
+import json
+from typing import Any, Dict, List, Optional, Union
 
 from graphql.type.definition import GraphQLList, GraphQLType
 import sqlalchemy
+from sqlalchemy.dialects import mssql, postgresql
 from sqlalchemy.dialects.mssql.pyodbc import MSDialect_pyodbc
 from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
-from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import BindParameter, ColumnElement, TextClause, _clone
 from sqlalchemy.sql.selectable import Select
+from sqlalchemy.sql.sqltypes import NullType
+from sqlalchemy.types import TypeDecorator
+
+
+# Name of the single column of the derived table that MSSQL reads large collections into.
+MSSQL_COLLECTION_VALUE_COLUMN = "collection_value"
+
+
+class CollectionMembership(ColumnElement):
+    """Check whether a column value is (or is not) a member of a list-valued runtime parameter.
+
+    For small collections, this compiles to the usual IN / NOT IN expression over an expanding
+    bind parameter, with one database parameter per collection element. Such lists can get
+    problematic as they grow: MSSQL rejects queries with more than 2100 parameters, and
+    PostgreSQL spends a long time planning giant IN lists. Therefore, when the collection bound
+    to the parameter has more elements than large_collection_threshold, the whole collection is
+    instead passed as a single database parameter:
+    - on PostgreSQL, as an array compared using "= ANY(...)" / "!= ALL(...)", and
+    - on MSSQL, as a JSON array unpacked into a derived table with OPENJSON (SQL Server 2016+).
+
+    The strategy is chosen when the query is compiled to a string, since that is the earliest
+    point at which the collection is known. If the parameter has not been bound yet (for example,
+    when printing the query), the IN form is used.
+    """
+
+    __visit_name__ = "collection_membership"
+
+    type = sqlalchemy.Boolean()
+    _is_implicitly_boolean = True
+
+    def __init__(
+        self,
+        element: ColumnElement,
+        collection: BindParameter,
+        negated: bool,
+        large_collection_threshold: Optional[int] = None,
+    ) -> None:
+        """Construct a new CollectionMembership.
+
+        Args:
+            element: sqlalchemy Column that needs to be (or not be) in the specified collection
+            collection: sqlalchemy BindParameter, a collection runtime parameter
+            negated: True if the element is required to not be in the collection
+            large_collection_threshold: if set, collections with more elements than this are
+                                        passed to the database as a single parameter
+        """
+        self.element = element
+        self.collection = collection
+        self.negated = negated
+        self.large_collection_threshold = large_collection_threshold
+
+    def get_children(self, **kwargs):
+        """Return the column and the collection parameter, for SQLAlchemy's visitors."""
+        return self.element, self.collection
+
+    def _copy_internals(self, clone=_clone, **kw):
+        """Copy the children, used by SQLAlchemy when binding parameters through .params()."""
+        self.element = clone(self.element, **kw)
+        self.collection = clone(self.collection, **kw)
+
+    @property
+    def _from_objects(self):
+        """Return the FROM objects the element depends on."""
+        return self.element._from_objects
+
+
+class _JSONEncodedCollection(TypeDecorator):
+    """Bind a Python collection as a JSON array string."""
+
+    impl = sqlalchemy.UnicodeText
+
+    def process_bind_param(self, value, dialect):
+        """Encode the collection as a JSON array, with non-JSON values in their string form."""
+
+        def encode_value(element_value):
+            """Encode a value that the json module does not handle natively."""
+            if isinstance(element_value, (datetime.date, datetime.time)):
+                return element_value.isoformat()
+            return str(element_value)
+
+        return json.dumps(list(value), default=encode_value)
+
+
+def _get_collection_size(collection: BindParameter) -> Optional[int]:
+    """Return the number of elements bound to the collection parameter, or None if not bound."""
+    if collection.callable is not None:
+        value = collection.callable()
+    else:
+        value = collection.value
+    if value is None:
+        return None
+    return len(value)
+
+
+@compiles(CollectionMembership)
+def _compile_collection_membership(element, compiler, **kw):
+    """Compile a CollectionMembership with the strategy suited to the dialect and collection."""
+    threshold = element.large_collection_threshold
+    collection_size = _get_collection_size(element.collection)
+    dialect_name = compiler.dialect.name
+    is_large_collection = (
+        threshold is not None and collection_size is not None and collection_size > threshold
+    )
+
+    if is_large_collection and dialect_name == postgresql.dialect.name:
+        array_parameter = sqlalchemy.bindparam(
+            element.collection.key,
+            value=element.collection.effective_value,
+            type_=postgresql.ARRAY(element.element.type),
+        )
+        if element.negated:
+            clause = element.element != sqlalchemy.all_(array_parameter)
+        else:
+            clause = element.element == sqlalchemy.any_(array_parameter)
+        return compiler.process(clause, **kw)
+    elif is_large_collection and dialect_name == mssql.dialect.name:
+        json_parameter = sqlalchemy.bindparam(
+            element.collection.key,
+            value=element.collection.effective_value,
+            type_=_JSONEncodedCollection(),
+        )
+        element_type = element.element.type
+        if isinstance(element_type, NullType):
+            element_type = mssql.NVARCHAR(length="max")
+        operator = "NOT IN" if element.negated else "IN"
+        return (
+            f"{compiler.process(element.element, **kw)} {operator} ("
+            f"SELECT {MSSQL_COLLECTION_VALUE_COLUMN} "
+            f"FROM OPENJSON({compiler.process(json_parameter, **kw)}) "
+            f"WITH ({MSSQL_COLLECTION_VALUE_COLUMN} "
+            f"{compiler.dialect.type_compiler.process(element_type)} '$'))"
+        )
+    else:
+        if element.negated:
+            clause = element.element.notin_(element.collection)
+        else:
+            clause = element.element.in_(element.collection)
+        return compiler.process(clause, **kw)
 
 
 def contains_operator(collection, element):
-    """Return a sqlalchemy BinaryExpression representing this operator.
+    """Return a sqlalchemy CollectionMembership representing this operator.
 
     Args:
         collection: sqlalchemy BindParameter, a collection runtime parameter
         element: sqlalchemy Column that needs to be in the specified collection
 
     Returns:
-        sqlalchemy BinaryExpression
+        sqlalchemy CollectionMembership
     """
     if not isinstance(collection, sqlalchemy.sql.elements.BindParameter):
         raise AssertionError(
@@ -33,18 +175,18 @@ def contains_operator(collection, element):
             )
         )
 
-    return element.in_(collection)
+    return CollectionMembership(element, collection, negated=False)
 
 
 def not_contains_operator(collection, element):
-    """Return a sqlalchemy BinaryExpression representing this operator.
+    """Return a sqlalchemy CollectionMembership representing this operator.
 
     Args:
         collection: sqlalchemy BindParameter, a collection runtime parameter
         element: sqlalchemy Column that needs to be in the specified collection
 
     Returns:
-        sqlalchemy BinaryExpression
+        sqlalchemy CollectionMembership
     """
     if not isinstance(collection, sqlalchemy.sql.elements.BindParameter):
         raise AssertionError(
@@ -59,7 +201,7 @@ def not_contains_operator(collection, element):
             )
         )
 
-    return element.notin_(collection)
+    return CollectionMembership(element, collection, negated=True)
 
 
 def print_sqlalchemy_query_string(
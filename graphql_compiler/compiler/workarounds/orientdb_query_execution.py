@@ -42,8 +42,17 @@ The process of applying the optimizations is as follows:
         - Ensure that all query points not inside fold, optional, or recursion scope contain
           a "class:" clause. That increases the number of available query start points,
           so OrientDB can choose the start point of lowest cardinality.
+
+When statistics about the data are available, the above assumptions are unnecessary: we can
+instead estimate the number of vertices at each preferred or eligible start point, by applying the
+selectivity of its local filters to the count of its class. The start point with the lowest
+estimate is then the only one exposed to the OrientDB query planner, and all others are pruned
+as described above. This avoids starting at a class with a local filter that matches hundreds of
+millions of vertices, when a few dozen vertices of a different class are just a traversal away.
+If a class count is missing for any of the start points, the assumptions above are used instead.
 """
 
+from ...cost_estimation.cardinality_estimator import estimate_vertex_count_at_location
 from ..blocks import CoerceType, Filter, QueryRoot, Recurse, Traverse
 from ..expressions import (
     BinaryComposition,
@@ -372,17 +381,126 @@ def _expose_all_eligible_locations(match_query, location_types, eligible_locatio
     return match_query._replace(match_traversals=new_match_traversals)
 
 
+def _get_ordered_match_query_locations(match_query):
+    """Return a list of the distinct locations in the MATCH query, in order of first appearance."""
+    ordered_locations = []
+    seen_locations = set()
+    for current_traversal in match_query.match_traversals:
+        for match_step in current_traversal:
+            current_step_location = match_step.as_block.location
+            if current_step_location not in seen_locations:
+                seen_locations.add(current_step_location)
+                ordered_locations.append(current_step_location)
+    return ordered_locations
+
+
+def _get_lowest_cardinality_start_location(
+    match_query,
+    location_types,
+    query_metadata_table,
+    schema_info,
+    parameters,
+    preferred_locations,
+    eligible_locations,
+):
+    """Return the start location with the fewest estimated vertices, or None if not estimable.
+
+    Ties are broken in favor of preferred locations, and then in favor of locations that appear
+    earlier in the MATCH query.
+    """
+    candidate_estimates = []
+    for location in _get_ordered_match_query_locations(match_query):
+        if location in preferred_locations:
+            preference_rank = 0
+        elif location in eligible_locations:
+            preference_rank = 1
+        else:
+            continue
+
+        vertex_count_estimate = estimate_vertex_count_at_location(
+            schema_info,
+            query_metadata_table,
+            parameters,
+            location,
+            location_types[location].name,
+        )
+        if vertex_count_estimate is None:
+            # Without a class count we can't tell whether this is the best start point.
+            return None
+
+        candidate_estimates.append(
+            (vertex_count_estimate, preference_rank, len(candidate_estimates), location)
+        )
+
+    if not candidate_estimates:
+        return None
+
+    _, _, _, best_location = min(candidate_estimates)
+    return best_location
+
+
 def expose_ideal_query_execution_start_points(
-    compound_match_query, location_types, coerced_locations
+    compound_match_query,
+    location_types,
+    coerced_locations,
+    query_metadata_table=None,
+    schema_info=None,
+    parameters=None,
 ):
-    """Ensure that OrientDB only considers desirable query start points in query planning."""
+    """Ensure that OrientDB only considers desirable query start points in query planning.
+
+    Args:
+        compound_match_query: CompoundMatchQuery object whose MATCH queries should be optimized
+        location_types: dict mapping each query Location to its GraphQL type
+        coerced_locations: set of Location objects that have associated type coercions
+        query_metadata_table: optional QueryMetadataTable for the query. Required if schema_info
+                              is provided, and ignored otherwise.
+        schema_info: optional QueryPlanningSchemaInfo, whose statistics are used to expose only
+                     the start point with the lowest estimated number of vertices. If not provided,
+                     start points are chosen structurally, as described in this module's docstring.
+        parameters: optional dict of the parameters the query will be executed with. They are
+                    used to estimate the selectivity of the filters at each start point.
+
+    Returns:
+        CompoundMatchQuery object with the same semantics, whose MATCH queries are optimized
+    """
+    if schema_info is not None and query_metadata_table is None:
+        raise AssertionError(
+            "A QueryMetadataTable is required to choose query start points using statistics, "
+            "but none was provided: {}".format(compound_match_query)
+        )
+    if parameters is None:
+        parameters = dict()
+
     new_queries = []
 
     for match_query in compound_match_query.match_queries:
         location_classification = _classify_query_locations(match_query)
         preferred_locations, eligible_locations, _ = location_classification
 
-        if preferred_locations:
+        best_location = None
+        if schema_info is not None:
+            best_location = _get_lowest_cardinality_start_location(
+                match_query,
+                location_types,
+                query_metadata_table,
+                schema_info,
+                parameters,
+                preferred_locations,
+                eligible_locations,
+            )
+
+        if best_location is not None:
+            # Expose the estimated-best location as the only start point, and prune all others
+            # exactly as if they were eligible but not preferred.
+            new_query = _expose_only_preferred_locations(
+                match_query,
+                location_types,
+                coerced_locations,
+                {best_location},
+                (preferred_locations | eligible_locations) - {best_location},
+            )
+        elif preferred_locations:
             # Convert all eligible locations into non-eligible ones, by removing
             # their "class:" clause. The "class:" clause is provided either by having
             # a QueryRoot block or a CoerceType block in the MatchStep corresponding
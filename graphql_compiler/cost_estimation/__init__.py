@@ -69,10 +69,24 @@ Approach Details:
     handle type casting, as well as optional, fold, recurse, and some filter directives. Additional
     statistics can be recorded to improve the coverage and accuracy of these adjustments.
 
+Estimating Execution Cost
+=========================
+
+The *execution cost* of a query is a rough measure of the work needed to execute it, defined as
+the number of vertices and edges read while expanding the query's result sets.
+
+We estimate it by following the same expansion model as for cardinality, while also counting
+the reads needed at each step of the expansion. Every edge traversed from a parent result set is
+read, and so is the vertex it leads to, whether or not that vertex passes the filters at its
+location. Subexpansions are performed one after the other, so in the example above, the
+Earthquake subexpansion is performed for each of the 12 TropicalCyclone result sets, even though
+only 4 of them end up in the query result.
+
+As a result, a query that returns few results may still have a very high execution cost,
+e.g. if it traverses many edges only to discard almost all of the vertices they lead to.
+
 TODOs
 =====
-    - Estimate execution cost by augmenting the cardinality calculation.
-    - Add recurse handling.
     - Add additional statistics to improve directive coverage (e.g. histograms
       to better model more filter operations).
 """
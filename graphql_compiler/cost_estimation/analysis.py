@@ -1,11 +1,14 @@
 # Copyright 2019-present Kensho Technologies, LLC.
 import bisect
-from dataclasses import dataclass
-from typing import Any, Dict, Set, Union
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
 
-from graphql import GraphQLInterfaceType, GraphQLObjectType
+from graphql import DocumentNode, GraphQLInterfaceType, GraphQLObjectType, print_ast
 
-from ..compiler.compiler_frontend import ast_to_ir
+from ..ast_manipulation import safe_parse_graphql
+from ..compiler.compiler_frontend import IrAndMetadata, ast_to_ir
 from ..compiler.helpers import (
     BaseLocation,
     FoldScopeLocation,
@@ -13,7 +16,13 @@ from ..compiler.helpers import (
     get_edge_direction_and_name,
 )
 from ..compiler.metadata import FilterInfo, QueryMetadataTable
-from ..cost_estimation.cardinality_estimator import estimate_query_result_cardinality
+from ..cost_estimation.cardinality_estimator import (
+    ExecutionCostEstimate,
+    estimate_query_execution_cost,
+    estimate_query_result_cardinalities,
+    estimate_query_result_cardinality,
+    get_cardinality_correction_keys,
+)
 from ..cost_estimation.int_value_conversion import (
     convert_int_to_field_value,
     field_supports_range_reasoning,
@@ -39,6 +48,11 @@ from .filter_selectivity_utils import (
 from .helpers import is_uuid4_type
 
 
+# The maximum number of queries whose parameter-independent analysis passes are cached, for each
+# QueryPlanningSchemaInfo.
+QUERY_STRUCTURE_CACHE_SIZE = 1000
+
+
 def _convert_int_interval_to_field_value_interval(
     schema_info: QueryPlanningSchemaInfo, vertex_type: str, field: str, interval: Interval[int]
 ) -> Interval[Any]:
@@ -66,7 +80,7 @@ def _convert_int_interval_to_field_value_interval(
     return Interval(lower_bound, upper_bound)
 
 
-def _get_location_vertex_path(location: BaseLocation) -> VertexPath:
+def get_location_vertex_path(location: BaseLocation) -> VertexPath:
     """Get the VertexPath for a BaseLocation pointing at a vertex."""
     if location.field is not None:
         raise AssertionError(
@@ -97,7 +111,7 @@ def get_types(
     """
     location_types = {}
     for location, location_info in query_metadata.registered_locations:
-        location_types[_get_location_vertex_path(location)] = location_info.type
+        location_types[get_location_vertex_path(location)] = location_info.type
     return location_types
 
 
@@ -106,7 +120,7 @@ def get_filters(query_metadata: QueryMetadataTable) -> Dict[VertexPath, Set[Filt
     filters: Dict[VertexPath, Set[FilterInfo]] = {}
     for location, _ in query_metadata.registered_locations:
         filter_infos = query_metadata.get_filter_infos(location)
-        filters.setdefault(_get_location_vertex_path(location), set()).update(filter_infos)
+        filters.setdefault(get_location_vertex_path(location), set()).update(filter_infos)
 
     return filters
 
@@ -116,9 +130,7 @@ def get_fold_scope_roots(query_metadata: QueryMetadataTable) -> Dict[VertexPath,
     fold_scope_roots: Dict[VertexPath, VertexPath] = {}
     for location, _ in query_metadata.registered_locations:
         if isinstance(location, FoldScopeLocation):
-            fold_scope_roots[
-                _get_location_vertex_path(location)
-            ] = location.base_location.query_path
+            fold_scope_roots[get_location_vertex_path(location)] = location.base_location.query_path
     return fold_scope_roots
 
 
@@ -380,6 +392,135 @@ def get_pagination_capacities(
     return pagination_capacities
 
 
+@dataclass
+class QueryStructureAnalysis:
+    """A cache for the analysis passes over a fixed query and fixed schema_info.
+
+    The passes cached here do not depend on the parameters of the query, and are shared by all
+    QueryPlanningAnalysis objects analyzing the same query with different parameters.
+    """
+
+    schema_info: QueryPlanningSchemaInfo
+    query_ast: DocumentNode
+
+    @cached_property
+    def ir_and_metadata(self) -> IrAndMetadata:
+        """Return the IR and metadata for this query."""
+        return ast_to_ir(
+            self.schema_info.schema,
+            self.query_ast,
+            type_equivalence_hints=self.schema_info.type_equivalence_hints,
+        )
+
+    @cached_property
+    def types(self) -> Dict[VertexPath, Union[GraphQLObjectType, GraphQLInterfaceType]]:
+        """Find the type at each VertexPath."""
+        return get_types(self.ir_and_metadata.query_metadata_table)
+
+    @cached_property
+    def filters(self) -> Dict[VertexPath, Set[FilterInfo]]:
+        """Get the filters at each VertexPath."""
+        return get_filters(self.ir_and_metadata.query_metadata_table)
+
+    @cached_property
+    def fold_scope_roots(self) -> Dict[VertexPath, VertexPath]:
+        """Map each VertexPath in the query that's inside a fold to the VertexPath of the fold."""
+        return get_fold_scope_roots(self.ir_and_metadata.query_metadata_table)
+
+    @cached_property
+    def single_field_filters(self) -> Dict[PropertyPath, Set[FilterInfo]]:
+        """Find the single field filters for each field. Filters like name_or_alias are excluded."""
+        return get_single_field_filters(self.filters)
+
+    @cached_property
+    def fields_eligible_for_pagination(self) -> Set[PropertyPath]:
+        """Return all the fields we can consider for pagination."""
+        return get_fields_eligible_for_pagination(
+            self.schema_info,
+            self.types,
+            self.single_field_filters,
+            self.fold_scope_roots,
+        )
+
+
+class _QueryStructureCache(object):
+    """Thread-safe LRU cache of the QueryStructureAnalysis objects of one schema_info.
+
+    Each QueryPlanningSchemaInfo owns its cache, see _get_query_structure_cache(). The cached
+    entries refer back to the schema_info, so it and its cache are freed together once they are
+    no longer used elsewhere, e.g. after the schema_info is rebuilt with refreshed statistics.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """Create an empty cache holding at most max_size entries."""
+        self._max_size = max_size
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, QueryStructureAnalysis]" = OrderedDict()
+
+    def get(
+        self,
+        schema_info: QueryPlanningSchemaInfo,
+        query_string: str,
+        query_ast: Optional[DocumentNode] = None,
+    ) -> QueryStructureAnalysis:
+        """Return the cached analysis of the query, creating it if it is not cached.
+
+        Args:
+            schema_info: QueryPlanningSchemaInfo owning this cache
+            query_string: the query in string form
+            query_ast: the query AST, if already parsed. If omitted and the query is not cached,
+                       the query string is parsed.
+
+        Returns:
+            QueryStructureAnalysis for the query, shared with all other callers analyzing
+            the same query string with the same schema_info.
+        """
+        with self._lock:
+            query_structure = self._entries.get(query_string)
+            if query_structure is not None:
+                self._entries.move_to_end(query_string)
+                return query_structure
+
+        if query_ast is None:
+            query_ast = safe_parse_graphql(query_string)
+        query_structure = QueryStructureAnalysis(schema_info, query_ast)
+        with self._lock:
+            self._entries[query_string] = query_structure
+            self._entries.move_to_end(query_string)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return query_structure
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Guards the creation of the query structure cache of each schema_info.
+_query_structure_cache_creation_lock = Lock()
+
+
+def _get_query_structure_cache(schema_info: QueryPlanningSchemaInfo) -> _QueryStructureCache:
+    """Return the query structure cache owned by the schema_info, creating it on first use."""
+    # The cache is private to the schema_info, and only managed by this module.
+    # pylint: disable=protected-access
+    query_structure_cache = schema_info._query_structure_cache
+    if query_structure_cache is None:
+        with _query_structure_cache_creation_lock:
+            query_structure_cache = schema_info._query_structure_cache
+            if query_structure_cache is None:
+                query_structure_cache = _QueryStructureCache(QUERY_STRUCTURE_CACHE_SIZE)
+                schema_info._query_structure_cache = query_structure_cache
+    # pylint: enable=protected-access
+    return query_structure_cache
+
+
+def clear_query_structure_cache(schema_info: QueryPlanningSchemaInfo) -> None:
+    """Remove the cached parameter-independent analysis passes of the schema_info's queries."""
+    _get_query_structure_cache(schema_info).clear()
+
+
 @dataclass
 class QueryPlanningAnalysis:
     """A cache for analysis passes over a fixed query and fixed schema_info."""
@@ -387,6 +528,20 @@ class QueryPlanningAnalysis:
     schema_info: QueryPlanningSchemaInfo
     ast_with_parameters: ASTWithParameters
 
+    # The analysis passes that don't depend on the query parameters. If omitted, they are
+    # computed for this analysis alone. analyze_query_string() and analyze_query_ast() instead
+    # share them between all analyses of the same query.
+    query_structure: Optional[QueryStructureAnalysis] = field(
+        default=None, compare=False, repr=False
+    )
+
+    @cached_property
+    def _query_structure(self) -> QueryStructureAnalysis:
+        """Return the analysis passes that don't depend on the query parameters."""
+        if self.query_structure is not None:
+            return self.query_structure
+        return QueryStructureAnalysis(self.schema_info, self.ast_with_parameters.query_ast)
+
     @cached_property
     def query_string_with_parameters(self) -> QueryStringWithParameters:
         """Return the query in string form."""
@@ -395,18 +550,14 @@ class QueryPlanningAnalysis:
     @cached_property
     def metadata_table(self) -> QueryMetadataTable:
         """Return the metadata table for this query."""
-        ir_and_metadata = ast_to_ir(
-            self.schema_info.schema,
-            self.ast_with_parameters.query_ast,
-            type_equivalence_hints=self.schema_info.type_equivalence_hints,
-        )
+        ir_and_metadata = self._query_structure.ir_and_metadata
         validate_arguments(ir_and_metadata.input_metadata, self.ast_with_parameters.parameters)
         return ir_and_metadata.query_metadata_table
 
-    @cached_property
+    @property
     def types(self) -> Dict[VertexPath, Union[GraphQLObjectType, GraphQLInterfaceType]]:
         """Find the type at each VertexPath."""
-        return get_types(self.metadata_table)
+        return self._query_structure.types
 
     @cached_property
     def classes_with_missing_counts(self) -> Set[str]:
@@ -430,29 +581,31 @@ class QueryPlanningAnalysis:
         )
 
     @cached_property
+    def execution_cost_estimate(self) -> ExecutionCostEstimate:
+        """Return the estimated number of reads and intermediate result sets for this query."""
+        return estimate_query_execution_cost(
+            self.schema_info, self.metadata_table, self.ast_with_parameters.parameters
+        )
+
+    @property
     def filters(self) -> Dict[VertexPath, Set[FilterInfo]]:
         """Get the filters at each VertexPath."""
-        return get_filters(self.metadata_table)
+        return self._query_structure.filters
 
-    @cached_property
+    @property
     def fold_scope_roots(self) -> Dict[VertexPath, VertexPath]:
         """Map each VertexPath in the query that's inside a fold to the VertexPath of the fold."""
-        return get_fold_scope_roots(self.metadata_table)
+        return self._query_structure.fold_scope_roots
 
-    @cached_property
+    @property
     def single_field_filters(self) -> Dict[PropertyPath, Set[FilterInfo]]:
         """Find the single field filters for each field. Filters like name_or_alias are excluded."""
-        return get_single_field_filters(self.filters)
+        return self._query_structure.single_field_filters
 
-    @cached_property
+    @property
     def fields_eligible_for_pagination(self) -> Set[PropertyPath]:
         """Return all the fields we can consider for pagination."""
-        return get_fields_eligible_for_pagination(
-            self.schema_info,
-            self.types,
-            self.single_field_filters,
-            self.fold_scope_roots,
-        )
+        return self._query_structure.fields_eligible_for_pagination
 
     @cached_property
     def field_value_intervals(self) -> Dict[PropertyPath, Interval[Any]]:
@@ -493,19 +646,94 @@ class QueryPlanningAnalysis:
 def analyze_query_string(
     schema_info: QueryPlanningSchemaInfo, query_with_params: QueryStringWithParameters
 ) -> QueryPlanningAnalysis:
-    """Create a QueryPlanningAnalysis object for the given query string and parameters."""
-    ast_with_params = ASTWithParameters.from_query_string_with_parameters(query_with_params)
-    return analyze_query_ast(schema_info, ast_with_params)
+    """Create a QueryPlanningAnalysis object for the given query string and parameters.
+
+    The analysis passes that don't depend on the parameters are shared with all other analyses
+    of the same query string, so the query is only parsed and compiled to IR once.
+    """
+    query_structure = _get_query_structure_cache(schema_info).get(
+        schema_info, query_with_params.query_string
+    )
+    ast_with_params = ASTWithParameters(query_structure.query_ast, query_with_params.parameters)
+    return QueryPlanningAnalysis(schema_info, ast_with_params, query_structure)
 
 
 def analyze_query_ast(
     schema_info: QueryPlanningSchemaInfo, ast_with_params: ASTWithParameters
 ) -> QueryPlanningAnalysis:
-    """Create a QueryPlanningAnalysis object for the given query AST and parameters."""
+    """Create a QueryPlanningAnalysis object for the given query AST and parameters.
+
+    The analysis passes that don't depend on the parameters are shared with all other analyses
+    of queries with the same AST, so the query is only compiled to IR once.
+    """
     # This function exists for the sake of parity with "analyze_query_string()" as
     # the analysis operations in question work just as well over ASTs as over query strings.
     # Even though this function is just a proxy for the QueryPlanningAnalysis constructor,
     # this is not something that would be obvious to the reader. What we are trying to avoid
     # is a situation where someone doesn't realize QueryPlanningAnalysis can be made from an AST,
     # so they print the AST into a query string, only to parse it again with analyze_query_string().
-    return QueryPlanningAnalysis(schema_info, ast_with_params)
+    query_structure = _get_query_structure_cache(schema_info).get(
+        schema_info, print_ast(ast_with_params.query_ast), ast_with_params.query_ast
+    )
+    return QueryPlanningAnalysis(schema_info, ast_with_params, query_structure)
+
+
+def estimate_query_string_cardinalities(
+    schema_info: QueryPlanningSchemaInfo,
+    query_string: str,
+    parameter_sets: Iterable[Dict[str, Any]],
+) -> List[float]:
+    """Estimate the cardinality of the query for each of many sets of its parameters at once.
+
+    The estimates are the same as the cardinality_estimate of analyze_query_string() for each
+    parameter set, but the parts of the query that the parameter sets don't change are only
+    estimated once. This is much faster when checking many variants of the same query.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_string: the query in string form
+        parameter_sets: parameters with which query will be executed, once per estimate
+
+    Returns:
+        the cardinality estimate for each parameter set, in order
+
+    Raises:
+        GraphQLInvalidArgumentError, if any parameter set is not valid for the query
+    """
+    query_structure = _get_query_structure_cache(schema_info).get(schema_info, query_string)
+    ir_and_metadata = query_structure.ir_and_metadata
+    parameter_sets = list(parameter_sets)
+    for parameters in parameter_sets:
+        validate_arguments(ir_and_metadata.input_metadata, parameters)
+    return estimate_query_result_cardinalities(
+        schema_info, ir_and_metadata.query_metadata_table, parameter_sets
+    )
+
+
+def record_observed_cardinality(
+    query_analysis: QueryPlanningAnalysis, observed_cardinality: int
+) -> None:
+    """Report the number of result rows an executed query returned, to improve future estimates.
+
+    The cardinality corrections of the query's schema_info learn from the difference between
+    the observed cardinality and the query's cardinality estimate. Executors should report the
+    result size of every query, or page of a paginated query, that they execute, so that the
+    corrected estimates converge towards the actual result sizes over time.
+
+    Args:
+        query_analysis: the analysis of the executed query, with the parameters it was executed
+                        with. Its cardinality estimate should have been made with the current
+                        corrections, e.g. by analyzing the query just before executing it.
+        observed_cardinality: the number of result rows the query returned
+    """
+    corrections = query_analysis.schema_info.cardinality_corrections
+    if corrections is None:
+        raise AssertionError(
+            "Cannot record the observed cardinality of a query whose schema_info has no "
+            "cardinality_corrections."
+        )
+
+    traversal_keys, filter_keys = get_cardinality_correction_keys(query_analysis.metadata_table)
+    corrections.record_observation(
+        traversal_keys, filter_keys, query_analysis.cardinality_estimate, observed_cardinality
+    )
@@ -0,0 +1,202 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Corrections to cardinality estimates, learned from the observed result sizes of queries.
+
+Cardinality estimates are only as accurate as the statistics and the assumptions behind them,
+e.g. that edges and field values are distributed uniformly. Executors can report the number of
+rows each executed query actually returned (see record_observed_cardinality() in analysis.py).
+CardinalityCorrections then learns multiplicative corrections for the parts of the query the
+estimate is made of:
+- traversal corrections, keyed by the vertex type a traversal starts from and the vertex field
+  it traverses, scale the estimated number of vertices reached per parent vertex, and
+- filter corrections, keyed by the vertex type and the fields and operators of the filters at
+  a vertex, scale the estimated selectivity of those filters.
+
+Both kinds of keys refer to the schema rather than to a particular query, so corrections learned
+from one query also apply to other queries with the same traversals and filters, such as all
+pages of a paginated query.
+
+The error of each observed estimate is split evenly between the corrections used to make it, in
+log space. Each observation moves the corrections a fraction of the way towards removing the
+error, so that corrections converge over many observations instead of chasing the noise in any
+single one of them.
+"""
+import json
+import math
+import os
+import tempfile
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from ..compiler.metadata import FilterInfo
+
+
+# Version of the serialization format of the corrections.
+_CARDINALITY_CORRECTIONS_FORMAT_VERSION = 1
+
+# (vertex type name, vertex field name), e.g. ("Animal", "out_Animal_ParentOf")
+TraversalCorrectionKey = Tuple[str, str]
+
+# (vertex type name, sorted tuple of (filtered field names, filter operator name))
+FilterCorrectionKey = Tuple[str, Tuple[Tuple[Tuple[str, ...], str], ...]]
+
+
+def get_filter_correction_key(
+    vertex_name: str, filter_infos: Iterable[FilterInfo]
+) -> Optional[FilterCorrectionKey]:
+    """Return the key of the correction for the filters at a vertex, or None if it has none."""
+    filter_signature = tuple(
+        sorted({(tuple(filter_info.fields), filter_info.op_name) for filter_info in filter_infos})
+    )
+    if not filter_signature:
+        return None
+    return (vertex_name, filter_signature)
+
+
+class CardinalityCorrections(object):
+    """Multiplicative corrections to cardinality estimates, learned from observed result sizes.
+
+    All methods are thread-safe, so corrections can be shared by all threads planning queries.
+    """
+
+    def __init__(self, *, learning_rate: float = 0.5, max_correction: float = 1000.0) -> None:
+        """Create corrections that do not change any estimates until observations are recorded.
+
+        Args:
+            learning_rate: fraction of the error of an observed estimate that each observation
+                           removes, between 0 exclusive and 1 inclusive
+            max_correction: largest factor by which any single correction may scale an estimate,
+                            either up or down
+        """
+        if not 0 < learning_rate <= 1:
+            raise AssertionError(
+                f"Expected a learning rate between 0 exclusive and 1 inclusive, "
+                f"got {learning_rate}."
+            )
+        if max_correction < 1:
+            raise AssertionError(f"Expected a max correction of at least 1, got {max_correction}.")
+        self.learning_rate = learning_rate
+        self.max_correction = max_correction
+
+        self._lock = Lock()
+        self._traversal_log_corrections: Dict[TraversalCorrectionKey, float] = {}
+        self._filter_log_corrections: Dict[FilterCorrectionKey, float] = {}
+
+    def get_traversal_correction(self, vertex_name: str, vertex_field_name: str) -> float:
+        """Return the factor scaling the estimated vertices reached via the vertex field."""
+        log_correction = self._traversal_log_corrections.get((vertex_name, vertex_field_name), 0.0)
+        return math.exp(log_correction)
+
+    def get_filter_correction(self, vertex_name: str, filter_infos: Iterable[FilterInfo]) -> float:
+        """Return the factor scaling the estimated selectivity of the filters at the vertex."""
+        filter_key = get_filter_correction_key(vertex_name, filter_infos)
+        if filter_key is None:
+            return 1.0
+        return math.exp(self._filter_log_corrections.get(filter_key, 0.0))
+
+    def record_observation(
+        self,
+        traversal_keys: Sequence[TraversalCorrectionKey],
+        filter_keys: Sequence[FilterCorrectionKey],
+        estimated_cardinality: float,
+        observed_cardinality: float,
+    ) -> None:
+        """Update the corrections used for an estimate, given the actual result size.
+
+        Args:
+            traversal_keys: keys of the traversal corrections applied to the estimate
+            filter_keys: keys of the filter corrections applied to the estimate
+            estimated_cardinality: the estimate, made with the current corrections
+            observed_cardinality: the number of result rows actually returned
+        """
+        correction_count = len(traversal_keys) + len(filter_keys)
+        if correction_count == 0:
+            # The estimate only depends on class counts, which are not corrected.
+            return
+
+        # Cardinalities under 1 are rounded up, so that empty results don't lead to infinite
+        # corrections, and are not treated as wildly different from single rows.
+        log_error = math.log(max(observed_cardinality, 1.0)) - math.log(
+            max(estimated_cardinality, 1.0)
+        )
+        log_update = self.learning_rate * log_error / correction_count
+        max_log_correction = math.log(self.max_correction)
+
+        with self._lock:
+            for log_corrections, keys in (
+                (self._traversal_log_corrections, traversal_keys),
+                (self._filter_log_corrections, filter_keys),
+            ):
+                for key in keys:
+                    log_correction = log_corrections.get(key, 0.0) + log_update
+                    log_corrections[key] = max(
+                        -max_log_correction, min(max_log_correction, log_correction)
+                    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation of the corrections."""
+        with self._lock:
+            traversal_log_corrections = sorted(self._traversal_log_corrections.items())
+            filter_log_corrections = sorted(self._filter_log_corrections.items())
+        return {
+            "format_version": _CARDINALITY_CORRECTIONS_FORMAT_VERSION,
+            "learning_rate": self.learning_rate,
+            "max_correction": self.max_correction,
+            "traversal_corrections": [
+                [vertex_name, vertex_field_name, log_correction]
+                for (vertex_name, vertex_field_name), log_correction in traversal_log_corrections
+            ],
+            "filter_corrections": [
+                [
+                    vertex_name,
+                    [[list(field_names), op_name] for field_names, op_name in filter_signature],
+                    log_correction,
+                ]
+                for (vertex_name, filter_signature), log_correction in filter_log_corrections
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, corrections_dict: Dict[str, Any]) -> "CardinalityCorrections":
+        """Return the corrections with the given representation, created by to_dict()."""
+        format_version = corrections_dict.get("format_version")
+        if format_version != _CARDINALITY_CORRECTIONS_FORMAT_VERSION:
+            raise ValueError(
+                f"Cannot load cardinality corrections with format version {format_version}. "
+                f"Only version {_CARDINALITY_CORRECTIONS_FORMAT_VERSION} is supported."
+            )
+
+        corrections = cls(
+            learning_rate=corrections_dict["learning_rate"],
+            max_correction=corrections_dict["max_correction"],
+        )
+        traversal_corrections = corrections_dict["traversal_corrections"]
+        for vertex_name, vertex_field_name, log_correction in traversal_corrections:
+            traversal_key = (vertex_name, vertex_field_name)
+            corrections._traversal_log_corrections[traversal_key] = log_correction
+        for vertex_name, filter_signature, log_correction in corrections_dict["filter_corrections"]:
+            filter_key = (
+                vertex_name,
+                tuple((tuple(field_names), op_name) for field_names, op_name in filter_signature),
+            )
+            corrections._filter_log_corrections[filter_key] = log_correction
+        return corrections
+
+    def save(self, file_path: str) -> None:
+        """Atomically write the corrections to a JSON file, e.g. next to the statistics file."""
+        directory = os.path.dirname(os.path.abspath(file_path))
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            # Temporary files are only readable by their owner by default.
+            os.fchmod(file_descriptor, 0o644)
+            with os.fdopen(file_descriptor, "w") as temporary_file:
+                json.dump(self.to_dict(), temporary_file)
+            os.replace(temporary_path, file_path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    @classmethod
+    def load(cls, file_path: str) -> "CardinalityCorrections":
+        """Return the corrections written to the JSON file with save()."""
+        with open(file_path, "r") as corrections_file:
+            return cls.from_dict(json.load(corrections_file))
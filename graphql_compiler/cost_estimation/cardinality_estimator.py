@@ -1,17 +1,86 @@
 # Copyright 2019-present Kensho Technologies, LLC.
+from dataclasses import dataclass
 from itertools import chain
-from typing import Any, Dict
+import math
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
 from ..compiler.helpers import (
     INBOUND_EDGE_DIRECTION,
     OUTBOUND_EDGE_DIRECTION,
+    BaseLocation,
     FoldScopeLocation,
     Location,
     get_edge_direction_and_name,
+    get_only_element_from_collection,
+    get_parameter_name,
+    is_runtime_parameter,
 )
 from ..compiler.metadata import QueryMetadataTable
 from ..schema.schema_info import QueryPlanningSchemaInfo
-from .filter_selectivity_utils import adjust_counts_for_filters
+from .cardinality_corrections import (
+    FilterCorrectionKey,
+    TraversalCorrectionKey,
+    get_filter_correction_key,
+)
+from .degree_distribution import estimate_mean_of_at_least_one_result_per_vertex
+from .filter_selectivity_utils import (
+    ABSOLUTE_SELECTIVITY,
+    adjust_counts_for_filters,
+    adjust_counts_with_selectivity,
+    get_selectivity_of_filters_at_vertex,
+)
+
+
+@dataclass(frozen=True)
+class TraversalStepCost:
+    """The estimated work needed to find the vertices at one location of a query."""
+
+    # The location in the query whose vertices are found in this step.
+    location: BaseLocation
+
+    # The number of result sets at the parent location that are expanded to reach the location.
+    # The root location has no parent location, and is reached exactly once.
+    parent_result_sets: float
+
+    # The number of vertices read, including ones that do not pass the filters at the location.
+    vertex_reads: float
+
+    # The number of edges read while traversing to the location. Zero at the root location.
+    edge_reads: float
+
+    # The number of intermediate result sets that pass the filters at the location.
+    result_sets: float
+
+
+@dataclass(frozen=True)
+class ExecutionCostEstimate:
+    """The estimated work needed to execute a query, step by step."""
+
+    # The cost of each traversal step, in the order in which they are executed.
+    step_costs: Tuple[TraversalStepCost, ...]
+
+    # The estimated cardinality of the query result.
+    result_cardinality: float
+
+    @property
+    def vertex_reads(self) -> float:
+        """Return the total number of vertices read while executing the query."""
+        return sum(step_cost.vertex_reads for step_cost in self.step_costs)
+
+    @property
+    def edge_reads(self) -> float:
+        """Return the total number of edges read while executing the query."""
+        return sum(step_cost.edge_reads for step_cost in self.step_costs)
+
+    @property
+    def intermediate_result_sets(self) -> float:
+        """Return the total number of result sets created while executing the query."""
+        return sum(step_cost.result_sets for step_cost in self.step_costs)
+
+    @property
+    def total_reads(self) -> float:
+        """Return the total number of vertices and edges read while executing the query."""
+        return self.vertex_reads + self.edge_reads
 
 
 def _is_subexpansion_optional(query_metadata, parent_location, child_location):
@@ -26,13 +95,21 @@ def _is_subexpansion_folded(location):
     return isinstance(location, FoldScopeLocation) and len(location.fold_path) == 1
 
 
-def _is_subexpansion_recursive(query_metadata, parent_location, child_location):
-    """Return True if child_location is the root of a recursive subexpansion."""
+def _get_subexpansion_recursion_depth(query_metadata, parent_location, child_location):
+    """Return the @recurse depth if child_location is the root of a recursive subexpansion."""
     edge_direction, edge_name = _get_last_edge_direction_and_name_to_location(child_location)
     for recurse_info in query_metadata.get_recurse_infos(parent_location):
         if recurse_info.edge_direction == edge_direction and recurse_info.edge_name == edge_name:
-            return True
-    return False
+            return recurse_info.depth
+    return None
+
+
+def _is_subexpansion_recursive(query_metadata, parent_location, child_location):
+    """Return True if child_location is the root of a recursive subexpansion."""
+    recursion_depth = _get_subexpansion_recursion_depth(
+        query_metadata, parent_location, child_location
+    )
+    return recursion_depth is not None
 
 
 def _get_all_original_child_locations(query_metadata, start_location):
@@ -46,7 +123,8 @@ def _get_all_original_child_locations(query_metadata, start_location):
         list of child Locations. Given start_location, get all revisits to start_location, then for
         all visits, get all child locations and return ones that are original visits.
     """
-    child_locations = set()
+    # Child locations are deduplicated in order, so that they are expanded in a deterministic order.
+    child_locations: Dict[BaseLocation, None] = {}
 
     start_location_revisit_origin = [start_location]
     start_location_revisits = list(query_metadata.get_all_revisits(start_location))
@@ -57,7 +135,7 @@ def _get_all_original_child_locations(query_metadata, start_location):
             if child_location_revisit_origin is None:
                 # If child_location is not a revisit, set origin to child_location
                 child_location_revisit_origin = child_location
-            child_locations.add(child_location_revisit_origin)
+            child_locations[child_location_revisit_origin] = None
 
     return list(child_locations)
 
@@ -73,6 +151,41 @@ def _get_last_edge_direction_and_name_to_location(location):
     return edge_direction, edge_name
 
 
+def _get_vertex_field_name_to_location(location):
+    """Get the name of the vertex field traversed last to reach a non-root BaseLocation object."""
+    edge_direction, edge_name = _get_last_edge_direction_and_name_to_location(location)
+    return "{}_{}".format(edge_direction, edge_name)
+
+
+def _get_filtered_edge_degree_of_parent(
+    query_metadata, parameters, parent_location, child_location
+):
+    """Return the edge degree to which has_edge_degree filters restrict the traversed vertex field.
+
+    Args:
+        query_metadata: QueryMetadataTable object.
+        parameters: dict, parameters with which query will be executed.
+        parent_location: BaseLocation, corresponding to the location the edge traversal begins from.
+        child_location: BaseLocation, child of parent_location corresponding to the location the
+                        edge traversal ends at.
+
+    Returns:
+        - int, number of edges each parent_location vertex has via the vertex field traversed to
+               reach child_location, if it is filtered with has_edge_degree.
+        - None otherwise.
+    """
+    vertex_field_name = _get_vertex_field_name_to_location(child_location)
+    parent_locations = chain([parent_location], query_metadata.get_all_revisits(parent_location))
+    for location in parent_locations:
+        for filter_info in query_metadata.get_filter_infos(location):
+            is_edge_degree_filter = filter_info.op_name == "has_edge_degree"
+            if is_edge_degree_filter and filter_info.fields == (vertex_field_name,):
+                filter_argument = get_only_element_from_collection(filter_info.args)
+                if is_runtime_parameter(filter_argument):
+                    return int(parameters[get_parameter_name(filter_argument)])
+    return None
+
+
 def _get_base_class_names_of_parent_and_child_from_edge(schema_graph, current_location):
     """Return the base class names of a location and its parent from last edge information."""
     edge_direction, edge_name = _get_last_edge_direction_and_name_to_location(current_location)
@@ -195,14 +308,15 @@ def _estimate_vertex_edge_vertex_count_using_class_count(
     return edge_counts
 
 
-def _estimate_edges_to_children_per_parent(
+def _estimate_unfiltered_edges_to_children_per_parent(
     schema_info, query_metadata, parameters, parent_location, child_location
 ):
-    """Estimate the count of edges per parent_location that connect to child_location vertices.
+    """Estimate the count of edges per parent_location vertex, before child filters are applied.
 
     Given a parent location of type A and child location of type B, assume all AB edges are
     distributed evenly over A vertices, so the expected number of child edges per parent vertex is
-    (number of AB edges) / (number of A vertices).
+    (number of AB edges) / (number of A vertices). If a has_edge_degree filter at the parent
+    location restricts the number of edges of each parent vertex, that number is used instead.
 
     Args:
         schema_info: QueryPlanningSchemaInfo
@@ -214,8 +328,16 @@ def _estimate_edges_to_children_per_parent(
 
     Returns:
         float, expected number of edges per parent_location vertex that connect to child_location
-        vertices.
+        vertices, regardless of whether the child vertices pass the filters at child_location.
     """
+    # The filtered edge degree only applies to the first step of a recursive traversal.
+    if not _is_subexpansion_recursive(query_metadata, parent_location, child_location):
+        filtered_edge_degree = _get_filtered_edge_degree_of_parent(
+            query_metadata, parameters, parent_location, child_location
+        )
+        if filtered_edge_degree is not None:
+            return float(filtered_edge_degree)
+
     edge_counts = _query_statistics_for_vertex_edge_vertex_count(
         schema_info.statistics, query_metadata, parent_location, child_location
     )
@@ -242,12 +364,86 @@ def _estimate_edges_to_children_per_parent(
     child_counts_per_parent = float(edge_counts) / parent_location_counts
     # pylint: enable=old-division
 
-    # TODO(evan): If edge is recursed over, we need a more detailed statistic
+    return child_counts_per_parent
+
+
+def _estimate_recursive_expansion(
+    schema_info, query_metadata, child_location, edges_per_vertex, recursion_depth
+):
+    """Estimate the vertices reached and edges read when recursing from a single vertex.
+
+    Each vertex first reached at some depth is expanded at the next depth, reading
+    edges_per_vertex edges. We assume these edges lead to random vertices of the recursed type,
+    so only some of them lead to vertices that were not reached before, which are expanded in
+    turn. With N vertices of which U are unreached, M edges reach U * (1 - exp(-M / N)) new
+    vertices on average. This is close to M when few vertices have been reached, and the reached
+    vertices saturate at N instead of growing exponentially with the depth.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: QueryMetadataTable object
+        child_location: BaseLocation, the root of the recursive subexpansion
+        edges_per_vertex: float, expected number of edges per vertex traversed by the recursion
+        recursion_depth: int, the depth of the @recurse directive
+
+    Returns:
+        tuple (float, float), the expected number of distinct vertices reached, including the
+        vertex the recursion starts from, and the expected number of edges read
+    """
+    child_name_from_location = query_metadata.get_location_info(child_location).type.name
+    vertex_count = schema_info.statistics.get_class_count(child_name_from_location)
+
+    vertices_reached = 1.0
+    vertices_at_depth = 1.0
+    edges_read = 0.0
+    for _ in range(recursion_depth):
+        edges_at_depth = vertices_at_depth * edges_per_vertex
+        edges_read += edges_at_depth
+        if vertex_count:
+            unreached_vertices = max(0.0, vertex_count - vertices_reached)
+            vertices_at_depth = unreached_vertices * -math.expm1(-edges_at_depth / vertex_count)
+        else:
+            # Without a vertex count, we can't tell how soon the reached vertices saturate.
+            vertices_at_depth = edges_at_depth
+        vertices_reached += vertices_at_depth
+    return vertices_reached, edges_read
+
+
+def _estimate_edges_to_children_per_parent(
+    schema_info, query_metadata, parameters, parent_location, child_location
+):
+    """Estimate the count of edges per parent_location that connect to child_location vertices.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: QueryMetadataTable object.
+        parameters: dict, parameters with which query will be executed.
+        parent_location: BaseLocation, corresponding to the location the edge traversal begins from.
+        child_location: BaseLocation, child of parent_location corresponding to the location the
+                        edge traversal ends at.
+
+    Returns:
+        float, expected number of edges per parent_location vertex that connect to child_location
+        vertices that pass the filters at child_location.
+    """
+    parent_name_from_location = query_metadata.get_location_info(parent_location).type.name
+    if schema_info.statistics.get_class_count(parent_name_from_location) == 0:
+        # There are no parent vertices, so there are no edges to expand either.
+        return 0.0
+
+    child_counts_per_parent = _estimate_unfiltered_edges_to_children_per_parent(
+        schema_info, query_metadata, parameters, parent_location, child_location
+    )
+
     # Recursion always starts with depth = 0, so we should treat the parent result set itself as a
-    # child result set to be expanded (so add 1 to child_counts).
-    is_recursive = _is_subexpansion_recursive(query_metadata, parent_location, child_location)
-    if is_recursive:
-        child_counts_per_parent += 1
+    # child result set to be expanded, along with the vertices reached at every further depth.
+    recursion_depth = _get_subexpansion_recursion_depth(
+        query_metadata, parent_location, child_location
+    )
+    if recursion_depth is not None:
+        child_counts_per_parent, _ = _estimate_recursive_expansion(
+            schema_info, query_metadata, child_location, child_counts_per_parent, recursion_depth
+        )
 
     # Adjust the counts for filters at child_location.
     child_name_from_location = query_metadata.get_location_info(child_location).type.name
@@ -256,11 +452,77 @@ def _estimate_edges_to_children_per_parent(
         schema_info, child_filters, parameters, child_name_from_location, child_counts_per_parent
     )
 
+    # Correct for the errors observed in the past when estimating traversals of this vertex field.
+    if schema_info.cardinality_corrections is not None:
+        child_counts_per_parent *= schema_info.cardinality_corrections.get_traversal_correction(
+            parent_name_from_location, _get_vertex_field_name_to_location(child_location)
+        )
+
     return child_counts_per_parent
 
 
+def _adjust_subexpansion_cardinality_for_directives(
+    schema_info,
+    query_metadata,
+    parameters,
+    parent_location,
+    child_location,
+    subexpansion_cardinality,
+):
+    """Adjust the cardinality of the subexpansion at child_location for @optional and @fold.
+
+    If child_location is the root of an optional or folded subexpansion, the empty result set will
+    be returned for each parent vertex for which no other result sets exist, so each parent vertex
+    produces at least 1 result set. If the edge degree quantiles of the traversed vertex field are
+    known, this is applied to each part of the edge degree distribution separately, since applying
+    it to the average underestimates the result size when most vertices have few edges.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: QueryMetadataTable object
+        parameters: dict, parameters with which query will be executed
+        parent_location: BaseLocation object, location corresponding to the vertex being expanded
+        child_location: BaseLocation object, child of parent_location corresponding to the
+                        subexpansion root
+        subexpansion_cardinality: float, expected number of result sets per parent vertex, before
+                                  adjusting for the directives
+
+    Returns:
+        float, expected number of result sets per parent vertex
+    """
+    # TODO(evan): @filters on _x_count inside @folds can reduce result size.
+    is_optional = _is_subexpansion_optional(query_metadata, parent_location, child_location)
+    is_folded = _is_subexpansion_folded(child_location)
+    if not (is_optional or is_folded):
+        return subexpansion_cardinality
+
+    # Parent vertices all have the same number of edges if it is filtered, and the distribution
+    # of edges reached by recursion is not known.
+    degree_quantiles = None
+    is_recursive = _is_subexpansion_recursive(query_metadata, parent_location, child_location)
+    filtered_edge_degree = _get_filtered_edge_degree_of_parent(
+        query_metadata, parameters, parent_location, child_location
+    )
+    if not is_recursive and filtered_edge_degree is None:
+        parent_name_from_location = query_metadata.get_location_info(parent_location).type.name
+        degree_quantiles = schema_info.statistics.get_edge_degree_quantiles(
+            parent_name_from_location, _get_vertex_field_name_to_location(child_location)
+        )
+
+    if degree_quantiles is None:
+        return max(subexpansion_cardinality, 1)
+    return estimate_mean_of_at_least_one_result_per_vertex(
+        degree_quantiles, subexpansion_cardinality
+    )
+
+
 def _estimate_subexpansion_cardinality(
-    schema_info, query_metadata, parameters, parent_location, child_location
+    schema_info,
+    query_metadata,
+    parameters,
+    parent_location,
+    child_location,
+    subexpansion_cache=None,
 ):
     """Estimate the cardinality associated with the subexpansion of a child_location vertex.
 
@@ -271,6 +533,8 @@ def _estimate_subexpansion_cardinality(
         parent_location: BaseLocation object, location corresponding to the vertex being expanded
         child_location: BaseLocation object, child of parent_location corresponding to the
                         subexpansion root
+        subexpansion_cache: optional _CardinalityEstimateCache, through which the estimates
+                            of nested subexpansions are looked up
 
     Returns:
         float, number of expected result sets found when a vertex corresponding to parent_location
@@ -285,23 +549,23 @@ def _estimate_subexpansion_cardinality(
     )
 
     results_per_child = _estimate_expansion_cardinality(
-        schema_info, query_metadata, parameters, child_location
+        schema_info, query_metadata, parameters, child_location, subexpansion_cache
     )
 
     subexpansion_cardinality = child_counts_per_parent * results_per_child
-
-    # If child_location is the root of an optional or folded subexpansion, the empty result set will
-    # be returned if no other result sets exist, so return at least 1.
-    # TODO(evan): @filters on _x_count inside @folds can reduce result size.
-    is_optional = _is_subexpansion_optional(query_metadata, parent_location, child_location)
-    is_folded = _is_subexpansion_folded(child_location)
-    if is_optional or is_folded:
-        subexpansion_cardinality = max(subexpansion_cardinality, 1)
-
-    return subexpansion_cardinality
+    return _adjust_subexpansion_cardinality_for_directives(
+        schema_info,
+        query_metadata,
+        parameters,
+        parent_location,
+        child_location,
+        subexpansion_cardinality,
+    )
 
 
-def _estimate_expansion_cardinality(schema_info, query_metadata, parameters, current_location):
+def _estimate_expansion_cardinality(
+    schema_info, query_metadata, parameters, current_location, subexpansion_cache=None
+):
     """Estimate the cardinality of fully expanding a vertex corresponding to current_location.
 
     Args:
@@ -309,6 +573,8 @@ def _estimate_expansion_cardinality(schema_info, query_metadata, parameters, cur
         query_metadata: QueryMetadataTable object
         parameters: dict, parameters with which query will be executed
         current_location: BaseLocation object, corresponding to the vertex we're expanding
+        subexpansion_cache: optional _CardinalityEstimateCache, through which the estimates
+                            of subexpansions are looked up instead of being recomputed
 
     Returns:
         float, expected cardinality associated with the full expansion of one current vertex.
@@ -319,8 +585,287 @@ def _estimate_expansion_cardinality(schema_info, query_metadata, parameters, cur
         # The expected cardinality per current vertex is the product of the expected cardinality for
         # each subexpansion (e.g. If we expect each current vertex to have 2 children of type A and
         # 3 children of type B, we'll return 6 distinct result sets per current vertex).
-        subexpansion_cardinality = _estimate_subexpansion_cardinality(
-            schema_info, query_metadata, parameters, current_location, child_location
+        if subexpansion_cache is None:
+            subexpansion_cardinality = _estimate_subexpansion_cardinality(
+                schema_info, query_metadata, parameters, current_location, child_location
+            )
+        else:
+            subexpansion_cardinality = subexpansion_cache.get_subexpansion_cardinality(
+                parameters, current_location, child_location
+            )
+        expansion_cardinality *= subexpansion_cardinality
+    return expansion_cardinality
+
+
+def _get_runtime_parameter_names(filter_infos):
+    """Return the names of the runtime parameters used by the given filters."""
+    return {
+        get_parameter_name(filter_argument)
+        for filter_info in filter_infos
+        for filter_argument in filter_info.args
+        if is_runtime_parameter(filter_argument)
+    }
+
+
+def _freeze_parameter_value(value):
+    """Return a hashable representation of the parameter value, distinguishing its type."""
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze_parameter_value(element) for element in value))
+    elif isinstance(value, (set, frozenset)):
+        return (type(value), frozenset(_freeze_parameter_value(element) for element in value))
+    else:
+        # Values like 1, 1.0 and True are equal, but may not have the same selectivity.
+        return (type(value), value)
+
+
+class _CardinalityEstimateCache(object):
+    """Cardinality estimates for parts of one query, shared by many sets of its parameters.
+
+    The estimate of a subexpansion only depends on the values of the runtime parameters used by
+    the filters inside it, and by has_edge_degree filters on the vertex field it traverses.
+    Likewise, the estimated count of root vertices only depends on the parameters used by the
+    filters at the root location. Each of them usually uses only a few of the parameters of the
+    query, so parameter sets that only differ in the values of the other parameters share them.
+    """
+
+    def __init__(self, schema_info, query_metadata):
+        """Create an empty cache for estimates of the given query."""
+        self._schema_info = schema_info
+        self._query_metadata = query_metadata
+
+        # (parent location, child location) -> names of the parameters the estimate depends on
+        self._subexpansion_parameter_names: Dict[
+            Tuple[BaseLocation, BaseLocation], Tuple[str, ...]
+        ] = {}
+        # (estimated part of the query, frozen parameter values) -> estimate
+        self._estimates: Dict[Tuple[Any, Tuple[Any, ...]], float] = {}
+
+        root_location = query_metadata.root_location
+        self._root_name = query_metadata.get_location_info(root_location).type.name
+        self._root_filter_infos = query_metadata.get_filter_infos(root_location)
+        self._root_parameter_names = tuple(
+            sorted(_get_runtime_parameter_names(self._root_filter_infos))
+        )
+
+    def _get_expansion_parameter_names(self, location):
+        """Return the names of the parameters the expansion of the location depends on."""
+        locations = chain([location], self._query_metadata.get_all_revisits(location))
+        parameter_names = _get_runtime_parameter_names(
+            chain.from_iterable(
+                self._query_metadata.get_filter_infos(visited_location)
+                for visited_location in locations
+            )
+        )
+        for child_location in _get_all_original_child_locations(self._query_metadata, location):
+            parameter_names.update(self._get_subexpansion_parameter_names(location, child_location))
+        return parameter_names
+
+    def _get_subexpansion_parameter_names(self, parent_location, child_location):
+        """Return the names of the parameters the subexpansion estimate depends on, sorted."""
+        subexpansion_key = (parent_location, child_location)
+        parameter_names = self._subexpansion_parameter_names.get(subexpansion_key)
+        if parameter_names is None:
+            vertex_field_name = _get_vertex_field_name_to_location(child_location)
+            parent_locations = chain(
+                [parent_location], self._query_metadata.get_all_revisits(parent_location)
+            )
+            edge_degree_filter_infos = [
+                filter_info
+                for location in parent_locations
+                for filter_info in self._query_metadata.get_filter_infos(location)
+                if filter_info.op_name == "has_edge_degree"
+                and filter_info.fields == (vertex_field_name,)
+            ]
+            parameter_names = tuple(
+                sorted(
+                    _get_runtime_parameter_names(edge_degree_filter_infos)
+                    | self._get_expansion_parameter_names(child_location)
+                )
+            )
+            self._subexpansion_parameter_names[subexpansion_key] = parameter_names
+        return parameter_names
+
+    def _get_or_estimate(self, estimate_key, parameter_names, parameters, estimate_function):
+        """Return the cached estimate for the parameter values, estimating it if not cached."""
+        parameter_values = tuple(
+            _freeze_parameter_value(parameters.get(parameter_name))
+            for parameter_name in parameter_names
+        )
+        cache_key = (estimate_key, parameter_values)
+        try:
+            estimate = self._estimates.get(cache_key)
+        except TypeError:
+            # Some parameter value is not hashable, so the estimate cannot be cached.
+            return estimate_function()
+
+        if estimate is None:
+            estimate = estimate_function()
+            self._estimates[cache_key] = estimate
+        return estimate
+
+    def get_root_count(self, parameters):
+        """Return the estimated number of root vertices that pass the filters at the root."""
+        return self._get_or_estimate(
+            self._query_metadata.root_location,
+            self._root_parameter_names,
+            parameters,
+            lambda: adjust_counts_for_filters(
+                self._schema_info,
+                self._root_filter_infos,
+                parameters,
+                self._root_name,
+                self._schema_info.statistics.get_class_count(self._root_name),
+            ),
+        )
+
+    def get_subexpansion_cardinality(self, parameters, parent_location, child_location):
+        """Return the estimate of the subexpansion, see _estimate_subexpansion_cardinality()."""
+        return self._get_or_estimate(
+            (parent_location, child_location),
+            self._get_subexpansion_parameter_names(parent_location, child_location),
+            parameters,
+            lambda: _estimate_subexpansion_cardinality(
+                self._schema_info,
+                self._query_metadata,
+                parameters,
+                parent_location,
+                child_location,
+                self,
+            ),
+        )
+
+
+def _estimate_edges_traversed_per_parent(
+    schema_info, query_metadata, parameters, parent_location, child_location
+):
+    """Estimate the count of edges read per parent_location vertex to reach child_location.
+
+    Every edge is read regardless of whether its child vertex passes the filters at
+    child_location. When recursing to depth N, every vertex reached at depth N - 1 or less is
+    expanded, so with E edges per vertex, up to E + E^2 + ... + E^N edges are read per parent
+    vertex. Fewer are read once the reached vertices saturate, see _estimate_recursive_expansion.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: QueryMetadataTable object
+        parameters: dict, parameters with which query will be executed
+        parent_location: BaseLocation, corresponding to the location the edge traversal begins from.
+        child_location: BaseLocation, child of parent_location corresponding to the location the
+                        edge traversal ends at.
+
+    Returns:
+        float, expected number of edges read per parent_location vertex.
+    """
+    edges_per_vertex = _estimate_unfiltered_edges_to_children_per_parent(
+        schema_info, query_metadata, parameters, parent_location, child_location
+    )
+    recursion_depth = _get_subexpansion_recursion_depth(
+        query_metadata, parent_location, child_location
+    )
+    if recursion_depth is None:
+        return edges_per_vertex
+
+    _, edges_traversed = _estimate_recursive_expansion(
+        schema_info, query_metadata, child_location, edges_per_vertex, recursion_depth
+    )
+    return edges_traversed
+
+
+def _estimate_subexpansion_cost(
+    schema_info,
+    query_metadata,
+    parameters,
+    parent_location,
+    child_location,
+    parent_result_sets,
+    step_costs,
+):
+    """Estimate the cost of the subexpansion of a child_location vertex, recording its steps.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: QueryMetadataTable object
+        parameters: dict, parameters with which query will be executed
+        parent_location: BaseLocation object, location corresponding to the vertex being expanded
+        child_location: BaseLocation object, child of parent_location corresponding to the
+                        subexpansion root
+        parent_result_sets: float, number of result sets at parent_location that are expanded
+                            via child_location
+        step_costs: list of TraversalStepCost objects, to which the cost of every traversal step
+                    in the subexpansion is appended
+
+    Returns:
+        float, number of expected result sets found when a vertex corresponding to parent_location
+        is expanded via child_location. See _estimate_subexpansion_cardinality for details.
+    """
+    edges_traversed_per_parent = _estimate_edges_traversed_per_parent(
+        schema_info, query_metadata, parameters, parent_location, child_location
+    )
+    child_counts_per_parent = _estimate_edges_to_children_per_parent(
+        schema_info, query_metadata, parameters, parent_location, child_location
+    )
+
+    # Each edge read leads to a vertex that needs to be read in order to apply its filters.
+    edge_reads = parent_result_sets * edges_traversed_per_parent
+    child_result_sets = parent_result_sets * child_counts_per_parent
+    step_costs.append(
+        TraversalStepCost(
+            location=child_location,
+            parent_result_sets=parent_result_sets,
+            vertex_reads=edge_reads,
+            edge_reads=edge_reads,
+            result_sets=child_result_sets,
+        )
+    )
+
+    results_per_child = _estimate_expansion_cost(
+        schema_info, query_metadata, parameters, child_location, child_result_sets, step_costs
+    )
+
+    subexpansion_cardinality = child_counts_per_parent * results_per_child
+    return _adjust_subexpansion_cardinality_for_directives(
+        schema_info,
+        query_metadata,
+        parameters,
+        parent_location,
+        child_location,
+        subexpansion_cardinality,
+    )
+
+
+def _estimate_expansion_cost(
+    schema_info, query_metadata, parameters, current_location, current_result_sets, step_costs
+):
+    """Estimate the cost of fully expanding the result sets at current_location.
+
+    Subexpansions are performed one after the other, so each subexpansion expands all the result
+    sets produced by the ones before it. Work done for result sets that are later discarded,
+    e.g. because a subsequent subexpansion finds no vertices that pass its filters, still counts
+    towards the cost.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: QueryMetadataTable object
+        parameters: dict, parameters with which query will be executed
+        current_location: BaseLocation object, corresponding to the vertex we're expanding
+        current_result_sets: float, number of result sets at current_location
+        step_costs: list of TraversalStepCost objects, to which the cost of every traversal step
+                    in the expansion is appended
+
+    Returns:
+        float, expected cardinality associated with the full expansion of one current vertex.
+    """
+    expansion_cardinality = 1.0
+    child_locations = _get_all_original_child_locations(query_metadata, current_location)
+    for child_location in child_locations:
+        subexpansion_cardinality = _estimate_subexpansion_cost(
+            schema_info,
+            query_metadata,
+            parameters,
+            current_location,
+            child_location,
+            current_result_sets * expansion_cardinality,
+            step_costs,
         )
         expansion_cardinality *= subexpansion_cardinality
     return expansion_cardinality
@@ -363,3 +908,169 @@ def estimate_query_result_cardinality(
     expected_query_result_cardinality = root_counts * results_per_root
 
     return expected_query_result_cardinality
+
+
+def estimate_query_result_cardinalities(
+    schema_info: QueryPlanningSchemaInfo,
+    query_metadata: QueryMetadataTable,
+    parameter_sets: Iterable[Dict[str, Any]],
+) -> List[float]:
+    """Estimate the cardinality of a GraphQL query's result for each of many sets of parameters.
+
+    The estimates are the same as those of estimate_query_result_cardinality(), but much faster
+    to compute than by calling it once per parameter set. Each part of the query is estimated
+    only once per distinct combination of values of the parameters that part uses, e.g. the
+    traversals below the root of a query that only has parameters at its root location are
+    estimated only once for all parameter sets.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: info on locations, inputs, outputs, and tags in the query
+        parameter_sets: parameters with which query will be executed, once per estimate
+
+    Returns:
+        list of floats, the expected query result cardinality for each parameter set, in order
+    """
+    estimate_cache = _CardinalityEstimateCache(schema_info, query_metadata)
+    root_location = query_metadata.root_location
+
+    cardinalities = []
+    for parameters in parameter_sets:
+        root_counts = estimate_cache.get_root_count(parameters)
+        results_per_root = _estimate_expansion_cardinality(
+            schema_info, query_metadata, parameters, root_location, estimate_cache
+        )
+        cardinalities.append(root_counts * results_per_root)
+    return cardinalities
+
+
+def get_cardinality_correction_keys(
+    query_metadata: QueryMetadataTable,
+) -> Tuple[List[TraversalCorrectionKey], List[FilterCorrectionKey]]:
+    """Return the keys of the corrections applied when estimating the query result cardinality.
+
+    Folded subexpansions do not change the number of result rows, so the corrections inside
+    them are omitted.
+
+    Args:
+        query_metadata: info on locations, inputs, outputs, and tags in the query
+
+    Returns:
+        tuple (traversal correction keys, filter correction keys), with one entry per time each
+        correction is applied
+    """
+    traversal_keys: List[TraversalCorrectionKey] = []
+    filter_keys: List[FilterCorrectionKey] = []
+
+    locations_to_visit = [query_metadata.root_location]
+    while locations_to_visit:
+        location = locations_to_visit.pop()
+        vertex_name = query_metadata.get_location_info(location).type.name
+        filter_infos = query_metadata.get_filter_infos(location)
+        filter_key = get_filter_correction_key(vertex_name, filter_infos)
+        if filter_key is not None:
+            filter_keys.append(filter_key)
+
+        for child_location in _get_all_original_child_locations(query_metadata, location):
+            if isinstance(child_location, FoldScopeLocation):
+                continue
+            traversal_keys.append((vertex_name, _get_vertex_field_name_to_location(child_location)))
+            locations_to_visit.append(child_location)
+
+    return traversal_keys, filter_keys
+
+
+def estimate_vertex_count_at_location(
+    schema_info: QueryPlanningSchemaInfo,
+    query_metadata: QueryMetadataTable,
+    parameters: Mapping[str, Any],
+    location: BaseLocation,
+    vertex_name: str,
+) -> Optional[float]:
+    """Estimate the number of vertices at the given location that pass its local filters.
+
+    Only the filters at the location itself are considered, so the estimate is independent of
+    the rest of the query. This makes it suitable for choosing where to start executing a query.
+    Filters using runtime parameters whose values are not given are assumed to not filter out
+    any vertices.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: info on locations, inputs, outputs, and tags in the query
+        parameters: parameters with which query will be executed. May be incomplete.
+        location: the location whose vertices to count
+        vertex_name: name of the vertex type at the location
+
+    Returns:
+        estimated number of vertices, or None if the class count for vertex_name is not known
+    """
+    class_count = schema_info.statistics.get_class_count(vertex_name)
+    if class_count is None:
+        return None
+
+    filter_infos = [
+        filter_info
+        for filter_info in query_metadata.get_filter_infos(location)
+        if all(
+            get_parameter_name(filter_argument) in parameters
+            for filter_argument in filter_info.args
+            if is_runtime_parameter(filter_argument)
+        )
+    ]
+    return adjust_counts_for_filters(
+        schema_info, filter_infos, parameters, vertex_name, class_count
+    )
+
+
+def estimate_query_execution_cost(
+    schema_info: QueryPlanningSchemaInfo,
+    query_metadata: QueryMetadataTable,
+    parameters: Dict[str, Any],
+) -> ExecutionCostEstimate:
+    """Estimate the work needed to execute a GraphQL query using database statistics.
+
+    The cost is estimated using the same expansion model as the result cardinality, but counts
+    every vertex and edge read while expanding result sets, along with the intermediate result
+    sets created at each traversal step. This includes the work that produces no results, e.g.
+    reading vertices that do not pass their filters, or expanding result sets that are discarded
+    later on. Queries that return few results can still have a very high execution cost.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query_metadata: info on locations, inputs, outputs, and tags in the query
+        parameters: dict, parameters with which query will be executed.
+
+    Returns:
+        ExecutionCostEstimate with the estimated cost of each traversal step of the query
+    """
+    root_location = query_metadata.root_location
+
+    # Unless the filters at the root location can be answered with a unique index lookup,
+    # all vertices of the root type need to be read in order to apply them.
+    root_name = query_metadata.get_location_info(root_location).type.name
+    root_counts = schema_info.statistics.get_class_count(root_name)
+    root_selectivity = get_selectivity_of_filters_at_vertex(
+        schema_info, query_metadata.get_filter_infos(root_location), parameters, root_name
+    )
+    root_result_sets = adjust_counts_with_selectivity(root_counts, root_selectivity)
+    if root_selectivity.kind == ABSOLUTE_SELECTIVITY:
+        root_vertex_reads = root_result_sets
+    else:
+        root_vertex_reads = root_counts
+
+    step_costs = [
+        TraversalStepCost(
+            location=root_location,
+            parent_result_sets=1.0,
+            vertex_reads=root_vertex_reads,
+            edge_reads=0.0,
+            result_sets=root_result_sets,
+        )
+    ]
+    results_per_root = _estimate_expansion_cost(
+        schema_info, query_metadata, parameters, root_location, root_result_sets, step_costs
+    )
+
+    return ExecutionCostEstimate(
+        step_costs=tuple(step_costs), result_cardinality=root_result_sets * results_per_root
+    )
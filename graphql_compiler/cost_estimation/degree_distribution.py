@@ -0,0 +1,91 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Estimates based on the distribution of the number of edges per vertex.
+
+Edges are rarely distributed evenly among vertices: most vertices of power-law graphs have few
+edges, while a handful of them have very many. Estimates made using the average number of edges
+per vertex are accurate for plain traversals, since the result size of a traversal only depends
+on the total number of edges. They are very inaccurate whenever vertices contribute to the result
+in a way that is not proportional to their number of edges, e.g. @optional and @fold traversals
+produce a result for vertices without any edges, and has_edge_degree filters select vertices by
+their number of edges.
+
+The distribution is described by edge degree quantiles (see Statistics.get_edge_degree_quantiles).
+We assume that the vertices between two consecutive quantiles are spread uniformly over the
+degrees between those quantiles, including both of them.
+"""
+import math
+from typing import List, Tuple
+
+
+def _get_degree_groups(degree_quantiles: List[int]) -> List[Tuple[int, int]]:
+    """Return the (lowest degree, highest degree) pair of each equally-sized group of vertices."""
+    if len(degree_quantiles) < 2:
+        raise AssertionError(f"Need at least 2 edge degree quantiles: {degree_quantiles}")
+    return list(zip(degree_quantiles[:-1], degree_quantiles[1:]))
+
+
+def get_mean_edge_degree(degree_quantiles: List[int]) -> float:
+    """Return the average number of edges per vertex, according to the edge degree quantiles."""
+    degree_groups = _get_degree_groups(degree_quantiles)
+    total_degree = sum(
+        (lowest_degree + highest_degree) / 2.0 for lowest_degree, highest_degree in degree_groups
+    )
+    return total_degree / len(degree_groups)
+
+
+def get_fraction_of_vertices_with_edge_degree(degree_quantiles: List[int], degree: int) -> float:
+    """Return the fraction of vertices that have exactly the given number of edges."""
+    degree_groups = _get_degree_groups(degree_quantiles)
+    fraction = 0.0
+    for lowest_degree, highest_degree in degree_groups:
+        if lowest_degree <= degree <= highest_degree:
+            fraction += 1.0 / (highest_degree - lowest_degree + 1)
+    return fraction / len(degree_groups)
+
+
+def estimate_mean_of_at_least_one_result_per_vertex(
+    degree_quantiles: List[int], results_per_vertex: float
+) -> float:
+    """Estimate the results per vertex, if each vertex with fewer than one result produces one.
+
+    This is the case for @optional and @fold traversals, where the vertices without any
+    neighbors that pass the filters produce a single result nonetheless. Applying that rule to
+    the average number of results per vertex underestimates the result size when most vertices
+    have fewer results than average.
+
+    Args:
+        degree_quantiles: edge degree quantiles of the vertex field being traversed
+        results_per_vertex: the average number of results per vertex, before applying the rule.
+                            Each vertex is assumed to produce results in proportion to its
+                            number of edges.
+
+    Returns:
+        the average number of results per vertex, after applying the rule
+    """
+    mean_degree = get_mean_edge_degree(degree_quantiles)
+    if mean_degree == 0 or results_per_vertex == 0:
+        return 1.0
+
+    results_per_edge = results_per_vertex / mean_degree
+    # Vertices with at least this many edges produce at least one result on average.
+    min_degree_producing_results = math.ceil(1.0 / results_per_edge)
+
+    degree_groups = _get_degree_groups(degree_quantiles)
+    total_results = 0.0
+    for lowest_degree, highest_degree in degree_groups:
+        degree_count = highest_degree - lowest_degree + 1
+        # Vertices with lower degrees produce a single result, the others produce results in
+        # proportion to their degree. The degrees in the group are summed as arithmetic series.
+        first_degree_producing_results = max(lowest_degree, min_degree_producing_results)
+        if first_degree_producing_results > highest_degree:
+            group_results = float(degree_count)
+        else:
+            single_result_degree_count = first_degree_producing_results - lowest_degree
+            summed_degrees = (
+                (first_degree_producing_results + highest_degree)
+                * (highest_degree - first_degree_producing_results + 1)
+                / 2.0
+            )
+            group_results = single_result_degree_count + results_per_edge * summed_degrees
+        total_results += group_results / degree_count
+    return total_results / len(degree_groups)
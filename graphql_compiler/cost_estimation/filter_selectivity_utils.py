@@ -15,6 +15,7 @@ from ..compiler.helpers import (
 )
 from ..compiler.metadata import FilterInfo
 from ..schema.schema_info import QueryPlanningSchemaInfo
+from .degree_distribution import get_fraction_of_vertices_with_edge_degree
 from .helpers import is_uuid4_type
 from .int_value_conversion import (
     MAX_UUID_INT,
@@ -223,6 +224,37 @@ def _estimate_filter_selectivity_of_in_collection(
         return Selectivity(kind=FRACTIONAL_SELECTIVITY, value=1.0)
 
 
+def _estimate_filter_selectivity_of_has_edge_degree(
+    schema_info: QueryPlanningSchemaInfo,
+    location_name: str,
+    filter_info: FilterInfo,
+    parameters: Dict[str, Any],
+) -> Selectivity:
+    """Calculate the selectivity of a has_edge_degree filter at a given location.
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        location_name: type name of the location being filtered
+        filter_info: the has_edge_degree filter
+        parameters: parameters with which query will be executed
+
+    Returns:
+        Selectivity object, the fraction of vertices with the filtered number of edges if the edge
+        degree quantiles of the vertex field are known, and a fractional selectivity of 1 otherwise.
+    """
+    filter_argument = get_only_element_from_collection(filter_info.args)
+    vertex_field_name = get_only_element_from_collection(filter_info.fields)
+    degree_quantiles = schema_info.statistics.get_edge_degree_quantiles(
+        location_name, vertex_field_name
+    )
+    if degree_quantiles is None or not is_runtime_parameter(filter_argument):
+        return Selectivity(kind=FRACTIONAL_SELECTIVITY, value=1.0)
+
+    degree = int(parameters[get_parameter_name(filter_argument)])
+    fraction = get_fraction_of_vertices_with_edge_degree(degree_quantiles, degree)
+    return Selectivity(kind=FRACTIONAL_SELECTIVITY, value=fraction)
+
+
 def _combine_filter_selectivities(selectivities):
     """Calculate the combined selectivity given a set of selectivities.
 
@@ -251,6 +283,14 @@ def _combine_filter_selectivities(selectivities):
     return Selectivity(kind=combined_selectivity_kind, value=combined_selectivity_value)
 
 
+def _apply_filter_correction(selectivity: Selectivity, correction: float) -> Selectivity:
+    """Scale the selectivity by the learned correction, keeping fractional selectivities <= 1."""
+    corrected_value = selectivity.value * correction
+    if _is_fractional(selectivity):
+        corrected_value = min(1.0, corrected_value)
+    return Selectivity(kind=selectivity.kind, value=corrected_value)
+
+
 def _get_selectivity_fraction_of_interval(
     interval: Interval[IntervalDomain], quantiles: List[IntervalDomain]
 ) -> float:
@@ -359,6 +399,8 @@ def get_selectivity_of_filters_at_vertex(
     Returns:
         Selectivity object
     """
+    filter_infos = list(filter_infos)
+
     # Group filters by field
     # TODO this is already computed in QueryPlanningAnalysis.single_field_filters
     single_field_filters: Dict[str, Set[FilterInfo]] = {}
@@ -448,10 +490,28 @@ def get_selectivity_of_filters_at_vertex(
                     [selectivity_at_field, selectivity]
                 )
 
+        # Process has_edge_degree filters, whose field is the vertex field whose edges are counted
+        for filter_info in filters_on_field:
+            if filter_info.op_name == "has_edge_degree":
+                selectivity = _estimate_filter_selectivity_of_has_edge_degree(
+                    schema_info, location_name, filter_info, parameters
+                )
+                selectivity_at_field = _combine_filter_selectivities(
+                    [selectivity_at_field, selectivity]
+                )
+
         selectivities.append(selectivity_at_field)
 
     # Combine selectivities
     combined_selectivity = _combine_filter_selectivities(selectivities)
+
+    # Correct for the errors observed in the past when estimating the selectivity of these filters.
+    if schema_info.cardinality_corrections is not None:
+        correction = schema_info.cardinality_corrections.get_filter_correction(
+            location_name, filter_infos
+        )
+        combined_selectivity = _apply_filter_correction(combined_selectivity, correction)
+
     return combined_selectivity
 
 
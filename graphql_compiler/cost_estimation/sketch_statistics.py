@@ -0,0 +1,441 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Statistics backed by mergeable sketches, built incrementally from streams of data.
+
+LocalStatistics stores exact distinct value counts, quantile lists and sampled value counts,
+whose size grows with the number of distinct values in the database. SketchStatistics instead
+summarizes the values of each property field with fixed-size sketches (see sketches.py):
+- a HyperLogLog sketch estimates the distinct value count of the field,
+- a CountMinSketch estimates the value counts of the field, and
+- a TDigest sketch estimates the quantiles of Int, Date and DateTime fields.
+
+The statistics are built by streaming the data into them, e.g. one vertex at a time. Statistics
+built separately, e.g. by workers reading different parts of the database, can be merged, and
+shared in a compact binary serialization.
+"""
+import datetime
+import struct
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .int_value_conversion import DATETIME_EPOCH_TZ_NAIVE
+from .sketches import CountMinSketch, HyperLogLog, TDigest
+from .statistics import Statistics
+
+
+# Serialization format version. Incremented whenever the format of the statistics changes.
+_SKETCH_STATISTICS_FORMAT_VERSION = 1
+_SKETCH_STATISTICS_MAGIC = b"GCSS"
+
+# magic, format version, HyperLogLog precision, CountMinSketch width and depth,
+# TDigest compression, quantile count
+_SKETCH_STATISTICS_HEADER = struct.Struct("<4sBBIIdI")
+_LENGTH = struct.Struct("<I")
+_COUNT = struct.Struct("<Q")
+_QUANTILE_VALUE_KIND = struct.Struct("<B")
+
+# The kinds of values a field can have, and whether their quantiles are estimated.
+# Values of each kind with quantiles are represented as numbers in the TDigest sketch.
+_UNORDERED_VALUE_KIND = 0
+_INT_VALUE_KIND = 1
+_DATE_VALUE_KIND = 2
+_DATETIME_VALUE_KIND = 3
+
+
+def _get_value_kind(value: Any) -> int:
+    """Return the kind of the field value."""
+    # Checks are ordered so that subclasses are checked before their superclasses.
+    if isinstance(value, bool):
+        return _UNORDERED_VALUE_KIND
+    elif isinstance(value, int):
+        return _INT_VALUE_KIND
+    elif isinstance(value, datetime.datetime):
+        return _DATETIME_VALUE_KIND
+    elif isinstance(value, datetime.date):
+        return _DATE_VALUE_KIND
+    else:
+        return _UNORDERED_VALUE_KIND
+
+
+def _convert_value_to_number(value_kind: int, value: Any) -> float:
+    """Return the number representing the field value in a TDigest sketch."""
+    if value_kind == _INT_VALUE_KIND:
+        return float(value)
+    elif value_kind == _DATE_VALUE_KIND:
+        return float(value.toordinal())
+    elif value_kind == _DATETIME_VALUE_KIND:
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return float((value - DATETIME_EPOCH_TZ_NAIVE) // datetime.timedelta(microseconds=1))
+    else:
+        raise AssertionError(f"Unexpected kind {value_kind} of value {value} with quantiles.")
+
+
+def _convert_number_to_value(value_kind: int, number: float) -> Any:
+    """Return the field value represented by the number in a TDigest sketch."""
+    int_value = int(round(number))
+    if value_kind == _INT_VALUE_KIND:
+        return int_value
+    elif value_kind == _DATE_VALUE_KIND:
+        return datetime.date.fromordinal(int_value)
+    elif value_kind == _DATETIME_VALUE_KIND:
+        return DATETIME_EPOCH_TZ_NAIVE + datetime.timedelta(microseconds=int_value)
+    else:
+        raise AssertionError(f"Unexpected kind {value_kind} of number {number} with quantiles.")
+
+
+def _pack_string(string: str) -> bytes:
+    """Return the binary serialization of the string, prefixed with its length."""
+    return _pack_blob(string.encode("utf-8"))
+
+
+def _pack_blob(blob: bytes) -> bytes:
+    """Return the bytes, prefixed with their length."""
+    return _LENGTH.pack(len(blob)) + blob
+
+
+class _ByteReader(object):
+    """Reader of the values serialized in a byte string, in order."""
+
+    def __init__(self, data: bytes) -> None:
+        """Start reading at the beginning of the data."""
+        self._data = memoryview(data)
+        self._offset = 0
+
+    def read_struct(self, struct_format: struct.Struct) -> Tuple[Any, ...]:
+        """Read the values serialized with the given struct format."""
+        values = struct_format.unpack_from(self._data, self._offset)
+        self._offset += struct_format.size
+        return values
+
+    def read_count(self) -> int:
+        """Read a count serialized as an unsigned 64-bit int."""
+        return self.read_struct(_COUNT)[0]
+
+    def read_blob(self) -> bytes:
+        """Read bytes serialized with _pack_blob()."""
+        (length,) = self.read_struct(_LENGTH)
+        if self._offset + length > len(self._data):
+            raise ValueError("Unexpected end of serialized SketchStatistics.")
+        blob = bytes(self._data[self._offset : self._offset + length])
+        self._offset += length
+        return blob
+
+    def read_string(self) -> str:
+        """Read a string serialized with _pack_string()."""
+        return self.read_blob().decode("utf-8")
+
+    def check_at_end(self) -> None:
+        """Raise an error if there is unread data left."""
+        if self._offset != len(self._data):
+            raise ValueError(
+                f"Unexpected {len(self._data) - self._offset} bytes at the end of serialized "
+                f"SketchStatistics."
+            )
+
+
+class _FieldSketches(object):
+    """The sketches summarizing the values of a single property field."""
+
+    __slots__ = ("value_kind", "hyperloglog", "count_min_sketch", "t_digest")
+
+    def __init__(
+        self,
+        value_kind: int,
+        hyperloglog: HyperLogLog,
+        count_min_sketch: CountMinSketch,
+        t_digest: Optional[TDigest],
+    ) -> None:
+        """Create the sketches of a field whose values are of the given kind."""
+        self.value_kind = value_kind
+        self.hyperloglog = hyperloglog
+        self.count_min_sketch = count_min_sketch
+        self.t_digest = t_digest
+
+
+class SketchStatistics(Statistics):
+    """Statistics class that summarizes field values with mergeable sketches.
+
+    Distinct value counts, value counts and quantiles describe the field values added to the
+    statistics, and only describe the database if all of its values are added. Values are
+    identified by their repr(), so the values passed to get_value_count() must have the same
+    type as the values added to the statistics.
+    """
+
+    _class_counts: Dict[str, int]
+    _vertex_edge_vertex_counts: Dict[Tuple[str, str, str], int]
+    _field_sketches: Dict[Tuple[str, str], _FieldSketches]
+
+    def __init__(
+        self,
+        *,
+        hyperloglog_precision: int = 12,
+        count_min_sketch_width: int = 1024,
+        count_min_sketch_depth: int = 4,
+        t_digest_compression: float = 100.0,
+        quantile_count: int = 101,
+    ) -> None:
+        """Initialize empty statistics, whose sketches have the given parameters.
+
+        Args:
+            hyperloglog_precision: precision of the HyperLogLog sketches of distinct value
+                                   counts. Each sketch uses 2 ** precision bytes.
+            count_min_sketch_width: number of counters in each row of the CountMinSketch sketches
+                                    of value counts.
+            count_min_sketch_depth: number of rows of the CountMinSketch sketches of value counts.
+                                    Each sketch uses 8 * width * depth bytes.
+            t_digest_compression: compression of the TDigest sketches of quantiles. Each sketch
+                                  uses at most about 16 * compression bytes.
+            quantile_count: number of quantiles returned by get_field_quantiles(), at least 2.
+        """
+        if quantile_count < 2:
+            raise AssertionError(
+                f"The number of quantiles should be at least 2, but got {quantile_count}."
+            )
+        self.hyperloglog_precision = hyperloglog_precision
+        self.count_min_sketch_width = count_min_sketch_width
+        self.count_min_sketch_depth = count_min_sketch_depth
+        self.t_digest_compression = t_digest_compression
+        self.quantile_count = quantile_count
+
+        self._class_counts = {}
+        self._vertex_edge_vertex_counts = {}
+        self._field_sketches = {}
+
+    def _make_field_sketches(self, value_kind: int) -> _FieldSketches:
+        """Return empty sketches for a field with values of the given kind."""
+        if value_kind == _UNORDERED_VALUE_KIND:
+            t_digest = None
+        else:
+            t_digest = TDigest(self.t_digest_compression)
+        return _FieldSketches(
+            value_kind,
+            HyperLogLog(self.hyperloglog_precision),
+            CountMinSketch(self.count_min_sketch_width, self.count_min_sketch_depth),
+            t_digest,
+        )
+
+    def add_class_count(self, class_name: str, count: int = 1) -> None:
+        """Add the given number of instances of the vertex or edge class to its count."""
+        self._class_counts[class_name] = self._class_counts.get(class_name, 0) + count
+
+    def add_vertex_edge_vertex_count(
+        self,
+        vertex_source_class_name: str,
+        edge_class_name: str,
+        vertex_target_class_name: str,
+        count: int = 1,
+    ) -> None:
+        """Add the given number of edges between instances of the vertex classes to their count."""
+        statistic_key = (vertex_source_class_name, edge_class_name, vertex_target_class_name)
+        self._vertex_edge_vertex_counts[statistic_key] = (
+            self._vertex_edge_vertex_counts.get(statistic_key, 0) + count
+        )
+
+    def add_field_value(self, vertex_name: str, field_name: str, value: Any) -> None:
+        """Add a value of the vertex's property field to the sketches of the field.
+
+        Args:
+            vertex_name: name of a vertex defined in the GraphQL schema
+            field_name: name of a property field of the vertex
+            value: value of the field on one instance of the vertex. None values are ignored.
+                   All values of a field should have the same type.
+        """
+        if value is None:
+            return
+
+        value_kind = _get_value_kind(value)
+        statistic_key = (vertex_name, field_name)
+        field_sketches = self._field_sketches.get(statistic_key)
+        if field_sketches is None:
+            field_sketches = self._make_field_sketches(value_kind)
+            self._field_sketches[statistic_key] = field_sketches
+        elif field_sketches.value_kind != value_kind:
+            raise ValueError(
+                f"Field {vertex_name}.{field_name} has values of different types, "
+                f"including {value}."
+            )
+
+        field_sketches.hyperloglog.add(value)
+        field_sketches.count_min_sketch.add(value)
+        if field_sketches.t_digest is not None:
+            field_sketches.t_digest.add(_convert_value_to_number(value_kind, value))
+
+    def add_vertex(self, vertex_name: str, field_values: Mapping[str, Any]) -> None:
+        """Add an instance of the vertex, with the given property field values, to the statistics.
+
+        The instance is only counted as an instance of the given vertex class. Instances of
+        subclasses of the vertex class have to be counted separately with add_class_count().
+
+        Args:
+            vertex_name: name of a vertex defined in the GraphQL schema
+            field_values: the values of the property fields of the instance, by field name
+        """
+        self.add_class_count(vertex_name)
+        for field_name, value in field_values.items():
+            self.add_field_value(vertex_name, field_name, value)
+
+    def merge(self, other: "SketchStatistics") -> None:
+        """Update these statistics to also account for the data added to the other statistics.
+
+        Args:
+            other: statistics whose sketches have the same parameters as these statistics,
+                   built from data not added to these statistics.
+        """
+        if self.quantile_count != other.quantile_count:
+            raise ValueError(
+                f"Cannot merge SketchStatistics with different quantile counts: "
+                f"{self.quantile_count} and {other.quantile_count}."
+            )
+
+        for class_name, count in other._class_counts.items():
+            self.add_class_count(class_name, count)
+        for statistic_key, count in other._vertex_edge_vertex_counts.items():
+            self.add_vertex_edge_vertex_count(*statistic_key, count)
+
+        for (vertex_name, field_name), other_field_sketches in other._field_sketches.items():
+            field_sketches = self._field_sketches.get((vertex_name, field_name))
+            if field_sketches is None:
+                field_sketches = self._make_field_sketches(other_field_sketches.value_kind)
+                self._field_sketches[(vertex_name, field_name)] = field_sketches
+            elif field_sketches.value_kind != other_field_sketches.value_kind:
+                raise ValueError(
+                    f"Cannot merge the statistics of field {vertex_name}.{field_name}, since "
+                    f"its values have different types in the two statistics."
+                )
+
+            field_sketches.hyperloglog.merge(other_field_sketches.hyperloglog)
+            field_sketches.count_min_sketch.merge(other_field_sketches.count_min_sketch)
+            if field_sketches.t_digest is not None and other_field_sketches.t_digest is not None:
+                field_sketches.t_digest.merge(other_field_sketches.t_digest)
+
+    def to_bytes(self) -> bytes:
+        """Return the binary serialization of the statistics."""
+        chunks: List[bytes] = [
+            _SKETCH_STATISTICS_HEADER.pack(
+                _SKETCH_STATISTICS_MAGIC,
+                _SKETCH_STATISTICS_FORMAT_VERSION,
+                self.hyperloglog_precision,
+                self.count_min_sketch_width,
+                self.count_min_sketch_depth,
+                self.t_digest_compression,
+                self.quantile_count,
+            )
+        ]
+
+        chunks.append(_LENGTH.pack(len(self._class_counts)))
+        for class_name, count in sorted(self._class_counts.items()):
+            chunks.extend((_pack_string(class_name), _COUNT.pack(count)))
+
+        chunks.append(_LENGTH.pack(len(self._vertex_edge_vertex_counts)))
+        for statistic_key, count in sorted(self._vertex_edge_vertex_counts.items()):
+            chunks.extend(_pack_string(class_name) for class_name in statistic_key)
+            chunks.append(_COUNT.pack(count))
+
+        chunks.append(_LENGTH.pack(len(self._field_sketches)))
+        for (vertex_name, field_name), field_sketches in sorted(self._field_sketches.items()):
+            t_digest = field_sketches.t_digest
+            chunks.extend(
+                (
+                    _pack_string(vertex_name),
+                    _pack_string(field_name),
+                    _QUANTILE_VALUE_KIND.pack(field_sketches.value_kind),
+                    _pack_blob(field_sketches.hyperloglog.to_bytes()),
+                    _pack_blob(field_sketches.count_min_sketch.to_bytes()),
+                    _pack_blob(b"" if t_digest is None else t_digest.to_bytes()),
+                )
+            )
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SketchStatistics":
+        """Return the statistics with the given binary serialization."""
+        reader = _ByteReader(data)
+        (
+            magic,
+            format_version,
+            hyperloglog_precision,
+            count_min_sketch_width,
+            count_min_sketch_depth,
+            t_digest_compression,
+            quantile_count,
+        ) = reader.read_struct(_SKETCH_STATISTICS_HEADER)
+        if magic != _SKETCH_STATISTICS_MAGIC:
+            raise ValueError("The data is not a serialization of SketchStatistics.")
+        if format_version != _SKETCH_STATISTICS_FORMAT_VERSION:
+            raise ValueError(
+                f"Cannot deserialize SketchStatistics with format version {format_version}. "
+                f"Only version {_SKETCH_STATISTICS_FORMAT_VERSION} is supported."
+            )
+        statistics = cls(
+            hyperloglog_precision=hyperloglog_precision,
+            count_min_sketch_width=count_min_sketch_width,
+            count_min_sketch_depth=count_min_sketch_depth,
+            t_digest_compression=t_digest_compression,
+            quantile_count=quantile_count,
+        )
+
+        (class_count_entries,) = reader.read_struct(_LENGTH)
+        for _ in range(class_count_entries):
+            class_name = reader.read_string()
+            statistics._class_counts[class_name] = reader.read_count()
+
+        (vertex_edge_vertex_count_entries,) = reader.read_struct(_LENGTH)
+        for _ in range(vertex_edge_vertex_count_entries):
+            statistic_key = (reader.read_string(), reader.read_string(), reader.read_string())
+            statistics._vertex_edge_vertex_counts[statistic_key] = reader.read_count()
+
+        (field_sketches_entries,) = reader.read_struct(_LENGTH)
+        for _ in range(field_sketches_entries):
+            statistic_key = (reader.read_string(), reader.read_string())
+            (value_kind,) = reader.read_struct(_QUANTILE_VALUE_KIND)
+            hyperloglog = HyperLogLog.from_bytes(reader.read_blob())
+            count_min_sketch = CountMinSketch.from_bytes(reader.read_blob())
+            t_digest_data = reader.read_blob()
+            t_digest = TDigest.from_bytes(t_digest_data) if t_digest_data else None
+            statistics._field_sketches[statistic_key] = _FieldSketches(
+                value_kind, hyperloglog, count_min_sketch, t_digest
+            )
+
+        reader.check_at_end()
+        return statistics
+
+    def get_class_count(self, class_name):
+        """See base class."""
+        return self._class_counts.get(class_name)
+
+    def get_vertex_edge_vertex_count(
+        self, vertex_source_class_name, edge_class_name, vertex_target_class_name
+    ):
+        """See base class."""
+        statistic_key = (vertex_source_class_name, edge_class_name, vertex_target_class_name)
+        return self._vertex_edge_vertex_counts.get(statistic_key)
+
+    def get_distinct_field_values_count(self, vertex_name, field_name):
+        """See base class."""
+        field_sketches = self._field_sketches.get((vertex_name, field_name))
+        if field_sketches is None:
+            return None
+        return max(1, int(round(field_sketches.hyperloglog.estimate())))
+
+    def get_field_quantiles(self, vertex_name, field_name):
+        """See base class."""
+        field_sketches = self._field_sketches.get((vertex_name, field_name))
+        if field_sketches is None or field_sketches.t_digest is None:
+            return None
+
+        last_index = self.quantile_count - 1
+        return [
+            _convert_number_to_value(
+                field_sketches.value_kind, field_sketches.t_digest.quantile(index / last_index)
+            )
+            for index in range(self.quantile_count)
+        ]
+
+    def get_value_count(self, vertex_name: str, field_name: str, value: Any) -> Optional[float]:
+        """See base class."""
+        field_sketches = self._field_sketches.get((vertex_name, field_name))
+        if field_sketches is None:
+            return None
+
+        # A count of zero means the value was never added. Like LocalStatistics, estimate that
+        # such values appear at least once, since the data may have changed in the meantime.
+        return float(max(1, field_sketches.count_min_sketch.estimate(value)))
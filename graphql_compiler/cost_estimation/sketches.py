@@ -0,0 +1,382 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Mergeable sketches summarizing streams of values in a small, fixed amount of memory.
+
+Each sketch can be updated one value at a time, merged with another sketch of the same shape
+built from a different part of the stream, and serialized to a compact binary representation:
+- HyperLogLog estimates the number of distinct values in the stream.
+- CountMinSketch estimates how many times each value appears in the stream. Its estimates are
+  never lower than the true counts.
+- TDigest estimates the quantiles of a stream of numbers, and is especially accurate close to
+  the minimum and maximum values.
+
+Values are identified by a hash of their repr(), so that sketches built in different processes
+can be merged. As a result, values of different types with the same repr() are not distinguished.
+"""
+from array import array
+import hashlib
+import math
+import struct
+import sys
+from typing import Any, List, Tuple
+
+
+# Serialization format versions. Incremented whenever the format of the sketch changes.
+_HYPERLOGLOG_FORMAT_VERSION = 1
+_COUNT_MIN_SKETCH_FORMAT_VERSION = 1
+_T_DIGEST_FORMAT_VERSION = 1
+
+_HYPERLOGLOG_HEADER = struct.Struct("<BB")  # format version, precision
+_COUNT_MIN_SKETCH_HEADER = struct.Struct("<BII")  # format version, width, depth
+_T_DIGEST_HEADER = struct.Struct("<BdddI")  # format version, compression, min, max, centroids
+_T_DIGEST_CENTROID = struct.Struct("<dd")  # mean, weight
+
+_MIN_HYPERLOGLOG_PRECISION = 4
+_MAX_HYPERLOGLOG_PRECISION = 16
+
+# Number of values the TDigest buffers before merging them into its centroids,
+# as a multiple of its compression.
+_T_DIGEST_BUFFER_SIZE_FACTOR = 5
+
+
+def hash_value(value: Any) -> bytes:
+    """Return a 128-bit hash of the value that is the same in all processes."""
+    return hashlib.blake2b(repr(value).encode("utf-8"), digest_size=16).digest()
+
+
+def _check_format_version(sketch_name: str, format_version: int, expected_version: int) -> None:
+    """Raise an error if the serialized sketch uses an unsupported format version."""
+    if format_version != expected_version:
+        raise ValueError(
+            f"Cannot deserialize {sketch_name} with format version {format_version}. "
+            f"Only version {expected_version} is supported."
+        )
+
+
+class HyperLogLog(object):
+    """Sketch estimating the number of distinct values in a stream.
+
+    The relative error of the estimate is about 1.04 / sqrt(2 ** precision). The sketch uses
+    2 ** precision bytes of memory.
+    """
+
+    __slots__ = ("precision", "_registers")
+
+    def __init__(self, precision: int = 12) -> None:
+        """Create an empty sketch with the given precision, between 4 and 16 inclusive."""
+        if not _MIN_HYPERLOGLOG_PRECISION <= precision <= _MAX_HYPERLOGLOG_PRECISION:
+            raise ValueError(
+                f"HyperLogLog precision must be between {_MIN_HYPERLOGLOG_PRECISION} and "
+                f"{_MAX_HYPERLOGLOG_PRECISION}, but got {precision}."
+            )
+        self.precision = precision
+        self._registers = bytearray(2 ** precision)
+
+    def add(self, value: Any) -> None:
+        """Add the value to the sketch."""
+        value_hash = int.from_bytes(hash_value(value)[:8], "little")
+        remaining_bits = 64 - self.precision
+        register_index = value_hash >> remaining_bits
+        remaining_hash = value_hash & ((1 << remaining_bits) - 1)
+        # The position of the leftmost 1 bit among the remaining bits, counting from 1.
+        rank = remaining_bits - remaining_hash.bit_length() + 1
+        if rank > self._registers[register_index]:
+            self._registers[register_index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Update this sketch to also account for the values added to the other sketch."""
+        if self.precision != other.precision:
+            raise ValueError(
+                f"Cannot merge HyperLogLog sketches with different precisions: "
+                f"{self.precision} and {other.precision}."
+            )
+        self._registers = bytearray(
+            max(register, other_register)
+            for register, other_register in zip(self._registers, other._registers)
+        )
+
+    def estimate(self) -> float:
+        """Return the estimated number of distinct values added to the sketch."""
+        register_count = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / register_count)
+        raw_estimate = (
+            alpha
+            * register_count
+            * register_count
+            / sum(2.0 ** -register for register in self._registers)
+        )
+
+        empty_register_count = self._registers.count(0)
+        if raw_estimate <= 2.5 * register_count and empty_register_count > 0:
+            # For small cardinalities, counting the empty registers is more accurate.
+            return register_count * math.log(float(register_count) / empty_register_count)
+        return raw_estimate
+
+    def to_bytes(self) -> bytes:
+        """Return the binary serialization of the sketch."""
+        header = _HYPERLOGLOG_HEADER.pack(_HYPERLOGLOG_FORMAT_VERSION, self.precision)
+        return header + bytes(self._registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        """Return the sketch with the given binary serialization."""
+        format_version, precision = _HYPERLOGLOG_HEADER.unpack_from(data)
+        _check_format_version("HyperLogLog", format_version, _HYPERLOGLOG_FORMAT_VERSION)
+        sketch = cls(precision)
+        registers = data[_HYPERLOGLOG_HEADER.size :]
+        if len(registers) != len(sketch._registers):
+            raise ValueError(
+                f"Expected {len(sketch._registers)} HyperLogLog registers, got {len(registers)}."
+            )
+        sketch._registers = bytearray(registers)
+        return sketch
+
+
+class CountMinSketch(object):
+    """Sketch estimating how many times each value appears in a stream.
+
+    With N values in the stream, each estimate exceeds the true count by at most
+    e * N / width with probability at least 1 - exp(-depth). The sketch uses
+    8 * width * depth bytes of memory.
+    """
+
+    __slots__ = ("width", "depth", "_counters")
+
+    def __init__(self, width: int = 1024, depth: int = 4) -> None:
+        """Create an empty sketch with the given number of counters per row, and of rows."""
+        if width < 1 or depth < 1:
+            raise ValueError(
+                f"CountMinSketch width and depth must be positive, but got {width} and {depth}."
+            )
+        self.width = width
+        self.depth = depth
+        self._counters = array("Q", bytes(8 * width * depth))
+
+    def _get_counter_indexes(self, value: Any) -> List[int]:
+        """Return the index of the counter for the value in each row."""
+        value_hash = hash_value(value)
+        first_hash = int.from_bytes(value_hash[:8], "little")
+        second_hash = int.from_bytes(value_hash[8:], "little")
+        # Double hashing is as good as using an independent hash function for each row.
+        return [
+            row * self.width + (first_hash + row * second_hash) % self.width
+            for row in range(self.depth)
+        ]
+
+    def add(self, value: Any, count: int = 1) -> None:
+        """Add the given number of occurrences of the value to the sketch."""
+        for counter_index in self._get_counter_indexes(value):
+            self._counters[counter_index] += count
+
+    def merge(self, other: "CountMinSketch") -> None:
+        """Update this sketch to also account for the values added to the other sketch."""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError(
+                f"Cannot merge CountMinSketch sketches with different shapes: "
+                f"{(self.width, self.depth)} and {(other.width, other.depth)}."
+            )
+        self._counters = array(
+            "Q",
+            (
+                counter + other_counter
+                for counter, other_counter in zip(self._counters, other._counters)
+            ),
+        )
+
+    def estimate(self, value: Any) -> int:
+        """Return the estimated number of occurrences of the value added to the sketch."""
+        return min(
+            self._counters[counter_index] for counter_index in self._get_counter_indexes(value)
+        )
+
+    def to_bytes(self) -> bytes:
+        """Return the binary serialization of the sketch."""
+        header = _COUNT_MIN_SKETCH_HEADER.pack(
+            _COUNT_MIN_SKETCH_FORMAT_VERSION, self.width, self.depth
+        )
+        counters = array("Q", self._counters)
+        if sys.byteorder != "little":
+            counters.byteswap()
+        return header + counters.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CountMinSketch":
+        """Return the sketch with the given binary serialization."""
+        format_version, width, depth = _COUNT_MIN_SKETCH_HEADER.unpack_from(data)
+        _check_format_version("CountMinSketch", format_version, _COUNT_MIN_SKETCH_FORMAT_VERSION)
+        sketch = cls(width, depth)
+        counters = array("Q")
+        counters.frombytes(data[_COUNT_MIN_SKETCH_HEADER.size :])
+        if sys.byteorder != "little":
+            counters.byteswap()
+        if len(counters) != width * depth:
+            raise ValueError(
+                f"Expected {width * depth} CountMinSketch counters, got {len(counters)}."
+            )
+        sketch._counters = counters
+        return sketch
+
+
+class TDigest(object):
+    """Sketch estimating the quantiles of a stream of numbers.
+
+    The numbers are summarized by centroids, i.e. (mean, weight) pairs, each of which stands for
+    a number of consecutive values in sorted order. Centroids close to the minimum and maximum
+    stand for fewer values than the ones in the middle, so extreme quantiles are more accurate.
+    Higher compression values use more centroids for more accurate estimates. There are at most
+    about compression centroids.
+
+    See Dunning and Ertl, "Computing extremely accurate quantiles using t-digests".
+    """
+
+    __slots__ = ("compression", "min_value", "max_value", "_centroids", "_buffer")
+
+    def __init__(self, compression: float = 100.0) -> None:
+        """Create an empty sketch with the given compression."""
+        if compression < 1:
+            raise ValueError(f"TDigest compression must be at least 1, but got {compression}.")
+        self.compression = compression
+        self.min_value = math.inf
+        self.max_value = -math.inf
+        self._centroids: List[Tuple[float, float]] = []
+        self._buffer: List[Tuple[float, float]] = []
+
+    @property
+    def total_weight(self) -> float:
+        """Return the number of values added to the sketch."""
+        return sum(weight for _, weight in self._centroids) + sum(
+            weight for _, weight in self._buffer
+        )
+
+    def _get_scale(self, quantile: float) -> float:
+        """Return the value of the k_1 scale function of the t-digest paper at the quantile."""
+        return self.compression / (2 * math.pi) * math.asin(2 * quantile - 1)
+
+    def _get_inverse_scale(self, scale: float) -> float:
+        """Return the quantile at which the k_1 scale function has the given value."""
+        return (math.sin(scale * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self) -> None:
+        """Merge the buffered values into the centroids."""
+        if not self._buffer:
+            return
+
+        points = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        total_weight = sum(weight for _, weight in points)
+
+        centroids = []
+        current_mean, current_weight = points[0]
+        merged_weight = 0.0
+        quantile_limit = self._get_inverse_scale(self._get_scale(0.0) + 1)
+        for mean, weight in points[1:]:
+            if (merged_weight + current_weight + weight) / total_weight <= quantile_limit:
+                # Merge the point into the current centroid, computing the mean incrementally.
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                centroids.append((current_mean, current_weight))
+                merged_weight += current_weight
+                quantile_limit = self._get_inverse_scale(
+                    self._get_scale(merged_weight / total_weight) + 1
+                )
+                current_mean, current_weight = mean, weight
+        centroids.append((current_mean, current_weight))
+        self._centroids = centroids
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        """Add the value to the sketch, with the given weight."""
+        self._buffer.append((float(value), float(weight)))
+        self.min_value = min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+        if len(self._buffer) >= _T_DIGEST_BUFFER_SIZE_FACTOR * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        """Update this sketch to also account for the values added to the other sketch."""
+        self._buffer.extend(other._centroids)
+        self._buffer.extend(other._buffer)
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self._compress()
+
+    def quantile(self, quantile: float) -> float:
+        """Return the estimated value below which the given fraction of values in the sketch are.
+
+        Args:
+            quantile: fraction between 0 and 1 inclusive
+
+        Returns:
+            estimated value at the quantile, between the minimum and maximum value added
+        """
+        if not 0 <= quantile <= 1:
+            raise ValueError(f"Expected a quantile between 0 and 1, but got {quantile}.")
+        self._compress()
+        if not self._centroids:
+            raise ValueError("Cannot estimate the quantiles of an empty TDigest.")
+
+        total_weight = self.total_weight
+        target_weight = quantile * total_weight
+
+        # Each centroid's mean is assumed to be at the middle of the weight it stands for,
+        # and values are interpolated linearly between the means of consecutive centroids.
+        first_mean, first_weight = self._centroids[0]
+        if target_weight < first_weight / 2:
+            return self.min_value + (first_mean - self.min_value) * target_weight / (
+                first_weight / 2
+            )
+
+        last_mean, last_weight = self._centroids[-1]
+        if target_weight > total_weight - last_weight / 2:
+            remaining_weight = total_weight - target_weight
+            return self.max_value - (self.max_value - last_mean) * remaining_weight / (
+                last_weight / 2
+            )
+
+        cumulative_weight = first_weight / 2
+        for (mean, weight), (next_mean, next_weight) in zip(self._centroids, self._centroids[1:]):
+            weight_between_means = (weight + next_weight) / 2
+            if target_weight <= cumulative_weight + weight_between_means:
+                fraction = (target_weight - cumulative_weight) / weight_between_means
+                return mean + (next_mean - mean) * fraction
+            cumulative_weight += weight_between_means
+        return last_mean
+
+    def to_bytes(self) -> bytes:
+        """Return the binary serialization of the sketch."""
+        self._compress()
+        header = _T_DIGEST_HEADER.pack(
+            _T_DIGEST_FORMAT_VERSION,
+            self.compression,
+            self.min_value,
+            self.max_value,
+            len(self._centroids),
+        )
+        return header + b"".join(
+            _T_DIGEST_CENTROID.pack(mean, weight) for mean, weight in self._centroids
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        """Return the sketch with the given binary serialization."""
+        (
+            format_version,
+            compression,
+            min_value,
+            max_value,
+            centroid_count,
+        ) = _T_DIGEST_HEADER.unpack_from(data)
+        _check_format_version("TDigest", format_version, _T_DIGEST_FORMAT_VERSION)
+        expected_size = _T_DIGEST_HEADER.size + centroid_count * _T_DIGEST_CENTROID.size
+        if len(data) != expected_size:
+            raise ValueError(f"Expected {expected_size} bytes of TDigest data, got {len(data)}.")
+
+        sketch = cls(compression)
+        sketch.min_value = min_value
+        sketch.max_value = max_value
+        sketch._centroids = [
+            _T_DIGEST_CENTROID.unpack_from(
+                data, _T_DIGEST_HEADER.size + index * _T_DIGEST_CENTROID.size
+            )
+            for index in range(centroid_count)
+        ]
+        return sketch
@@ -0,0 +1,375 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Collect the statistics used for cost estimation from a SQL database.
+
+Statistics are collected separately for each vertex table, and the tables are processed
+concurrently using a thread pool. For each table, the collector:
+- counts the rows in the table, which is the class count of its vertex type,
+- reads a bounded sample of the table's rows. Where the database supports it, the sample is
+  drawn with TABLESAMPLE, and is otherwise made up of the first rows a bounded scan returns,
+- estimates the distinct value counts, quantiles, and value counts of each property field from
+  the sample, and
+- estimates the number of rows joined via each vertex field of the table, by joining the sample
+  to the table at the other end of the vertex field. These are the vertex-edge-vertex counts.
+
+Estimates from a sample are exact whenever the sample contains the entire table.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import datetime
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from graphql import GraphQLInt, GraphQLInterfaceType, GraphQLObjectType
+import sqlalchemy
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.selectable import FromClause
+
+from ..compiler.helpers import (
+    INBOUND_EDGE_DIRECTION,
+    get_edge_direction_and_name,
+    strip_non_null_and_list_from_type,
+    strip_non_null_from_type,
+)
+from ..global_utils import is_same_type
+from ..schema import GraphQLDate, GraphQLDateTime, is_meta_field, is_vertex_field_name
+from ..schema.schema_info import DirectJoinDescriptor, JoinDescriptor, SQLAlchemySchemaInfo
+from .statistics import LocalStatistics, VertexSamplingSummary
+
+
+# Names of the dialects that support drawing samples using TABLESAMPLE.
+TABLESAMPLE_DIALECT_NAMES = frozenset({"mssql", "postgresql"})
+
+# The TABLESAMPLE percentage is increased by this factor over the expected fraction of rows
+# needed for a full sample, since TABLESAMPLE only returns approximately that fraction of rows.
+_TABLESAMPLE_OVERSAMPLING_FACTOR = 2.0
+
+# The seed of the TABLESAMPLE random number generator. Using the same seed when sampling a table
+# again returns the same sample, as long as the table is not modified in the meantime.
+_TABLESAMPLE_SEED = 0
+
+# Property field types whose values are ordered, and for which quantiles are collected.
+_QUANTILE_FIELD_TYPES = (GraphQLInt, GraphQLDate, GraphQLDateTime)
+
+# (vertex source class name, edge class name, vertex target class name)
+VertexEdgeVertex = Tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class _JoinedVertexField:
+    """A vertex field of a vertex type, whose vertex-edge-vertex count is to be estimated."""
+
+    vertex_edge_vertex: VertexEdgeVertex
+    destination_table: sqlalchemy.Table
+    join_descriptor: JoinDescriptor
+
+
+@dataclass
+class _VertexTableStatistics:
+    """Statistics collected from the table of a single vertex type."""
+
+    class_count: int
+    vertex_edge_vertex_counts: Dict[VertexEdgeVertex, int]
+    distinct_field_values_counts: Dict[str, int]
+    field_quantiles: Dict[str, List[Any]]
+    sampling_summary: Optional[VertexSamplingSummary]
+
+
+def _get_property_field_columns(
+    sql_schema_info: SQLAlchemySchemaInfo, vertex_name: str
+) -> Dict[str, sqlalchemy.Column]:
+    """Return the column of each property field of the vertex type, by field name."""
+    vertex_type = sql_schema_info.schema.get_type(vertex_name)
+    if not isinstance(vertex_type, (GraphQLInterfaceType, GraphQLObjectType)):
+        return {}
+
+    table = sql_schema_info.vertex_name_to_table[vertex_name]
+    return {
+        field_name: table.columns[field_name]
+        for field_name in sorted(vertex_type.fields)
+        if not is_vertex_field_name(field_name)
+        and not is_meta_field(field_name)
+        and field_name in table.columns
+    }
+
+
+def _get_joined_vertex_fields(
+    sql_schema_info: SQLAlchemySchemaInfo,
+) -> Dict[str, List[_JoinedVertexField]]:
+    """Return the vertex fields to join in order to count edges, by the name of their vertex type.
+
+    Each edge between two vertex types can be counted using either endpoint's vertex field.
+    Only one of the two is returned, so that each vertex-edge-vertex count is estimated once.
+    """
+    joined_vertex_fields: Dict[str, List[_JoinedVertexField]] = {}
+    seen_vertex_edge_vertices = set()
+    for vertex_name in sorted(sql_schema_info.vertex_name_to_table):
+        joined_vertex_fields[vertex_name] = []
+        vertex_type = sql_schema_info.schema.get_type(vertex_name)
+        if not isinstance(vertex_type, (GraphQLInterfaceType, GraphQLObjectType)):
+            continue
+
+        join_descriptors = sql_schema_info.join_descriptors.get(vertex_name, {})
+        for vertex_field_name, join_descriptor in sorted(join_descriptors.items()):
+            field = vertex_type.fields.get(vertex_field_name)
+            if field is None:
+                continue
+            destination_name = strip_non_null_and_list_from_type(field.type).name
+            destination_table = sql_schema_info.vertex_name_to_table.get(destination_name)
+            if destination_table is None:
+                continue
+
+            edge_direction, edge_name = get_edge_direction_and_name(vertex_field_name)
+            if edge_direction == INBOUND_EDGE_DIRECTION:
+                vertex_edge_vertex = (destination_name, edge_name, vertex_name)
+            else:
+                vertex_edge_vertex = (vertex_name, edge_name, destination_name)
+            if vertex_edge_vertex in seen_vertex_edge_vertices:
+                continue
+            seen_vertex_edge_vertices.add(vertex_edge_vertex)
+
+            joined_vertex_fields[vertex_name].append(
+                _JoinedVertexField(vertex_edge_vertex, destination_table, join_descriptor)
+            )
+    return joined_vertex_fields
+
+
+def _get_join_condition(
+    source: FromClause, destination: FromClause, join_descriptor: JoinDescriptor
+) -> sqlalchemy.sql.ClauseElement:
+    """Return the condition joining the rows of source and destination along a vertex field."""
+    if isinstance(join_descriptor, DirectJoinDescriptor):
+        column_pairs = {(join_descriptor.from_column, join_descriptor.to_column)}
+    else:
+        column_pairs = join_descriptor.column_pairs
+    return sqlalchemy.and_(
+        *(
+            source.c[from_column] == destination.c[to_column]
+            for from_column, to_column in sorted(column_pairs)
+        )
+    )
+
+
+def _get_sample_query(
+    engine: Engine, table: sqlalchemy.Table, row_count: int, sample_size: int
+) -> sqlalchemy.sql.Select:
+    """Return a query selecting a sample of at most sample_size rows of the table."""
+    if row_count > sample_size and engine.dialect.name in TABLESAMPLE_DIALECT_NAMES:
+        sample_percentage = min(
+            100.0, 100.0 * _TABLESAMPLE_OVERSAMPLING_FACTOR * sample_size / row_count
+        )
+        sampled_table = sqlalchemy.tablesample(
+            table,
+            sqlalchemy.func.system(sample_percentage),
+            name="sampled_table",
+            seed=sqlalchemy.literal_column(str(_TABLESAMPLE_SEED)),
+        )
+    else:
+        # Without TABLESAMPLE, the rows are read with a scan bounded by the sample size.
+        sampled_table = table.alias("sampled_table")
+    return sqlalchemy.select([sampled_table]).limit(sample_size)
+
+
+def _normalize_quantile_value(field_type: Any, value: Any) -> Any:
+    """Return the value in the canonical representation expected by LocalStatistics quantiles."""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        if is_same_type(field_type, GraphQLDate):
+            # Date fields are sometimes stored in datetime columns.
+            value = value.date()
+    return value
+
+
+def _get_quantiles(sorted_values: List[Any], quantile_count: int) -> List[Any]:
+    """Return up to quantile_count values, evenly spaced within the sorted values."""
+    quantile_count = min(quantile_count, len(sorted_values))
+    last_index = len(sorted_values) - 1
+    return [
+        sorted_values[int(round(index * last_index / (quantile_count - 1)))]
+        for index in range(quantile_count)
+    ]
+
+
+def _estimate_distinct_values_count(
+    value_counts: Dict[Any, int], sample_count: int, row_count: int
+) -> int:
+    """Estimate the number of distinct values in the table, from their counts in the sample.
+
+    This uses the Guaranteed-Error Estimator of Charikar et al., "Towards estimation error
+    guarantees for distinct values": values seen more than once in the sample are assumed to
+    appear in the sample with all their distinct values, while each value seen once stands for
+    sqrt(row_count / sample_count) distinct values in the table.
+    """
+    if sample_count == row_count:
+        return len(value_counts)
+
+    values_seen_once = sum(1 for count in value_counts.values() if count == 1)
+    values_seen_more_than_once = len(value_counts) - values_seen_once
+    estimate = (
+        math.sqrt(float(row_count) / sample_count) * values_seen_once + values_seen_more_than_once
+    )
+    return int(round(min(max(estimate, len(value_counts)), row_count)))
+
+
+def _collect_vertex_table_statistics(
+    sql_schema_info: SQLAlchemySchemaInfo,
+    engine: Engine,
+    vertex_name: str,
+    joined_vertex_fields: List[_JoinedVertexField],
+    sample_size: int,
+    quantile_count: int,
+) -> _VertexTableStatistics:
+    """Collect the statistics of the table of a single vertex type."""
+    table = sql_schema_info.vertex_name_to_table[vertex_name]
+    property_field_columns = _get_property_field_columns(sql_schema_info, vertex_name)
+    vertex_type = sql_schema_info.schema.get_type(vertex_name)
+
+    with engine.connect() as connection:
+        count_query = sqlalchemy.select([sqlalchemy.func.count()]).select_from(table)
+        row_count = connection.execute(count_query).scalar()
+        if row_count == 0:
+            return _VertexTableStatistics(
+                class_count=0,
+                vertex_edge_vertex_counts={
+                    joined_vertex_field.vertex_edge_vertex: 0
+                    for joined_vertex_field in joined_vertex_fields
+                },
+                distinct_field_values_counts={},
+                field_quantiles={},
+                sampling_summary=None,
+            )
+
+        sample_query = _get_sample_query(engine, table, row_count, sample_size)
+        sample_rows = connection.execute(sample_query).fetchall()
+        sample_count = len(sample_rows)
+
+        # The sample is drawn again for each join, and the joined counts are scaled up from the
+        # sample to the entire table.
+        sample = sample_query.alias("sample")
+        vertex_edge_vertex_counts = {}
+        for joined_vertex_field in joined_vertex_fields:
+            destination = joined_vertex_field.destination_table.alias("destination")
+            join_condition = _get_join_condition(
+                sample, destination, joined_vertex_field.join_descriptor
+            )
+            joined_count_query = sqlalchemy.select([sqlalchemy.func.count()]).select_from(
+                sample.join(destination, join_condition)
+            )
+            joined_count = connection.execute(joined_count_query).scalar()
+            vertex_edge_vertex_counts[joined_vertex_field.vertex_edge_vertex] = int(
+                round(float(joined_count) * row_count / sample_count)
+            )
+
+    value_counts: Dict[str, Dict[Any, int]] = {}
+    distinct_field_values_counts: Dict[str, int] = {}
+    field_quantiles: Dict[str, List[Any]] = {}
+    for field_name in property_field_columns:
+        field_value_counts: Dict[Any, int] = {}
+        for row in sample_rows:
+            value = row[field_name]
+            if value is not None:
+                field_value_counts[value] = field_value_counts.get(value, 0) + 1
+        value_counts[field_name] = field_value_counts
+        distinct_field_values_counts[field_name] = _estimate_distinct_values_count(
+            field_value_counts, sample_count, row_count
+        )
+
+        field_type = strip_non_null_from_type(vertex_type.fields[field_name].type)
+        if any(is_same_type(field_type, quantile_type) for quantile_type in _QUANTILE_FIELD_TYPES):
+            sorted_values = sorted(
+                _normalize_quantile_value(field_type, value)
+                for value, count in field_value_counts.items()
+                for _ in range(count)
+            )
+            if len(sorted_values) >= 2:
+                field_quantiles[field_name] = _get_quantiles(sorted_values, quantile_count)
+
+    sampling_summary = VertexSamplingSummary(
+        vertex_name=vertex_name,
+        value_counts=value_counts,
+        sample_ratio=max(1, int(round(float(row_count) / sample_count))),
+    )
+    return _VertexTableStatistics(
+        class_count=row_count,
+        vertex_edge_vertex_counts=vertex_edge_vertex_counts,
+        distinct_field_values_counts=distinct_field_values_counts,
+        field_quantiles=field_quantiles,
+        sampling_summary=sampling_summary,
+    )
+
+
+def collect_sql_statistics(
+    sql_schema_info: SQLAlchemySchemaInfo,
+    engine: Engine,
+    *,
+    sample_size: int = 10000,
+    quantile_count: int = 100,
+    max_workers: int = 8,
+) -> LocalStatistics:
+    """Collect statistics for cost estimation from the database, using samples of each table.
+
+    The class count of each edge is the largest of its vertex-edge-vertex counts. Since class
+    counts include the instances of subclasses, the counts of an edge between the most general
+    vertex types it connects are the largest.
+
+    Args:
+        sql_schema_info: SQLAlchemySchemaInfo describing the tables of the vertex types, and how
+                         to join them along vertex fields
+        engine: engine connected to the database containing the tables. Each table is processed
+                using its own connection, so the engine's connection pool should allow
+                max_workers concurrent connections.
+        sample_size: maximum number of rows sampled from each table
+        quantile_count: maximum number of quantiles collected for each ordered property field
+        max_workers: maximum number of tables processed concurrently
+
+    Returns:
+        LocalStatistics with class counts, vertex-edge-vertex counts, distinct field values
+        counts, field quantiles and sampling summaries for all vertex types with tables
+    """
+    if sample_size < 1:
+        raise AssertionError(f"Expected a positive sample size, but got {sample_size}.")
+    if quantile_count < 2:
+        raise AssertionError(f"Expected a quantile count of at least 2, but got {quantile_count}.")
+
+    joined_vertex_fields = _get_joined_vertex_fields(sql_schema_info)
+    vertex_names = sorted(sql_schema_info.vertex_name_to_table)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        vertex_table_statistics = list(
+            executor.map(
+                lambda vertex_name: _collect_vertex_table_statistics(
+                    sql_schema_info,
+                    engine,
+                    vertex_name,
+                    joined_vertex_fields[vertex_name],
+                    sample_size,
+                    quantile_count,
+                ),
+                vertex_names,
+            )
+        )
+
+    class_counts: Dict[str, int] = {}
+    vertex_edge_vertex_counts: Dict[VertexEdgeVertex, int] = {}
+    distinct_field_values_counts: Dict[Tuple[str, str], int] = {}
+    field_quantiles: Dict[Tuple[str, str], List[Any]] = {}
+    sampling_summaries: Dict[str, VertexSamplingSummary] = {}
+    for vertex_name, table_statistics in zip(vertex_names, vertex_table_statistics):
+        class_counts[vertex_name] = table_statistics.class_count
+        vertex_edge_vertex_counts.update(table_statistics.vertex_edge_vertex_counts)
+        for field_name, distinct_count in table_statistics.distinct_field_values_counts.items():
+            distinct_field_values_counts[(vertex_name, field_name)] = distinct_count
+        for field_name, quantiles in table_statistics.field_quantiles.items():
+            field_quantiles[(vertex_name, field_name)] = quantiles
+        if table_statistics.sampling_summary is not None:
+            sampling_summaries[vertex_name] = table_statistics.sampling_summary
+
+    for (_, edge_name, _), edge_count in vertex_edge_vertex_counts.items():
+        class_counts[edge_name] = max(class_counts.get(edge_name, 0), edge_count)
+
+    return LocalStatistics(
+        class_counts,
+        vertex_edge_vertex_counts=vertex_edge_vertex_counts,
+        distinct_field_values_counts=distinct_field_values_counts,
+        field_quantiles=field_quantiles,
+        sampling_summaries=sampling_summaries,
+    )
@@ -115,6 +115,28 @@ class Statistics(object):
         """
         return None
 
+    def get_edge_degree_quantiles(
+        self, vertex_name: str, vertex_field_name: str
+    ) -> Optional[List[int]]:
+        """Return a list dividing the vertices in equally-sized groups by their number of edges.
+
+        Edges are rarely distributed evenly among vertices, and most vertices of power-law graphs
+        have far fewer edges than average. This statistic helps estimate the result size of
+        @optional and @fold traversals and has_edge_degree filters, which are not determined by
+        the average number of edges per vertex alone.
+
+        Args:
+            vertex_name: name of a vertex defined in the GraphQL schema.
+            vertex_field_name: name of a vertex field of that vertex, e.g. "out_Animal_ParentOf".
+
+        Returns:
+            None or a sorted list of N quantiles of the number of edges each vertex has via the
+            vertex field, dividing the vertices into N-1 groups of almost equal size. Vertices
+            without any such edges have zero edges, and are included. The first element of the
+            list is the smallest known number of edges, and the last element is the largest.
+        """
+        return None
+
     def get_value_count(self, vertex_name: str, field_name: str, value: Any) -> Optional[float]:
         """Return the estimated number of times the given value appears in the database.
 
@@ -139,6 +161,7 @@ class LocalStatistics(Statistics):
     _distinct_field_values_counts: Dict[Tuple[str, str], int]
     _field_quantiles: Dict[Tuple[str, str], List[Any]]
     _sampling_summaries: Dict[str, VertexSamplingSummary]
+    _edge_degree_quantiles: Dict[Tuple[str, str], List[int]]
 
     def __init__(
         self,
@@ -148,6 +171,7 @@ class LocalStatistics(Statistics):
         distinct_field_values_counts: Optional[Dict[Tuple[str, str], int]] = None,
         field_quantiles: Optional[Dict[Tuple[str, str], List[Any]]] = None,
         sampling_summaries: Optional[Dict[str, VertexSamplingSummary]] = None,
+        edge_degree_quantiles: Optional[Dict[Tuple[str, str], List[int]]] = None,
     ):
         """Initialize statistics with the given data.
 
@@ -170,6 +194,11 @@ class LocalStatistics(Statistics):
                              values. The number N can be different for each entry. N has to be at
                              least 2 for every entry present in the dict.
             sampling_summaries: optional SamplingSummaries for some classes
+            edge_degree_quantiles: optional dict, (str, str) -> list, mapping vertex class name
+                                   and vertex field name to a list of N quantiles of the number
+                                   of edges each vertex of the class has via the vertex field,
+                                   including vertices without such edges. N has to be at least
+                                   2 for every entry present in the dict.
 
         TODO(bojanserafimov): Enforce a canonical representation for quantile values and
                               sampling summaries. Datetimes should be in utc, decimals should
@@ -184,6 +213,8 @@ class LocalStatistics(Statistics):
             field_quantiles = dict()
         if sampling_summaries is None:
             sampling_summaries = dict()
+        if edge_degree_quantiles is None:
+            edge_degree_quantiles = dict()
 
         # Validate arguments
         for (vertex_name, field_name), quantile_list in six.iteritems(field_quantiles):
@@ -199,12 +230,24 @@ class LocalStatistics(Statistics):
                             f"Range reasoning for tz-aware datetimes is not implemented. "
                             f"found tz-aware quantiles for {vertex_name}.{field_name}."
                         )
+        for (vertex_name, vertex_field_name), degree_quantiles in edge_degree_quantiles.items():
+            if len(degree_quantiles) < 2:
+                raise AssertionError(
+                    f"The number of edge degree quantiles should be at least 2. Vertex field "
+                    f"{vertex_name}.{vertex_field_name} has {len(degree_quantiles)}."
+                )
+            if degree_quantiles[0] < 0 or sorted(degree_quantiles) != list(degree_quantiles):
+                raise AssertionError(
+                    f"Expected edge degree quantiles to be sorted and non-negative. Vertex field "
+                    f"{vertex_name}.{vertex_field_name} has {degree_quantiles}."
+                )
 
         self._class_counts = class_counts
         self._vertex_edge_vertex_counts = vertex_edge_vertex_counts
         self._distinct_field_values_counts = distinct_field_values_counts
         self._field_quantiles = field_quantiles
         self._sampling_summaries = sampling_summaries
+        self._edge_degree_quantiles = edge_degree_quantiles
 
     def get_class_count(self, class_name):
         """See base class."""
@@ -227,6 +270,13 @@ class LocalStatistics(Statistics):
         statistic_key = (vertex_name, field_name)
         return self._field_quantiles.get(statistic_key)
 
+    def get_edge_degree_quantiles(
+        self, vertex_name: str, vertex_field_name: str
+    ) -> Optional[List[int]]:
+        """See base class."""
+        statistic_key = (vertex_name, vertex_field_name)
+        return self._edge_degree_quantiles.get(statistic_key)
+
     def get_value_count(self, vertex_name: str, field_name: str, value: Any) -> Optional[float]:
         """See base class."""
         vertex_sampling_summary = self._sampling_summaries.get(vertex_name)
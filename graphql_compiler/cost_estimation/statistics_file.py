@@ -0,0 +1,419 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Statistics file format that can be memory-mapped and shared by many processes.
+
+Each process holding its own LocalStatistics object pays for its own copy of the statistics.
+Statistics files instead store the statistics as sorted tables, that MappedStatistics reads
+directly from a read-only memory map of the file. All processes mapping the same file share
+the same physical memory, and only the parts of the file that are used are ever read.
+
+Each table maps keys to values, both of which are byte strings. The file consists of:
+- a header, with the file format version and the version of the statistics in the file,
+- the offsets of the tables in the file, and
+- the tables. Each table starts with its number of entries, followed by the start and end
+  offsets of each key and value, and then the keys and values themselves. Entries are sorted
+  by key, so a value is found with a binary search over the keys.
+
+Statistics files are published atomically: write_statistics_file() writes the file under a
+temporary name, and then renames it to its final path. Processes using MappedStatistics can
+then switch to the new version of the statistics by calling refresh().
+"""
+import bisect
+import datetime
+import decimal
+import math
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .int_value_conversion import DATETIME_EPOCH_TZ_NAIVE
+from .statistics import Statistics, VertexSamplingSummary
+
+
+# Version of the file format. Incremented whenever the format changes.
+STATISTICS_FILE_FORMAT_VERSION = 1
+_STATISTICS_FILE_MAGIC = b"GCSF"
+
+# magic, file format version, statistics version, table count
+_HEADER = struct.Struct("<4sHQI")
+_OFFSET = struct.Struct("<Q")
+_OFFSET_PAIR = struct.Struct("<QQ")
+_COUNT = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+_VALUE_TAG = struct.Struct("<B")
+_INT64 = struct.Struct("<q")
+_FLOAT64 = struct.Struct("<d")
+
+# The tables in a statistics file, in order.
+_CLASS_COUNTS_TABLE = 0
+_VERTEX_EDGE_VERTEX_COUNTS_TABLE = 1
+_DISTINCT_FIELD_VALUES_COUNTS_TABLE = 2
+_FIELD_QUANTILES_TABLE = 3
+_SAMPLE_RATIOS_TABLE = 4
+_VALUE_COUNTS_TABLE = 5
+_TABLE_COUNT = 6
+
+# Tags identifying the type of each serialized field value.
+_INT_TAG = 0
+_FLOAT_TAG = 1
+_DATE_TAG = 2
+_DATETIME_TAG = 3
+_STRING_TAG = 4
+_BOOL_TAG = 5
+_DECIMAL_TAG = 6
+
+
+def _encode_key(names: Sequence[str]) -> bytes:
+    """Return the table key of the tuple of names."""
+    encoded_names = []
+    for name in names:
+        if "\x00" in name:
+            raise AssertionError(f"Names in statistics files cannot contain NUL: {name}")
+        encoded_names.append(name.encode("utf-8"))
+    return b"\x00".join(encoded_names) + b"\x00"
+
+
+def _encode_value(value: Any) -> Optional[bytes]:
+    """Return the serialization of the field value, or None if its type is not supported."""
+    # Checks are ordered so that subclasses are checked before their superclasses.
+    if isinstance(value, bool):
+        return _VALUE_TAG.pack(_BOOL_TAG) + _VALUE_TAG.pack(value)
+    elif isinstance(value, int):
+        return _VALUE_TAG.pack(_INT_TAG) + _INT64.pack(value)
+    elif isinstance(value, float):
+        return _VALUE_TAG.pack(_FLOAT_TAG) + _FLOAT64.pack(value)
+    elif isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            raise NotImplementedError(
+                f"Statistics files do not support tz-aware datetimes, but got {value}."
+            )
+        microseconds = (value - DATETIME_EPOCH_TZ_NAIVE) // datetime.timedelta(microseconds=1)
+        return _VALUE_TAG.pack(_DATETIME_TAG) + _INT64.pack(microseconds)
+    elif isinstance(value, datetime.date):
+        return _VALUE_TAG.pack(_DATE_TAG) + _INT64.pack(value.toordinal())
+    elif isinstance(value, str):
+        encoded_string = value.encode("utf-8")
+        return _VALUE_TAG.pack(_STRING_TAG) + _LENGTH.pack(len(encoded_string)) + encoded_string
+    elif isinstance(value, decimal.Decimal):
+        # Equal decimals have the same normalized representation.
+        encoded_decimal = str(value.normalize()).encode("ascii")
+        return _VALUE_TAG.pack(_DECIMAL_TAG) + _LENGTH.pack(len(encoded_decimal)) + encoded_decimal
+    else:
+        return None
+
+
+def _decode_value(buffer: Any, offset: int) -> Tuple[Any, int]:
+    """Return the field value serialized at the offset in the buffer, and the offset after it."""
+    (tag,) = _VALUE_TAG.unpack_from(buffer, offset)
+    offset += _VALUE_TAG.size
+    if tag == _BOOL_TAG:
+        (bool_value,) = _VALUE_TAG.unpack_from(buffer, offset)
+        return bool(bool_value), offset + _VALUE_TAG.size
+    elif tag in (_INT_TAG, _DATE_TAG, _DATETIME_TAG):
+        (int_value,) = _INT64.unpack_from(buffer, offset)
+        offset += _INT64.size
+        if tag == _DATE_TAG:
+            return datetime.date.fromordinal(int_value), offset
+        elif tag == _DATETIME_TAG:
+            return DATETIME_EPOCH_TZ_NAIVE + datetime.timedelta(microseconds=int_value), offset
+        return int_value, offset
+    elif tag == _FLOAT_TAG:
+        (float_value,) = _FLOAT64.unpack_from(buffer, offset)
+        return float_value, offset + _FLOAT64.size
+    elif tag in (_STRING_TAG, _DECIMAL_TAG):
+        (length,) = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        string_value = bytes(buffer[offset : offset + length]).decode("utf-8")
+        offset += length
+        if tag == _DECIMAL_TAG:
+            return decimal.Decimal(string_value), offset
+        return string_value, offset
+    else:
+        raise AssertionError(f"Unexpected value tag {tag} in statistics file.")
+
+
+def _encode_supported_value(value: Any) -> bytes:
+    """Return the serialization of the field value, raising an error if it is not supported."""
+    encoded_value = _encode_value(value)
+    if encoded_value is None:
+        raise NotImplementedError(
+            f"Statistics files do not support values of type {type(value).__name__}: {value}"
+        )
+    return encoded_value
+
+
+def _encode_table(entries: Dict[bytes, bytes], table_offset: int) -> bytes:
+    """Return the serialization of the table with the given entries, starting at the offset."""
+    sorted_entries = sorted(entries.items())
+    entry_count = len(sorted_entries)
+    data_offset = table_offset + _COUNT.size + 2 * entry_count * _OFFSET_PAIR.size
+
+    key_offsets = []
+    for key, _ in sorted_entries:
+        key_offsets.append(_OFFSET_PAIR.pack(data_offset, data_offset + len(key)))
+        data_offset += len(key)
+    value_offsets = []
+    for _, value in sorted_entries:
+        value_offsets.append(_OFFSET_PAIR.pack(data_offset, data_offset + len(value)))
+        data_offset += len(value)
+
+    return b"".join(
+        [_COUNT.pack(entry_count)]
+        + key_offsets
+        + value_offsets
+        + [key for key, _ in sorted_entries]
+        + [value for _, value in sorted_entries]
+    )
+
+
+def write_statistics_file(
+    file_path: str,
+    statistics_version: int,
+    class_counts: Dict[str, int],
+    *,
+    vertex_edge_vertex_counts: Optional[Dict[Tuple[str, str, str], int]] = None,
+    distinct_field_values_counts: Optional[Dict[Tuple[str, str], int]] = None,
+    field_quantiles: Optional[Dict[Tuple[str, str], List[Any]]] = None,
+    sampling_summaries: Optional[Dict[str, VertexSamplingSummary]] = None,
+) -> None:
+    """Atomically write the statistics to a statistics file, replacing any existing file.
+
+    Processes already using a previous version of the file are not affected, and can switch to
+    the new version with MappedStatistics.refresh().
+
+    Args:
+        file_path: path of the statistics file
+        statistics_version: version of the statistics, reported by MappedStatistics.version
+        class_counts: see LocalStatistics
+        vertex_edge_vertex_counts: see LocalStatistics
+        distinct_field_values_counts: see LocalStatistics
+        field_quantiles: see LocalStatistics. Quantiles can be ints, floats, strings, dates and
+                         tz-naive datetimes.
+        sampling_summaries: see LocalStatistics. Sampled values can be bools, ints, floats,
+                            strings, decimals, dates and tz-naive datetimes.
+    """
+    if vertex_edge_vertex_counts is None:
+        vertex_edge_vertex_counts = dict()
+    if distinct_field_values_counts is None:
+        distinct_field_values_counts = dict()
+    if field_quantiles is None:
+        field_quantiles = dict()
+    if sampling_summaries is None:
+        sampling_summaries = dict()
+
+    tables: List[Dict[bytes, bytes]] = [dict() for _ in range(_TABLE_COUNT)]
+    for class_name, count in class_counts.items():
+        tables[_CLASS_COUNTS_TABLE][_encode_key((class_name,))] = _COUNT.pack(count)
+    for statistic_key, count in vertex_edge_vertex_counts.items():
+        tables[_VERTEX_EDGE_VERTEX_COUNTS_TABLE][_encode_key(statistic_key)] = _COUNT.pack(count)
+    for statistic_key, count in distinct_field_values_counts.items():
+        tables[_DISTINCT_FIELD_VALUES_COUNTS_TABLE][_encode_key(statistic_key)] = _COUNT.pack(count)
+    for (vertex_name, field_name), quantile_list in field_quantiles.items():
+        if len(quantile_list) < 2:
+            raise AssertionError(
+                f"The number of quantiles should be at least 2. Field "
+                f"{vertex_name}.{field_name} has {len(quantile_list)}."
+            )
+        tables[_FIELD_QUANTILES_TABLE][_encode_key((vertex_name, field_name))] = b"".join(
+            [_LENGTH.pack(len(quantile_list))]
+            + [_encode_supported_value(quantile) for quantile in quantile_list]
+        )
+    for vertex_name, sampling_summary in sampling_summaries.items():
+        for field_name, value_counts in sampling_summary.value_counts.items():
+            field_key = _encode_key((vertex_name, field_name))
+            tables[_SAMPLE_RATIOS_TABLE][field_key] = _COUNT.pack(sampling_summary.sample_ratio)
+            for value, count in value_counts.items():
+                value_key = field_key + _encode_supported_value(value)
+                tables[_VALUE_COUNTS_TABLE][value_key] = _COUNT.pack(count)
+
+    table_offset = _HEADER.size + _TABLE_COUNT * _OFFSET.size
+    table_offsets = []
+    encoded_tables = []
+    for table in tables:
+        encoded_table = _encode_table(table, table_offset)
+        table_offsets.append(_OFFSET.pack(table_offset))
+        encoded_tables.append(encoded_table)
+        table_offset += len(encoded_table)
+
+    header = _HEADER.pack(
+        _STATISTICS_FILE_MAGIC, STATISTICS_FILE_FORMAT_VERSION, statistics_version, _TABLE_COUNT
+    )
+
+    # The file is renamed to its final path only once it is complete, so that readers never
+    # see a partially written file.
+    directory = os.path.dirname(os.path.abspath(file_path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        # Temporary files are only readable by their owner by default.
+        os.fchmod(file_descriptor, 0o644)
+        with os.fdopen(file_descriptor, "wb") as temporary_file:
+            temporary_file.write(header)
+            temporary_file.writelines(table_offsets)
+            temporary_file.writelines(encoded_tables)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.replace(temporary_path, file_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+class _TableKeys(object):
+    """The sorted keys of a table in a mapped statistics file, read on demand.
+
+    Supports the sequence operations needed to binary search the keys with the bisect module.
+    """
+
+    def __init__(self, buffer: mmap.mmap, table_offset: int) -> None:
+        """Read the keys of the table starting at the offset in the buffer."""
+        self._buffer = buffer
+        (self._entry_count,) = _COUNT.unpack_from(buffer, table_offset)
+        self._key_offsets_offset = table_offset + _COUNT.size
+        self._value_offsets_offset = (
+            self._key_offsets_offset + self._entry_count * _OFFSET_PAIR.size
+        )
+
+    def __len__(self) -> int:
+        """Return the number of entries in the table."""
+        return self._entry_count
+
+    def __getitem__(self, index: int) -> bytes:
+        """Return the key at the given index."""
+        start, end = _OFFSET_PAIR.unpack_from(
+            self._buffer, self._key_offsets_offset + index * _OFFSET_PAIR.size
+        )
+        return self._buffer[start:end]
+
+    def find_value_offset(self, key: bytes) -> Optional[int]:
+        """Return the offset at which the value of the key starts, or None if it is missing."""
+        index = bisect.bisect_left(self, key)
+        if index == self._entry_count or self[index] != key:
+            return None
+        start, _ = _OFFSET_PAIR.unpack_from(
+            self._buffer, self._value_offsets_offset + index * _OFFSET_PAIR.size
+        )
+        return start
+
+
+class _StatisticsFileMapping(object):
+    """A read-only memory map of a statistics file."""
+
+    def __init__(self, file_path: str) -> None:
+        """Map the statistics file at the given path into memory."""
+        with open(file_path, "rb") as statistics_file:
+            file_stat = os.fstat(statistics_file.fileno())
+            self.file_identity = (file_stat.st_dev, file_stat.st_ino)
+            self.buffer = mmap.mmap(statistics_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.buffer) < _HEADER.size:
+            raise ValueError(f"The file {file_path} is not a statistics file.")
+        magic, format_version, self.statistics_version, table_count = _HEADER.unpack_from(
+            self.buffer
+        )
+        if magic != _STATISTICS_FILE_MAGIC:
+            raise ValueError(f"The file {file_path} is not a statistics file.")
+        if format_version != STATISTICS_FILE_FORMAT_VERSION or table_count != _TABLE_COUNT:
+            raise ValueError(
+                f"Cannot read statistics file {file_path} with format version {format_version}. "
+                f"Only version {STATISTICS_FILE_FORMAT_VERSION} is supported."
+            )
+
+        self.tables = []
+        for index in range(table_count):
+            (table_offset,) = _OFFSET.unpack_from(self.buffer, _HEADER.size + index * _OFFSET.size)
+            self.tables.append(_TableKeys(self.buffer, table_offset))
+
+    def get_count(self, table_index: int, key: bytes) -> Optional[int]:
+        """Return the count stored under the key in the table, or None if it is missing."""
+        value_offset = self.tables[table_index].find_value_offset(key)
+        if value_offset is None:
+            return None
+        return _COUNT.unpack_from(self.buffer, value_offset)[0]
+
+
+class MappedStatistics(Statistics):
+    """Statistics class that reads statistics from a memory-mapped statistics file.
+
+    Statistics are looked up in the file whenever they are requested, so the statistics are
+    never loaded into the memory of the process as a whole. The mapped file is shared with all
+    other processes mapping the same file.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """Map the statistics file at the given path, written with write_statistics_file()."""
+        self._file_path = file_path
+        self._mapping = _StatisticsFileMapping(file_path)
+
+    @property
+    def version(self) -> int:
+        """Return the version of the statistics currently in use."""
+        return self._mapping.statistics_version
+
+    def refresh(self) -> bool:
+        """Switch to the latest statistics file published at the file path, if it was replaced.
+
+        Lookups in progress in other threads complete using the previous version of the file,
+        which is unmapped once it is no longer used.
+
+        Returns:
+            True if the statistics were replaced with a newly published version of the file.
+        """
+        file_stat = os.stat(self._file_path)
+        if (file_stat.st_dev, file_stat.st_ino) == self._mapping.file_identity:
+            return False
+        self._mapping = _StatisticsFileMapping(self._file_path)
+        return True
+
+    def get_class_count(self, class_name):
+        """See base class."""
+        return self._mapping.get_count(_CLASS_COUNTS_TABLE, _encode_key((class_name,)))
+
+    def get_vertex_edge_vertex_count(
+        self, vertex_source_class_name, edge_class_name, vertex_target_class_name
+    ):
+        """See base class."""
+        statistic_key = (vertex_source_class_name, edge_class_name, vertex_target_class_name)
+        return self._mapping.get_count(_VERTEX_EDGE_VERTEX_COUNTS_TABLE, _encode_key(statistic_key))
+
+    def get_distinct_field_values_count(self, vertex_name, field_name):
+        """See base class."""
+        return self._mapping.get_count(
+            _DISTINCT_FIELD_VALUES_COUNTS_TABLE, _encode_key((vertex_name, field_name))
+        )
+
+    def get_field_quantiles(self, vertex_name, field_name):
+        """See base class."""
+        mapping = self._mapping
+        value_offset = mapping.tables[_FIELD_QUANTILES_TABLE].find_value_offset(
+            _encode_key((vertex_name, field_name))
+        )
+        if value_offset is None:
+            return None
+
+        (quantile_count,) = _LENGTH.unpack_from(mapping.buffer, value_offset)
+        value_offset += _LENGTH.size
+        quantiles = []
+        for _ in range(quantile_count):
+            quantile, value_offset = _decode_value(mapping.buffer, value_offset)
+            quantiles.append(quantile)
+        return quantiles
+
+    def get_value_count(self, vertex_name: str, field_name: str, value: Any) -> Optional[float]:
+        """See base class."""
+        # Lookups use a single version of the file, even if it is replaced in the meantime.
+        mapping = self._mapping
+        field_key = _encode_key((vertex_name, field_name))
+        sample_ratio = mapping.get_count(_SAMPLE_RATIOS_TABLE, field_key)
+        if sample_ratio is None:
+            return None
+
+        encoded_value = _encode_value(value)
+        sampled_value_count = None
+        if encoded_value is not None:
+            sampled_value_count = mapping.get_count(_VALUE_COUNTS_TABLE, field_key + encoded_value)
+        if sampled_value_count is not None:
+            return sampled_value_count * sample_ratio
+        else:
+            # See LocalStatistics.get_value_count() for the reasoning behind this estimate.
+            return max(1, math.sqrt(3 * sample_ratio))
@@ -0,0 +1,168 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Query admission control.
+
+Queries that are too expensive to execute can overload the database they run on, along with
+every other query sharing it. Database timeouts only stop such queries after they have
+already consumed a lot of the database's capacity. Admission control instead uses the cost
+estimates of a query to reject it before it is ever executed.
+
+Each tenant querying the database is subject to an AdmissionBudget, that limits the estimated
+number of rows a query may return, the estimated number of vertices and edges it may read, and
+the estimated number of vertices any of its @fold scopes may collect per result row. A query
+is admitted only if it is within all limits of the budget. Otherwise, each exceeded limit is
+reported as a QueryRejection, pointing at the vertex in the query most responsible for it.
+"""
+from typing import List, Tuple
+
+from ..compiler.helpers import FoldScopeLocation, get_edge_direction_and_name
+from ..cost_estimation.analysis import (
+    QueryPlanningAnalysis,
+    analyze_query_string,
+    get_location_vertex_path,
+)
+from ..cost_estimation.cardinality_estimator import TraversalStepCost
+from ..global_utils import QueryStringWithParameters
+from ..schema.schema_info import QueryPlanningSchemaInfo
+from .rejections import (
+    ExecutionCostOverBudget,
+    FoldFanOutOverBudget,
+    MissingStatistics,
+    QueryRejection,
+    ResultCardinalityOverBudget,
+)
+from .typedefs import AdmissionBudget, AdmissionPolicy  # noqa
+
+
+def _get_missing_statistics_rejections(
+    query_analysis: QueryPlanningAnalysis,
+) -> Tuple[QueryRejection, ...]:
+    """Return a rejection for each class in the query that does not have count statistics."""
+    classes_with_missing_counts = query_analysis.classes_with_missing_counts
+    if not classes_with_missing_counts:
+        return tuple()
+
+    rejections: List[QueryRejection] = []
+    reported_class_names = set()
+    for vertex_path, vertex_type in query_analysis.types.items():
+        class_names = [vertex_type.name]
+        if len(vertex_path) > 1:
+            _, edge_name = get_edge_direction_and_name(vertex_path[-1])
+            class_names.append(edge_name)
+        for class_name in class_names:
+            if class_name in classes_with_missing_counts and class_name not in reported_class_names:
+                reported_class_names.add(class_name)
+                rejections.append(MissingStatistics(vertex_path, class_name))
+    return tuple(rejections)
+
+
+def _get_fold_fan_outs(
+    step_costs: Tuple[TraversalStepCost, ...]
+) -> List[Tuple[float, FoldScopeLocation]]:
+    """Return the estimated fold fan-out at each location inside a fold, with its location."""
+    step_costs_by_location = {step_cost.location: step_cost for step_cost in step_costs}
+
+    fold_fan_outs = []
+    for step_cost in step_costs:
+        location = step_cost.location
+        if not isinstance(location, FoldScopeLocation):
+            continue
+
+        # The vertices collected at any location inside a fold are found by expanding the result
+        # sets reached before entering the fold, each of which becomes a single result row.
+        fold_root_location = FoldScopeLocation(location.base_location, location.fold_path[:1])
+        result_rows = step_costs_by_location[fold_root_location].parent_result_sets
+        if result_rows == 0:
+            fold_fan_out = 0.0
+        else:
+            fold_fan_out = step_cost.result_sets / result_rows
+        fold_fan_outs.append((fold_fan_out, location))
+    return fold_fan_outs
+
+
+def check_query_analysis_admission(
+    query_analysis: QueryPlanningAnalysis, budget: AdmissionBudget
+) -> Tuple[QueryRejection, ...]:
+    """Check whether the estimated costs of an analyzed query are within the given budget.
+
+    Args:
+        query_analysis: the query with any query analysis needed for estimating its costs
+        budget: the limits on the estimated costs of the query
+
+    Returns:
+        tuple of QueryRejection objects, one for each exceeded limit of the budget. Empty if
+        the query is admitted. If the costs of the query cannot be estimated due to missing
+        statistics, the query is rejected, with a MissingStatistics rejection for each class
+        with missing counts.
+    """
+    if budget.is_unlimited:
+        return tuple()
+
+    missing_statistics_rejections = _get_missing_statistics_rejections(query_analysis)
+    if missing_statistics_rejections:
+        return missing_statistics_rejections
+
+    step_costs = query_analysis.execution_cost_estimate.step_costs
+    rejections: List[QueryRejection] = []
+
+    if budget.max_result_cardinality is not None:
+        estimated_cardinality = query_analysis.cardinality_estimate
+        if estimated_cardinality > budget.max_result_cardinality:
+            largest_step_cost = max(step_costs, key=lambda step_cost: step_cost.result_sets)
+            rejections.append(
+                ResultCardinalityOverBudget(
+                    get_location_vertex_path(largest_step_cost.location),
+                    estimated_cardinality,
+                    budget.max_result_cardinality,
+                )
+            )
+
+    if budget.max_execution_cost is not None:
+        estimated_cost = query_analysis.execution_cost_estimate.total_reads
+        if estimated_cost > budget.max_execution_cost:
+            costliest_step_cost = max(
+                step_costs, key=lambda step_cost: step_cost.vertex_reads + step_cost.edge_reads
+            )
+            rejections.append(
+                ExecutionCostOverBudget(
+                    get_location_vertex_path(costliest_step_cost.location),
+                    estimated_cost,
+                    budget.max_execution_cost,
+                )
+            )
+
+    if budget.max_fold_fan_out is not None:
+        fold_fan_outs = _get_fold_fan_outs(step_costs)
+        if fold_fan_outs:
+            largest_fold_fan_out, location = max(fold_fan_outs, key=lambda item: item[0])
+            if largest_fold_fan_out > budget.max_fold_fan_out:
+                rejections.append(
+                    FoldFanOutOverBudget(
+                        get_location_vertex_path(location),
+                        largest_fold_fan_out,
+                        budget.max_fold_fan_out,
+                    )
+                )
+
+    return tuple(rejections)
+
+
+def check_query_admission(
+    schema_info: QueryPlanningSchemaInfo,
+    query: QueryStringWithParameters,
+    budget: AdmissionBudget,
+) -> Tuple[QueryRejection, ...]:
+    """Check whether the estimated costs of a query are within the given budget.
+
+    The query should be checked before it is compiled and handed to a backend for execution.
+    To check a query on behalf of a tenant, use the budget from AdmissionPolicy.get_budget().
+
+    Args:
+        schema_info: QueryPlanningSchemaInfo
+        query: the query string and parameters with which it will be executed
+        budget: the limits on the estimated costs of the query
+
+    Returns:
+        tuple of QueryRejection objects, one for each exceeded limit of the budget. Empty if
+        the query is admitted. See check_query_analysis_admission() for details.
+    """
+    return check_query_analysis_admission(analyze_query_string(schema_info, query), budget)
@@ -0,0 +1,68 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+from abc import ABC
+from dataclasses import dataclass, field
+
+from ..global_utils import VertexPath
+
+
+@dataclass
+class QueryRejection(ABC):
+    # The path to the vertex in the query that is most responsible for the rejection.
+    vertex_path: VertexPath
+
+    message: str = field(init=False)
+
+
+@dataclass
+class MissingStatistics(QueryRejection):
+    class_name: str
+
+    def __post_init__(self) -> None:
+        """Initialize a human-readable message."""
+        self.message = (
+            f"The cost of the query cannot be estimated without class count statistics for "
+            f"the vertices and edges it mentions. Class {self.class_name} at vertex "
+            f"{self.vertex_path} had no counts."
+        )
+
+
+@dataclass
+class ResultCardinalityOverBudget(QueryRejection):
+    estimated_cardinality: float
+    max_result_cardinality: float
+
+    def __post_init__(self) -> None:
+        """Initialize a human-readable message."""
+        self.message = (
+            f"The query is estimated to return {self.estimated_cardinality:.0f} rows, more "
+            f"than the budget of {self.max_result_cardinality:.0f}. Most intermediate results "
+            f"are produced at vertex {self.vertex_path}."
+        )
+
+
+@dataclass
+class ExecutionCostOverBudget(QueryRejection):
+    estimated_cost: float
+    max_execution_cost: float
+
+    def __post_init__(self) -> None:
+        """Initialize a human-readable message."""
+        self.message = (
+            f"The query is estimated to read {self.estimated_cost:.0f} vertices and edges, more "
+            f"than the budget of {self.max_execution_cost:.0f}. Most reads are made while "
+            f"traversing to vertex {self.vertex_path}."
+        )
+
+
+@dataclass
+class FoldFanOutOverBudget(QueryRejection):
+    estimated_fan_out: float
+    max_fold_fan_out: float
+
+    def __post_init__(self) -> None:
+        """Initialize a human-readable message."""
+        self.message = (
+            f"The @fold at vertex {self.vertex_path} is estimated to collect "
+            f"{self.estimated_fan_out:.0f} vertices per result row, more than the budget "
+            f"of {self.max_fold_fan_out:.0f}."
+        )
@@ -0,0 +1,43 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+from dataclasses import dataclass, field
+from typing import Mapping, Optional
+
+
+@dataclass(frozen=True)
+class AdmissionBudget:
+    """Limits on the estimated costs of a query. Costs without a limit are not checked."""
+
+    # The maximum estimated number of rows the query may return.
+    max_result_cardinality: Optional[float] = None
+
+    # The maximum estimated number of vertices and edges read while executing the query.
+    max_execution_cost: Optional[float] = None
+
+    # The maximum estimated number of vertices any @fold may collect for a single result row.
+    max_fold_fan_out: Optional[float] = None
+
+    @property
+    def is_unlimited(self) -> bool:
+        """Return True if the budget does not limit any cost."""
+        return (
+            self.max_result_cardinality is None
+            and self.max_execution_cost is None
+            and self.max_fold_fan_out is None
+        )
+
+
+@dataclass(frozen=True)
+class AdmissionPolicy:
+    """The budgets that queries of each tenant are subject to."""
+
+    # The budget for queries of tenants that do not have a budget of their own.
+    default_budget: AdmissionBudget = AdmissionBudget()
+
+    # The budget for queries of each tenant, by tenant name.
+    tenant_budgets: Mapping[str, AdmissionBudget] = field(default_factory=dict)
+
+    def get_budget(self, tenant_name: Optional[str]) -> AdmissionBudget:
+        """Return the budget for queries of the given tenant, or the default if it has none."""
+        if tenant_name is None:
+            return self.default_budget
+        return self.tenant_budgets.get(tenant_name, self.default_budget)
@@ -1,5 +1,29 @@
 # Copyright 2018-present Kensho Technologies, LLC.
+from typing import Set
+
+import sqlalchemy
+from sqlalchemy.sql.elements import BindParameter
+from sqlalchemy.sql.selectable import Select
+
 from ..compiler.common import SQL_LANGUAGE
+from ..compiler.keyset_pagination import (
+    KEYSET_CURSOR_PARAMETER_NAME,
+    KEYSET_LAST_SEEN_PARAMETER_PREFIX,
+    get_keyset_cursor_bind_parameters,
+)
+
+
+def _get_keyset_key_column_count(query: Select) -> int:
+    """Return the number of columns of the last seen key bind parameters in the given query."""
+    parameter_names: Set[str] = set()
+
+    def visit_bind_parameter(bind_parameter: BindParameter) -> None:
+        """Record the name of the bind parameter, if it is part of the last seen key."""
+        if bind_parameter.key.startswith(KEYSET_LAST_SEEN_PARAMETER_PREFIX):
+            parameter_names.add(bind_parameter.key)
+
+    sqlalchemy.sql.visitors.traverse(query, {}, {"bindparam": visit_bind_parameter})
+    return len(parameter_names)
 
 
 ######
@@ -20,6 +44,14 @@ def insert_arguments_into_sql_query(compilation_result, arguments):
     if compilation_result.language != SQL_LANGUAGE:
         raise AssertionError("Unexpected query output language: {}".format(compilation_result))
     base_query = compilation_result.query
+    if KEYSET_CURSOR_PARAMETER_NAME in arguments:
+        # The cursor token of a keyset-paginated query is passed as one bind parameter
+        # per component of the last seen key.
+        arguments = dict(arguments)
+        cursor = arguments.pop(KEYSET_CURSOR_PARAMETER_NAME)
+        arguments.update(
+            get_keyset_cursor_bind_parameters(cursor, _get_keyset_key_column_count(base_query))
+        )
     return base_query.params(**arguments)
 
 
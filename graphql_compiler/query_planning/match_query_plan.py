@@ -0,0 +1,658 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Compile queries with many complex @optional scopes into a bounded number of MATCH queries.
+
+OrientDB only allows optional nodes at the end of a MATCH pattern, so each @optional scope that
+expands vertex fields (a "complex" @optional scope) doubles the number of sub-queries that the
+compiled MATCH query consists of. Above a given number of sub-queries, the query plans compiled
+here instead consist of a base query, in which each top-level complex @optional scope is replaced
+by a @fold counting the edges it traverses, and one query per such scope, in which the scope is
+no longer optional. The results of all of these queries are then merged client-side, by joining
+each base result with the results of every scope query that traversed from the same vertices.
+
+The number of emitted MATCH sub-queries is thus the sum over the queries of the plan, rather than
+the product of those queries' sub-query counts.
+"""
+from copy import copy
+from dataclasses import dataclass
+import itertools
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
+
+from graphql import GraphQLID, GraphQLInterfaceType, GraphQLObjectType, GraphQLSchema
+from graphql.language.ast import (
+    ArgumentNode,
+    DirectiveNode,
+    DocumentNode,
+    FieldNode,
+    InlineFragmentNode,
+    ListValueNode,
+    NameNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    StringValueNode,
+)
+from graphql.pyutils import FrozenList
+
+from .. import backend
+from ..ast_manipulation import safe_parse_graphql
+from ..compiler.blocks import ConstructResult
+from ..compiler.common import MATCH_LANGUAGE, CompilationResult
+from ..compiler.compiler_frontend import IrAndMetadata, OutputMetadata, ast_to_ir
+from ..compiler.expressions import (
+    ContextFieldExistence,
+    Expression,
+    NullLiteral,
+    OutputContextField,
+    TernaryConditional,
+)
+from ..compiler.helpers import Location, get_vertex_field_type, strip_non_null_and_list_from_type
+from ..compiler.ir_lowering_common.common import extract_optional_location_root_info
+from ..compiler.ir_lowering_match import MatchCompilationOptions, lower_ir
+from ..compiler.ir_lowering_match.utils import construct_optional_traversal_tree
+from ..exceptions import GraphQLCompilationError
+from ..query_formatting.common import insert_arguments_into_query
+from ..schema import (
+    COUNT_META_FIELD_NAME,
+    FilterDirective,
+    FoldDirective,
+    OptionalDirective,
+    OutputDirective,
+    TagDirective,
+    is_vertex_field_name,
+)
+from ..schema.schema_info import CommonSchemaInfo
+
+
+# Prefix of the names of the outputs added to each query of a plan, which identify the vertices
+# that each of its results traversed outside of the split @optional scopes. The prefix is
+# reserved for use by the compiler, so these names can't clash with the query's own outputs.
+_KEY_OUTPUT_NAME_PREFIX = "___optional_scope_key_"
+
+# Prefix of the names of the outputs added to the base query of a plan, each of which counts the
+# edges that one of the split @optional scopes could have traversed.
+_EDGE_COUNT_OUTPUT_NAME_PREFIX = "optional_scope_edge_count_"
+
+
+@dataclass(frozen=True)
+class OptionalScopeQuery:
+    """A query producing the results of one complex @optional scope split out of a query."""
+
+    # MATCH query in which the @optional scope is mandatory, and the other split scopes are folded.
+    compilation_result: CompilationResult
+
+    # Names of the outputs of the original query that are within the split @optional scope.
+    output_names: FrozenSet[str]
+
+    # Name of the base query output that counts the edges the split @optional scope traverses.
+    # Results for which this count is zero get a null value for each of the scope's outputs.
+    edge_count_output_name: str
+
+
+@dataclass(frozen=True)
+class MatchQueryPlan:
+    """Plan for executing a GraphQL query as several MATCH queries, and merging their results."""
+
+    # MATCH query producing the results of the query outside of the split @optional scopes.
+    base_compilation_result: CompilationResult
+
+    # One query per split @optional scope. If empty, the base query is the entire query.
+    optional_scope_queries: Tuple[OptionalScopeQuery, ...]
+
+    # Names of the outputs, present in every query of the plan, that identify the vertices each
+    # result traversed outside of the split @optional scopes. Results of the scope queries are
+    # merged with the base query results that have the same values for these outputs.
+    key_output_names: Tuple[str, ...]
+
+    # Metadata of the outputs of the original query, which are the outputs of the merged results.
+    output_metadata: Dict[str, OutputMetadata]
+
+
+@dataclass(frozen=True)
+class _OptionalScope:
+    """A top-level complex @optional scope of a query, as found in the query's AST."""
+
+    # The vertex field with the @optional directive.
+    field_ast: FieldNode
+
+    # The type of the vertex reached by traversing the vertex field.
+    vertex_type: Union[GraphQLInterfaceType, GraphQLObjectType]
+
+
+def _get_query_definition(query_ast: DocumentNode) -> OperationDefinitionNode:
+    """Return the query definition of the AST of a query that compiled successfully."""
+    definition_ast = query_ast.definitions[0]
+    if not isinstance(definition_ast, OperationDefinitionNode):
+        raise AssertionError(f"Expected a query definition, but got: {definition_ast}")
+    return definition_ast
+
+
+def _get_selections(
+    selection_set: Optional[SelectionSetNode],
+) -> List[Union[FieldNode, InlineFragmentNode]]:
+    """Return the selections of a selection set of a query that compiled successfully."""
+    if selection_set is None:
+        return []
+
+    selections: List[Union[FieldNode, InlineFragmentNode]] = []
+    for selection in selection_set.selections:
+        if not isinstance(selection, (FieldNode, InlineFragmentNode)):
+            raise AssertionError(f"Expected a field or an inline fragment, but got: {selection}")
+        selections.append(selection)
+    return selections
+
+
+def _get_directive(ast: Union[FieldNode, InlineFragmentNode], name: str) -> Optional[DirectiveNode]:
+    """Return the directive with the given name on the given AST node, or None if there is none."""
+    for directive in ast.directives or ():
+        if directive.name.value == name:
+            return directive
+    return None
+
+
+def _get_string_argument(directive: DirectiveNode, argument_name: str) -> Optional[str]:
+    """Return the value of the directive's string argument with the given name, if present."""
+    for argument in directive.arguments or ():
+        if argument.name.value == argument_name and isinstance(argument.value, StringValueNode):
+            return argument.value.value
+    return None
+
+
+def _get_filter_tag_names(directive: DirectiveNode) -> Set[str]:
+    """Return the names of the tags used by the given @filter directive."""
+    tag_names = set()
+    for argument in directive.arguments or ():
+        if argument.name.value == "value" and isinstance(argument.value, ListValueNode):
+            for value in argument.value.values:
+                if isinstance(value, StringValueNode) and value.value.startswith("%"):
+                    tag_names.add(value.value[1:])
+    return tag_names
+
+
+def _has_vertex_field(selection_set: Optional[SelectionSetNode]) -> bool:
+    """Return True if any field within the given selection set (at any depth) is a vertex field."""
+    for selection in _get_selections(selection_set):
+        if isinstance(selection, FieldNode) and is_vertex_field_name(selection.name.value):
+            return True
+        if _has_vertex_field(selection.selection_set):
+            return True
+    return False
+
+
+def _find_optional_scopes(
+    schema: GraphQLSchema,
+    selection_set: Optional[SelectionSetNode],
+    current_type: Union[GraphQLInterfaceType, GraphQLObjectType],
+) -> List[_OptionalScope]:
+    """Return the complex @optional scopes in the selection set that aren't within another."""
+    optional_scopes: List[_OptionalScope] = []
+    for selection in _get_selections(selection_set):
+        if isinstance(selection, InlineFragmentNode):
+            coerced_type = cast(
+                Union[GraphQLInterfaceType, GraphQLObjectType],
+                schema.get_type(selection.type_condition.name.value),
+            )
+            optional_scopes.extend(
+                _find_optional_scopes(schema, selection.selection_set, coerced_type)
+            )
+            continue
+
+        field_name = selection.name.value
+        if not is_vertex_field_name(field_name):
+            continue
+        if _get_directive(selection, FoldDirective.name) is not None:
+            # @optional is not allowed within @fold, so there is nothing to find within it.
+            continue
+
+        vertex_type = get_vertex_field_type(current_type, field_name)
+        if _get_directive(selection, OptionalDirective.name) is not None:
+            if _has_vertex_field(selection.selection_set):
+                optional_scopes.append(_OptionalScope(selection, vertex_type))
+        else:
+            optional_scopes.extend(
+                _find_optional_scopes(schema, selection.selection_set, vertex_type)
+            )
+
+    return optional_scopes
+
+
+def _collect_tag_names(
+    selection_set: Optional[SelectionSetNode],
+    replacements: Mapping[int, FieldNode],
+    defined_tag_names: Set[str],
+    used_tag_names: Set[str],
+) -> None:
+    """Add the tags defined and used in the selection set, after replacing fields, to the sets.
+
+    Args:
+        selection_set: selection set whose tags to collect
+        replacements: id() of field AST -> the AST to collect the tags of instead of that field's
+        defined_tag_names: set to which the names of tags defined with @tag are added
+        used_tag_names: set to which the names of tags used in @filter directives are added
+    """
+    for selection in _get_selections(selection_set):
+        selection = replacements.get(id(selection), selection)
+        for directive in selection.directives or ():
+            if directive.name.value == TagDirective.name:
+                tag_name = _get_string_argument(directive, "tag_name")
+                if tag_name is not None:
+                    defined_tag_names.add(tag_name)
+            elif directive.name.value == FilterDirective.name:
+                used_tag_names.update(_get_filter_tag_names(directive))
+        _collect_tag_names(selection.selection_set, replacements, defined_tag_names, used_tag_names)
+
+
+def _replace_fields(
+    selection_set: SelectionSetNode, replacements: Mapping[int, FieldNode], used_tag_names: Set[str]
+) -> SelectionSetNode:
+    """Return the selection set with fields replaced, and tags not in used_tag_names removed."""
+    new_selections = []
+    for selection in _get_selections(selection_set):
+        new_selection = copy(replacements.get(id(selection), selection))
+        if new_selection.directives:
+            new_selection.directives = FrozenList(
+                directive
+                for directive in new_selection.directives
+                if directive.name.value != TagDirective.name
+                or _get_string_argument(directive, "tag_name") in used_tag_names
+            )
+        if new_selection.selection_set is not None:
+            new_selection.selection_set = _replace_fields(
+                new_selection.selection_set, replacements, used_tag_names
+            )
+        new_selections.append(new_selection)
+    return SelectionSetNode(selections=FrozenList(new_selections))
+
+
+def _get_ast_with_replaced_fields(
+    query_ast: DocumentNode, replacements: Mapping[int, FieldNode]
+) -> DocumentNode:
+    """Return the query AST with fields replaced, and with the tags left unused removed."""
+    definition_ast = _get_query_definition(query_ast)
+    defined_tag_names: Set[str] = set()
+    used_tag_names: Set[str] = set()
+    _collect_tag_names(
+        definition_ast.selection_set, replacements, defined_tag_names, used_tag_names
+    )
+
+    new_definition_ast = copy(definition_ast)
+    new_definition_ast.selection_set = _replace_fields(
+        definition_ast.selection_set, replacements, used_tag_names
+    )
+    new_query_ast = copy(query_ast)
+    new_query_ast.definitions = FrozenList([new_definition_ast])
+    return new_query_ast
+
+
+def _is_splittable(query_ast: DocumentNode, optional_scope: _OptionalScope) -> bool:
+    """Return True if the @optional scope's results can be computed by a separate query."""
+    if COUNT_META_FIELD_NAME not in optional_scope.vertex_type.fields:
+        # The base query can't count the edges the scope traverses.
+        return False
+
+    definition_ast = _get_query_definition(query_ast)
+    scope_defined_tag_names: Set[str] = set()
+    _collect_tag_names(
+        SelectionSetNode(selections=[optional_scope.field_ast]), {}, scope_defined_tag_names, set()
+    )
+    # Collect the tags used outside of the scope, by replacing it with a field without any.
+    outside_used_tag_names: Set[str] = set()
+    _collect_tag_names(
+        definition_ast.selection_set,
+        {id(optional_scope.field_ast): FieldNode(name=optional_scope.field_ast.name)},
+        set(),
+        outside_used_tag_names,
+    )
+    # A tag defined within the scope and used outside of it filters results by values that the
+    # other queries of the plan don't have.
+    return not (scope_defined_tag_names & outside_used_tag_names)
+
+
+def _make_edge_count_field_ast(optional_scope: _OptionalScope, output_name: str) -> FieldNode:
+    """Return a field AST that outputs the number of edges the @optional scope may traverse."""
+    output_directive = DirectiveNode(
+        name=NameNode(value=OutputDirective.name),
+        arguments=FrozenList(
+            [
+                ArgumentNode(
+                    name=NameNode(value="out_name"), value=StringValueNode(value=output_name)
+                )
+            ]
+        ),
+    )
+    count_field_ast = FieldNode(
+        name=NameNode(value=COUNT_META_FIELD_NAME), directives=FrozenList([output_directive])
+    )
+    return FieldNode(
+        name=optional_scope.field_ast.name,
+        directives=FrozenList([DirectiveNode(name=NameNode(value=FoldDirective.name))]),
+        selection_set=SelectionSetNode(selections=FrozenList([count_field_ast])),
+    )
+
+
+def _make_mandatory_field_ast(optional_scope: _OptionalScope) -> FieldNode:
+    """Return the field AST of the @optional scope, without its @optional directive."""
+    field_ast = copy(optional_scope.field_ast)
+    field_ast.directives = FrozenList(
+        directive
+        for directive in optional_scope.field_ast.directives
+        if directive.name.value != OptionalDirective.name
+    )
+    return field_ast
+
+
+def _get_match_subquery_count(ir: IrAndMetadata) -> int:
+    """Return the number of sub-queries the MATCH query compiled from the IR would consist of."""
+    complex_optional_roots, location_to_optional_roots = extract_optional_location_root_info(
+        ir.ir_blocks
+    )
+    optional_traversal_tree = construct_optional_traversal_tree(
+        complex_optional_roots, location_to_optional_roots
+    )
+    return optional_traversal_tree.get_rooted_subtree_count()
+
+
+def _get_key_query_paths(ir: IrAndMetadata) -> List[Tuple[str, ...]]:
+    """Return the query paths of the vertices that identify each result of the IR's query."""
+    query_metadata_table = ir.query_metadata_table
+    return sorted(
+        location.query_path
+        for location, _ in query_metadata_table.registered_locations
+        if isinstance(location, Location)
+        and query_metadata_table.get_revisit_origin(location) == location
+    )
+
+
+def _compile_match_query_with_key_outputs(
+    common_schema_info: CommonSchemaInfo,
+    query_ast: DocumentNode,
+    key_query_paths: Optional[List[Tuple[str, ...]]],
+    max_optional_subqueries: int,
+    compilation_options: Optional[MatchCompilationOptions],
+) -> Tuple[CompilationResult, List[Tuple[str, ...]]]:
+    """Compile the query AST to MATCH, outputting the @rid of the vertices at the key query paths.
+
+    Args:
+        common_schema_info: GraphQL schema object describing the schema of the graph to be queried
+        query_ast: AST of the query to compile
+        key_query_paths: query paths of the vertices whose @rid to output. If None, all vertices
+                         of the query outside of @fold scopes are used.
+        max_optional_subqueries: the maximum number of sub-queries the MATCH query may consist of
+        compilation_options: MatchCompilationOptions controlling how the query is lowered
+
+    Returns:
+        tuple (CompilationResult, query paths of the vertices whose @rid is output)
+    """
+    ir = ast_to_ir(
+        common_schema_info.schema,
+        query_ast,
+        type_equivalence_hints=common_schema_info.type_equivalence_hints,
+    )
+    subquery_count = _get_match_subquery_count(ir)
+    if subquery_count > max_optional_subqueries:
+        raise GraphQLCompilationError(
+            "The query's @optional scopes that expand vertex fields would be compiled into {} "
+            "MATCH sub-queries even after splitting them into separate queries, which is more "
+            "than the maximum of {}. Each such scope can only be split into a separate query if "
+            "it is not within another one, and if no tag defined within it is used outside of "
+            "it.".format(subquery_count, max_optional_subqueries)
+        )
+
+    if key_query_paths is None:
+        key_query_paths = _get_key_query_paths(ir)
+
+    query_metadata_table = ir.query_metadata_table
+    key_locations = {
+        location.query_path: location
+        for location, _ in query_metadata_table.registered_locations
+        if isinstance(location, Location)
+        and query_metadata_table.get_revisit_origin(location) == location
+    }
+    output_block = ir.ir_blocks[-1]
+    if not isinstance(output_block, ConstructResult):
+        raise AssertionError(f"Expected the last IR block to be a ConstructResult: {ir.ir_blocks}")
+
+    new_output_fields = dict(output_block.fields)
+    new_output_metadata = dict(ir.output_metadata)
+    for index, query_path in enumerate(key_query_paths):
+        location = key_locations[query_path]
+        optional = query_metadata_table.get_location_info(location).optional_scopes_depth > 0
+        output_name = f"{_KEY_OUTPUT_NAME_PREFIX}{index}"
+        expression: Expression = OutputContextField(location.navigate_to_field("@rid"), GraphQLID)
+        if optional:
+            expression = TernaryConditional(
+                ContextFieldExistence(location), expression, NullLiteral
+            )
+        new_output_fields[output_name] = expression
+        new_output_metadata[output_name] = OutputMetadata(
+            type=GraphQLID, optional=optional, folded=False
+        )
+
+    ir = IrAndMetadata(
+        ir_blocks=ir.ir_blocks[:-1] + [ConstructResult(new_output_fields)],
+        input_metadata=ir.input_metadata,
+        output_metadata=new_output_metadata,
+        query_metadata_table=query_metadata_table,
+    )
+    compound_match_query = lower_ir(common_schema_info, ir, compilation_options=compilation_options)
+    compilation_result = CompilationResult(
+        query=backend.match_backend.emit_func(common_schema_info, compound_match_query),
+        language=MATCH_LANGUAGE,
+        output_metadata=ir.output_metadata,
+        input_metadata=ir.input_metadata,
+        lowering_pass_statistics=None,
+    )
+    return compilation_result, key_query_paths
+
+
+def compile_graphql_to_match_query_plan(
+    common_schema_info: CommonSchemaInfo,
+    graphql_query: str,
+    max_optional_subqueries: int,
+    compilation_options: Optional[MatchCompilationOptions] = None,
+) -> MatchQueryPlan:
+    """Compile the GraphQL query into MATCH queries of at most the given number of sub-queries.
+
+    If compiling the query into a single MATCH query would produce more than the given number of
+    sub-queries, each complex @optional scope that isn't within another @optional scope is split
+    out of the query, and compiled into a separate query that is executed alongside the rest.
+    Execute the returned plan with execute_match_query_plan.
+
+    Args:
+        common_schema_info: GraphQL schema object describing the schema of the graph to be queried
+        graphql_query: the GraphQL query to compile to MATCH, as a string
+        max_optional_subqueries: the maximum number of sub-queries each MATCH query of the plan
+                                 may consist of
+        compilation_options: optional MatchCompilationOptions controlling how the queries are
+                             lowered. If not specified, the default options are used.
+
+    Returns:
+        MatchQueryPlan whose merged results are the same as those of the GraphQL query
+
+    Raises:
+        GraphQLCompilationError if some query of the plan would still consist of more than
+        max_optional_subqueries sub-queries
+    """
+    query_ast = safe_parse_graphql(graphql_query)
+    ir = ast_to_ir(
+        common_schema_info.schema,
+        query_ast,
+        type_equivalence_hints=common_schema_info.type_equivalence_hints,
+    )
+    if _get_match_subquery_count(ir) <= max_optional_subqueries:
+        lowered_ir = lower_ir(common_schema_info, ir, compilation_options=compilation_options)
+        compilation_result = CompilationResult(
+            query=backend.match_backend.emit_func(common_schema_info, lowered_ir),
+            language=MATCH_LANGUAGE,
+            output_metadata=ir.output_metadata,
+            input_metadata=ir.input_metadata,
+            lowering_pass_statistics=None,
+        )
+        return MatchQueryPlan(
+            base_compilation_result=compilation_result,
+            optional_scope_queries=tuple(),
+            key_output_names=tuple(),
+            output_metadata=ir.output_metadata,
+        )
+
+    schema = common_schema_info.schema
+    definition_ast = _get_query_definition(query_ast)
+    root_field_ast = _get_selections(definition_ast.selection_set)[0]
+    if not isinstance(root_field_ast, FieldNode):
+        raise AssertionError(f"Expected the root selection to be a field: {root_field_ast}")
+    root_type_name = root_field_ast.name.value
+    all_output_names = set(ir.output_metadata)
+    optional_scopes = [
+        optional_scope
+        for optional_scope in _find_optional_scopes(
+            schema,
+            root_field_ast.selection_set,
+            strip_non_null_and_list_from_type(schema.query_type.fields[root_type_name].type),
+        )
+        if _is_splittable(query_ast, optional_scope)
+    ]
+
+    taken_output_names = set(all_output_names)
+    edge_count_output_names = []
+    for _ in optional_scopes:
+        output_name = next(
+            f"{_EDGE_COUNT_OUTPUT_NAME_PREFIX}{index}"
+            for index in itertools.count()
+            if f"{_EDGE_COUNT_OUTPUT_NAME_PREFIX}{index}" not in taken_output_names
+        )
+        taken_output_names.add(output_name)
+        edge_count_output_names.append(output_name)
+
+    folded_field_asts = {
+        id(optional_scope.field_ast): _make_edge_count_field_ast(optional_scope, output_name)
+        for optional_scope, output_name in zip(optional_scopes, edge_count_output_names)
+    }
+    base_compilation_result, key_query_paths = _compile_match_query_with_key_outputs(
+        common_schema_info,
+        _get_ast_with_replaced_fields(query_ast, folded_field_asts),
+        None,
+        max_optional_subqueries,
+        compilation_options,
+    )
+
+    optional_scope_queries = []
+    for optional_scope, edge_count_output_name in zip(optional_scopes, edge_count_output_names):
+        replacements = dict(folded_field_asts)
+        replacements[id(optional_scope.field_ast)] = _make_mandatory_field_ast(optional_scope)
+        compilation_result, _ = _compile_match_query_with_key_outputs(
+            common_schema_info,
+            _get_ast_with_replaced_fields(query_ast, replacements),
+            key_query_paths,
+            max_optional_subqueries,
+            compilation_options,
+        )
+        optional_scope_queries.append(
+            OptionalScopeQuery(
+                compilation_result=compilation_result,
+                output_names=frozenset(
+                    all_output_names.intersection(compilation_result.output_metadata)
+                    - set(base_compilation_result.output_metadata)
+                ),
+                edge_count_output_name=edge_count_output_name,
+            )
+        )
+
+    return MatchQueryPlan(
+        base_compilation_result=base_compilation_result,
+        optional_scope_queries=tuple(optional_scope_queries),
+        key_output_names=tuple(
+            f"{_KEY_OUTPUT_NAME_PREFIX}{index}" for index in range(len(key_query_paths))
+        ),
+        output_metadata=ir.output_metadata,
+    )
+
+
+def _execute_compilation_result(
+    compilation_result: CompilationResult,
+    parameters: Mapping[str, Any],
+    execute_query: Callable[[str], Iterable[Mapping[str, Any]]],
+) -> List[Mapping[str, Any]]:
+    """Execute the compiled query with the parameters it uses, and return its results."""
+    arguments = {
+        name: value
+        for name, value in parameters.items()
+        if name in compilation_result.input_metadata
+    }
+    return list(execute_query(insert_arguments_into_query(compilation_result, arguments)))
+
+
+def execute_match_query_plan(
+    query_plan: MatchQueryPlan,
+    parameters: Mapping[str, Any],
+    execute_query: Callable[[str], Iterable[Mapping[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """Execute the queries of the plan, and merge their results into those of the GraphQL query.
+
+    Args:
+        query_plan: MatchQueryPlan to execute
+        parameters: the parameters of the GraphQL query the plan was compiled from
+        execute_query: function that executes a MATCH query, and returns its results
+
+    Returns:
+        list of results of the GraphQL query, each a dict of output name -> value
+    """
+    base_results = _execute_compilation_result(
+        query_plan.base_compilation_result, parameters, execute_query
+    )
+
+    scope_results_by_key = []
+    for optional_scope_query in query_plan.optional_scope_queries:
+        results_by_key: Dict[Tuple[Any, ...], List[Dict[str, Any]]] = {}
+        for result in _execute_compilation_result(
+            optional_scope_query.compilation_result, parameters, execute_query
+        ):
+            key = tuple(result[output_name] for output_name in query_plan.key_output_names)
+            results_by_key.setdefault(key, []).append(
+                {
+                    output_name: result[output_name]
+                    for output_name in optional_scope_query.output_names
+                }
+            )
+        scope_results_by_key.append(results_by_key)
+
+    base_output_names = [
+        output_name
+        for output_name in query_plan.output_metadata
+        if output_name in query_plan.base_compilation_result.output_metadata
+    ]
+    merged_results = []
+    for base_result in base_results:
+        key = tuple(base_result[output_name] for output_name in query_plan.key_output_names)
+        partial_results = [
+            {output_name: base_result[output_name] for output_name in base_output_names}
+        ]
+        for optional_scope_query, results_by_key in zip(
+            query_plan.optional_scope_queries, scope_results_by_key
+        ):
+            scope_results = results_by_key.get(key)
+            if scope_results is None:
+                if base_result[optional_scope_query.edge_count_output_name] > 0:
+                    # Just like in a single MATCH query, a result is discarded if the scope's
+                    # edges exist but none of the vertices they lead to satisfy its filters.
+                    partial_results = []
+                    break
+                scope_results = [dict.fromkeys(optional_scope_query.output_names)]
+            partial_results = [
+                dict(partial_result, **scope_result)
+                for partial_result in partial_results
+                for scope_result in scope_results
+            ]
+        merged_results.extend(partial_results)
+
+    return merged_results
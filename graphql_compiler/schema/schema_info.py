@@ -4,7 +4,7 @@ from collections import namedtuple
 from dataclasses import dataclass, field
 from enum import Enum, Flag, auto, unique
 from functools import partial
-from typing import AbstractSet, Dict, Mapping, Optional, Sequence, Tuple, Union
+from typing import AbstractSet, Any, Dict, Mapping, Optional, Sequence, Tuple, Union
 
 from graphql.type import GraphQLSchema
 from graphql.type.definition import GraphQLInterfaceType, GraphQLObjectType
@@ -16,6 +16,7 @@ from sqlalchemy.dialects.postgresql import dialect as postgresql_dialect
 from sqlalchemy.engine.interfaces import Dialect
 
 from . import TypeEquivalenceHintsType, is_vertex_field_name
+from ..cost_estimation.cardinality_corrections import CardinalityCorrections
 from ..cost_estimation.statistics import Statistics
 from ..schema_generation.schema_graph import SchemaGraph
 
@@ -439,3 +440,15 @@ class QueryPlanningSchemaInfo:
 
     # Map edge names to constraints inferred for them.
     edge_constraints: Dict[str, EdgeConstraint] = field(default_factory=dict)
+
+    # Optional corrections to cardinality estimates, learned from the observed result sizes of
+    # executed queries. See cost_estimation/cardinality_corrections.py for details.
+    cardinality_corrections: Optional[CardinalityCorrections] = None
+
+    # Cache of the analysis passes that don't depend on the query parameters, for the queries
+    # analyzed with this schema info. It is created on first use by cost_estimation/analysis.py,
+    # and belongs to this object so that it is freed along with it. Copies made with
+    # dataclasses.replace() start with an empty cache, since they may have different statistics.
+    _query_structure_cache: Optional[Any] = field(
+        default=None, init=False, repr=False, compare=False
+    )
@@ -0,0 +1,191 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Benchmark applying expression rewrite rules in a single fused traversal of the IR.
+
+The lowering passes that rewrite expressions used to each traverse all the IR blocks, rebuilding
+every expression a rule rewrote along with all of its parents. The rules of several such passes
+are now applied in a single traversal instead. This benchmark compares the two approaches on
+the queries in the compiler test corpus, reporting for each group of fused rules the time taken
+to rewrite the whole corpus and the peak memory allocated while doing so.
+
+Usage:
+    python -m graphql_compiler.tests.benchmarks.expression_rewrite_benchmark [--repetitions N]
+"""
+import argparse
+from dataclasses import dataclass
+import inspect
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .. import test_input_data
+from ...compiler.compiler_entities import BasicBlock
+from ...compiler.compiler_frontend import IrAndMetadata, graphql_to_ir
+from ...compiler.ir_lowering_common.common import (
+    ExpressionRewriteRule,
+    apply_expression_rewrite_rules,
+    make_context_field_existence_lowering_rule,
+    optimize_boolean_expression_comparisons_rule,
+)
+from ...compiler.ir_lowering_match.ir_lowering import (
+    lower_string_operators_rule,
+    rewrite_binary_composition_inside_ternary_conditional_rule,
+)
+from ...exceptions import GraphQLError
+from ...schema.schema_info import CommonSchemaInfo
+from ..test_helpers import get_common_schema_info
+
+
+# Functions returning the rewrite rules to benchmark for a given query, by name of the group.
+REWRITE_RULE_GROUPS: Dict[str, Callable[[IrAndMetadata], List[ExpressionRewriteRule]]] = {
+    "context_field_existence+boolean_comparisons": lambda ir: [
+        make_context_field_existence_lowering_rule(ir.query_metadata_table),
+        optimize_boolean_expression_comparisons_rule,
+    ],
+    "match_ternary_conditionals+string_operators": lambda ir: [
+        rewrite_binary_composition_inside_ternary_conditional_rule,
+        lower_string_operators_rule,
+    ],
+}
+
+
+@dataclass(frozen=True)
+class RewriteMeasurement:
+    """Measurements of rewriting the IR of all corpus queries, using one of the approaches."""
+
+    seconds: float  # the best of all repetitions
+    peak_allocated_bytes: int
+
+
+@dataclass(frozen=True)
+class RewriteBenchmarkResult:
+    """Measurements of rewriting the corpus with a group of rules, sequentially and fused."""
+
+    rule_group_name: str
+    sequential: RewriteMeasurement
+    fused: RewriteMeasurement
+
+
+def get_corpus_graphql_inputs() -> List[str]:
+    """Return the GraphQL input of each query in the compiler test corpus."""
+    graphql_inputs = []
+    for _, test_data_func in sorted(inspect.getmembers(test_input_data, inspect.isfunction)):
+        if inspect.signature(test_data_func).parameters:
+            continue
+        test_data = test_data_func()
+        if isinstance(test_data, test_input_data.CommonTestData):
+            graphql_inputs.append(test_data.graphql_input)
+    return graphql_inputs
+
+
+def get_corpus_irs(common_schema_info: CommonSchemaInfo) -> List[IrAndMetadata]:
+    """Return the IR of each query in the compiler test corpus that compiles to IR."""
+    corpus_irs = []
+    for graphql_input in get_corpus_graphql_inputs():
+        try:
+            corpus_irs.append(
+                graphql_to_ir(
+                    common_schema_info.schema,
+                    graphql_input,
+                    type_equivalence_hints=common_schema_info.type_equivalence_hints,
+                )
+            )
+        except GraphQLError:
+            # Some corpus queries are intentionally invalid, or need a different schema.
+            pass
+    return corpus_irs
+
+
+def rewrite_sequentially(
+    ir_blocks: List[BasicBlock], rewrite_rules: Sequence[ExpressionRewriteRule]
+) -> List[BasicBlock]:
+    """Apply the rewrite rules to the IR blocks with one traversal per rule."""
+    for rewrite_rule in rewrite_rules:
+        ir_blocks = apply_expression_rewrite_rules(ir_blocks, [rewrite_rule])
+    return ir_blocks
+
+
+def rewrite_fused(
+    ir_blocks: List[BasicBlock], rewrite_rules: Sequence[ExpressionRewriteRule]
+) -> List[BasicBlock]:
+    """Apply the rewrite rules to the IR blocks in a single traversal."""
+    return apply_expression_rewrite_rules(ir_blocks, rewrite_rules)
+
+
+def _measure(
+    rewrite_func: Callable[[List[BasicBlock], Sequence[ExpressionRewriteRule]], List[BasicBlock]],
+    corpus_inputs: List[Tuple[List[BasicBlock], List[ExpressionRewriteRule]]],
+    repetitions: int,
+) -> RewriteMeasurement:
+    """Rewrite all corpus inputs with the given function, and measure its time and memory."""
+    best_seconds = float("inf")
+    for _ in range(repetitions):
+        start_time = time.perf_counter()
+        for ir_blocks, rewrite_rules in corpus_inputs:
+            rewrite_func(ir_blocks, rewrite_rules)
+        best_seconds = min(best_seconds, time.perf_counter() - start_time)
+
+    # Memory is measured separately, since tracing allocations slows down execution.
+    tracemalloc.start()
+    try:
+        for ir_blocks, rewrite_rules in corpus_inputs:
+            rewrite_func(ir_blocks, rewrite_rules)
+        _, peak_allocated_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return RewriteMeasurement(seconds=best_seconds, peak_allocated_bytes=peak_allocated_bytes)
+
+
+def run_benchmark(
+    corpus_irs: List[IrAndMetadata], repetitions: int
+) -> List[RewriteBenchmarkResult]:
+    """Rewrite the corpus with each group of rules, sequentially and fused, and measure both."""
+    results = []
+    for rule_group_name, make_rewrite_rules in sorted(REWRITE_RULE_GROUPS.items()):
+        corpus_inputs = [(ir.ir_blocks, make_rewrite_rules(ir)) for ir in corpus_irs]
+        results.append(
+            RewriteBenchmarkResult(
+                rule_group_name=rule_group_name,
+                sequential=_measure(rewrite_sequentially, corpus_inputs, repetitions),
+                fused=_measure(rewrite_fused, corpus_inputs, repetitions),
+            )
+        )
+    return results
+
+
+def _write_line(line: str) -> None:
+    """Write a line of the benchmark report to standard output."""
+    sys.stdout.write(line + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark and print its results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--repetitions",
+        type=int,
+        default=10,
+        help="number of times the corpus is rewritten; the fastest repetition is reported",
+    )
+    args = parser.parse_args(argv)
+
+    corpus_irs = get_corpus_irs(get_common_schema_info())
+    _write_line("Corpus of {} queries.".format(len(corpus_irs)))
+
+    row_format = "{:<60} {:>10} {:>16}"
+    _write_line(row_format.format("rule group / approach", "time (ms)", "peak memory (B)"))
+    for result in run_benchmark(corpus_irs, args.repetitions):
+        for approach, measurement in (("sequential", result.sequential), ("fused", result.fused)):
+            _write_line(
+                row_format.format(
+                    "{} / {}".format(result.rule_group_name, approach),
+                    f"{1000 * measurement.seconds:.3f}",
+                    measurement.peak_allocated_bytes,
+                )
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Benchmark the memory footprint of the IR and metadata of compiled queries.
+
+Processes that keep many IrAndMetadata objects around, e.g. as part of a QueryPlanningAnalysis,
+pay for the memory of every basic block, expression, location, and metadata table entry of each
+query. This benchmark compiles the queries in the compiler test corpus to IR, keeps all of them
+alive, and reports the memory they retain: in total, and on average per query.
+
+Usage:
+    python -m graphql_compiler.tests.benchmarks.ir_memory_benchmark [--copies N]
+"""
+import argparse
+from dataclasses import dataclass
+import gc
+import sys
+import tracemalloc
+from typing import List, Optional
+
+from ...compiler.compiler_frontend import IrAndMetadata, graphql_to_ir
+from ...exceptions import GraphQLError
+from ...schema.schema_info import CommonSchemaInfo
+from ..test_helpers import get_common_schema_info
+from .expression_rewrite_benchmark import get_corpus_graphql_inputs
+
+
+@dataclass(frozen=True)
+class IrMemoryBenchmarkResult:
+    """Memory retained by the IR and metadata of the compiled corpus queries."""
+
+    query_count: int
+    retained_bytes: int
+
+    @property
+    def retained_bytes_per_query(self) -> float:
+        """Return the average memory retained by the IR and metadata of a single query."""
+        return self.retained_bytes / self.query_count
+
+
+def get_compilable_corpus_graphql_inputs(common_schema_info: CommonSchemaInfo) -> List[str]:
+    """Return the GraphQL input of each query in the compiler test corpus that compiles to IR."""
+    graphql_inputs = []
+    for graphql_input in get_corpus_graphql_inputs():
+        try:
+            _compile_to_ir(common_schema_info, graphql_input)
+        except GraphQLError:
+            # Some corpus queries are intentionally invalid, or need a different schema.
+            continue
+        graphql_inputs.append(graphql_input)
+    return graphql_inputs
+
+
+def _compile_to_ir(common_schema_info: CommonSchemaInfo, graphql_input: str) -> IrAndMetadata:
+    """Compile the GraphQL input to IR using the given schema info."""
+    return graphql_to_ir(
+        common_schema_info.schema,
+        graphql_input,
+        type_equivalence_hints=common_schema_info.type_equivalence_hints,
+    )
+
+
+def run_benchmark(
+    common_schema_info: CommonSchemaInfo, graphql_inputs: List[str], copies: int
+) -> IrMemoryBenchmarkResult:
+    """Compile each input the given number of times, and measure the memory the results retain.
+
+    Args:
+        common_schema_info: schema info with which to compile the inputs
+        graphql_inputs: GraphQL inputs that compile to IR with the given schema info
+        copies: number of times each input is compiled, with all results kept alive at once
+
+    Returns:
+        IrMemoryBenchmarkResult with the memory retained by all the compiled results
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        retained_bytes_before, _ = tracemalloc.get_traced_memory()
+        compiled_irs = [
+            _compile_to_ir(common_schema_info, graphql_input)
+            for _ in range(copies)
+            for graphql_input in graphql_inputs
+        ]
+        gc.collect()
+        retained_bytes_after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return IrMemoryBenchmarkResult(
+        query_count=len(compiled_irs), retained_bytes=retained_bytes_after - retained_bytes_before
+    )
+
+
+def _write_line(line: str) -> None:
+    """Write a line of the benchmark report to standard output."""
+    sys.stdout.write(line + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark and print its results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--copies",
+        type=int,
+        default=1,
+        help="number of times each corpus query is compiled and kept alive",
+    )
+    args = parser.parse_args(argv)
+
+    common_schema_info = get_common_schema_info()
+    graphql_inputs = get_compilable_corpus_graphql_inputs(common_schema_info)
+    result = run_benchmark(common_schema_info, graphql_inputs, args.copies)
+
+    _write_line("Compiled {} queries.".format(result.query_count))
+    _write_line("Retained memory (B): {}".format(result.retained_bytes))
+    _write_line("Retained memory per query (B): {:.0f}".format(result.retained_bytes_per_query))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
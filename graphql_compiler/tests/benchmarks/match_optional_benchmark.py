@@ -0,0 +1,192 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Benchmark the compilation to MATCH of queries with many complex @optional traversals.
+
+Each complex @optional traversal (an @optional traversal that has a further traversal within it)
+doubles the number of MATCH subqueries the compiler has to emit, since every combination of the
+@optional traversals being present or absent gets its own subquery. This benchmark compiles
+queries with an increasing number of such traversals, and reports the compilation time, the
+number of emitted subqueries and the length of the emitted query for each. It also reports the
+same for the MATCH query plan of each query, which splits such traversals into separate queries
+once the number of subqueries exceeds the given maximum.
+
+Usage:
+    python -m graphql_compiler.tests.benchmarks.match_optional_benchmark
+        [--max-optional-traversals N] [--max-optional-subqueries N] [--repetitions N]
+"""
+import argparse
+from dataclasses import dataclass
+import sys
+import time
+from typing import List, Optional
+
+from ...compiler.common import compile_graphql_to_match
+from ...compiler.compiler_frontend import graphql_to_ir
+from ...compiler.ir_lowering_match import lower_ir
+from ...compiler.ir_lowering_match.utils import CompoundMatchQuery
+from ...query_planning.match_query_plan import MatchQueryPlan, compile_graphql_to_match_query_plan
+from ...schema.schema_info import CommonSchemaInfo
+from ..test_helpers import get_common_schema_info
+
+
+@dataclass(frozen=True)
+class OptionalBenchmarkResult:
+    """Measurements of compiling a query with the given number of complex @optional traversals."""
+
+    optional_traversal_count: int
+    compilation_seconds: float  # the best of all repetitions
+    subquery_count: int
+    query_length: int
+
+    # The same measurements for the MATCH query plan of the query.
+    plan_compilation_seconds: float
+    plan_query_count: int
+    plan_query_length: int
+
+
+def make_query_with_complex_optionals(optional_traversal_count: int) -> str:
+    """Return a query with the given number of independent complex @optional traversals.
+
+    Each complex @optional traversal hangs off a different vertex along a chain of mandatory
+    traversals, so none of them are nested within another. This is the worst case for the number
+    of emitted MATCH subqueries, which is 2 ** optional_traversal_count.
+    """
+    nested_body = ""
+    for index in reversed(range(optional_traversal_count)):
+        nested_body = f"""
+            out_Entity_Related @optional {{
+                out_Entity_Related {{
+                    name @output(out_name: "related_name_{index}")
+                }}
+            }}
+            out_Animal_ParentOf {{
+                name @output(out_name: "name_{index}")
+                {nested_body}
+            }}
+        """
+    return f"""{{
+        Animal {{
+            name @output(out_name: "name")
+            {nested_body}
+        }}
+    }}"""
+
+
+def get_subquery_count(common_schema_info: CommonSchemaInfo, graphql_query: str) -> int:
+    """Return the number of MATCH subqueries emitted for the given query."""
+    ir = graphql_to_ir(
+        common_schema_info.schema,
+        graphql_query,
+        type_equivalence_hints=common_schema_info.type_equivalence_hints,
+    )
+    lowered_ir_blocks = lower_ir(common_schema_info, ir)
+    if isinstance(lowered_ir_blocks, CompoundMatchQuery):
+        return len(lowered_ir_blocks.match_queries)
+    return 1
+
+
+def get_plan_query_length(query_plan: MatchQueryPlan) -> int:
+    """Return the total length of the MATCH queries of the given plan."""
+    return len(query_plan.base_compilation_result.query) + sum(
+        len(optional_scope_query.compilation_result.query)
+        for optional_scope_query in query_plan.optional_scope_queries
+    )
+
+
+def run_benchmark(
+    common_schema_info: CommonSchemaInfo,
+    optional_traversal_count: int,
+    repetitions: int,
+    max_optional_subqueries: int = 16,
+) -> OptionalBenchmarkResult:
+    """Compile a query with the given number of complex @optional traversals, and measure it."""
+    graphql_query = make_query_with_complex_optionals(optional_traversal_count)
+
+    best_seconds = float("inf")
+    for _ in range(repetitions):
+        start_time = time.perf_counter()
+        compilation_result = compile_graphql_to_match(common_schema_info, graphql_query)
+        best_seconds = min(best_seconds, time.perf_counter() - start_time)
+
+    best_plan_seconds = float("inf")
+    for _ in range(repetitions):
+        start_time = time.perf_counter()
+        query_plan = compile_graphql_to_match_query_plan(
+            common_schema_info, graphql_query, max_optional_subqueries
+        )
+        best_plan_seconds = min(best_plan_seconds, time.perf_counter() - start_time)
+
+    return OptionalBenchmarkResult(
+        optional_traversal_count=optional_traversal_count,
+        compilation_seconds=best_seconds,
+        subquery_count=get_subquery_count(common_schema_info, graphql_query),
+        query_length=len(compilation_result.query),
+        plan_compilation_seconds=best_plan_seconds,
+        plan_query_count=1 + len(query_plan.optional_scope_queries),
+        plan_query_length=get_plan_query_length(query_plan),
+    )
+
+
+def _write_line(line: str) -> None:
+    """Write a line of the benchmark report to standard output."""
+    sys.stdout.write(line + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark and print its results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--max-optional-traversals",
+        type=int,
+        default=8,
+        help="the largest number of complex @optional traversals to benchmark",
+    )
+    parser.add_argument(
+        "--max-optional-subqueries",
+        type=int,
+        default=16,
+        help="the most subqueries each MATCH query of the query plans may consist of",
+    )
+    parser.add_argument(
+        "--repetitions",
+        type=int,
+        default=3,
+        help="number of times each query is compiled; the fastest compilation is reported",
+    )
+    args = parser.parse_args(argv)
+
+    common_schema_info = get_common_schema_info()
+    row_format = "{:>10} {:>12} {:>12} {:>14} {:>12} {:>12} {:>14}"
+    _write_line(
+        row_format.format(
+            "optionals",
+            "time (ms)",
+            "subqueries",
+            "query length",
+            "plan (ms)",
+            "plan queries",
+            "plan length",
+        )
+    )
+    for optional_traversal_count in range(1, args.max_optional_traversals + 1):
+        result = run_benchmark(
+            common_schema_info,
+            optional_traversal_count,
+            args.repetitions,
+            max_optional_subqueries=args.max_optional_subqueries,
+        )
+        _write_line(
+            row_format.format(
+                result.optional_traversal_count,
+                f"{1000 * result.compilation_seconds:.3f}",
+                result.subquery_count,
+                result.query_length,
+                f"{1000 * result.plan_compilation_seconds:.3f}",
+                result.plan_query_count,
+                result.plan_query_length,
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
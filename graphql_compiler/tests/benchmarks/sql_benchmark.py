@@ -0,0 +1,456 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+"""Benchmark the compilation of GraphQL to SQL, and snapshot the plans of the emitted queries.
+
+The benchmark compiles a corpus of representative queries against the test schema, timing each
+compilation stage separately for every supported dialect. It also executes EXPLAIN for each query
+on a database with the test schema, and compares the resulting plans to the snapshot in this
+directory, so that changes in emitted SQL that affect query plans get noticed.
+
+By default, plans are produced by an in-memory SQLite database standing in for a real one.
+Queries that can't be emitted for SQLite (e.g. ones using @fold) are only timed. A PostgreSQL
+database with the test schema can be used instead by passing its connection string.
+
+Usage:
+    python -m graphql_compiler.tests.benchmarks.sql_benchmark [--repetitions N]
+        [--plan-database-url URL] [--update-plan-snapshots]
+"""
+import argparse
+from dataclasses import dataclass, field, replace
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import sqlalchemy
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
+from sqlalchemy.sql.selectable import Select
+
+from ... import graphql_to_sql
+from ...backend import sql_backend
+from ...compiler import SQLCompilationOptions
+from ...compiler.compiler_frontend import graphql_to_ir
+from ...compiler.emit_sql import emit_code_from_ir
+from ...schema.schema_info import SQLAlchemySchemaInfo
+from ..test_helpers import get_sqlalchemy_schema_info
+
+
+T = TypeVar("T")
+
+BENCHMARKED_DIALECTS = ("mssql", "postgresql")
+
+PLAN_SNAPSHOT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "snapshots", "sqlite_explain_plans.json"
+)
+
+# Names of the schemas containing the test tables outside of MSSQL.
+_TEST_SCHEMA_NAMES = ("schema_1", "schema_2")
+
+# Prefixes of the statements producing a query plan, by dialect name.
+_EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN",
+    "postgresql": "EXPLAIN (COSTS OFF)",
+}
+
+
+@dataclass(frozen=True)
+class BenchmarkQuery:
+    """A GraphQL query in the benchmark corpus, with arguments for executing it."""
+
+    name: str
+    graphql_query: str
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    compilation_options: SQLCompilationOptions = field(default_factory=SQLCompilationOptions)
+
+
+@dataclass(frozen=True)
+class StageTimings:
+    """Seconds spent in each stage of compiling a query to SQL, the best of all repetitions."""
+
+    graphql_to_ir: float
+    lower_ir: float
+    emit_code_from_ir: float
+    string_compilation: float
+
+    @property
+    def total(self) -> float:
+        """Return the seconds spent compiling the query across all stages."""
+        return self.graphql_to_ir + self.lower_ir + self.emit_code_from_ir + self.string_compilation
+
+
+BENCHMARK_QUERIES = (
+    BenchmarkQuery(
+        name="traverse_and_filter",
+        graphql_query="""{
+            Animal {
+                name @output(out_name: "animal_name")
+                     @filter(op_name: "=", value: ["$animal_name"])
+                out_Animal_ParentOf {
+                    name @output(out_name: "child_name")
+                }
+            }
+        }""",
+        parameters={"animal_name": "Nazgul"},
+    ),
+    BenchmarkQuery(
+        name="optional_traverse",
+        graphql_query="""{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_ParentOf @optional {
+                    name @output(out_name: "child_name")
+                    out_Animal_ParentOf {
+                        name @output(out_name: "grandchild_name")
+                    }
+                }
+            }
+        }""",
+    ),
+    BenchmarkQuery(
+        name="fold_after_traverse",
+        graphql_query="""{
+            Animal {
+                name @output(out_name: "animal_name")
+                in_Animal_ParentOf {
+                    out_Animal_ParentOf @fold {
+                        name @output(out_name: "sibling_and_self_names_list")
+                    }
+                }
+            }
+        }""",
+    ),
+    BenchmarkQuery(
+        name="filter_within_fold",
+        graphql_query="""{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_ParentOf @fold {
+                    color @filter(op_name: "=", value: ["$color"])
+                    name @output(out_name: "child_names")
+                }
+            }
+        }""",
+        parameters={"color": "red"},
+    ),
+    BenchmarkQuery(
+        name="recurse_after_filter",
+        graphql_query="""{
+            Animal {
+                name @output(out_name: "animal_name")
+                     @filter(op_name: "=", value: ["$animal_name"])
+                out_Animal_ParentOf @recurse(depth: 3) {
+                    name @output(out_name: "descendant_name")
+                }
+            }
+        }""",
+        parameters={"animal_name": "Nazgul"},
+    ),
+    BenchmarkQuery(
+        name="recurse_after_traverse_with_cycle_pruning",
+        graphql_query="""{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    out_Animal_ParentOf @recurse(depth: 5) {
+                        name @output(out_name: "descendant_name")
+                    }
+                }
+            }
+        }""",
+        compilation_options=SQLCompilationOptions(prune_recursion_cycles=True),
+    ),
+    BenchmarkQuery(
+        name="small_in_collection",
+        graphql_query="""{
+            Animal {
+                name @output(out_name: "animal_name")
+                     @filter(op_name: "in_collection", value: ["$names"])
+            }
+        }""",
+        parameters={"names": [f"Animal {index}" for index in range(10)]},
+    ),
+    BenchmarkQuery(
+        name="large_in_collection",
+        graphql_query="""{
+            Animal {
+                name @output(out_name: "animal_name")
+                     @filter(op_name: "in_collection", value: ["$names"])
+            }
+        }""",
+        parameters={"names": [f"Animal {index}" for index in range(5000)]},
+    ),
+)
+
+
+class _Explain(Executable, ClauseElement):
+    """An EXPLAIN statement for a query, keeping the query's bound parameters."""
+
+    def __init__(self, query: Select) -> None:
+        """Construct an EXPLAIN statement for the given query."""
+        self.query = query
+
+
+@compiles(_Explain)
+def _compile_explain(element, compiler, **kw):
+    """Compile the EXPLAIN statement for the dialect it is being compiled for."""
+    dialect_name = compiler.dialect.name
+    if dialect_name not in _EXPLAIN_PREFIXES:
+        raise NotImplementedError(f"Producing query plans is not supported for {dialect_name}.")
+    return f"{_EXPLAIN_PREFIXES[dialect_name]} {compiler.process(element.query, **kw)}"
+
+
+def _time_best_of(repetitions: int, function: Callable[[], T]) -> Tuple[float, T]:
+    """Return the shortest time in seconds that calling the function took, and its result."""
+    best_time = None
+    result = None
+    for _ in range(repetitions):
+        start_time = time.perf_counter()
+        result = function()
+        elapsed_time = time.perf_counter() - start_time
+        if best_time is None or elapsed_time < best_time:
+            best_time = elapsed_time
+    if best_time is None:
+        raise AssertionError(f"Expected a positive number of repetitions, got {repetitions}.")
+    return best_time, result
+
+
+def _get_sqlite_stand_in_engine() -> Engine:
+    """Return an engine for an in-memory SQLite database with empty tables of the test schema."""
+    engine = sqlalchemy.create_engine("sqlite://")
+
+    # SQLite has no schemas, but an attached database can be referenced in the same way.
+    @sqlalchemy.event.listens_for(engine, "connect")
+    def attach_test_schemas(dbapi_connection, connection_record):
+        """Attach an empty in-memory database under the name of each test schema."""
+        for schema_name in _TEST_SCHEMA_NAMES:
+            dbapi_connection.execute(f"ATTACH DATABASE ':memory:' AS {schema_name}")
+
+    _get_plan_schema_info(engine).vertex_name_to_table["Animal"].metadata.create_all(engine)
+    return engine
+
+
+def _get_plan_schema_info(engine: Engine) -> SQLAlchemySchemaInfo:
+    """Return the schema info of the test schema, for emitting queries to the given engine."""
+    # Outside of MSSQL, the test tables are in the same schemas regardless of dialect.
+    return replace(get_sqlalchemy_schema_info("postgresql"), dialect=engine.dialect)
+
+
+######
+# Public API
+######
+
+
+def time_sql_compilation(
+    sql_schema_info: SQLAlchemySchemaInfo, benchmark_query: BenchmarkQuery, repetitions: int
+) -> StageTimings:
+    """Time each stage of compiling the given query to SQL.
+
+    Args:
+        sql_schema_info: SQLAlchemySchemaInfo used to compile the query
+        benchmark_query: query to compile
+        repetitions: number of times to run each stage. The fastest run of each stage is reported,
+                     as it is the one least affected by unrelated activity on the machine.
+
+    Returns:
+        StageTimings for the query
+    """
+    graphql_to_ir_time, ir = _time_best_of(
+        repetitions,
+        lambda: graphql_to_ir(
+            sql_schema_info.schema,
+            benchmark_query.graphql_query,
+            type_equivalence_hints=sql_schema_info.type_equivalence_hints,
+        ),
+    )
+    lower_ir_time, lowered_ir = _time_best_of(
+        repetitions, lambda: sql_backend.lower_func(sql_schema_info, ir)
+    )
+    emit_code_from_ir_time, query = _time_best_of(
+        repetitions,
+        lambda: emit_code_from_ir(
+            sql_schema_info, lowered_ir, compilation_options=benchmark_query.compilation_options
+        ),
+    )
+    string_compilation_time, _ = _time_best_of(
+        repetitions, lambda: str(query.compile(dialect=sql_schema_info.dialect))
+    )
+    return StageTimings(
+        graphql_to_ir=graphql_to_ir_time,
+        lower_ir=lower_ir_time,
+        emit_code_from_ir=emit_code_from_ir_time,
+        string_compilation=string_compilation_time,
+    )
+
+
+def get_query_plan(engine: Engine, benchmark_query: BenchmarkQuery) -> Optional[List[str]]:
+    """Return the plan the database chooses for the given query, or None if it can't be emitted.
+
+    Args:
+        engine: engine connected to a database containing the tables of the test schema. Its
+                dialect must be SQLite or PostgreSQL.
+        benchmark_query: query whose plan to produce
+
+    Returns:
+        list of strings, one per line of the query plan. None if the compiler doesn't support
+        emitting the query for the engine's dialect.
+    """
+    sql_schema_info = _get_plan_schema_info(engine)
+    try:
+        compilation_result = graphql_to_sql(
+            sql_schema_info,
+            benchmark_query.graphql_query,
+            benchmark_query.parameters,
+            compilation_options=benchmark_query.compilation_options,
+        )
+    except NotImplementedError:
+        return None
+
+    with engine.connect() as connection:
+        plan_rows = connection.execute(_Explain(compilation_result.query)).fetchall()
+
+    if engine.dialect.name == "sqlite":
+        # SQLite plans are trees given as (node id, parent id, unused, description) rows.
+        # Node ids depend on the number of bytecode instructions, so they are dropped in favor
+        # of indenting each node by its depth in the tree.
+        node_depths = {0: -1}
+        plan_lines = []
+        for node_id, parent_id, _, description in plan_rows:
+            node_depths[node_id] = node_depths.get(parent_id, -1) + 1
+            plan_lines.append("  " * node_depths[node_id] + description)
+        return plan_lines
+    else:
+        return [plan_row[0] for plan_row in plan_rows]
+
+
+def get_query_plans(engine: Engine) -> Dict[str, Optional[List[str]]]:
+    """Return the query plan of each query in the benchmark corpus, keyed by query name."""
+    return {
+        benchmark_query.name: get_query_plan(engine, benchmark_query)
+        for benchmark_query in BENCHMARK_QUERIES
+    }
+
+
+def get_sqlite_query_plans() -> Dict[str, Optional[List[str]]]:
+    """Return the query plans that the SQLite stand-in database chooses for the corpus."""
+    return get_query_plans(_get_sqlite_stand_in_engine())
+
+
+def load_plan_snapshot() -> Dict[str, Any]:
+    """Load the snapshot of SQLite query plans, and the SQLite version that produced them."""
+    with open(PLAN_SNAPSHOT_PATH, "r") as snapshot_file:
+        return json.load(snapshot_file)
+
+
+def get_plan_differences(
+    expected_plans: Dict[str, Optional[List[str]]], actual_plans: Dict[str, Optional[List[str]]]
+) -> List[str]:
+    """Return a description of every query whose plan differs between the two sets of plans."""
+    differences = []
+    for query_name in sorted(set(expected_plans.keys()) | set(actual_plans.keys())):
+        expected_plan = expected_plans.get(query_name)
+        actual_plan = actual_plans.get(query_name)
+        if expected_plan != actual_plan:
+            differences.append(
+                f"Plan for query {query_name} changed.\n"
+                f"Expected:\n{json.dumps(expected_plan, indent=4)}\n"
+                f"Actual:\n{json.dumps(actual_plan, indent=4)}"
+            )
+    return differences
+
+
+def _write_line(line: str) -> None:
+    """Write a line of the benchmark report to standard output."""
+    sys.stdout.write(line + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark, print its results, and return the process exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--repetitions", type=int, default=20, help="number of times to run each stage"
+    )
+    parser.add_argument(
+        "--plan-database-url",
+        default=None,
+        help="URL of a PostgreSQL database with the test schema to produce query plans with. "
+        "By default, an in-memory SQLite database is used, and plans are checked against the "
+        "snapshot.",
+    )
+    parser.add_argument(
+        "--update-plan-snapshots",
+        action="store_true",
+        help="overwrite the SQLite query plan snapshot with the current plans",
+    )
+    args = parser.parse_args(argv)
+
+    row_format = "{:<45} {:<12} {:>12} {:>12} {:>12} {:>12} {:>12}"
+    _write_line(
+        row_format.format(
+            "query", "dialect", "to_ir (ms)", "lower (ms)", "emit (ms)", "string (ms)", "total (ms)"
+        )
+    )
+    for dialect in BENCHMARKED_DIALECTS:
+        sql_schema_info = get_sqlalchemy_schema_info(dialect)
+        for benchmark_query in BENCHMARK_QUERIES:
+            try:
+                timings = time_sql_compilation(sql_schema_info, benchmark_query, args.repetitions)
+            except NotImplementedError:
+                _write_line(row_format.format(benchmark_query.name, dialect, *(["n/a"] * 5)))
+                continue
+            _write_line(
+                row_format.format(
+                    benchmark_query.name,
+                    dialect,
+                    *(
+                        f"{1000 * stage_time:.3f}"
+                        for stage_time in (
+                            timings.graphql_to_ir,
+                            timings.lower_ir,
+                            timings.emit_code_from_ir,
+                            timings.string_compilation,
+                            timings.total,
+                        )
+                    ),
+                )
+            )
+
+    if args.plan_database_url is not None:
+        plans = get_query_plans(sqlalchemy.create_engine(args.plan_database_url))
+        _write_line(json.dumps(plans, indent=4))
+        return 0
+
+    plans = get_sqlite_query_plans()
+    if args.update_plan_snapshots:
+        with open(PLAN_SNAPSHOT_PATH, "w") as snapshot_file:
+            json.dump(
+                {"sqlite_version": sqlite3.sqlite_version, "plans": plans},
+                snapshot_file,
+                indent=4,
+                sort_keys=True,
+            )
+            snapshot_file.write("\n")
+        _write_line(f"Updated query plan snapshot at {PLAN_SNAPSHOT_PATH}.")
+        return 0
+
+    snapshot = load_plan_snapshot()
+    if snapshot["sqlite_version"] != sqlite3.sqlite_version:
+        _write_line(
+            f"Query plan snapshot was produced with SQLite {snapshot['sqlite_version']}, but "
+            f"SQLite {sqlite3.sqlite_version} is installed. Plans were not compared."
+        )
+        return 0
+    differences = get_plan_differences(snapshot["plans"], plans)
+    for difference in differences:
+        _write_line(difference)
+    if differences:
+        return 1
+    _write_line("All query plans match the snapshot.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
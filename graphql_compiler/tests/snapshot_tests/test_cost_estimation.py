@@ -31,6 +31,18 @@ from ...schema_generation.schema_graph import SchemaGraph
 from ..test_helpers import generate_schema_graph
 
 
+def _get_expected_animals_reached_by_recursion() -> float:
+    """Return the Animals reached per Animal by a depth 2 recursion, with 7 Animals and 11 edges."""
+    # Each Animal has 11.0 / 7.0 "child" Animals, leading to random Animals. Only the ones that
+    # were not reached before are new: with N Animals of which U are unreached, M edges reach
+    # U * (1 - exp(-M / N)) new Animals on average. Since recurse first explores depth=0, the
+    # parent Animal itself is reached too.
+    animals_at_depth_1 = 6.0 * (1 - math.exp(-(11.0 / 7.0) / 7.0))
+    edges_at_depth_2 = animals_at_depth_1 * 11.0 / 7.0
+    animals_at_depth_2 = (7.0 - 1 - animals_at_depth_1) * (1 - math.exp(-edges_at_depth_2 / 7.0))
+    return 1 + animals_at_depth_1 + animals_at_depth_2
+
+
 def _intersect_and_check_int_intervals(test_case, interval_a, interval_b):
     """Run intersect_int_intervals and assert commutativity."""
     result_1 = intersect_int_intervals(interval_a, interval_b)
@@ -515,10 +527,8 @@ class CostEstimationTests(unittest.TestCase):
             schema_graph, statistics, graphql_input, dict()
         )
 
-        # For each Animal, we expect 11.0 / 7.0 "child" Animals. Since recurse first explores
-        # depth=0, we add 1 to account for the parent. At the moment, we don't account for depths
-        # greater than 1, so we expect 7.0 * (11.0 / 7.0 + 1) results.
-        expected_cardinality_estimate = 7.0 * (11.0 / 7.0 + 1)
+        # For each Animal, we expect the Animals reached at depths 0, 1 and 2.
+        expected_cardinality_estimate = 7.0 * _get_expected_animals_reached_by_recursion()
         self.assertAlmostEqual(expected_cardinality_estimate, cardinality_estimate)
 
     @pytest.mark.usefixtures("snapshot_orientdb_client")
@@ -547,11 +557,11 @@ class CostEstimationTests(unittest.TestCase):
             schema_graph, statistics, graphql_input, dict()
         )
 
-        # For each Animal, we expect 11.0 / 7.0 "child" Animals. Since recurse first explores
-        # depth=0, we add 1 to account for the parent. At the moment, we don't account for depths
-        # greater than 1, so we expect 11.0 / 7.0 + 1 total children, each of which has 13.0 / 7.0
-        # Animal_BornAt edges.
-        expected_cardinality_estimate = 7.0 * (11.0 / 7.0 + 1) * (13.0 / 7.0)
+        # For each Animal, we expect the Animals reached at depths 0, 1 and 2, each of which has
+        # 13.0 / 7.0 Animal_BornAt edges.
+        expected_cardinality_estimate = (
+            7.0 * _get_expected_animals_reached_by_recursion() * (13.0 / 7.0)
+        )
         self.assertAlmostEqual(expected_cardinality_estimate, cardinality_estimate)
 
     @pytest.mark.usefixtures("snapshot_orientdb_client")
@@ -881,7 +891,7 @@ class CostEstimationTests(unittest.TestCase):
             schema_graph, statistics, graphql_input, params
         )
 
-        # For each Animal, we expect 11.0 / 7.0 + 1 "child" Animals due to the recurse. Since
+        # For each Animal, we expect several "child" Animals due to the recurse. Since
         # there's a filter immediately following, we only expect 1 Animal to pass. We expect this to
         # have 13.0 / 7.0 Animal_BornAt edges, giving a total of 7.0 * (13.0 / 7.0) results.
         expected_cardinality_estimate = 7.0 * 1.0 * (13.0 / 7.0)
@@ -916,10 +926,10 @@ class CostEstimationTests(unittest.TestCase):
             schema_graph, statistics, graphql_input, params
         )
 
-        # For each Animal, we expect 11.0 / 7.0 + 1 "child" Animals due to the recurse. Since
-        # there's a filter immediately following, we only expect 1 Animal to pass. We expect this to
-        # have 13.0 / 7.0 Animal_BornAt edges, giving a total of 7.0 * (13.0 / 7.0) results.
-        expected_cardinality_estimate = 7.0 * (11.0 / 7.0 + 1.0) * 1.0
+        # For each Animal, we expect the Animals reached at depths 0, 1 and 2 due to the recurse.
+        # Since there's a filter on their Animal_BornAt neighbors, we only expect 1 of those to
+        # pass per Animal reached.
+        expected_cardinality_estimate = 7.0 * _get_expected_animals_reached_by_recursion() * 1.0
         self.assertAlmostEqual(expected_cardinality_estimate, cardinality_estimate)
 
     @pytest.mark.usefixtures("snapshot_orientdb_client")
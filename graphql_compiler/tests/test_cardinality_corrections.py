@@ -0,0 +1,117 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import dataclasses
+import os
+import tempfile
+import unittest
+
+from ..cost_estimation.analysis import analyze_query_string, record_observed_cardinality
+from ..cost_estimation.cardinality_corrections import CardinalityCorrections
+from ..cost_estimation.cardinality_estimator import get_cardinality_correction_keys
+from ..cost_estimation.statistics import LocalStatistics
+from ..global_utils import QueryStringWithParameters
+from .test_helpers import get_query_planning_schema_info
+
+
+class CardinalityCorrectionsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        statistics = LocalStatistics(
+            {"Animal": 1000, "Animal_ParentOf": 1000, "Species": 10, "Animal_OfSpecies": 1000},
+            vertex_edge_vertex_counts={
+                ("Animal", "Animal_ParentOf", "Animal"): 1000,
+                ("Animal", "Animal_OfSpecies", "Species"): 1000,
+            },
+            distinct_field_values_counts={("Animal", "name"): 1000},
+        )
+        self.schema_info = dataclasses.replace(
+            get_query_planning_schema_info(statistics),
+            cardinality_corrections=CardinalityCorrections(),
+        )
+        self.query_string = """{
+            Animal {
+                name @filter(op_name: "=", value: ["$name"]) @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    name @output(out_name: "child_name")
+                }
+                out_Animal_OfSpecies @fold {
+                    name @output(out_name: "species_names")
+                }
+            }
+        }"""
+
+    def _estimate_cardinality(self, name: str) -> float:
+        """Return the cardinality estimate for the test query with the given name."""
+        query = QueryStringWithParameters(self.query_string, {"name": name})
+        return analyze_query_string(self.schema_info, query).cardinality_estimate
+
+    def test_correction_keys_exclude_folds(self) -> None:
+        query_analysis = analyze_query_string(
+            self.schema_info, QueryStringWithParameters(self.query_string, {"name": "Bob"})
+        )
+        self.assertEqual(
+            (
+                [("Animal", "out_Animal_ParentOf")],
+                [("Animal", ((("name",), "="),))],
+            ),
+            get_cardinality_correction_keys(query_analysis.metadata_table),
+        )
+
+    def test_estimates_converge_to_observed_cardinality(self) -> None:
+        # Names are far less diverse than the statistics claim, and so are parents.
+        self.assertAlmostEqual(1.0, self._estimate_cardinality("Bob"))
+        for name in ("Bob", "Alice", "Eve", "Dave") * 5:
+            query = QueryStringWithParameters(self.query_string, {"name": name})
+            record_observed_cardinality(analyze_query_string(self.schema_info, query), 200)
+
+        # Corrections learned from some parameters also apply to new ones.
+        self.assertAlmostEqual(200.0, self._estimate_cardinality("Carol"), delta=1.0)
+
+        # The filter and the traversal share the correction evenly.
+        corrections = self.schema_info.cardinality_corrections
+        self.assertAlmostEqual(
+            200.0 ** 0.5,
+            corrections.get_traversal_correction("Animal", "out_Animal_ParentOf"),
+            delta=0.1,
+        )
+
+    def test_corrections_are_bounded(self) -> None:
+        corrections = CardinalityCorrections(learning_rate=1.0, max_correction=10.0)
+        for _ in range(5):
+            corrections.record_observation([("Animal", "out_Animal_ParentOf")], [], 1.0, 1e9)
+        self.assertAlmostEqual(
+            10.0, corrections.get_traversal_correction("Animal", "out_Animal_ParentOf")
+        )
+
+        # Empty results are treated as a single row, so they do not cause infinite corrections.
+        corrections.record_observation([("Animal", "out_Animal_ParentOf")], [], 10.0, 0)
+        self.assertAlmostEqual(
+            1.0, corrections.get_traversal_correction("Animal", "out_Animal_ParentOf")
+        )
+
+    def test_corrections_round_trip_through_file(self) -> None:
+        for _ in range(3):
+            query = QueryStringWithParameters(self.query_string, {"name": "Bob"})
+            record_observed_cardinality(analyze_query_string(self.schema_info, query), 50)
+        corrected_estimate = self._estimate_cardinality("Bob")
+
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            file_path = os.path.join(temporary_directory, "corrections.json")
+            self.schema_info.cardinality_corrections.save(file_path)
+            loaded_corrections = CardinalityCorrections.load(file_path)
+
+        self.assertEqual(
+            self.schema_info.cardinality_corrections.to_dict(), loaded_corrections.to_dict()
+        )
+        self.schema_info = dataclasses.replace(
+            self.schema_info, cardinality_corrections=loaded_corrections
+        )
+        self.assertAlmostEqual(corrected_estimate, self._estimate_cardinality("Bob"))
+
+    def test_recording_requires_corrections(self) -> None:
+        schema_info = dataclasses.replace(self.schema_info, cardinality_corrections=None)
+        query_analysis = analyze_query_string(
+            schema_info, QueryStringWithParameters(self.query_string, {"name": "Bob"})
+        )
+        with self.assertRaises(AssertionError):
+            record_observed_cardinality(query_analysis, 10)
@@ -2343,10 +2343,9 @@ class CompilerTests(unittest.TestCase):
             ])}
         """
         expected_mssql = """
-            WITH anon_1(name, parent, uuid, __cte_key, __cte_depth) AS (
+            WITH anon_1(name, uuid, __cte_key, __cte_depth) AS (
                 SELECT
                     [Animal_2].name AS name,
-                    [Animal_2].parent AS parent,
                     [Animal_2].uuid AS uuid,
                     [Animal_2].uuid AS __cte_key,
                     0 AS __cte_depth
@@ -2355,7 +2354,6 @@ class CompilerTests(unittest.TestCase):
                 UNION ALL
                 SELECT
                     [Animal_3].name AS name,
-                    [Animal_3].parent AS parent,
                     [Animal_3].uuid AS uuid,
                     anon_1.__cte_key AS __cte_key,
                     anon_1.__cte_depth + 1 AS __cte_depth
@@ -2379,10 +2377,9 @@ class CompilerTests(unittest.TestCase):
             RETURN Animal__out_Animal_ParentOf___1.name AS `relation_name`
         """
         expected_postgresql = """
-            WITH RECURSIVE anon_1(name, parent, uuid, __cte_key, __cte_depth) AS (
+            WITH RECURSIVE anon_1(name, uuid, __cte_key, __cte_depth) AS (
                 SELECT
                     "Animal_2".name AS name,
-                    "Animal_2".parent AS parent,
                     "Animal_2".uuid AS uuid,
                     "Animal_2".uuid AS __cte_key,
                     0 AS __cte_depth
@@ -2391,7 +2388,6 @@ class CompilerTests(unittest.TestCase):
                 UNION ALL
                 SELECT
                     "Animal_3".name AS name,
-                    "Animal_3".parent AS parent,
                     "Animal_3".uuid AS uuid,
                     anon_1.__cte_key AS __cte_key,
                     anon_1.__cte_depth + 1 AS __cte_depth
@@ -2428,21 +2424,17 @@ class CompilerTests(unittest.TestCase):
             WITH anon_2 AS (
                 SELECT
                     [Species_1].name AS [Species__name],
-                    [Species_1].uuid AS [Species__uuid],
                     [Animal_1].name AS [Species_in_Animal_OfSpecies__name],
-                    [Animal_1].parent AS [Species_in_Animal_OfSpecies__parent],
-                    [Animal_1].species AS [Species_in_Animal_OfSpecies__species],
                     [Animal_1].uuid AS [Species_in_Animal_OfSpecies__uuid]
                 FROM
                     db_1.schema_1.[Species] AS [Species_1]
                     JOIN db_1.schema_1.[Animal] AS [Animal_1]
                         ON [Species_1].uuid = [Animal_1].species
             ),
-            anon_1(name, parent, uuid, __cte_key, __cte_depth) AS (
+            anon_1(name, parent, __cte_key, __cte_depth) AS (
                 SELECT
                     [Animal_2].name AS name,
                     [Animal_2].parent AS parent,
-                    [Animal_2].uuid AS uuid,
                     [Animal_2].uuid AS __cte_key,
                     0 AS __cte_depth
                 FROM
@@ -2455,7 +2447,6 @@ class CompilerTests(unittest.TestCase):
                     SELECT
                         [Animal_3].name AS name,
                         [Animal_3].parent AS parent,
-                        [Animal_3].uuid AS uuid,
                         anon_1.__cte_key AS __cte_key,
                         anon_1.__cte_depth + 1 AS __cte_depth
                     FROM
@@ -2478,20 +2469,16 @@ class CompilerTests(unittest.TestCase):
         WITH RECURSIVE anon_2 AS (
             SELECT
                 "Species_1".name AS "Species__name",
-                "Species_1".uuid AS "Species__uuid",
                 "Animal_1".name AS "Species_in_Animal_OfSpecies__name",
-                "Animal_1".parent AS "Species_in_Animal_OfSpecies__parent",
-                "Animal_1".species AS "Species_in_Animal_OfSpecies__species",
                 "Animal_1".uuid AS "Species_in_Animal_OfSpecies__uuid"
             FROM
                 schema_1."Species" AS "Species_1"
                 JOIN schema_1."Animal" AS "Animal_1"
                     ON "Species_1".uuid = "Animal_1".species),
-        anon_1(name, parent, uuid, __cte_key, __cte_depth) AS (
+        anon_1(name, parent, __cte_key, __cte_depth) AS (
             SELECT
                 "Animal_2".name AS name,
                 "Animal_2".parent AS parent,
-                "Animal_2".uuid AS uuid,
                 "Animal_2".uuid AS __cte_key,
                 0 AS __cte_depth
             FROM
@@ -2502,7 +2489,6 @@ class CompilerTests(unittest.TestCase):
             SELECT
                 "Animal_3".name AS name,
                 "Animal_3".parent AS parent,
-                "Animal_3".uuid AS uuid,
                 anon_1.__cte_key AS __cte_key,
                 anon_1.__cte_depth + 1 AS __cte_depth
             FROM
@@ -2538,17 +2524,15 @@ class CompilerTests(unittest.TestCase):
         expected_mssql = """
             WITH anon_2 AS (
                 SELECT
-                    [Animal_1].name AS [Animal__name],
                     [Animal_1].uuid AS [Animal__uuid]
                 FROM
                     db_1.schema_1.[Animal] AS [Animal_1]
                 WHERE
                     [Animal_1].name = :animal_name),
-            anon_1(color, name, parent, uuid, __cte_key, __cte_depth) AS (
+            anon_1(color, name, uuid, __cte_key, __cte_depth) AS (
                 SELECT
                     [Animal_2].color AS color,
                     [Animal_2].name AS name,
-                    [Animal_2].parent AS parent,
                     [Animal_2].uuid AS uuid,
                     [Animal_2].uuid AS __cte_key,
                     0 AS __cte_depth
@@ -2560,7 +2544,6 @@ class CompilerTests(unittest.TestCase):
                 SELECT
                     [Animal_3].color AS color,
                     [Animal_3].name AS name,
-                    [Animal_3].parent AS parent,
                     [Animal_3].uuid AS uuid,
                     anon_1.__cte_key AS __cte_key,
                     anon_1.__cte_depth + 1 AS __cte_depth
@@ -2599,16 +2582,14 @@ class CompilerTests(unittest.TestCase):
         expected_mssql = """
             WITH anon_2 AS (
                 SELECT
-                    [Animal_1].name AS [Animal__name],
                     [Animal_1].uuid AS [Animal__uuid]
                 FROM
                     db_1.schema_1.[Animal] AS [Animal_1]
                 WHERE
                     [Animal_1].name = :animal_name),
-            anon_1(name, parent, uuid, __cte_key, __cte_depth) AS (
+            anon_1(name, uuid, __cte_key, __cte_depth) AS (
                 SELECT
                     [Animal_2].name AS name,
-                    [Animal_2].parent AS parent,
                     [Animal_2].uuid AS uuid,
                     [Animal_2].uuid AS __cte_key,
                     0 AS __cte_depth
@@ -2619,7 +2600,6 @@ class CompilerTests(unittest.TestCase):
                 UNION ALL
                 SELECT
                     [Animal_3].name AS name,
-                    [Animal_3].parent AS parent,
                     [Animal_3].uuid AS uuid,
                     anon_1.__cte_key AS __cte_key,
                     anon_1.__cte_depth + 1 AS __cte_depth
@@ -2992,11 +2972,10 @@ class CompilerTests(unittest.TestCase):
             ])}
         """
         expected_mssql = """
-            WITH anon_1(color, name, parent, uuid, __cte_key, __cte_depth) AS (
+            WITH anon_1(color, name, uuid, __cte_key, __cte_depth) AS (
                 SELECT
                     [Animal_2].color AS color,
                     [Animal_2].name AS name,
-                    [Animal_2].parent AS parent,
                     [Animal_2].uuid AS uuid,
                     [Animal_2].uuid AS __cte_key,
                     0 AS __cte_depth
@@ -3006,7 +2985,6 @@ class CompilerTests(unittest.TestCase):
                 SELECT
                     [Animal_3].color AS color,
                     [Animal_3].name AS name,
-                    [Animal_3].parent AS parent,
                     [Animal_3].uuid AS uuid,
                     anon_1.__cte_key AS __cte_key,
                     anon_1.__cte_depth + 1 AS __cte_depth
@@ -3027,11 +3005,10 @@ class CompilerTests(unittest.TestCase):
         """
         expected_cypher = SKIP_TEST
         expected_postgresql = """
-            WITH RECURSIVE anon_1(color, name, parent, uuid, __cte_key, __cte_depth) AS (
+            WITH RECURSIVE anon_1(color, name, uuid, __cte_key, __cte_depth) AS (
                 SELECT
                     "Animal_2".color AS color,
                     "Animal_2".name AS name,
-                    "Animal_2".parent AS parent,
                     "Animal_2".uuid AS uuid,
                     "Animal_2".uuid AS __cte_key,
                     0 AS __cte_depth
@@ -3041,7 +3018,6 @@ class CompilerTests(unittest.TestCase):
                 SELECT
                     "Animal_3".color AS color,
                     "Animal_3".name AS name,
-                    "Animal_3".parent AS parent,
                     "Animal_3".uuid AS uuid,
                     anon_1.__cte_key AS __cte_key,
                     anon_1.__cte_depth + 1 AS __cte_depth
@@ -5591,10 +5567,9 @@ class CompilerTests(unittest.TestCase):
         expected_postgresql = SKIP_TEST
         expected_mssql = """
 
-        WITH anon_1(lives_in, parent, uuid, __cte_key, __cte_depth) AS (
+        WITH anon_1(lives_in, uuid, __cte_key, __cte_depth) AS (
             SELECT
                 [Animal_2].lives_in AS lives_in,
-                [Animal_2].parent AS parent,
                 [Animal_2].uuid AS uuid,
                 [Animal_2].uuid AS __cte_key,
                 0 AS __cte_depth
@@ -5603,7 +5578,6 @@ class CompilerTests(unittest.TestCase):
             UNION ALL
             SELECT
                 [Animal_3].lives_in AS lives_in,
-                [Animal_3].parent AS parent,
                 [Animal_3].uuid AS uuid,
                 anon_1.__cte_key AS __cte_key,
                 anon_1.__cte_depth + 1 AS __cte_depth
@@ -5656,6 +5630,152 @@ class CompilerTests(unittest.TestCase):
             expected_postgresql,
         )
 
+    def test_filter_and_fold_then_recurse(self) -> None:
+        # This is a regression test, checking that:
+        # - the CTE wrapping the query before the recursion exposes the fold subquery outputs
+        # - the CTE only exposes the columns that are used after the recursion, and not the ones
+        #   that were only needed for filtering or joining inside the CTE
+        #
+        # Testing in the SQL backends is sufficient.
+        test_data = test_input_data.filter_and_fold_then_recurse()
+
+        expected_mssql = """
+            WITH anon_1 AS (
+                SELECT
+                    [Animal_1].name AS [Animal__name],
+                    [Animal_1].uuid AS [Animal__uuid],
+                    folded_subquery_1.fold_output_name
+                        AS [Animal_out_Animal_LivesIn__fold_output_name]
+                FROM
+                    db_1.schema_1.[Animal] AS [Animal_1]
+                    JOIN (
+                        SELECT
+                            [Animal_2].uuid AS uuid,
+                            coalesce((
+                                SELECT
+                                    '|' + coalesce(
+                                        REPLACE(
+                                            REPLACE(
+                                                REPLACE([Location_1].name, '^', '^e'),
+                                            '~',
+                                            '^n'),
+                                        '|',
+                                        '^d'),
+                                    '~')
+                                FROM
+                                    db_1.schema_1.[Location] AS [Location_1]
+                                WHERE
+                                    [Animal_2].lives_in = [Location_1].uuid FOR XML PATH ('')),
+                            '') AS fold_output_name
+                        FROM db_1.schema_1.[Animal] AS [Animal_2]
+                    ) AS folded_subquery_1
+                        ON [Animal_1].uuid = folded_subquery_1.uuid
+                WHERE
+                    [Animal_1].name = :animal_name
+            ),
+            anon_2(name, uuid, __cte_key, __cte_depth) AS (
+                SELECT
+                    [Animal_3].name AS name,
+                    [Animal_3].uuid AS uuid,
+                    [Animal_3].uuid AS __cte_key,
+                    0 AS __cte_depth
+                FROM
+                    db_1.schema_1.[Animal] AS [Animal_3]
+                WHERE
+                    [Animal_3].uuid IN (SELECT anon_1.[Animal__uuid] FROM anon_1)
+                UNION ALL
+                SELECT
+                    [Animal_4].name AS name,
+                    [Animal_4].uuid AS uuid,
+                    anon_2.__cte_key AS __cte_key,
+                    anon_2.__cte_depth + 1 AS __cte_depth
+                FROM
+                    anon_2
+                    JOIN db_1.schema_1.[Animal] AS [Animal_4]
+                        ON anon_2.uuid = [Animal_4].parent
+                WHERE
+                    anon_2.__cte_depth < 1
+            )
+            SELECT
+                anon_1.[Animal__name] AS animal_name,
+                anon_1.[Animal_out_Animal_LivesIn__fold_output_name] AS homes_list,
+                anon_2.name AS relation_name
+            FROM
+                anon_1
+                JOIN anon_2
+                    ON anon_1.[Animal__uuid] = anon_2.__cte_key
+        """
+        expected_postgresql = """
+            WITH RECURSIVE anon_1 AS (
+                SELECT
+                    "Animal_1".name AS "Animal__name",
+                    "Animal_1".uuid AS "Animal__uuid",
+                    folded_subquery_1.fold_output_name
+                        AS "Animal_out_Animal_LivesIn__fold_output_name"
+                FROM
+                    schema_1."Animal" AS "Animal_1"
+                    LEFT OUTER JOIN (
+                        SELECT
+                            "Animal_2".uuid AS uuid,
+                            array_agg("Location_1".name) AS fold_output_name
+                        FROM
+                            schema_1."Animal" AS "Animal_2"
+                            JOIN schema_1."Location" AS "Location_1"
+                                ON "Animal_2".lives_in = "Location_1".uuid
+                        GROUP BY "Animal_2".uuid
+                    ) AS folded_subquery_1
+                        ON "Animal_1".uuid = folded_subquery_1.uuid
+                WHERE
+                    "Animal_1".name = :animal_name
+            ),
+            anon_2(name, uuid, __cte_key, __cte_depth) AS (
+                SELECT
+                    "Animal_3".name AS name,
+                    "Animal_3".uuid AS uuid,
+                    "Animal_3".uuid AS __cte_key,
+                    0 AS __cte_depth
+                FROM
+                    schema_1."Animal" AS "Animal_3"
+                WHERE
+                    "Animal_3".uuid IN (SELECT anon_1."Animal__uuid" FROM anon_1)
+                UNION ALL
+                SELECT
+                    "Animal_4".name AS name,
+                    "Animal_4".uuid AS uuid,
+                    anon_2.__cte_key AS __cte_key,
+                    anon_2.__cte_depth + 1 AS __cte_depth
+                FROM
+                    anon_2
+                    JOIN schema_1."Animal" AS "Animal_4"
+                        ON anon_2.uuid = "Animal_4".parent
+                WHERE
+                    anon_2.__cte_depth < 1
+            )
+            SELECT
+                anon_1."Animal__name" AS animal_name,
+                coalesce(
+                    anon_1."Animal_out_Animal_LivesIn__fold_output_name",
+                    ARRAY[]::VARCHAR[]
+                ) AS homes_list,
+                anon_2.name AS relation_name
+            FROM
+                anon_1
+                JOIN anon_2
+                    ON anon_1."Animal__uuid" = anon_2.__cte_key
+        """
+        expected_match = SKIP_TEST
+        expected_gremlin = SKIP_TEST
+        expected_cypher = SKIP_TEST
+        check_test_data(
+            self,
+            test_data,
+            expected_match,
+            expected_gremlin,
+            expected_mssql,
+            expected_cypher,
+            expected_postgresql,
+        )
+
     def test_fold_on_two_output_variables(self) -> None:
         test_data = test_input_data.fold_on_two_output_variables()
 
@@ -9899,7 +10019,6 @@ class CompilerTests(unittest.TestCase):
             WITH anon_1 AS (
                 SELECT
                     [Animal_1].name AS [Animal__name],
-                    [Animal_1].parent AS [Animal__parent],
                     [Animal_2].name AS [Animal_in_Animal_ParentOf__name],
                     [Animal_2].uuid AS [Animal_in_Animal_ParentOf__uuid]
                 FROM
@@ -9907,10 +10026,9 @@ class CompilerTests(unittest.TestCase):
                     LEFT OUTER JOIN db_1.schema_1.[Animal] AS [Animal_2]
                         ON [Animal_1].parent = [Animal_2].uuid
             ),
-            anon_2(name, parent, uuid, __cte_key, __cte_depth) AS (
+            anon_2(name, uuid, __cte_key, __cte_depth) AS (
                 SELECT
                     [Animal_3].name AS name,
-                    [Animal_3].parent AS parent,
                     [Animal_3].uuid AS uuid,
                     [Animal_3].uuid AS __cte_key,
                     0 AS __cte_depth
@@ -9921,7 +10039,6 @@ class CompilerTests(unittest.TestCase):
                 UNION ALL
                 SELECT
                     [Animal_4].name AS name,
-                    [Animal_4].parent AS parent,
                     [Animal_4].uuid AS uuid,
                     anon_2.__cte_key AS __cte_key,
                     anon_2.__cte_depth + 1 AS __cte_depth
@@ -9949,7 +10066,6 @@ class CompilerTests(unittest.TestCase):
             WITH RECURSIVE anon_1 AS (
                 SELECT
                     "Animal_1".name AS "Animal__name",
-                    "Animal_1".parent AS "Animal__parent",
                     "Animal_2".name AS "Animal_in_Animal_ParentOf__name",
                     "Animal_2".uuid AS "Animal_in_Animal_ParentOf__uuid"
                 FROM
@@ -9957,10 +10073,9 @@ class CompilerTests(unittest.TestCase):
                     LEFT OUTER JOIN schema_1."Animal" AS "Animal_2"
                         ON "Animal_1".parent = "Animal_2".uuid
             ),
-            anon_2(name, parent, uuid, __cte_key, __cte_depth) AS (
+            anon_2(name, uuid, __cte_key, __cte_depth) AS (
                 SELECT
                     "Animal_3".name AS name,
-                    "Animal_3".parent AS parent,
                     "Animal_3".uuid AS uuid,
                     "Animal_3".uuid AS __cte_key,
                     0 AS __cte_depth
@@ -9971,7 +10086,6 @@ class CompilerTests(unittest.TestCase):
                 UNION ALL
                 SELECT
                     "Animal_4".name AS name,
-                    "Animal_4".parent AS parent,
                     "Animal_4".uuid AS uuid,
                     anon_2.__cte_key AS __cte_key,
                     anon_2.__cte_depth + 1 AS __cte_depth
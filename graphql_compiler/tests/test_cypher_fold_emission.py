@@ -0,0 +1,84 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import unittest
+
+from . import test_input_data
+from ..compiler import CypherCompilationOptions, compile_graphql_to_cypher
+from .test_helpers import compare_cypher, get_common_schema_info
+
+
+class CypherFoldEmissionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.common_schema_info = get_common_schema_info()
+        self.compilation_options = CypherCompilationOptions(
+            use_pattern_comprehensions_for_folds=True
+        )
+
+    def test_multiple_folds(self) -> None:
+        graphql_input = test_input_data.multiple_folds().graphql_input
+        expected_cypher = """
+            MATCH (Animal___1:Animal)
+            WITH
+              Animal___1 AS Animal___1,
+              [(Animal___1)<-[:Animal_ParentOf]-(Animal__in_Animal_ParentOf___1:Animal) |
+                Animal__in_Animal_ParentOf___1] AS collected_Animal__in_Animal_ParentOf___1,
+              [(Animal___1)-[:Animal_ParentOf]->(Animal__out_Animal_ParentOf___1:Animal) |
+                Animal__out_Animal_ParentOf___1] AS collected_Animal__out_Animal_ParentOf___1
+            RETURN
+              Animal___1.name AS `animal_name`,
+              [x IN collected_Animal__out_Animal_ParentOf___1 | x.name] AS `child_names_list`,
+              [x IN collected_Animal__out_Animal_ParentOf___1 | x.uuid] AS `child_uuids_list`,
+              [x IN collected_Animal__in_Animal_ParentOf___1 | x.name] AS `parent_names_list`,
+              [x IN collected_Animal__in_Animal_ParentOf___1 | x.uuid] AS `parent_uuids_list`
+        """
+        result = compile_graphql_to_cypher(
+            self.common_schema_info, graphql_input, compilation_options=self.compilation_options
+        )
+        compare_cypher(self, expected_cypher, result.query)
+
+    def test_filters_within_multi_step_fold(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                     @filter(op_name: "=", value: ["$animal_name"])
+                in_Animal_ParentOf @fold {
+                    net_worth @filter(op_name: ">", value: ["$parent_min_worth"])
+                    in_Animal_ParentOf {
+                        name @output(out_name: "grand_parent_list")
+                    }
+                }
+            }
+        }"""
+        # The mandatory filter outside the fold scope is applied before any folded vertices are
+        # collected, and the filters of all steps in the fold scope apply to its folded vertices.
+        expected_cypher = """
+            MATCH (Animal___1:Animal)
+              WHERE (Animal___1.name = $animal_name)
+            WITH
+              Animal___1 AS Animal___1,
+              [(Animal___1)<-[:Animal_ParentOf]-(Animal__in_Animal_ParentOf___1:Animal)
+                <-[:Animal_ParentOf]-(Animal__in_Animal_ParentOf__in_Animal_ParentOf___1:Animal)
+                WHERE (Animal__in_Animal_ParentOf___1.net_worth > $parent_min_worth) |
+                Animal__in_Animal_ParentOf__in_Animal_ParentOf___1] AS
+                collected_Animal__in_Animal_ParentOf__in_Animal_ParentOf___1
+            RETURN
+              Animal___1.name AS `animal_name`,
+              [x IN collected_Animal__in_Animal_ParentOf__in_Animal_ParentOf___1 | x.name] AS
+                `grand_parent_list`
+        """
+        result = compile_graphql_to_cypher(
+            self.common_schema_info, graphql_input, compilation_options=self.compilation_options
+        )
+        compare_cypher(self, expected_cypher, result.query)
+
+    def test_default_emission_is_unchanged(self) -> None:
+        graphql_input = test_input_data.multiple_folds().graphql_input
+        expected_result = compile_graphql_to_cypher(self.common_schema_info, graphql_input)
+        result = compile_graphql_to_cypher(
+            self.common_schema_info,
+            graphql_input,
+            compilation_options=CypherCompilationOptions(),
+        )
+        self.assertEqual(expected_result.query, result.query)
+        self.assertIn("OPTIONAL MATCH", result.query)
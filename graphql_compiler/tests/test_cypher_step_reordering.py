@@ -0,0 +1,125 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import unittest
+
+from ..compiler import CypherCompilationOptions, compile_graphql_to_cypher
+from ..cost_estimation.statistics import LocalStatistics
+from .test_helpers import compare_cypher, get_common_schema_info, get_query_planning_schema_info
+
+
+class CypherStepReorderingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.common_schema_info = get_common_schema_info()
+
+    def test_anchor_at_most_selective_vertex(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @filter(op_name: "=", value: ["$animal_name"])
+                     @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    name @output(out_name: "child_name")
+                    out_Animal_OfSpecies {
+                        name @filter(op_name: "=", value: ["$species_name"])
+                             @output(out_name: "species_name")
+                    }
+                }
+                out_Animal_FedAt @optional {
+                    name @output(out_name: "event_name")
+                }
+            }
+        }"""
+        statistics = LocalStatistics(
+            {"Animal": 100000000, "Species": 50},
+            distinct_field_values_counts={("Animal", "name"): 1000, ("Species", "name"): 50},
+        )
+        compilation_options = CypherCompilationOptions(
+            query_planning_schema_info=get_query_planning_schema_info(statistics),
+            parameters={"animal_name": "Bob", "species_name": "Beaver"},
+        )
+
+        # The pattern is anchored at the Species vertex, and its edges are reversed to reach
+        # the remaining vertices. The optional traversal stays after all mandatory ones.
+        expected_cypher = """
+            MATCH (Animal__out_Animal_ParentOf__out_Animal_OfSpecies___1:Species)
+                WHERE (Animal__out_Animal_ParentOf__out_Animal_OfSpecies___1.name = $species_name)
+            MATCH (Animal__out_Animal_ParentOf__out_Animal_OfSpecies___1)
+                <-[:Animal_OfSpecies]-(Animal__out_Animal_ParentOf___1:Animal)
+            MATCH (Animal__out_Animal_ParentOf___1)<-[:Animal_ParentOf]-(Animal___1:Animal)
+                WHERE (Animal___1.name = $animal_name)
+            OPTIONAL MATCH (Animal___1)-[:Animal_FedAt]->(Animal__out_Animal_FedAt___1:FeedingEvent)
+            RETURN
+                Animal___1.name AS `animal_name`,
+                Animal__out_Animal_ParentOf___1.name AS `child_name`,
+                (CASE WHEN (Animal__out_Animal_FedAt___1 IS NOT null)
+                 THEN Animal__out_Animal_FedAt___1.name ELSE null END) AS `event_name`,
+                Animal__out_Animal_ParentOf__out_Animal_OfSpecies___1.name AS `species_name`
+        """
+        result = compile_graphql_to_cypher(
+            self.common_schema_info, graphql_input, compilation_options=compilation_options
+        )
+        compare_cypher(self, expected_cypher, result.query)
+
+    def test_tagged_filter_deferred_until_tag_is_matched(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @tag(tag_name: "animal_name") @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    name @filter(op_name: "=", value: ["%animal_name"])
+                         @output(out_name: "child_name")
+                    out_Animal_OfSpecies {
+                        name @filter(op_name: "=", value: ["$species_name"])
+                             @output(out_name: "species_name")
+                    }
+                }
+            }
+        }"""
+        statistics = LocalStatistics(
+            {"Animal": 100000000, "Species": 50},
+            distinct_field_values_counts={("Animal", "name"): 1000, ("Species", "name"): 50},
+        )
+        compilation_options = CypherCompilationOptions(
+            query_planning_schema_info=get_query_planning_schema_info(statistics),
+            parameters={"species_name": "Beaver"},
+        )
+
+        # The child Animal is matched before its parent, so its filter that uses the parent's name
+        # is applied once the parent is matched.
+        expected_cypher = """
+            MATCH (Animal__out_Animal_ParentOf__out_Animal_OfSpecies___1:Species)
+                WHERE (Animal__out_Animal_ParentOf__out_Animal_OfSpecies___1.name = $species_name)
+            MATCH (Animal__out_Animal_ParentOf__out_Animal_OfSpecies___1)
+                <-[:Animal_OfSpecies]-(Animal__out_Animal_ParentOf___1:Animal)
+            MATCH (Animal__out_Animal_ParentOf___1)<-[:Animal_ParentOf]-(Animal___1:Animal)
+                WHERE (Animal__out_Animal_ParentOf___1.name = Animal___1.name)
+            RETURN
+                Animal___1.name AS `animal_name`,
+                Animal__out_Animal_ParentOf___1.name AS `child_name`,
+                Animal__out_Animal_ParentOf__out_Animal_OfSpecies___1.name AS `species_name`
+        """
+        result = compile_graphql_to_cypher(
+            self.common_schema_info, graphql_input, compilation_options=compilation_options
+        )
+        compare_cypher(self, expected_cypher, result.query)
+
+    def test_missing_class_count_keeps_original_order(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_OfSpecies {
+                    name @filter(op_name: "=", value: ["$species_name"])
+                         @output(out_name: "species_name")
+                }
+            }
+        }"""
+        statistics = LocalStatistics({"Species": 50})
+        compilation_options = CypherCompilationOptions(
+            query_planning_schema_info=get_query_planning_schema_info(statistics),
+            parameters={"species_name": "Beaver"},
+        )
+
+        expected_result = compile_graphql_to_cypher(self.common_schema_info, graphql_input)
+        result = compile_graphql_to_cypher(
+            self.common_schema_info, graphql_input, compilation_options=compilation_options
+        )
+        self.assertEqual(expected_result, result)
@@ -0,0 +1,106 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+from typing import Any, Dict, List, Optional, Tuple
+import unittest
+
+from ..cost_estimation.analysis import analyze_query_string
+from ..cost_estimation.degree_distribution import (
+    estimate_mean_of_at_least_one_result_per_vertex,
+    get_fraction_of_vertices_with_edge_degree,
+    get_mean_edge_degree,
+)
+from ..cost_estimation.statistics import LocalStatistics
+from ..global_utils import QueryStringWithParameters
+from .test_helpers import get_query_planning_schema_info
+
+
+class EdgeDegreeStatisticsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.class_counts = {"Animal": 1000, "Animal_ParentOf": 500}
+        # Three quarters of all animals have no children, the rest have up to 4.
+        self.degree_quantiles = [0, 0, 0, 0, 4]
+
+    def _estimate_cardinality(
+        self,
+        query_string: str,
+        parameters: Dict[str, Any],
+        edge_degree_quantiles: Optional[Dict[Tuple[str, str], List[int]]],
+    ) -> float:
+        """Return the cardinality estimate of the query, using the given degree statistics."""
+        statistics = LocalStatistics(
+            self.class_counts,
+            vertex_edge_vertex_counts={("Animal", "Animal_ParentOf", "Animal"): 500},
+            edge_degree_quantiles=edge_degree_quantiles,
+        )
+        schema_info = get_query_planning_schema_info(statistics)
+        query = QueryStringWithParameters(query_string, parameters)
+        return analyze_query_string(schema_info, query).cardinality_estimate
+
+    def test_degree_distribution(self) -> None:
+        self.assertAlmostEqual(0.5, get_mean_edge_degree(self.degree_quantiles))
+        self.assertAlmostEqual(
+            0.8, get_fraction_of_vertices_with_edge_degree(self.degree_quantiles, 0)
+        )
+        self.assertAlmostEqual(
+            0.05, get_fraction_of_vertices_with_edge_degree(self.degree_quantiles, 4)
+        )
+        self.assertAlmostEqual(
+            0.0, get_fraction_of_vertices_with_edge_degree(self.degree_quantiles, 5)
+        )
+
+        # Vertices with no edges produce one result, the others produce 2 per edge on average.
+        self.assertAlmostEqual(
+            (3 + (1 + 2 * (1 + 2 + 3 + 4)) / 5) / 4,
+            estimate_mean_of_at_least_one_result_per_vertex(self.degree_quantiles, 1.0),
+        )
+        # With enough results per vertex, every vertex produces at least one on its own.
+        self.assertAlmostEqual(1.0, estimate_mean_of_at_least_one_result_per_vertex([1, 1], 1.0))
+        self.assertAlmostEqual(1.0, estimate_mean_of_at_least_one_result_per_vertex([0, 0], 0.0))
+
+    def test_optional_traversal_uses_degree_distribution(self) -> None:
+        query_string = """{
+            Animal {
+                name @output(out_name: "name")
+                out_Animal_ParentOf @optional {
+                    name @output(out_name: "child_name")
+                }
+            }
+        }"""
+        # On average, animals have half a child, so each animal produces a single result set.
+        self.assertAlmostEqual(1000.0, self._estimate_cardinality(query_string, {}, None))
+
+        # The animals with children produce several result sets each, so there are more overall.
+        edge_degree_quantiles = {("Animal", "out_Animal_ParentOf"): self.degree_quantiles}
+        self.assertAlmostEqual(
+            1000.0 * (3 + (1 + 1 + 2 + 3 + 4) / 5) / 4,
+            self._estimate_cardinality(query_string, {}, edge_degree_quantiles),
+        )
+
+    def test_has_edge_degree_filter(self) -> None:
+        query_string = """{
+            Animal {
+                name @output(out_name: "name")
+                out_Animal_ParentOf @filter(op_name: "has_edge_degree", value: ["$child_count"])
+                                    @optional {
+                    name @output(out_name: "child_name")
+                }
+            }
+        }"""
+        edge_degree_quantiles = {("Animal", "out_Animal_ParentOf"): self.degree_quantiles}
+
+        # Without degree statistics, the filter is assumed to not filter anything out.
+        self.assertAlmostEqual(
+            4000.0, self._estimate_cardinality(query_string, {"child_count": 4}, None)
+        )
+
+        # 5% of animals have 4 children, and each of them produces 4 result sets.
+        self.assertAlmostEqual(
+            200.0,
+            self._estimate_cardinality(query_string, {"child_count": 4}, edge_degree_quantiles),
+        )
+        # 80% of animals have no children, and each of them produces 1 result set.
+        self.assertAlmostEqual(
+            800.0,
+            self._estimate_cardinality(query_string, {"child_count": 0}, edge_degree_quantiles),
+        )
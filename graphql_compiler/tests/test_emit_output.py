@@ -1,10 +1,25 @@
 # Copyright 2017-present Kensho Technologies, LLC.
+import dataclasses
+import json
 import unittest
 
 from graphql import GraphQLString
+import sqlalchemy
 from sqlalchemy.dialects.mssql.base import MSDialect
 
-from ..compiler import emit_cypher, emit_gremlin, emit_match, emit_sql
+from . import test_input_data
+from .. import graphql_to_sql
+from ..compiler import (
+    KEYSET_COLUMN_PREFIX,
+    KEYSET_CURSOR_PARAMETER_NAME,
+    SQLCompilationOptions,
+    compile_graphql_to_sql,
+    emit_cypher,
+    emit_gremlin,
+    emit_match,
+    emit_sql,
+    encode_keyset_cursor,
+)
 from ..compiler.blocks import (
     Backtrack,
     CoerceType,
@@ -31,6 +46,8 @@ from ..compiler.ir_lowering_match.utils import CompoundMatchQuery
 from ..compiler.match_query import convert_to_match_query
 from ..compiler.metadata import LocationInfo, QueryMetadataTable
 from ..compiler.sqlalchemy_extensions import print_sqlalchemy_query_string
+from ..exceptions import GraphQLCompilationError, GraphQLInvalidArgumentError
+from ..query_formatting import insert_arguments_into_query
 from ..schema import GraphQLDateTime
 from .test_helpers import (
     compare_cypher,
@@ -747,3 +764,377 @@ class EmitSQLTests(unittest.TestCase):
 
         self.assertEqual({"uuid", "fold_output_name"}, set(subquery.c.keys()))
         self.assertEqual(fold_scope_location, output_location)
+
+    def test_recurse_with_cycle_pruning(self) -> None:
+        graphql_query = test_input_data.simple_recurse().graphql_input
+        compilation_options = SQLCompilationOptions(prune_recursion_cycles=True)
+
+        expected_sql = {
+            "mssql": """
+                WITH anon_1(name, uuid, __cte_key, __cte_depth, __cte_path) AS (
+                    SELECT
+                        [Animal_2].name AS name,
+                        [Animal_2].uuid AS uuid,
+                        [Animal_2].uuid AS __cte_key,
+                        0 AS __cte_depth,
+                        CAST(
+                            '|' + CAST([Animal_2].uuid AS NVARCHAR(max)) + '|' AS NVARCHAR(max)
+                        ) AS __cte_path
+                    FROM
+                        db_1.schema_1.[Animal] AS [Animal_2]
+                    UNION ALL
+                    SELECT
+                        [Animal_3].name AS name,
+                        [Animal_3].uuid AS uuid,
+                        anon_1.__cte_key AS __cte_key,
+                        anon_1.__cte_depth + 1 AS __cte_depth,
+                        CAST(
+                            anon_1.__cte_path + CAST([Animal_3].uuid AS NVARCHAR(max)) + '|'
+                            AS NVARCHAR(max)
+                        ) AS __cte_path
+                    FROM
+                        anon_1
+                        JOIN db_1.schema_1.[Animal] AS [Animal_3]
+                            ON anon_1.uuid = [Animal_3].parent
+                    WHERE
+                        anon_1.__cte_depth < 1 AND
+                        CHARINDEX(
+                            '|' + CAST([Animal_3].uuid AS NVARCHAR(max)) + '|',
+                            anon_1.__cte_path
+                        ) = 0
+                )
+                SELECT
+                    anon_1.name AS relation_name
+                FROM
+                    db_1.schema_1.[Animal] AS [Animal_1]
+                    JOIN anon_1 ON [Animal_1].uuid = anon_1.__cte_key
+            """,
+            "postgresql": """
+                WITH RECURSIVE anon_1(name, uuid, __cte_key, __cte_depth, __cte_path) AS (
+                    SELECT
+                        "Animal_2".name AS name,
+                        "Animal_2".uuid AS uuid,
+                        "Animal_2".uuid AS __cte_key,
+                        0 AS __cte_depth,
+                        ARRAY["Animal_2".uuid] AS __cte_path
+                    FROM
+                        schema_1."Animal" AS "Animal_2"
+                    UNION ALL
+                    SELECT
+                        "Animal_3".name AS name,
+                        "Animal_3".uuid AS uuid,
+                        anon_1.__cte_key AS __cte_key,
+                        anon_1.__cte_depth + 1 AS __cte_depth,
+                        array_append(anon_1.__cte_path, "Animal_3".uuid) AS __cte_path
+                    FROM
+                        anon_1
+                        JOIN schema_1."Animal" AS "Animal_3"
+                            ON anon_1.uuid = "Animal_3".parent
+                    WHERE
+                        anon_1.__cte_depth < 1 AND
+                        "Animal_3".uuid != ALL (anon_1.__cte_path)
+                )
+                SELECT
+                    anon_1.name AS relation_name
+                FROM
+                    schema_1."Animal" AS "Animal_1"
+                    JOIN anon_1 ON "Animal_1".uuid = anon_1.__cte_key
+            """,
+        }
+
+        for dialect_name, schema_info in self.schema_infos.items():
+            compilation_result = compile_graphql_to_sql(
+                schema_info, graphql_query, compilation_options=compilation_options
+            )
+            string_result = print_sqlalchemy_query_string(
+                compilation_result.query, schema_info.dialect
+            )
+            compare_sql(self, expected_sql[dialect_name], string_result)
+
+            # Cycle pruning is opt-in: without the option, no path column is tracked.
+            default_result = compile_graphql_to_sql(schema_info, graphql_query)
+            default_string = print_sqlalchemy_query_string(
+                default_result.query, schema_info.dialect
+            )
+            self.assertNotIn(emit_sql.CTE_PATH_NAME, default_string)
+
+    def test_large_collection_filters(self) -> None:
+        graphql_query = """{
+            Animal {
+                name @output(out_name: "name")
+                     @filter(op_name: "in_collection", value: ["$names"])
+                uuid @filter(op_name: "not_in_collection", value: ["$uuids"])
+            }
+        }"""
+        compilation_options = SQLCompilationOptions(large_collection_threshold=2)
+        small_parameters = {
+            "names": ["Nazgul", "Bilbo"],
+            "uuids": ["cfc6e625-8594-0927-468f-f53d864a7a51"],
+        }
+        large_parameters = {
+            "names": ["Nazgul", "Bilbo", "Frodo"],
+            "uuids": ["cfc6e625-8594-0927-468f-f53d864a7a51"],
+        }
+
+        expected_small_sql = {
+            "mssql": """
+                SELECT [Animal_1].name AS name
+                FROM db_1.schema_1.[Animal] AS [Animal_1]
+                WHERE [Animal_1].name IN :names AND [Animal_1].uuid NOT IN :uuids
+            """,
+            "postgresql": """
+                SELECT "Animal_1".name AS name
+                FROM schema_1."Animal" AS "Animal_1"
+                WHERE "Animal_1".name IN :names AND "Animal_1".uuid NOT IN :uuids
+            """,
+        }
+        expected_large_sql = {
+            "mssql": """
+                SELECT [Animal_1].name AS name
+                FROM db_1.schema_1.[Animal] AS [Animal_1]
+                WHERE
+                    [Animal_1].name IN (
+                        SELECT collection_value
+                        FROM OPENJSON(:names) WITH (collection_value VARCHAR(40) '$')
+                    ) AND
+                    [Animal_1].uuid NOT IN :uuids
+            """,
+            "postgresql": """
+                SELECT "Animal_1".name AS name
+                FROM schema_1."Animal" AS "Animal_1"
+                WHERE
+                    "Animal_1".name = ANY (:names::VARCHAR(40)[]) AND
+                    "Animal_1".uuid NOT IN :uuids
+            """,
+        }
+
+        for dialect_name, schema_info in self.schema_infos.items():
+            for parameters, expected_sql in (
+                (small_parameters, expected_small_sql),
+                (large_parameters, expected_large_sql),
+            ):
+                compilation_result = graphql_to_sql(
+                    schema_info, graphql_query, parameters, compilation_options=compilation_options
+                )
+                string_result = print_sqlalchemy_query_string(
+                    compilation_result.query, schema_info.dialect
+                )
+                compare_sql(self, expected_sql[dialect_name], string_result)
+
+            # Without a threshold, collections of any size are passed as IN lists.
+            compilation_result = graphql_to_sql(
+                schema_info,
+                graphql_query,
+                large_parameters,
+                compilation_options=SQLCompilationOptions(large_collection_threshold=None),
+            )
+            string_result = print_sqlalchemy_query_string(
+                compilation_result.query, schema_info.dialect
+            )
+            compare_sql(self, expected_small_sql[dialect_name], string_result)
+
+    def test_large_collection_parameter_encoding_mssql(self) -> None:
+        graphql_query = """{
+            Animal {
+                name @output(out_name: "name")
+                     @filter(op_name: "in_collection", value: ["$names"])
+            }
+        }"""
+        names = ["Nazgul", 'Bilbo "Ring-bearer" Baggins', "Frodo's|friend"]
+        schema_info = self.schema_infos["mssql"]
+        compilation_result = graphql_to_sql(
+            schema_info,
+            graphql_query,
+            {"names": names},
+            compilation_options=SQLCompilationOptions(large_collection_threshold=2),
+        )
+        compiled_query = compilation_result.query.compile(dialect=schema_info.dialect)
+
+        # The whole collection is a single database parameter, encoded as a JSON array.
+        self.assertEqual({"names"}, set(compiled_query.params.keys()))
+        bind_processor = compiled_query._bind_processors["names"]
+        self.assertEqual(names, json.loads(bind_processor(names)))
+
+    def test_keyset_pagination(self) -> None:
+        graphql_query = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    name @output(out_name: "child_name")
+                }
+            }
+        }"""
+        cursor = encode_keyset_cursor(
+            {
+                "animal_name": "Nazgul",
+                "child_name": "Nazgul Jr.",
+                f"{KEYSET_COLUMN_PREFIX}0": "cfc6e625-8594-0927-468f-f53d864a7a51",
+                f"{KEYSET_COLUMN_PREFIX}1": "e7d1a5b4-7b1b-4b6e-8c63-f0c8a2b4c5d6",
+            }
+        )
+
+        expected_first_page_sql = {
+            "mssql": """
+                SELECT TOP 10
+                    [Animal_1].uuid AS __keyset_key_0,
+                    [Animal_2].uuid AS __keyset_key_1,
+                    [Animal_1].name AS animal_name,
+                    [Animal_2].name AS child_name
+                FROM
+                    db_1.schema_1.[Animal] AS [Animal_1]
+                    JOIN db_1.schema_1.[Animal] AS [Animal_2]
+                        ON [Animal_1].uuid = [Animal_2].parent
+                ORDER BY [Animal_1].uuid, [Animal_2].uuid
+            """,
+            "postgresql": """
+                SELECT
+                    "Animal_1".uuid AS __keyset_key_0,
+                    "Animal_2".uuid AS __keyset_key_1,
+                    "Animal_1".name AS animal_name,
+                    "Animal_2".name AS child_name
+                FROM
+                    schema_1."Animal" AS "Animal_1"
+                    JOIN schema_1."Animal" AS "Animal_2"
+                        ON "Animal_1".uuid = "Animal_2".parent
+                ORDER BY "Animal_1".uuid, "Animal_2".uuid
+                LIMIT :param_1
+            """,
+        }
+        expected_next_page_sql = {
+            "mssql": """
+                SELECT TOP 10
+                    [Animal_1].uuid AS __keyset_key_0,
+                    [Animal_2].uuid AS __keyset_key_1,
+                    [Animal_1].name AS animal_name,
+                    [Animal_2].name AS child_name
+                FROM
+                    db_1.schema_1.[Animal] AS [Animal_1]
+                    JOIN db_1.schema_1.[Animal] AS [Animal_2]
+                        ON [Animal_1].uuid = [Animal_2].parent
+                WHERE (
+                    [Animal_1].uuid > :__keyset_last_seen_0 OR
+                    [Animal_1].uuid = :__keyset_last_seen_0 AND
+                    [Animal_2].uuid > :__keyset_last_seen_1
+                )
+                ORDER BY [Animal_1].uuid, [Animal_2].uuid
+            """,
+            "postgresql": """
+                SELECT
+                    "Animal_1".uuid AS __keyset_key_0,
+                    "Animal_2".uuid AS __keyset_key_1,
+                    "Animal_1".name AS animal_name,
+                    "Animal_2".name AS child_name
+                FROM
+                    schema_1."Animal" AS "Animal_1"
+                    JOIN schema_1."Animal" AS "Animal_2"
+                        ON "Animal_1".uuid = "Animal_2".parent
+                WHERE ("Animal_1".uuid, "Animal_2".uuid) >
+                    (:__keyset_last_seen_0, :__keyset_last_seen_1)
+                ORDER BY "Animal_1".uuid, "Animal_2".uuid
+                LIMIT :param_1
+            """,
+        }
+
+        for dialect_name, schema_info in self.schema_infos.items():
+            for after_cursor, expected_sql in (
+                (False, expected_first_page_sql),
+                (True, expected_next_page_sql),
+            ):
+                compilation_result = compile_graphql_to_sql(
+                    schema_info,
+                    graphql_query,
+                    compilation_options=SQLCompilationOptions(
+                        keyset_page_size=10, keyset_after_cursor=after_cursor
+                    ),
+                )
+                string_result = print_sqlalchemy_query_string(
+                    compilation_result.query, schema_info.dialect
+                )
+                compare_sql(self, expected_sql[dialect_name], string_result)
+
+            # The cursor is a runtime parameter, so the same compiled query fetches every page.
+            self.assertEqual(
+                GraphQLString, compilation_result.input_metadata[KEYSET_CURSOR_PARAMETER_NAME]
+            )
+            query = insert_arguments_into_query(
+                compilation_result, {KEYSET_CURSOR_PARAMETER_NAME: cursor}
+            )
+            compiled_query = query.compile(dialect=schema_info.dialect)
+            self.assertEqual(
+                {
+                    "__keyset_last_seen_0": "cfc6e625-8594-0927-468f-f53d864a7a51",
+                    "__keyset_last_seen_1": "e7d1a5b4-7b1b-4b6e-8c63-f0c8a2b4c5d6",
+                },
+                {
+                    name: value
+                    for name, value in compiled_query.params.items()
+                    if name.startswith("__keyset_last_seen_")
+                },
+            )
+
+    def test_keyset_pagination_errors(self) -> None:
+        schema_info = self.schema_infos["postgresql"]
+        one_column_cursor = encode_keyset_cursor({f"{KEYSET_COLUMN_PREFIX}0": "uuid"})
+        traversal_query = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    name @output(out_name: "child_name")
+                }
+            }
+        }"""
+
+        # The cursor must have one value per ordering key column.
+        compilation_result = compile_graphql_to_sql(
+            schema_info,
+            traversal_query,
+            compilation_options=SQLCompilationOptions(
+                keyset_page_size=10, keyset_after_cursor=True
+            ),
+        )
+        with self.assertRaises(GraphQLInvalidArgumentError):
+            insert_arguments_into_query(
+                compilation_result, {KEYSET_CURSOR_PARAMETER_NAME: one_column_cursor}
+            )
+
+        # A cursor can only be used if keyset pagination is enabled.
+        with self.assertRaises(GraphQLInvalidArgumentError):
+            compile_graphql_to_sql(
+                schema_info,
+                traversal_query,
+                compilation_options=SQLCompilationOptions(keyset_after_cursor=True),
+            )
+
+        # Results can only be ordered by the primary keys of the vertices if they all have one.
+        animal_table = schema_info.vertex_name_to_table["Animal"]
+        animal_table_without_primary_key = sqlalchemy.Table(
+            animal_table.name,
+            sqlalchemy.MetaData(),
+            *(sqlalchemy.Column(column.name, column.type) for column in animal_table.columns),
+            schema=animal_table.schema,
+        )
+        schema_info_without_primary_key = dataclasses.replace(
+            schema_info,
+            vertex_name_to_table={
+                **schema_info.vertex_name_to_table,
+                "Animal": animal_table_without_primary_key,
+            },
+        )
+        with self.assertRaises(GraphQLCompilationError):
+            compile_graphql_to_sql(
+                schema_info_without_primary_key,
+                traversal_query,
+                compilation_options=SQLCompilationOptions(keyset_page_size=10),
+            )
+
+        # Results of queries with @optional or @recurse aren't identified by primary keys.
+        for test_data in (
+            test_input_data.optional_traverse_after_mandatory_traverse(),
+            test_input_data.simple_recurse(),
+        ):
+            with self.assertRaises(NotImplementedError):
+                compile_graphql_to_sql(
+                    schema_info,
+                    test_data.graphql_input,
+                    compilation_options=SQLCompilationOptions(keyset_page_size=10),
+                )
@@ -0,0 +1,198 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+from typing import Any, Dict, Tuple
+import unittest
+
+from ..cost_estimation.analysis import QueryPlanningAnalysis, analyze_query_string
+from ..cost_estimation.statistics import LocalStatistics
+from ..global_utils import QueryStringWithParameters
+from .test_helpers import get_query_planning_schema_info
+
+
+def _analyze_query(
+    graphql_input: str,
+    parameters: Dict[str, Any],
+    class_counts: Dict[str, int],
+    vertex_edge_vertex_counts: Dict[Tuple[str, str, str], int],
+    distinct_field_values_counts: Dict[Tuple[str, str], int],
+) -> QueryPlanningAnalysis:
+    """Analyze the query using the test schema, with the given statistics."""
+    statistics = LocalStatistics(
+        class_counts,
+        vertex_edge_vertex_counts=vertex_edge_vertex_counts,
+        distinct_field_values_counts=distinct_field_values_counts,
+    )
+    schema_info = get_query_planning_schema_info(statistics)
+    return analyze_query_string(schema_info, QueryStringWithParameters(graphql_input, parameters))
+
+
+class ExecutionCostEstimationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+
+    def test_few_results_after_many_reads(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    name @filter(op_name: "=", value: ["$child_name"])
+                }
+            }
+        }"""
+        analysis = _analyze_query(
+            graphql_input,
+            {"child_name": "Bob"},
+            {"Animal": 1000, "Animal_ParentOf": 1000000000},
+            {("Animal", "Animal_ParentOf", "Animal"): 1000000000},
+            {("Animal", "name"): 100000000},
+        )
+
+        # Every edge and child vertex is read, but very few children have the given name.
+        cost_estimate = analysis.execution_cost_estimate
+        self.assertAlmostEqual(10.0, analysis.cardinality_estimate)
+        self.assertAlmostEqual(10.0, cost_estimate.result_cardinality)
+        self.assertEqual(
+            [(1000, 0, 1000), (1000000000, 1000000000, 10)],
+            [
+                (step_cost.vertex_reads, step_cost.edge_reads, step_cost.result_sets)
+                for step_cost in cost_estimate.step_costs
+            ],
+        )
+        self.assertEqual(1000001000, cost_estimate.vertex_reads)
+        self.assertEqual(1000000000, cost_estimate.edge_reads)
+        self.assertEqual(2000001000, cost_estimate.total_reads)
+        self.assertEqual(1010, cost_estimate.intermediate_result_sets)
+
+    def test_subexpansions_expand_previous_result_sets(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    name @output(out_name: "child_name")
+                }
+                out_Animal_OfSpecies {
+                    name @filter(op_name: "=", value: ["$species_name"])
+                }
+            }
+        }"""
+        analysis = _analyze_query(
+            graphql_input,
+            {"species_name": "Beaver"},
+            {"Animal": 100, "Species": 10},
+            {
+                ("Animal", "Animal_ParentOf", "Animal"): 300,
+                ("Animal", "Animal_OfSpecies", "Species"): 100,
+            },
+            {("Species", "name"): 10},
+        )
+
+        # All 300 parent-child result sets are expanded to find the species of the parent,
+        # even though only a tenth of them are of the given species.
+        cost_estimate = analysis.execution_cost_estimate
+        self.assertEqual(
+            [
+                ("Animal",),
+                ("Animal", "out_Animal_ParentOf"),
+                ("Animal", "out_Animal_OfSpecies"),
+            ],
+            [step_cost.location.query_path for step_cost in cost_estimate.step_costs],
+        )
+        self.assertEqual(
+            [(100, 0, 100), (300, 300, 300), (300, 300, 30)],
+            [
+                (step_cost.vertex_reads, step_cost.edge_reads, step_cost.result_sets)
+                for step_cost in cost_estimate.step_costs
+            ],
+        )
+        self.assertAlmostEqual(30.0, cost_estimate.result_cardinality)
+        self.assertAlmostEqual(analysis.cardinality_estimate, cost_estimate.result_cardinality)
+
+    def test_recursion_reads_every_depth(self) -> None:
+        graphql_input = """{
+            Animal {
+                out_Animal_ParentOf @recurse(depth: 3) {
+                    name @output(out_name: "descendant_name")
+                }
+            }
+        }"""
+        analysis = _analyze_query(
+            graphql_input,
+            {},
+            {"Animal": 10 ** 6},
+            {("Animal", "Animal_ParentOf", "Animal"): 2 * 10 ** 6},
+            {},
+        )
+
+        # Each Animal has 2 children, 4 grandchildren, and 8 great-grandchildren. The graph is
+        # large enough for almost all of them to be distinct.
+        cost_estimate = analysis.execution_cost_estimate
+        recursion_step_cost = cost_estimate.step_costs[1]
+        self.assertAlmostEqual(14 * 10 ** 6, recursion_step_cost.edge_reads, delta=100)
+        self.assertAlmostEqual(recursion_step_cost.edge_reads, recursion_step_cost.vertex_reads)
+        self.assertAlmostEqual(analysis.cardinality_estimate, cost_estimate.result_cardinality)
+
+    def test_recursion_saturates_at_class_count(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @filter(op_name: "=", value: ["$name"])
+                out_Animal_ParentOf @recurse(depth: 5) {
+                    name @output(out_name: "descendant_name")
+                }
+            }
+        }"""
+
+        def estimate_descendants(animal_count: int) -> float:
+            """Estimate the descendants of an Animal within depth 5, with 3 children per Animal."""
+            return _analyze_query(
+                graphql_input,
+                {"name": "Bob"},
+                {"Animal": animal_count},
+                {("Animal", "Animal_ParentOf", "Animal"): 3 * animal_count},
+                {("Animal", "name"): animal_count},
+            ).cardinality_estimate
+
+        # In a large graph, the descendants at each depth are almost all distinct.
+        self.assertAlmostEqual(
+            1 + 3 + 9 + 27 + 81 + 243, estimate_descendants(10 ** 9), delta=0.001
+        )
+
+        # In a small graph, at most all Animals are reached, however deep the recursion goes.
+        small_graph_estimate = estimate_descendants(50)
+        self.assertLess(small_graph_estimate, 50)
+        self.assertGreater(small_graph_estimate, 45)
+
+    def test_folded_and_optional_reads_are_counted(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_ParentOf @fold {
+                    name @output(out_name: "child_names")
+                }
+                out_Animal_OfSpecies @optional {
+                    name @filter(op_name: "=", value: ["$species_name"])
+                         @output(out_name: "species_name")
+                }
+            }
+        }"""
+        analysis = _analyze_query(
+            graphql_input,
+            {"species_name": "Beaver"},
+            {"Animal": 100, "Species": 10},
+            {
+                ("Animal", "Animal_ParentOf", "Animal"): 50,
+                ("Animal", "Animal_OfSpecies", "Species"): 100,
+            },
+            {("Species", "name"): 10},
+        )
+
+        # Neither subexpansion can discard result sets, but their vertices and edges are read.
+        cost_estimate = analysis.execution_cost_estimate
+        self.assertEqual(
+            [(100, 0, 100), (50, 50, 50), (100, 100, 10)],
+            [
+                (step_cost.vertex_reads, step_cost.edge_reads, step_cost.result_sets)
+                for step_cost in cost_estimate.step_costs
+            ],
+        )
+        self.assertAlmostEqual(100.0, cost_estimate.result_cardinality)
+        self.assertAlmostEqual(analysis.cardinality_estimate, cost_estimate.result_cardinality)
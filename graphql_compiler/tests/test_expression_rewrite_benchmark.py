@@ -0,0 +1,78 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import unittest
+
+from graphql import GraphQLString
+
+from ..compiler.blocks import Filter, MarkLocation, QueryRoot
+from ..compiler.expressions import BinaryComposition, LocalField, Variable
+from ..compiler.helpers import Location
+from ..compiler.ir_lowering_common.common import (
+    apply_expression_rewrite_rules,
+    optimize_boolean_expression_comparisons_rule,
+)
+from ..compiler.ir_lowering_match.ir_lowering import lower_string_operators_rule
+from .benchmarks.expression_rewrite_benchmark import (
+    REWRITE_RULE_GROUPS,
+    get_corpus_irs,
+    rewrite_fused,
+    rewrite_sequentially,
+    run_benchmark,
+)
+from .test_helpers import get_common_schema_info
+
+
+class ExpressionRewriteBenchmarkTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.corpus_irs = get_corpus_irs(get_common_schema_info())
+
+    def test_fused_rewrites_match_sequential_rewrites(self) -> None:
+        self.assertGreater(len(self.corpus_irs), 0)
+        for rule_group_name, make_rewrite_rules in REWRITE_RULE_GROUPS.items():
+            for ir in self.corpus_irs:
+                rewrite_rules = make_rewrite_rules(ir)
+                self.assertEqual(
+                    rewrite_sequentially(ir.ir_blocks, rewrite_rules),
+                    rewrite_fused(ir.ir_blocks, rewrite_rules),
+                )
+
+    def test_unchanged_blocks_are_reused(self) -> None:
+        location = Location(("Animal",))
+        unchanged_filter = Filter(
+            BinaryComposition(
+                "=", LocalField("name", GraphQLString), Variable("$wanted", GraphQLString)
+            )
+        )
+        changed_filter = Filter(
+            BinaryComposition(
+                "has_substring",
+                LocalField("name", GraphQLString),
+                Variable("$substring", GraphQLString),
+            )
+        )
+        ir_blocks = [
+            QueryRoot({"Animal"}),
+            unchanged_filter,
+            changed_filter,
+            MarkLocation(location),
+        ]
+
+        new_ir_blocks = apply_expression_rewrite_rules(
+            ir_blocks, [optimize_boolean_expression_comparisons_rule, lower_string_operators_rule]
+        )
+        self.assertIs(ir_blocks[0], new_ir_blocks[0])
+        self.assertIs(unchanged_filter, new_ir_blocks[1])
+        self.assertIsNot(changed_filter, new_ir_blocks[2])
+        self.assertIs(changed_filter.predicate.left, new_ir_blocks[2].predicate.left)
+        self.assertEqual("LIKE", new_ir_blocks[2].predicate.operator)
+        self.assertIs(ir_blocks[3], new_ir_blocks[3])
+
+    def test_run_benchmark(self) -> None:
+        results = run_benchmark(self.corpus_irs[:5], 1)
+        self.assertEqual(
+            sorted(REWRITE_RULE_GROUPS), [result.rule_group_name for result in results]
+        )
+        for result in results:
+            self.assertGreaterEqual(result.sequential.seconds, 0)
+            self.assertGreaterEqual(result.fused.seconds, 0)
@@ -0,0 +1,83 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import unittest
+
+from ..compiler import GremlinCompilationOptions, compile_graphql_to_gremlin
+from .test_helpers import compare_gremlin, get_common_schema_info
+
+
+class GremlinHasStepTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.common_schema_info = get_common_schema_info()
+        self.compilation_options = GremlinCompilationOptions(use_has_steps_for_filters=True)
+
+    def test_equality_and_between_filters(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @filter(op_name: "=", value: ["$wanted"]) @output(out_name: "name")
+                net_worth @filter(op_name: "between", value: ["$lower", "$upper"])
+            }
+        }"""
+        expected_gremlin = """
+            g.V('@class', 'Animal')
+            .has('name', T.eq, $wanted)
+            .has('net_worth', T.gte, $lower)
+            .has('net_worth', T.lte, $upper)
+            .as('Animal___1')
+            .transform{it, m -> new com.orientechnologies.orient.core.record.impl.ODocument([
+                name: m.Animal___1.name
+            ])}
+        """
+        result = compile_graphql_to_gremlin(
+            self.common_schema_info, graphql_input, compilation_options=self.compilation_options
+        )
+        compare_gremlin(self, expected_gremlin, result.query)
+
+    def test_in_collection_and_closure_filters_after_traversal(self) -> None:
+        graphql_input = """{
+            Animal {
+                color @tag(tag_name: "color")
+                out_Animal_ParentOf {
+                    name @filter(op_name: "in_collection", value: ["$names"])
+                         @output(out_name: "child_name")
+                    description @filter(op_name: "=", value: ["%color"])
+                    birthday @filter(op_name: ">=", value: ["$earliest"])
+                }
+            }
+        }"""
+        # The filter using the tagged value is not known ahead of execution, so it remains
+        # a closure, after all the has() steps.
+        expected_gremlin = """
+            g.V('@class', 'Animal')
+            .as('Animal___1')
+            .out('Animal_ParentOf')
+            .has('name', T.in, $names)
+            .has('birthday', T.gte, Date.parse("yyyy-MM-dd", $earliest))
+            .filter{it, m -> (it.description == m.Animal___1.color)}
+            .as('Animal__out_Animal_ParentOf___1')
+            .back('Animal___1')
+            .transform{it, m -> new com.orientechnologies.orient.core.record.impl.ODocument([
+                child_name: m.Animal__out_Animal_ParentOf___1.name
+            ])}
+        """
+        result = compile_graphql_to_gremlin(
+            self.common_schema_info, graphql_input, compilation_options=self.compilation_options
+        )
+        compare_gremlin(self, expected_gremlin, result.query)
+
+    def test_filters_in_optional_scope_are_unchanged(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "name")
+                out_Animal_FedAt @optional {
+                    name @filter(op_name: "=", value: ["$event_name"])
+                         @output(out_name: "event_name")
+                }
+            }
+        }"""
+        expected_result = compile_graphql_to_gremlin(self.common_schema_info, graphql_input)
+        result = compile_graphql_to_gremlin(
+            self.common_schema_info, graphql_input, compilation_options=self.compilation_options
+        )
+        self.assertEqual(expected_result, result)
@@ -17,6 +17,7 @@ from sqlalchemy.dialects import mssql, postgresql
 
 from ..compiler.compiler_entities import BasicBlock
 from ..compiler.subclass import compute_subclass_sets
+from ..cost_estimation.statistics import Statistics
 from ..debugging_utils import pretty_print_gremlin, pretty_print_match
 from ..global_utils import is_same_type
 from ..macros import MacroRegistry, create_macro_registry, register_macro_edge
@@ -32,6 +33,7 @@ from ..schema.schema_info import (
     CompositeJoinDescriptor,
     DirectJoinDescriptor,
     JoinDescriptor,
+    QueryPlanningSchemaInfo,
     SQLAlchemySchemaInfo,
     make_sqlalchemy_schema_info,
 )
@@ -629,6 +631,22 @@ def get_common_schema_info() -> CommonSchemaInfo:
     return CommonSchemaInfo(get_schema(), get_type_equivalence_hints())
 
 
+def get_query_planning_schema_info(statistics: Statistics) -> QueryPlanningSchemaInfo:
+    """Get a QueryPlanningSchemaInfo for the default testing schema, with the given statistics.
+
+    The schema graph of the returned schema info contains no classes or indexes, so it is only
+    suitable for tests that do not depend on unique indexes for estimating filter selectivity.
+    """
+    return QueryPlanningSchemaInfo(
+        schema=get_schema(),
+        type_equivalence_hints=get_type_equivalence_hints(),
+        schema_graph=get_orientdb_schema_graph([], []),
+        statistics=statistics,
+        pagination_keys={},
+        uuid4_field_info={},
+    )
+
+
 def _get_schema_without_list_valued_property_fields() -> GraphQLSchema:
     """Get the default testing schema, skipping any list-valued property fields it has."""
     schema = get_schema()
@@ -1897,6 +1897,36 @@ def fold_after_recurse() -> CommonTestData:  # noqa: D103
     )
 
 
+def filter_and_fold_then_recurse() -> CommonTestData:  # noqa: D103
+    graphql_input = """{
+        Animal {
+            name @filter(op_name: "=", value: ["$animal_name"])
+                 @output(out_name: "animal_name")
+            out_Animal_LivesIn @fold {
+                name @output(out_name: "homes_list")
+            }
+            out_Animal_ParentOf @recurse(depth: 1) {
+                name @output(out_name: "relation_name")
+            }
+        }
+    }"""
+    expected_output_metadata = {
+        "animal_name": OutputMetadata(type=GraphQLString, optional=False, folded=False),
+        "homes_list": OutputMetadata(type=GraphQLList(GraphQLString), optional=False, folded=True),
+        "relation_name": OutputMetadata(type=GraphQLString, optional=False, folded=False),
+    }
+    expected_input_metadata = {
+        "animal_name": GraphQLString,
+    }
+
+    return CommonTestData(
+        graphql_input=graphql_input,
+        expected_output_metadata=expected_output_metadata,
+        expected_input_metadata=expected_input_metadata,
+        type_equivalence_hints=None,
+    )
+
+
 def fold_same_edge_type_in_different_locations() -> CommonTestData:  # noqa: D103
     graphql_input = """{
         Animal {
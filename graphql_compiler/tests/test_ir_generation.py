@@ -3583,6 +3583,52 @@ class IrGenerationTests(unittest.TestCase):
 
         check_test_data(self, test_data, expected_blocks, expected_location_types)
 
+    def test_filter_and_fold_then_recurse(self):
+        test_data = test_input_data.filter_and_fold_then_recurse()
+
+        base_location = helpers.Location(("Animal",))
+        base_fold = base_location.navigate_to_fold("out_Animal_LivesIn")
+        base_recurse = base_location.navigate_to_subpath("out_Animal_ParentOf")
+
+        expected_blocks = [
+            blocks.QueryRoot({"Animal"}),
+            blocks.Filter(
+                expressions.BinaryComposition(
+                    "=",
+                    expressions.LocalField("name", GraphQLString),
+                    expressions.Variable("$animal_name", GraphQLString),
+                )
+            ),
+            blocks.MarkLocation(base_location),
+            blocks.Fold(base_fold),
+            blocks.MarkLocation(base_fold),
+            blocks.Unfold(),
+            blocks.Recurse("out", "Animal_ParentOf", 1, within_optional_scope=False),
+            blocks.MarkLocation(base_recurse),
+            blocks.Backtrack(base_location),
+            blocks.GlobalOperationsStart(),
+            blocks.ConstructResult(
+                {
+                    "animal_name": expressions.OutputContextField(
+                        base_location.navigate_to_field("name"), GraphQLString
+                    ),
+                    "homes_list": expressions.FoldedContextField(
+                        base_fold.navigate_to_field("name"), GraphQLList(GraphQLString)
+                    ),
+                    "relation_name": expressions.OutputContextField(
+                        base_recurse.navigate_to_field("name"), GraphQLString
+                    ),
+                }
+            ),
+        ]
+        expected_location_types = {
+            base_location: "Animal",
+            base_fold: "Location",
+            base_recurse: "Animal",
+        }
+
+        check_test_data(self, test_data, expected_blocks, expected_location_types)
+
     def test_fold_after_traverse(self):
         test_data = test_input_data.fold_after_traverse()
 
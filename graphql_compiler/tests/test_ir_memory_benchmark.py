@@ -0,0 +1,79 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import gc
+import unittest
+
+from ..compiler.blocks import Traverse
+from ..compiler.compiler_entities import CompilerEntity
+from ..compiler.compiler_frontend import graphql_to_ir
+from ..compiler.metadata import QueryMetadataTable
+from .benchmarks.ir_memory_benchmark import get_compilable_corpus_graphql_inputs, run_benchmark
+from .test_helpers import get_common_schema_info
+
+
+class IrMemoryBenchmarkTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.common_schema_info = get_common_schema_info()
+
+    def test_ir_objects_have_no_instance_dicts(self) -> None:
+        graphql_inputs = get_compilable_corpus_graphql_inputs(self.common_schema_info)
+        self.assertGreater(len(graphql_inputs), 0)
+        for graphql_input in graphql_inputs:
+            ir = graphql_to_ir(
+                self.common_schema_info.schema,
+                graphql_input,
+                type_equivalence_hints=self.common_schema_info.type_equivalence_hints,
+            )
+            # Check every block, expression, and metadata table reachable from the IR.
+            objects_to_check = [ir.query_metadata_table, *ir.ir_blocks]
+            while objects_to_check:
+                current_object = objects_to_check.pop()
+                self.assertFalse(hasattr(current_object, "__dict__"), current_object)
+                objects_to_check.extend(
+                    referent
+                    for referent in gc.get_referents(current_object)
+                    if isinstance(referent, (CompilerEntity, QueryMetadataTable, tuple))
+                )
+
+    def test_compact_print_args_and_kwargs(self) -> None:
+        traverse = Traverse("out", "Animal_ParentOf", optional=True)
+        # pylint: disable=protected-access
+        self.assertEqual(("out", "Animal_ParentOf"), traverse._print_args)
+        self.assertEqual({"optional": True, "within_optional_scope": False}, traverse._print_kwargs)
+        # pylint: enable=protected-access
+        self.assertEqual(
+            "Traverse(('out', 'Animal_ParentOf'), "
+            "{'optional': True, 'within_optional_scope': False})",
+            str(traverse),
+        )
+        self.assertEqual(Traverse("out", "Animal_ParentOf", optional=True), traverse)
+        self.assertNotEqual(Traverse("out", "Animal_ParentOf"), traverse)
+
+    def test_empty_tables_are_not_shared_once_written(self) -> None:
+        ir = graphql_to_ir(
+            self.common_schema_info.schema,
+            """{
+                Animal {
+                    name @output(out_name: "name")
+                }
+            }""",
+        )
+        query_metadata_table = ir.query_metadata_table
+        other_query_metadata_table = QueryMetadataTable(
+            query_metadata_table.root_location,
+            query_metadata_table.get_location_info(query_metadata_table.root_location),
+        )
+        root_location = query_metadata_table.root_location
+        revisited_location = query_metadata_table.revisit_location(root_location)
+        self.assertEqual(
+            [revisited_location], list(query_metadata_table.get_all_revisits(root_location))
+        )
+        self.assertEqual([], list(other_query_metadata_table.get_all_revisits(root_location)))
+
+    def test_run_benchmark(self) -> None:
+        graphql_inputs = get_compilable_corpus_graphql_inputs(self.common_schema_info)
+        result = run_benchmark(self.common_schema_info, graphql_inputs[:5], 2)
+        self.assertEqual(10, result.query_count)
+        self.assertGreater(result.retained_bytes, 0)
+        self.assertGreater(result.retained_bytes_per_query, 0)
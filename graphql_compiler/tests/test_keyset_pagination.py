@@ -0,0 +1,60 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import datetime
+import decimal
+import unittest
+from uuid import UUID
+
+from ..compiler.keyset_pagination import (
+    KEYSET_COLUMN_PREFIX,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+)
+from ..exceptions import GraphQLInvalidArgumentError
+
+
+class KeysetCursorTests(unittest.TestCase):
+    def test_cursor_round_trip(self) -> None:
+        key_values = [
+            "cfc6e625-8594-0927-468f-f53d864a7a51",
+            42,
+            1.5,
+            datetime.date(2020, 1, 2),
+            datetime.datetime(2020, 1, 2, 3, 4, 5),
+            decimal.Decimal("123.456"),
+            UUID("cfc6e625-8594-0927-468f-f53d864a7a51"),
+        ]
+        result_row = {
+            "animal_name": "Nazgul",
+            **{
+                f"{KEYSET_COLUMN_PREFIX}{index}": value
+                for index, value in reversed(list(enumerate(key_values)))
+            },
+        }
+
+        cursor = encode_keyset_cursor(result_row)
+        self.assertEqual(key_values, decode_keyset_cursor(cursor))
+
+    def test_cursor_is_url_safe(self) -> None:
+        cursor = encode_keyset_cursor({f"{KEYSET_COLUMN_PREFIX}0": "???>>>~~~"})
+        self.assertTrue(all(character.isalnum() or character in "-_=" for character in cursor))
+
+    def test_encode_row_without_key_columns(self) -> None:
+        with self.assertRaises(GraphQLInvalidArgumentError):
+            encode_keyset_cursor({"animal_name": "Nazgul"})
+
+    def test_encode_unsupported_value(self) -> None:
+        with self.assertRaises(GraphQLInvalidArgumentError):
+            encode_keyset_cursor({f"{KEYSET_COLUMN_PREFIX}0": object()})
+
+    def test_decode_malformed_cursor(self) -> None:
+        malformed_cursors = [
+            "not a cursor",
+            encode_keyset_cursor({f"{KEYSET_COLUMN_PREFIX}0": "a"})[:-3],
+            "W10=",  # the empty JSON list
+            "eyJhIjogMX0=",  # a JSON object
+            "W3siZGF0ZSI6ICJub3QgYSBkYXRlIn1d",  # [{"date": "not a date"}]
+            "W3siZm9vIjogImJhciJ9XQ==",  # [{"foo": "bar"}]
+        ]
+        for cursor in malformed_cursors:
+            with self.assertRaises(GraphQLInvalidArgumentError):
+                decode_keyset_cursor(cursor)
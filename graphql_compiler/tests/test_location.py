@@ -1,4 +1,6 @@
 # Copyright 2017-present Kensho Technologies, LLC.
+import copy
+import pickle
 from typing import List
 import unittest
 
@@ -151,3 +153,43 @@ class LocationTests(unittest.TestCase):
         ]
 
         compare_sorted_locations_list(self, sorted_locations)
+
+    def test_locations_are_interned(self) -> None:
+        location = Location(("Animal", "out_Animal_ParentOf"), "name", 2)
+        self.assertIs(location, Location(("Animal", "out_Animal_ParentOf"), "name", 2))
+        child_location = Location(("Animal",)).navigate_to_subpath("out_Animal_ParentOf")
+        self.assertIs(location, child_location.revisit().navigate_to_field("name"))
+        self.assertIsNot(location, Location(("Animal", "out_Animal_ParentOf"), "name", 1))
+        self.assertNotEqual(location, location.at_vertex())
+
+        fold_scope_location = Location(("Animal",)).navigate_to_fold("out_Animal_ParentOf")
+        self.assertIs(
+            fold_scope_location,
+            FoldScopeLocation(Location(("Animal",)), (("out", "Animal_ParentOf"),)),
+        )
+        self.assertIs(
+            fold_scope_location, fold_scope_location.navigate_to_field("name").at_vertex()
+        )
+
+        # Hashes are consistent with equality, so locations work as dict keys.
+        location_values = {location: 1, fold_scope_location: 2}
+        self.assertEqual(1, location_values[Location(("Animal", "out_Animal_ParentOf"), "name", 2)])
+        self.assertEqual(
+            2,
+            location_values[
+                FoldScopeLocation(Location(("Animal",)), (("out", "Animal_ParentOf"),))
+            ],
+        )
+
+    def test_locations_are_immutable(self) -> None:
+        location = Location(("Animal",), "name")
+        fold_scope_location = Location(("Animal",)).navigate_to_fold("out_Animal_ParentOf")
+        with self.assertRaises(AttributeError):
+            location.field = "uuid"
+        with self.assertRaises(AttributeError):
+            fold_scope_location.field = "uuid"
+
+        for base_location in (location, fold_scope_location):
+            self.assertIs(base_location, copy.copy(base_location))
+            self.assertIs(base_location, copy.deepcopy(base_location))
+            self.assertIs(base_location, pickle.loads(pickle.dumps(base_location)))
@@ -0,0 +1,75 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import unittest
+
+from ..compiler import (
+    compile_graphql_to_cypher,
+    compile_graphql_to_gremlin,
+    compile_graphql_to_match,
+    compile_graphql_to_sql,
+)
+from ..compiler.ir_lowering_common.pipeline import LoweringPass, run_lowering_pipeline
+from .test_helpers import get_common_schema_info, get_sqlalchemy_schema_info
+
+
+class LoweringPipelineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.common_schema_info = get_common_schema_info()
+        self.graphql_input = """{
+            Animal {
+                name @output(out_name: "name")
+                     @filter(op_name: "=", value: ["$wanted"])
+                out_Animal_ParentOf @optional {
+                    name @output(out_name: "child_name")
+                }
+            }
+        }"""
+
+    def test_recorded_pass_statistics(self) -> None:
+        compile_funcs_and_schema_infos = (
+            (compile_graphql_to_match, self.common_schema_info),
+            (compile_graphql_to_gremlin, self.common_schema_info),
+            (compile_graphql_to_cypher, self.common_schema_info),
+            (compile_graphql_to_sql, get_sqlalchemy_schema_info()),
+        )
+        for compile_func, schema_info in compile_funcs_and_schema_infos:
+            expected_result = compile_func(schema_info, self.graphql_input)
+            self.assertIsNone(expected_result.lowering_pass_statistics)
+
+            result = compile_func(schema_info, self.graphql_input, record_lowering_passes=True)
+            lowering_pass_statistics = result.lowering_pass_statistics
+            self.assertGreater(len(lowering_pass_statistics), 0)
+
+            # Recording the passes doesn't change the compiled query. The SQL query objects
+            # don't compare equal to each other, so compare their string forms instead.
+            self.assertEqual(str(expected_result.query), str(result.query))
+            self.assertEqual(expected_result.output_metadata, result.output_metadata)
+            self.assertEqual(expected_result.input_metadata, result.input_metadata)
+
+            pass_names = [statistics.pass_name for statistics in lowering_pass_statistics]
+            self.assertEqual(len(pass_names), len(set(pass_names)))
+            for statistics in lowering_pass_statistics:
+                self.assertGreaterEqual(statistics.elapsed_seconds, 0)
+            for previous, current in zip(lowering_pass_statistics, lowering_pass_statistics[1:]):
+                self.assertEqual(previous.block_count_after, current.block_count_before)
+
+    def test_match_pass_order(self) -> None:
+        result = compile_graphql_to_match(
+            self.common_schema_info, self.graphql_input, record_lowering_passes=True
+        )
+        pass_names = [statistics.pass_name for statistics in result.lowering_pass_statistics]
+        self.assertEqual("remove_end_optionals", pass_names[0])
+        self.assertLess(
+            pass_names.index("convert_to_match_query"),
+            pass_names.index("convert_optional_traversals_to_compound_match_query"),
+        )
+        self.assertEqual("orientdb_query_execution", pass_names[-1])
+
+    def test_duplicate_pass_names(self) -> None:
+        lowering_passes = [
+            LoweringPass("identity", lambda lowered_query: lowered_query),
+            LoweringPass("identity", lambda lowered_query: lowered_query),
+        ]
+        with self.assertRaises(AssertionError):
+            run_lowering_pipeline(lowering_passes, [])
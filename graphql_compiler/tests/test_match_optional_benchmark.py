@@ -0,0 +1,84 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import unittest
+
+from ..compiler.blocks import Traverse
+from ..compiler.compiler_frontend import graphql_to_ir
+from ..compiler.ir_lowering_common.common import extract_optional_location_root_info
+from ..compiler.ir_lowering_match import lower_ir
+from ..compiler.ir_lowering_match.utils import CompoundMatchQuery, construct_optional_traversal_tree
+from .benchmarks.match_optional_benchmark import (
+    get_subquery_count,
+    make_query_with_complex_optionals,
+    run_benchmark,
+)
+from .test_helpers import get_common_schema_info
+
+
+class MatchOptionalBenchmarkTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.common_schema_info = get_common_schema_info()
+
+    def test_subquery_count_doubles_per_complex_optional(self) -> None:
+        for optional_traversal_count in range(1, 5):
+            result = run_benchmark(self.common_schema_info, optional_traversal_count, 1)
+            self.assertEqual(2**optional_traversal_count, result.subquery_count)
+            self.assertGreater(result.query_length, 0)
+
+    def test_query_plan_bounds_subqueries(self) -> None:
+        result = run_benchmark(self.common_schema_info, 8, 1, max_optional_subqueries=16)
+        self.assertEqual(2**8, result.subquery_count)
+        # A base query, plus one query per complex @optional traversal.
+        self.assertEqual(9, result.plan_query_count)
+        self.assertLess(result.plan_query_length, result.query_length)
+
+    def test_rooted_subtree_count_matches_enumeration(self) -> None:
+        for optional_traversal_count in range(0, 5):
+            graphql_query = make_query_with_complex_optionals(optional_traversal_count)
+            ir = graphql_to_ir(
+                self.common_schema_info.schema,
+                graphql_query,
+                type_equivalence_hints=self.common_schema_info.type_equivalence_hints,
+            )
+            location_to_optional_results = extract_optional_location_root_info(ir.ir_blocks)
+            complex_optional_roots, location_to_optional_roots = location_to_optional_results
+            optional_traversal_tree = construct_optional_traversal_tree(
+                complex_optional_roots, location_to_optional_roots
+            )
+            self.assertEqual(
+                len(optional_traversal_tree.get_all_rooted_subtrees_as_lists()),
+                optional_traversal_tree.get_rooted_subtree_count(),
+            )
+            self.assertEqual(
+                max(1, 2**optional_traversal_count),
+                get_subquery_count(self.common_schema_info, graphql_query),
+            )
+
+    def test_optional_subqueries_cannot_be_merged(self) -> None:
+        optional_traversal_count = 3
+        graphql_query = make_query_with_complex_optionals(optional_traversal_count)
+        ir = graphql_to_ir(
+            self.common_schema_info.schema,
+            graphql_query,
+            type_equivalence_hints=self.common_schema_info.type_equivalence_hints,
+        )
+        compound_match_query = lower_ir(self.common_schema_info, ir)
+        if not isinstance(compound_match_query, CompoundMatchQuery):
+            raise AssertionError(f"Expected a CompoundMatchQuery, got: {compound_match_query}")
+
+        required_locations_per_subquery = set()
+        for match_query in compound_match_query.match_queries:
+            required_locations = set()
+            for match_traversal in match_query.match_traversals:
+                for step in match_traversal:
+                    # MATCH only allows optional nodes at the end of a pattern, so none of the
+                    # complex @optional traverses may remain optional.
+                    if isinstance(step.root_block, Traverse):
+                        self.assertFalse(step.root_block.optional)
+                    required_locations.add(step.as_block.location.at_vertex())
+            required_locations_per_subquery.add(frozenset(required_locations))
+
+        # Every subquery requires a different set of vertices, so each produces the results of
+        # a single combination of present and absent @optional scopes, and none are redundant.
+        self.assertEqual(2**optional_traversal_count, len(required_locations_per_subquery))
@@ -0,0 +1,204 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+from typing import Any, Callable, Dict, Iterable, List, Mapping
+import unittest
+
+from ..compiler import compile_graphql_to_match
+from ..compiler.common import CompilationResult
+from ..exceptions import GraphQLCompilationError
+from ..query_formatting.common import insert_arguments_into_query
+from ..query_planning.match_query_plan import (
+    compile_graphql_to_match_query_plan,
+    execute_match_query_plan,
+)
+from .benchmarks.match_optional_benchmark import make_query_with_complex_optionals
+from .test_helpers import get_common_schema_info
+
+
+def _make_query_executor(
+    results_by_query: Mapping[str, List[Dict[str, Any]]]
+) -> Callable[[str], Iterable[Mapping[str, Any]]]:
+    """Return a function that executes the given queries, by returning the given results."""
+
+    def execute_query(query: str) -> Iterable[Mapping[str, Any]]:
+        """Return the results of the given query."""
+        return results_by_query[query]
+
+    return execute_query
+
+
+def _get_query(compilation_result: CompilationResult, arguments: Dict[str, Any]) -> str:
+    """Return the compiled query with the given arguments inserted."""
+    return insert_arguments_into_query(compilation_result, arguments)
+
+
+class MatchQueryPlanTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.common_schema_info = get_common_schema_info()
+
+    def test_plan_within_limit_is_single_query(self) -> None:
+        graphql_query = make_query_with_complex_optionals(4)
+        query_plan = compile_graphql_to_match_query_plan(self.common_schema_info, graphql_query, 16)
+
+        self.assertEqual(
+            compile_graphql_to_match(self.common_schema_info, graphql_query),
+            query_plan.base_compilation_result,
+        )
+        self.assertEqual(tuple(), query_plan.optional_scope_queries)
+        self.assertEqual(tuple(), query_plan.key_output_names)
+
+    def test_plan_splits_complex_optionals_above_limit(self) -> None:
+        optional_traversal_count = 8
+        graphql_query = make_query_with_complex_optionals(optional_traversal_count)
+        query_plan = compile_graphql_to_match_query_plan(self.common_schema_info, graphql_query, 1)
+
+        self.assertEqual(optional_traversal_count, len(query_plan.optional_scope_queries))
+        compilation_results = [query_plan.base_compilation_result] + [
+            optional_scope_query.compilation_result
+            for optional_scope_query in query_plan.optional_scope_queries
+        ]
+        for compilation_result in compilation_results:
+            # Every query of the plan consists of a single MATCH sub-query.
+            self.assertNotIn("UNIONALL", compilation_result.query)
+
+        self.assertEqual(
+            [frozenset({f"related_name_{index}"}) for index in range(optional_traversal_count)],
+            [
+                optional_scope_query.output_names
+                for optional_scope_query in query_plan.optional_scope_queries
+            ],
+        )
+        self.assertEqual(
+            compile_graphql_to_match(self.common_schema_info, graphql_query).output_metadata,
+            query_plan.output_metadata,
+        )
+
+    def test_plan_merges_query_results(self) -> None:
+        graphql_query = make_query_with_complex_optionals(2)
+        query_plan = compile_graphql_to_match_query_plan(self.common_schema_info, graphql_query, 2)
+        first_scope_query, second_scope_query = query_plan.optional_scope_queries
+        self.assertEqual(3, len(query_plan.key_output_names))
+
+        def make_result(key: str, **outputs: Any) -> Dict[str, Any]:
+            """Return a query result for the vertices identified by the key."""
+            result = {
+                output_name: f"#{key}:{index}"
+                for index, output_name in enumerate(query_plan.key_output_names)
+            }
+            result.update(name=key, name_0=f"{key}_child", name_1=f"{key}_grandchild")
+            result.update(outputs)
+            return result
+
+        first_edge_count_name = first_scope_query.edge_count_output_name
+        second_edge_count_name = second_scope_query.edge_count_output_name
+        base_results = [
+            # Both scopes have no edges to traverse.
+            make_result("a", **{first_edge_count_name: 0, second_edge_count_name: 0}),
+            # The first scope has results, the second has no edges to traverse.
+            make_result("b", **{first_edge_count_name: 2, second_edge_count_name: 0}),
+            # The first scope has edges, but no vertices that satisfy its traversals.
+            make_result("c", **{first_edge_count_name: 1, second_edge_count_name: 1}),
+            # Both scopes have results.
+            make_result("d", **{first_edge_count_name: 1, second_edge_count_name: 3}),
+        ]
+        first_scope_results = [
+            make_result("b", related_name_0="b_related_0"),
+            make_result("b", related_name_0="b_related_1"),
+            make_result("d", related_name_0="d_related"),
+        ]
+        second_scope_results = [
+            make_result("c", related_name_1="c_related"),
+            make_result("d", related_name_1="d_related_0"),
+            make_result("d", related_name_1="d_related_1"),
+        ]
+        execute_query = _make_query_executor(
+            {
+                _get_query(query_plan.base_compilation_result, {}): base_results,
+                _get_query(first_scope_query.compilation_result, {}): first_scope_results,
+                _get_query(second_scope_query.compilation_result, {}): second_scope_results,
+            }
+        )
+
+        def make_expected_result(
+            key: str, first_related_name: Any, second_related_name: Any
+        ) -> Dict[str, Any]:
+            """Return the merged result for the vertices identified by the key."""
+            return {
+                "name": key,
+                "name_0": f"{key}_child",
+                "name_1": f"{key}_grandchild",
+                "related_name_0": first_related_name,
+                "related_name_1": second_related_name,
+            }
+
+        expected_results = [
+            make_expected_result("a", None, None),
+            make_expected_result("b", "b_related_0", None),
+            make_expected_result("b", "b_related_1", None),
+            make_expected_result("d", "d_related", "d_related_0"),
+            make_expected_result("d", "d_related", "d_related_1"),
+        ]
+        self.assertEqual(expected_results, execute_match_query_plan(query_plan, {}, execute_query))
+
+    def test_plan_passes_each_query_its_parameters(self) -> None:
+        graphql_query = """{
+            Animal {
+                name @output(out_name: "name") @tag(tag_name: "parent_name")
+                out_Animal_ParentOf @optional {
+                    out_Animal_ParentOf {
+                        name @filter(op_name: "!=", value: ["%parent_name"])
+                             @filter(op_name: "=", value: ["$wanted"])
+                             @output(out_name: "grandchild_name")
+                    }
+                }
+            }
+        }"""
+        parameters = {"wanted": "Bob"}
+        query_plan = compile_graphql_to_match_query_plan(self.common_schema_info, graphql_query, 1)
+        (optional_scope_query,) = query_plan.optional_scope_queries
+
+        # The tag and the parameter are only used within the split scope, so the base query
+        # uses neither of them.
+        self.assertEqual({}, query_plan.base_compilation_result.input_metadata)
+        self.assertEqual({"wanted"}, set(optional_scope_query.compilation_result.input_metadata))
+
+        key_output_name = query_plan.key_output_names[0]
+        execute_query = _make_query_executor(
+            {
+                _get_query(query_plan.base_compilation_result, {}): [
+                    {
+                        key_output_name: "#1:0",
+                        "name": "Alice",
+                        optional_scope_query.edge_count_output_name: 1,
+                    }
+                ],
+                _get_query(optional_scope_query.compilation_result, parameters): [
+                    {key_output_name: "#1:0", "name": "Alice", "grandchild_name": "Bob"}
+                ],
+            }
+        )
+        self.assertEqual(
+            [{"name": "Alice", "grandchild_name": "Bob"}],
+            execute_match_query_plan(query_plan, parameters, execute_query),
+        )
+
+    def test_plan_does_not_split_scopes_whose_tags_are_used_outside(self) -> None:
+        graphql_query = """{
+            Animal {
+                name @output(out_name: "name")
+                out_Animal_ParentOf @optional {
+                    out_Animal_ParentOf {
+                        name @tag(tag_name: "grandchild_name")
+                    }
+                }
+                out_Animal_OfSpecies {
+                    name @filter(op_name: "=", value: ["%grandchild_name"])
+                }
+            }
+        }"""
+        query_plan = compile_graphql_to_match_query_plan(self.common_schema_info, graphql_query, 2)
+        self.assertEqual(tuple(), query_plan.optional_scope_queries)
+
+        with self.assertRaises(GraphQLCompilationError):
+            compile_graphql_to_match_query_plan(self.common_schema_info, graphql_query, 1)
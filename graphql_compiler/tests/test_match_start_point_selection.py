@@ -0,0 +1,126 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+from typing import Dict, Tuple
+import unittest
+
+from ..compiler import MatchCompilationOptions, compile_graphql_to_match
+from ..cost_estimation.statistics import LocalStatistics
+from ..schema.schema_info import QueryPlanningSchemaInfo
+from .test_helpers import compare_match, get_common_schema_info, get_query_planning_schema_info
+
+
+def _make_query_planning_schema_info(
+    class_counts: Dict[str, int], distinct_field_values_counts: Dict[Tuple[str, str], int]
+) -> QueryPlanningSchemaInfo:
+    """Return a QueryPlanningSchemaInfo for the test schema, with the given statistics."""
+    return get_query_planning_schema_info(
+        LocalStatistics(class_counts, distinct_field_values_counts=distinct_field_values_counts)
+    )
+
+
+class MatchStartPointSelectionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.common_schema_info = get_common_schema_info()
+
+    def test_filtered_start_point_with_fewest_vertices(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @filter(op_name: "=", value: ["$animal_name"])
+                     @output(out_name: "animal_name")
+                out_Animal_OfSpecies {
+                    name @filter(op_name: "=", value: ["$species_name"])
+                         @output(out_name: "species_name")
+                }
+            }
+        }"""
+        schema_info = _make_query_planning_schema_info(
+            {"Animal": 100000000, "Species": 50},
+            {("Animal", "name"): 1000, ("Species", "name"): 50},
+        )
+        compilation_options = MatchCompilationOptions(
+            query_planning_schema_info=schema_info,
+            parameters={"animal_name": "Bob", "species_name": "Beaver"},
+        )
+
+        # Both locations have local filters, so structurally they are equally good start points.
+        # The statistics show that the Species filter leaves far fewer vertices.
+        expected_match = """
+            SELECT
+                Animal___1.name AS `animal_name`,
+                Animal__out_Animal_OfSpecies___1.name AS `species_name`
+            FROM (
+                MATCH {{
+                    where: (((@this INSTANCEOF 'Animal') AND (name = {animal_name}))),
+                    as: Animal___1
+                }}.out('Animal_OfSpecies') {{
+                    class: Species,
+                    where: ((name = {species_name})),
+                    as: Animal__out_Animal_OfSpecies___1
+                }}
+                RETURN $matches
+            )
+        """
+        result = compile_graphql_to_match(
+            self.common_schema_info, graphql_input, compilation_options=compilation_options
+        )
+        compare_match(self, expected_match, result.query)
+
+    def test_unfiltered_start_point_with_fewest_vertices(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_OfSpecies {
+                    name @filter(op_name: "=", value: ["$species_name"])
+                         @output(out_name: "species_name")
+                }
+            }
+        }"""
+        schema_info = _make_query_planning_schema_info(
+            {"Animal": 50, "Species": 100000000}, {("Species", "name"): 10}
+        )
+        compilation_options = MatchCompilationOptions(
+            query_planning_schema_info=schema_info, parameters={"species_name": "Beaver"}
+        )
+
+        # Without statistics, the filtered Species location would be the only start point.
+        expected_match = """
+            SELECT
+                Animal___1.name AS `animal_name`,
+                Animal__out_Animal_OfSpecies___1.name AS `species_name`
+            FROM (
+                MATCH {{
+                    class: Animal,
+                    as: Animal___1
+                }}.out('Animal_OfSpecies') {{
+                    where: ((name = {species_name})),
+                    as: Animal__out_Animal_OfSpecies___1
+                }}
+                RETURN $matches
+            )
+        """
+        result = compile_graphql_to_match(
+            self.common_schema_info, graphql_input, compilation_options=compilation_options
+        )
+        compare_match(self, expected_match, result.query)
+
+    def test_missing_class_count_uses_structural_start_points(self) -> None:
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "animal_name")
+                out_Animal_OfSpecies {
+                    name @filter(op_name: "=", value: ["$species_name"])
+                         @output(out_name: "species_name")
+                }
+            }
+        }"""
+        schema_info = _make_query_planning_schema_info({"Animal": 50}, {})
+        compilation_options = MatchCompilationOptions(
+            query_planning_schema_info=schema_info, parameters={"species_name": "Beaver"}
+        )
+
+        expected_result = compile_graphql_to_match(self.common_schema_info, graphql_input)
+        result = compile_graphql_to_match(
+            self.common_schema_info, graphql_input, compilation_options=compilation_options
+        )
+        self.assertEqual(expected_result, result)
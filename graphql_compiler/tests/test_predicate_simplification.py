@@ -0,0 +1,142 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import unittest
+
+from graphql import GraphQLInt, GraphQLString
+
+from ..compiler import compile_graphql_to_cypher, compile_graphql_to_match
+from ..compiler.expressions import BinaryComposition, Literal, LocalField, TrueLiteral, Variable
+from ..compiler.ir_lowering_common.predicate_simplification import simplify_conjunction
+from .test_helpers import compare_cypher, compare_match, get_common_schema_info
+
+
+def _conjunction(*predicates):
+    """Return the conjunction of the given predicates."""
+    conjunction = predicates[-1]
+    for predicate in reversed(predicates[:-1]):
+        conjunction = BinaryComposition("&&", predicate, conjunction)
+    return conjunction
+
+
+class PredicateSimplificationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.net_worth = LocalField("net_worth", GraphQLInt)
+        self.name = LocalField("name", GraphQLString)
+        self.lower = Variable("$lower", GraphQLInt)
+        self.upper = Variable("$upper", GraphQLInt)
+
+    def test_simplest_predicate_is_unchanged(self) -> None:
+        predicate = _conjunction(
+            BinaryComposition(">=", self.net_worth, self.lower),
+            BinaryComposition("<=", self.net_worth, self.upper),
+            BinaryComposition("=", self.name, Variable("$name", GraphQLString)),
+        )
+        self.assertIs(predicate, simplify_conjunction(predicate))
+
+    def test_duplicates_and_true_literals_are_removed(self) -> None:
+        lower_bound = BinaryComposition(">=", self.net_worth, self.lower)
+        predicate = _conjunction(
+            lower_bound,
+            TrueLiteral,
+            BinaryComposition("<=", self.lower, self.net_worth),
+        )
+        self.assertEqual(lower_bound, simplify_conjunction(predicate))
+
+    def test_bounds_are_tightened(self) -> None:
+        predicate = _conjunction(
+            BinaryComposition(">=", self.net_worth, self.lower),
+            BinaryComposition(">", self.net_worth, self.lower),
+            BinaryComposition("<", self.net_worth, Literal(100)),
+            BinaryComposition("<=", self.net_worth, Literal(50)),
+        )
+        expected_predicate = _conjunction(
+            BinaryComposition(">", self.net_worth, self.lower),
+            BinaryComposition("<=", self.net_worth, Literal(50)),
+        )
+        self.assertEqual(expected_predicate, simplify_conjunction(predicate))
+
+    def test_inclusive_bounds_with_the_same_value_become_equality(self) -> None:
+        predicate = _conjunction(
+            BinaryComposition("=", self.name, Literal("Bob")),
+            BinaryComposition(">=", self.net_worth, self.lower),
+            BinaryComposition("<=", self.net_worth, self.lower),
+        )
+        expected_predicate = _conjunction(
+            BinaryComposition("=", self.name, Literal("Bob")),
+            BinaryComposition("=", self.net_worth, self.lower),
+        )
+        self.assertEqual(expected_predicate, simplify_conjunction(predicate))
+
+    def test_predicates_implied_by_equality_are_removed(self) -> None:
+        predicate = _conjunction(
+            BinaryComposition("contains", Literal(["Alice", "Bob"]), self.name),
+            BinaryComposition("=", self.name, Literal("Bob")),
+            BinaryComposition("=", self.net_worth, Literal(10)),
+            BinaryComposition(">", self.net_worth, Literal(5)),
+            BinaryComposition("<", self.net_worth, self.upper),
+        )
+        expected_predicate = _conjunction(
+            BinaryComposition("=", self.name, Literal("Bob")),
+            BinaryComposition("=", self.net_worth, Literal(10)),
+            BinaryComposition("<", self.net_worth, self.upper),
+        )
+        self.assertEqual(expected_predicate, simplify_conjunction(predicate))
+
+    def test_contradictions_are_kept(self) -> None:
+        predicate = _conjunction(
+            BinaryComposition("=", self.net_worth, Literal(10)),
+            BinaryComposition("<", self.net_worth, Literal(5)),
+        )
+        self.assertIs(predicate, simplify_conjunction(predicate))
+
+    def test_compiled_queries_are_simplified(self) -> None:
+        common_schema_info = get_common_schema_info()
+        graphql_input = """{
+            Animal {
+                name @output(out_name: "name")
+                net_worth @filter(op_name: ">=", value: ["$net_worth"])
+                          @filter(op_name: "<=", value: ["$net_worth"])
+                out_Animal_ParentOf {
+                    birthday @filter(op_name: ">", value: ["$born_after"])
+                             @filter(op_name: ">=", value: ["$born_after"])
+                             @filter(op_name: "<=", value: ["$born_before"])
+                }
+            }
+        }"""
+        expected_match = """
+            SELECT Animal___1.name AS `name` FROM (
+                MATCH {{
+                    class: Animal,
+                    where: ((net_worth = {net_worth})),
+                    as: Animal___1
+                }}.out('Animal_ParentOf') {{
+                    class: Animal,
+                    where: ((
+                        (birthday <= date({born_before}, "yyyy-MM-dd")) AND
+                        (birthday > date({born_after}, "yyyy-MM-dd"))
+                    )),
+                    as: Animal__out_Animal_ParentOf___1
+                }}
+                RETURN $matches
+            )
+        """
+        expected_cypher = """
+            MATCH (Animal___1:Animal)
+              WHERE (Animal___1.net_worth = $net_worth)
+            MATCH (Animal___1)-[:Animal_ParentOf]->(Animal__out_Animal_ParentOf___1:Animal)
+              WHERE (
+                (Animal__out_Animal_ParentOf___1.birthday > $born_after) AND
+                (Animal__out_Animal_ParentOf___1.birthday <= $born_before)
+              )
+            RETURN
+              Animal___1.name AS `name`
+        """
+        compare_match(
+            self, expected_match, compile_graphql_to_match(common_schema_info, graphql_input).query
+        )
+        compare_cypher(
+            self,
+            expected_cypher,
+            compile_graphql_to_cypher(common_schema_info, graphql_input).query,
+        )
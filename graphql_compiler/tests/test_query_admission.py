@@ -0,0 +1,163 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import unittest
+
+from ..cost_estimation.statistics import LocalStatistics
+from ..global_utils import QueryStringWithParameters
+from ..query_admission import (
+    AdmissionBudget,
+    AdmissionPolicy,
+    ExecutionCostOverBudget,
+    FoldFanOutOverBudget,
+    MissingStatistics,
+    ResultCardinalityOverBudget,
+    check_query_admission,
+)
+from .test_helpers import get_query_planning_schema_info
+
+
+class QueryAdmissionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        statistics = LocalStatistics(
+            {
+                "Animal": 1000,
+                "Animal_OfSpecies": 1000,
+                "Animal_ParentOf": 1000000000,
+                "Species": 10,
+            },
+            vertex_edge_vertex_counts={
+                ("Animal", "Animal_ParentOf", "Animal"): 1000000000,
+                ("Animal", "Animal_OfSpecies", "Species"): 1000,
+            },
+            distinct_field_values_counts={("Animal", "name"): 100000000},
+        )
+        self.schema_info = get_query_planning_schema_info(statistics)
+
+    def test_query_within_budget_is_admitted(self) -> None:
+        query = QueryStringWithParameters(
+            """{
+                Animal {
+                    name @output(out_name: "animal_name")
+                    out_Animal_OfSpecies {
+                        name @output(out_name: "species_name")
+                    }
+                }
+            }""",
+            {},
+        )
+        budget = AdmissionBudget(
+            max_result_cardinality=1000, max_execution_cost=10000, max_fold_fan_out=10
+        )
+        self.assertEqual(tuple(), check_query_admission(self.schema_info, query, budget))
+
+    def test_few_rows_with_many_reads_are_rejected(self) -> None:
+        query = QueryStringWithParameters(
+            """{
+                Animal {
+                    name @output(out_name: "animal_name")
+                    out_Animal_ParentOf {
+                        name @filter(op_name: "=", value: ["$child_name"])
+                    }
+                }
+            }""",
+            {"child_name": "Bob"},
+        )
+        budget = AdmissionBudget(max_result_cardinality=1000, max_execution_cost=1000000)
+        expected_rejections = (
+            ExecutionCostOverBudget(
+                ("Animal", "out_Animal_ParentOf"),
+                estimated_cost=2000001000,
+                max_execution_cost=1000000,
+            ),
+        )
+        self.assertEqual(
+            expected_rejections, check_query_admission(self.schema_info, query, budget)
+        )
+
+    def test_cross_product_is_rejected(self) -> None:
+        query = QueryStringWithParameters(
+            """{
+                Animal {
+                    name @output(out_name: "animal_name")
+                    out_Animal_ParentOf {
+                        name @output(out_name: "child_name")
+                    }
+                }
+            }""",
+            {},
+        )
+        budget = AdmissionBudget(max_result_cardinality=1000000)
+        rejections = check_query_admission(self.schema_info, query, budget)
+        self.assertEqual(1, len(rejections))
+        rejection = rejections[0]
+        self.assertIsInstance(rejection, ResultCardinalityOverBudget)
+        self.assertEqual(("Animal", "out_Animal_ParentOf"), rejection.vertex_path)
+        self.assertIn("1000000000 rows", rejection.message)
+
+    def test_fold_fan_out_is_limited(self) -> None:
+        query = QueryStringWithParameters(
+            """{
+                Animal {
+                    name @output(out_name: "animal_name")
+                    out_Animal_ParentOf @fold {
+                        name @output(out_name: "child_names")
+                    }
+                }
+            }""",
+            {},
+        )
+        expected_rejections = (
+            FoldFanOutOverBudget(
+                ("Animal", "out_Animal_ParentOf"),
+                estimated_fan_out=1000000,
+                max_fold_fan_out=1000,
+            ),
+        )
+        self.assertEqual(
+            expected_rejections,
+            check_query_admission(self.schema_info, query, AdmissionBudget(max_fold_fan_out=1000)),
+        )
+        self.assertEqual(
+            tuple(),
+            check_query_admission(
+                self.schema_info, query, AdmissionBudget(max_fold_fan_out=10000000)
+            ),
+        )
+
+    def test_missing_statistics_reject_the_query(self) -> None:
+        query = QueryStringWithParameters(
+            """{
+                Animal {
+                    name @output(out_name: "animal_name")
+                    out_Animal_LivesIn {
+                        name @output(out_name: "location_name")
+                    }
+                }
+            }""",
+            {},
+        )
+        expected_rejections = (
+            MissingStatistics(("Animal", "out_Animal_LivesIn"), "Location"),
+            MissingStatistics(("Animal", "out_Animal_LivesIn"), "Animal_LivesIn"),
+        )
+        self.assertEqual(
+            expected_rejections,
+            check_query_admission(
+                self.schema_info, query, AdmissionBudget(max_result_cardinality=1000)
+            ),
+        )
+
+        # Queries are not analyzed at all if the budget does not limit any costs.
+        self.assertEqual(tuple(), check_query_admission(self.schema_info, query, AdmissionBudget()))
+
+    def test_per_tenant_budgets(self) -> None:
+        strict_budget = AdmissionBudget(max_execution_cost=1000)
+        lenient_budget = AdmissionBudget(max_execution_cost=1000000)
+        policy = AdmissionPolicy(
+            default_budget=strict_budget, tenant_budgets={"reporting": lenient_budget}
+        )
+        self.assertEqual(lenient_budget, policy.get_budget("reporting"))
+        self.assertEqual(strict_budget, policy.get_budget("other_tenant"))
+        self.assertEqual(strict_budget, policy.get_budget(None))
+        self.assertEqual(AdmissionBudget(), AdmissionPolicy().get_budget("reporting"))
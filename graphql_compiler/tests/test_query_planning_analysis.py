@@ -0,0 +1,199 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import dataclasses
+import gc
+import unittest
+import weakref
+
+from graphql import print_ast
+
+from ..ast_manipulation import safe_parse_graphql
+from ..cost_estimation.analysis import (
+    QueryPlanningAnalysis,
+    _QueryStructureCache,
+    analyze_query_ast,
+    analyze_query_string,
+    clear_query_structure_cache,
+    estimate_query_string_cardinalities,
+)
+from ..cost_estimation.statistics import LocalStatistics
+from ..exceptions import GraphQLInvalidArgumentError
+from ..global_utils import ASTWithParameters, QueryStringWithParameters
+from .test_helpers import get_query_planning_schema_info
+
+
+class QueryPlanningAnalysisTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        statistics = LocalStatistics(
+            {"Animal": 1000, "Animal_ParentOf": 1000},
+            vertex_edge_vertex_counts={("Animal", "Animal_ParentOf", "Animal"): 1000},
+            distinct_field_values_counts={("Animal", "name"): 100},
+        )
+        self.schema_info = get_query_planning_schema_info(statistics)
+        self.query_string = """{
+            Animal {
+                name @filter(op_name: "=", value: ["$name"]) @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    net_worth @filter(op_name: ">=", value: ["$min_net_worth"])
+                              @output(out_name: "child_net_worth")
+                }
+            }
+        }"""
+
+    def test_parameter_independent_passes_are_shared(self) -> None:
+        first_analysis = analyze_query_string(
+            self.schema_info,
+            QueryStringWithParameters(self.query_string, {"name": "Bob", "min_net_worth": 10}),
+        )
+        second_analysis = analyze_query_string(
+            self.schema_info,
+            QueryStringWithParameters(self.query_string, {"name": "Eve", "min_net_worth": 20}),
+        )
+        self.assertIs(first_analysis.query_structure, second_analysis.query_structure)
+        self.assertIs(first_analysis.metadata_table, second_analysis.metadata_table)
+        self.assertIs(first_analysis.types, second_analysis.types)
+        self.assertIs(
+            first_analysis.fields_eligible_for_pagination,
+            second_analysis.fields_eligible_for_pagination,
+        )
+
+        # Analyzing the AST of the query shares the passes of queries with the same AST.
+        ast_analysis = analyze_query_ast(
+            self.schema_info,
+            ASTWithParameters(
+                safe_parse_graphql(self.query_string), {"name": "Bob", "min_net_worth": 10}
+            ),
+        )
+        printed_query_analysis = analyze_query_string(
+            self.schema_info,
+            QueryStringWithParameters(
+                print_ast(ast_analysis.ast_with_parameters.query_ast),
+                {"name": "Bob", "min_net_worth": 10},
+            ),
+        )
+        self.assertIs(ast_analysis.query_structure, printed_query_analysis.query_structure)
+
+        # Passes of different schema_info objects are not shared.
+        other_schema_info = get_query_planning_schema_info(self.schema_info.statistics)
+        other_analysis = analyze_query_string(
+            other_schema_info,
+            QueryStringWithParameters(self.query_string, {"name": "Bob", "min_net_worth": 10}),
+        )
+        self.assertIsNot(first_analysis.query_structure, other_analysis.query_structure)
+
+    def test_shared_passes_match_unshared_passes(self) -> None:
+        parameters = {"name": "Bob", "min_net_worth": 10}
+        query = QueryStringWithParameters(self.query_string, parameters)
+        shared_analysis = analyze_query_string(self.schema_info, query)
+        unshared_analysis = QueryPlanningAnalysis(
+            self.schema_info, ASTWithParameters.from_query_string_with_parameters(query)
+        )
+        self.assertIsNot(shared_analysis.metadata_table, unshared_analysis.metadata_table)
+
+        for pass_name in (
+            "types",
+            "filters",
+            "fold_scope_roots",
+            "single_field_filters",
+            "fields_eligible_for_pagination",
+            "field_value_intervals",
+            "selectivities",
+            "distinct_result_set_estimates",
+            "pagination_capacities",
+            "cardinality_estimate",
+            "execution_cost_estimate",
+        ):
+            self.assertEqual(
+                getattr(unshared_analysis, pass_name), getattr(shared_analysis, pass_name)
+            )
+
+    def test_parameters_are_validated_for_each_analysis(self) -> None:
+        analyze_query_string(
+            self.schema_info,
+            QueryStringWithParameters(self.query_string, {"name": "Bob", "min_net_worth": 10}),
+        ).metadata_table
+
+        invalid_analysis = analyze_query_string(
+            self.schema_info, QueryStringWithParameters(self.query_string, {"name": "Bob"})
+        )
+        with self.assertRaises(GraphQLInvalidArgumentError):
+            invalid_analysis.metadata_table
+
+    def test_batch_cardinality_estimates_match_single_estimates(self) -> None:
+        query_string = """{
+            Animal {
+                name @filter(op_name: "in_collection", value: ["$names"])
+                     @output(out_name: "animal_name")
+                out_Animal_ParentOf {
+                    name @filter(op_name: "=", value: ["$child_name"])
+                         @output(out_name: "child_name")
+                    out_Animal_ParentOf @optional {
+                        name @output(out_name: "grandchild_name")
+                    }
+                }
+                in_Animal_ParentOf @fold {
+                    name @output(out_name: "parent_names")
+                }
+            }
+        }"""
+        parameter_sets = [
+            {"names": ["Bob"], "child_name": "Eve"},
+            {"names": ["Bob", "Alice"], "child_name": "Eve"},
+            {"names": ["Bob", "Alice"], "child_name": "Dave"},
+            {"names": ["Bob"], "child_name": "Eve"},
+            {"names": [], "child_name": "Eve"},
+        ]
+        expected_estimates = [
+            analyze_query_string(
+                self.schema_info, QueryStringWithParameters(query_string, parameters)
+            ).cardinality_estimate
+            for parameters in parameter_sets
+        ]
+        self.assertEqual(
+            expected_estimates,
+            estimate_query_string_cardinalities(self.schema_info, query_string, parameter_sets),
+        )
+
+        with self.assertRaises(GraphQLInvalidArgumentError):
+            estimate_query_string_cardinalities(
+                self.schema_info, query_string, parameter_sets + [{"names": ["Bob"]}]
+            )
+
+    def test_cached_passes_do_not_outlive_schema_info(self) -> None:
+        query = QueryStringWithParameters(self.query_string, {"name": "Bob", "min_net_worth": 10})
+        first_analysis = analyze_query_string(self.schema_info, query)
+
+        # Copies of the schema_info, e.g. with refreshed statistics, don't share cached passes.
+        copied_schema_info = dataclasses.replace(self.schema_info)
+        self.assertIsNot(
+            first_analysis.query_structure,
+            analyze_query_string(copied_schema_info, query).query_structure,
+        )
+
+        # Once a schema_info is no longer used, it is freed along with its cached passes.
+        schema_info_reference = weakref.ref(copied_schema_info)
+        del copied_schema_info
+        gc.collect()
+        self.assertIsNone(schema_info_reference())
+
+        clear_query_structure_cache(self.schema_info)
+        self.assertIsNot(
+            first_analysis.query_structure,
+            analyze_query_string(self.schema_info, query).query_structure,
+        )
+
+    def test_least_recently_used_queries_are_evicted(self) -> None:
+        cache = _QueryStructureCache(2)
+        animal_name_query = '{ Animal { name @output(out_name: "name") } }'
+        animal_uuid_query = '{ Animal { uuid @output(out_name: "uuid") } }'
+        species_name_query = '{ Species { name @output(out_name: "name") } }'
+
+        animal_name_structure = cache.get(self.schema_info, animal_name_query)
+        animal_uuid_structure = cache.get(self.schema_info, animal_uuid_query)
+        self.assertIs(animal_name_structure, cache.get(self.schema_info, animal_name_query))
+
+        # The Animal uuid query is the least recently used one, so it is evicted.
+        cache.get(self.schema_info, species_name_query)
+        self.assertIs(animal_name_structure, cache.get(self.schema_info, animal_name_query))
+        self.assertIsNot(animal_uuid_structure, cache.get(self.schema_info, animal_uuid_query))
@@ -0,0 +1,162 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import datetime
+import unittest
+
+from ..cost_estimation.analysis import analyze_query_string
+from ..cost_estimation.sketch_statistics import SketchStatistics
+from ..cost_estimation.sketches import CountMinSketch, HyperLogLog, TDigest
+from ..global_utils import QueryStringWithParameters
+from .test_helpers import get_query_planning_schema_info
+
+
+class SketchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+
+    def test_hyperloglog(self) -> None:
+        sketch = HyperLogLog()
+        other_sketch = HyperLogLog()
+        for value in range(20000):
+            sketch.add(f"value_{value}")
+            sketch.add(f"value_{value}")
+        for value in range(10000, 30000):
+            other_sketch.add(f"value_{value}")
+        self.assertAlmostEqual(20000, sketch.estimate(), delta=20000 * 0.05)
+
+        sketch.merge(other_sketch)
+        self.assertAlmostEqual(30000, sketch.estimate(), delta=30000 * 0.05)
+        self.assertEqual(sketch.estimate(), HyperLogLog.from_bytes(sketch.to_bytes()).estimate())
+
+        small_sketch = HyperLogLog()
+        for value in range(10):
+            small_sketch.add(value)
+        self.assertEqual(10, round(small_sketch.estimate()))
+
+        with self.assertRaises(ValueError):
+            sketch.merge(HyperLogLog(10))
+
+    def test_count_min_sketch(self) -> None:
+        sketch = CountMinSketch(width=64, depth=4)
+        other_sketch = CountMinSketch(width=64, depth=4)
+        for value in range(100):
+            sketch.add(value, count=value)
+            other_sketch.add(value)
+
+        sketch.merge(other_sketch)
+        sketch = CountMinSketch.from_bytes(sketch.to_bytes())
+
+        # Estimates are never lower than the true counts.
+        for value in range(100):
+            self.assertLessEqual(value + 1, sketch.estimate(value))
+        self.assertEqual(100, sketch.estimate(99))
+        self.assertEqual(0, CountMinSketch().estimate("missing_value"))
+
+    def test_t_digest(self) -> None:
+        sketch = TDigest()
+        other_sketch = TDigest()
+        for value in range(0, 10000, 2):
+            sketch.add(value)
+            other_sketch.add(value + 1)
+
+        sketch.merge(other_sketch)
+        self.assertEqual(0, sketch.quantile(0))
+        self.assertEqual(9999, sketch.quantile(1))
+        for quantile in (0.01, 0.1, 0.5, 0.9, 0.99):
+            self.assertAlmostEqual(quantile * 10000, sketch.quantile(quantile), delta=50)
+
+        deserialized_sketch = TDigest.from_bytes(sketch.to_bytes())
+        self.assertEqual(sketch.quantile(0.5), deserialized_sketch.quantile(0.5))
+        self.assertLess(len(sketch.to_bytes()), 16 * 200)
+
+        single_value_sketch = TDigest()
+        single_value_sketch.add(5)
+        self.assertEqual([5, 5, 5], [single_value_sketch.quantile(q) for q in (0, 0.5, 1)])
+
+
+class SketchStatisticsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+
+    def test_statistics_from_merged_streams(self) -> None:
+        worker_statistics = [SketchStatistics(quantile_count=3) for _ in range(2)]
+        for index in range(1000):
+            statistics = worker_statistics[index % 2]
+            statistics.add_vertex(
+                "Animal",
+                {
+                    "name": "Bob" if index < 100 else f"animal_{index}",
+                    "birthday": datetime.date(2000, 1, 1) + datetime.timedelta(days=index),
+                    "net_worth": None,
+                },
+            )
+            statistics.add_vertex_edge_vertex_count("Animal", "Animal_ParentOf", "Animal", 2)
+        worker_statistics[0].add_class_count("Animal_ParentOf", 2000)
+
+        statistics = worker_statistics[0]
+        statistics.merge(worker_statistics[1])
+        statistics = SketchStatistics.from_bytes(statistics.to_bytes())
+
+        self.assertEqual(1000, statistics.get_class_count("Animal"))
+        self.assertEqual(2000, statistics.get_class_count("Animal_ParentOf"))
+        self.assertIsNone(statistics.get_class_count("Species"))
+        self.assertEqual(
+            2000, statistics.get_vertex_edge_vertex_count("Animal", "Animal_ParentOf", "Animal")
+        )
+        self.assertAlmostEqual(
+            901, statistics.get_distinct_field_values_count("Animal", "name"), delta=901 * 0.05
+        )
+        self.assertIsNone(statistics.get_distinct_field_values_count("Animal", "net_worth"))
+        self.assertEqual(100, statistics.get_value_count("Animal", "name", "Bob"))
+        self.assertEqual(1, statistics.get_value_count("Animal", "name", "Eve"))
+        self.assertIsNone(statistics.get_value_count("Animal", "color", "red"))
+
+        birthday_quantiles = statistics.get_field_quantiles("Animal", "birthday")
+        self.assertEqual(datetime.date(2000, 1, 1), birthday_quantiles[0])
+        self.assertEqual(datetime.date(2002, 9, 26), birthday_quantiles[2])
+        self.assertAlmostEqual(
+            datetime.date(2001, 5, 15).toordinal(), birthday_quantiles[1].toordinal(), delta=5
+        )
+        self.assertIsNone(statistics.get_field_quantiles("Animal", "name"))
+
+    def test_datetime_and_int_quantiles(self) -> None:
+        statistics = SketchStatistics(quantile_count=2)
+        for hour in range(24):
+            event_date = datetime.datetime(2020, 1, 1, hour, tzinfo=datetime.timezone.utc)
+            statistics.add_field_value("Event", "event_date", event_date)
+            statistics.add_field_value("Animal", "uuid", hour)
+        self.assertEqual(
+            [datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 1, 23)],
+            statistics.get_field_quantiles("Event", "event_date"),
+        )
+        self.assertEqual([0, 23], statistics.get_field_quantiles("Animal", "uuid"))
+
+        with self.assertRaises(ValueError):
+            statistics.add_field_value("Animal", "uuid", "not an int")
+
+    def test_cardinality_estimation_with_sketch_statistics(self) -> None:
+        statistics = SketchStatistics()
+        for index in range(1000):
+            statistics.add_vertex("Animal", {"name": "Bob" if index < 100 else f"animal_{index}"})
+        schema_info = get_query_planning_schema_info(statistics)
+
+        graphql_input = """{
+            Animal {
+                name @filter(op_name: "=", value: ["$name"]) @output(out_name: "animal_name")
+            }
+        }"""
+        bob_analysis = analyze_query_string(
+            schema_info, QueryStringWithParameters(graphql_input, {"name": "Bob"})
+        )
+        self.assertAlmostEqual(100.0, bob_analysis.cardinality_estimate)
+        eve_analysis = analyze_query_string(
+            schema_info, QueryStringWithParameters(graphql_input, {"name": "Eve"})
+        )
+        self.assertAlmostEqual(1.0, eve_analysis.cardinality_estimate)
+
+    def test_invalid_serialization(self) -> None:
+        with self.assertRaises(ValueError):
+            SketchStatistics.from_bytes(b"not statistics" + bytes(100))
+        with self.assertRaises(ValueError):
+            SketchStatistics.from_bytes(SketchStatistics().to_bytes() + b"extra")
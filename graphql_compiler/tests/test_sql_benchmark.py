@@ -0,0 +1,40 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import sqlite3
+import unittest
+
+from .benchmarks.sql_benchmark import (
+    BENCHMARK_QUERIES,
+    BENCHMARKED_DIALECTS,
+    get_plan_differences,
+    get_sqlite_query_plans,
+    load_plan_snapshot,
+    time_sql_compilation,
+)
+from .test_helpers import get_sqlalchemy_schema_info
+
+
+class SqlBenchmarkTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+
+    def test_benchmark_queries_compile_for_all_dialects(self) -> None:
+        for dialect in BENCHMARKED_DIALECTS:
+            sql_schema_info = get_sqlalchemy_schema_info(dialect)
+            for benchmark_query in BENCHMARK_QUERIES:
+                timings = time_sql_compilation(sql_schema_info, benchmark_query, 1)
+                self.assertGreater(timings.total, 0)
+
+    def test_sqlite_query_plans_match_snapshot(self) -> None:
+        snapshot = load_plan_snapshot()
+        if snapshot["sqlite_version"] != sqlite3.sqlite_version:
+            self.skipTest(
+                f"The query plan snapshot was produced with SQLite {snapshot['sqlite_version']}, "
+                f"but SQLite {sqlite3.sqlite_version} is installed."
+            )
+
+        plans = get_sqlite_query_plans()
+        self.assertEqual([], get_plan_differences(snapshot["plans"], plans))
+        self.assertEqual(
+            {benchmark_query.name for benchmark_query in BENCHMARK_QUERIES}, set(plans.keys())
+        )
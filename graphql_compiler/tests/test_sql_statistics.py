@@ -0,0 +1,125 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import datetime
+import os
+import tempfile
+from typing import Any, Dict
+import unittest
+
+import sqlalchemy
+from sqlalchemy.engine import Engine
+
+from ..cost_estimation.sql_statistics import collect_sql_statistics
+from .test_helpers import get_sqlalchemy_schema_info
+
+
+# Names of the schemas containing the test tables outside of MSSQL.
+_TEST_SCHEMA_NAMES = ("schema_1", "schema_2")
+
+
+def _make_animal_row(
+    uuid: str, name: str, birth_year: int, parent: str, species: str
+) -> Dict[str, Any]:
+    """Return the values of a row of the Animal table."""
+    return {
+        "uuid": uuid,
+        "name": name,
+        "birthday": datetime.datetime(birth_year, 1, 1),
+        "parent": parent,
+        "species": species,
+    }
+
+
+class SqlStatisticsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        self.sql_schema_info = get_sqlalchemy_schema_info("postgresql")
+
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temporary_directory.cleanup)
+        self.engine = self._make_sqlite_engine(self.temporary_directory.name)
+
+        tables = self.sql_schema_info.vertex_name_to_table
+        tables["Animal"].metadata.create_all(self.engine)
+        with self.engine.connect() as connection:
+            connection.execute(
+                tables["Species"].insert(),
+                [
+                    {"uuid": "species_1", "name": "Beaver"},
+                    {"uuid": "species_2", "name": "Owl"},
+                ],
+            )
+            connection.execute(
+                tables["Animal"].insert(),
+                [
+                    _make_animal_row("animal_1", "Alice", 2000, "animal_0", "species_1"),
+                    _make_animal_row("animal_2", "Bob", 2001, "animal_1", "species_1"),
+                    _make_animal_row("animal_3", "Bob", 2002, "animal_1", "species_1"),
+                    _make_animal_row("animal_4", "Carol", 2003, "animal_2", "species_2"),
+                    _make_animal_row("animal_5", "Dave", 2004, "animal_9", "species_3"),
+                    _make_animal_row("animal_6", "Eve", 2005, "animal_9", "species_2"),
+                ],
+            )
+
+    def _make_sqlite_engine(self, directory: str) -> Engine:
+        """Return an engine for a SQLite database in the given directory, with the test schemas."""
+        engine = sqlalchemy.create_engine("sqlite:///" + os.path.join(directory, "main.db"))
+
+        # SQLite has no schemas, but an attached database can be referenced in the same way.
+        @sqlalchemy.event.listens_for(engine, "connect")
+        def attach_test_schemas(dbapi_connection, connection_record):
+            """Attach a database file under the name of each test schema."""
+            for schema_name in _TEST_SCHEMA_NAMES:
+                schema_path = os.path.join(directory, schema_name + ".db")
+                dbapi_connection.execute(f"ATTACH DATABASE '{schema_path}' AS {schema_name}")
+
+        return engine
+
+    def test_statistics_of_entire_tables(self) -> None:
+        statistics = collect_sql_statistics(self.sql_schema_info, self.engine, max_workers=4)
+
+        self.assertEqual(6, statistics.get_class_count("Animal"))
+        self.assertEqual(2, statistics.get_class_count("Species"))
+        self.assertEqual(0, statistics.get_class_count("Location"))
+        self.assertEqual(3, statistics.get_class_count("Animal_ParentOf"))
+        self.assertEqual(5, statistics.get_class_count("Animal_OfSpecies"))
+
+        self.assertEqual(
+            3, statistics.get_vertex_edge_vertex_count("Animal", "Animal_ParentOf", "Animal")
+        )
+        self.assertEqual(
+            5, statistics.get_vertex_edge_vertex_count("Animal", "Animal_OfSpecies", "Species")
+        )
+        self.assertEqual(
+            0, statistics.get_vertex_edge_vertex_count("Animal", "Animal_LivesIn", "Location")
+        )
+
+        self.assertEqual(5, statistics.get_distinct_field_values_count("Animal", "name"))
+        self.assertEqual(2, statistics.get_distinct_field_values_count("Species", "name"))
+        self.assertEqual(
+            [datetime.date(year, 1, 1) for year in range(2000, 2006)],
+            statistics.get_field_quantiles("Animal", "birthday"),
+        )
+        self.assertIsNone(statistics.get_field_quantiles("Animal", "name"))
+        self.assertEqual(2, statistics.get_value_count("Animal", "name", "Bob"))
+        self.assertEqual(1, statistics.get_value_count("Animal", "name", "Eve"))
+
+    def test_statistics_of_bounded_samples(self) -> None:
+        statistics = collect_sql_statistics(
+            self.sql_schema_info, self.engine, sample_size=3, quantile_count=2
+        )
+
+        # Class counts are exact, while the other statistics are scaled up from the sample.
+        self.assertEqual(6, statistics.get_class_count("Animal"))
+        self.assertEqual(2, statistics.get_class_count("Species"))
+        self.assertEqual(
+            6, statistics.get_vertex_edge_vertex_count("Animal", "Animal_OfSpecies", "Species")
+        )
+        self.assertEqual(
+            [datetime.date(2000, 1, 1), datetime.date(2002, 1, 1)],
+            statistics.get_field_quantiles("Animal", "birthday"),
+        )
+        self.assertEqual(4, statistics.get_value_count("Animal", "name", "Bob"))
+
+        # One of the two names in the sample appears once, and stands for sqrt(6 / 3) names.
+        self.assertEqual(2, statistics.get_distinct_field_values_count("Animal", "name"))
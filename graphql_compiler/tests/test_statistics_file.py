@@ -0,0 +1,137 @@
+# Copyright 2020-present Kensho Technologies, LLC.
+import datetime
+import decimal
+import os
+import tempfile
+import unittest
+
+from ..cost_estimation.statistics import LocalStatistics, VertexSamplingSummary
+from ..cost_estimation.statistics_file import MappedStatistics, write_statistics_file
+
+
+class StatisticsFileTests(unittest.TestCase):
+    def setUp(self) -> None:
+        """Disable max diff limits for all tests."""
+        self.maxDiff = None
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.file_path = os.path.join(temporary_directory.name, "statistics.bin")
+
+    def test_mapped_statistics_match_local_statistics(self) -> None:
+        statistics_kwargs = {
+            "vertex_edge_vertex_counts": {
+                ("Animal", "Animal_ParentOf", "Animal"): 2000,
+                ("Animal", "Animal_OfSpecies", "Species"): 1000,
+            },
+            "distinct_field_values_counts": {("Animal", "name"): 800, ("Species", "name"): 10},
+            "field_quantiles": {
+                ("Animal", "birthday"): [datetime.date(2000, 1, 1), datetime.date(2010, 1, 1)],
+                ("Animal", "uuid"): [
+                    "00000000-0000-0000-0000-000000000000",
+                    "ffffffff-ffff-ffff-ffff-ffffffffffff",
+                ],
+                ("Event", "event_date"): [
+                    datetime.datetime(2020, 1, 1, 12, 30),
+                    datetime.datetime(2020, 6, 1),
+                    datetime.datetime(2021, 1, 1),
+                ],
+            },
+            "sampling_summaries": {
+                "Animal": VertexSamplingSummary(
+                    "Animal",
+                    {
+                        "name": {"Bob": 3, "Alice": 1},
+                        "net_worth": {decimal.Decimal("1.50"): 2},
+                        "color": {},
+                    },
+                    sample_ratio=10,
+                )
+            },
+        }
+        class_counts = {"Animal": 1000, "Animal_ParentOf": 2000, "Species": 10}
+        write_statistics_file(self.file_path, 1, class_counts, **statistics_kwargs)
+        mapped_statistics = MappedStatistics(self.file_path)
+        local_statistics = LocalStatistics(class_counts, **statistics_kwargs)
+
+        self.assertEqual(1, mapped_statistics.version)
+        for class_name in ("Animal", "Animal_ParentOf", "Species", "Animal_OfSpecies", "A"):
+            self.assertEqual(
+                local_statistics.get_class_count(class_name),
+                mapped_statistics.get_class_count(class_name),
+            )
+        for statistic_key in (
+            ("Animal", "Animal_ParentOf", "Animal"),
+            ("Animal", "Animal_OfSpecies", "Species"),
+            ("Animal", "Animal_LivesIn", "Location"),
+        ):
+            self.assertEqual(
+                local_statistics.get_vertex_edge_vertex_count(*statistic_key),
+                mapped_statistics.get_vertex_edge_vertex_count(*statistic_key),
+            )
+        for vertex_name, field_name in (
+            ("Animal", "name"),
+            ("Species", "name"),
+            ("Animal", "birthday"),
+            ("Animal", "uuid"),
+            ("Event", "event_date"),
+        ):
+            self.assertEqual(
+                local_statistics.get_distinct_field_values_count(vertex_name, field_name),
+                mapped_statistics.get_distinct_field_values_count(vertex_name, field_name),
+            )
+            self.assertEqual(
+                local_statistics.get_field_quantiles(vertex_name, field_name),
+                mapped_statistics.get_field_quantiles(vertex_name, field_name),
+            )
+        for vertex_name, field_name, value in (
+            ("Animal", "name", "Bob"),
+            ("Animal", "name", "Alice"),
+            ("Animal", "name", "Eve"),
+            ("Animal", "name", 1),
+            ("Animal", "net_worth", decimal.Decimal("1.5")),
+            ("Animal", "color", "red"),
+            ("Animal", "description", "fluffy"),
+            ("Species", "name", "Beaver"),
+        ):
+            self.assertEqual(
+                local_statistics.get_value_count(vertex_name, field_name, value),
+                mapped_statistics.get_value_count(vertex_name, field_name, value),
+            )
+
+    def test_published_statistics_are_swapped_in_on_refresh(self) -> None:
+        write_statistics_file(self.file_path, 1, {"Animal": 1000})
+        statistics = MappedStatistics(self.file_path)
+        self.assertFalse(statistics.refresh())
+
+        write_statistics_file(self.file_path, 2, {"Animal": 2000, "Species": 10})
+        self.assertEqual(1, statistics.version)
+        self.assertEqual(1000, statistics.get_class_count("Animal"))
+        self.assertIsNone(statistics.get_class_count("Species"))
+
+        self.assertTrue(statistics.refresh())
+        self.assertEqual(2, statistics.version)
+        self.assertEqual(2000, statistics.get_class_count("Animal"))
+        self.assertEqual(10, statistics.get_class_count("Species"))
+        self.assertFalse(statistics.refresh())
+
+        # No temporary files are left behind.
+        self.assertEqual(["statistics.bin"], os.listdir(os.path.dirname(self.file_path)))
+
+    def test_invalid_statistics(self) -> None:
+        with self.assertRaises(AssertionError):
+            write_statistics_file(
+                self.file_path, 1, {"Animal": 1}, field_quantiles={("Animal", "name"): ["Bob"]}
+            )
+        with self.assertRaises(NotImplementedError):
+            write_statistics_file(
+                self.file_path,
+                1,
+                {"Animal": 1},
+                field_quantiles={("Animal", "name"): [object(), object()]},
+            )
+        self.assertFalse(os.path.exists(self.file_path))
+
+        with open(self.file_path, "wb") as statistics_file:
+            statistics_file.write(b"not a statistics file")
+        with self.assertRaises(ValueError):
+            MappedStatistics(self.file_path)